@@ -3,4 +3,11 @@
 # Licensed under the MIT License.
 # --------------------------------------------------------------------------
 
-from .backend import is_compatible, prepare, run, supports_device  # noqa: F401
+from .backend import (  # noqa: F401
+    clear_session_cache,
+    is_compatible,
+    prepare,
+    run,
+    set_session_cache_size,
+    supports_device,
+)
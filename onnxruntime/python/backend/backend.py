@@ -5,16 +5,160 @@
 """
 Implements ONNX's backend API.
 """
+import functools
+import hashlib
 import os
+import threading
 import unittest
+from collections import OrderedDict
 
+import numpy
 import packaging.version
-from onnx import ModelProto, helper, version  # noqa: F401
+from onnx import AttributeProto, ModelProto, NodeProto, TensorProto, helper, version  # noqa: F401
 from onnx.backend.base import Backend
 from onnx.checker import check_model
+from onnx.defs import onnx_opset_version
 
 from onnxruntime import InferenceSession, SessionOptions, get_available_providers, get_device
 from onnxruntime.backend.backend_rep import OnnxRuntimeBackendRep
+from onnxruntime.capi._pybind_state import get_all_opkernel_def
+
+
+def _get_tensor_element_type(dtype):
+    if dtype.kind in ("U", "S", "O"):
+        return TensorProto.STRING
+    return helper.np_dtype_to_tensor_dtype(dtype)
+
+
+def _get_value_type(value):
+    """
+    Return the kind, element type and rank of a node input,
+    which is a numpy array or a list of numpy arrays for a sequence.
+    """
+    if isinstance(value, list):
+        if not value:
+            raise ValueError("Unable to infer the element type of an empty sequence")
+        element = numpy.asarray(value[0])
+        return ("sequence", _get_tensor_element_type(element.dtype), element.ndim)
+    return ("tensor", _get_tensor_element_type(value.dtype), value.ndim)
+
+
+def _get_value_shape(value):
+    # Shapes of sequence elements are not fixed.
+    return None if isinstance(value, list) else value.shape
+
+
+@functools.lru_cache(maxsize=None)
+def _get_latest_opset_version(domain, op_type=None):
+    """
+    Return the latest opset version of the kernels registered for an operator,
+    or for any operator of the domain when *op_type* is None.
+    """
+    versions = [
+        kernel.version_range[0]
+        for kernel in get_all_opkernel_def()
+        if kernel.domain == domain and op_type in (None, kernel.op_name)
+    ]
+    if versions:
+        return max(versions)
+    if op_type is not None:
+        return _get_latest_opset_version(domain)
+    return onnx_opset_version() if domain == "" else 1
+
+
+def _make_node_model(node, input_names, input_types, input_shapes, outputs_types, domain, opset_version):
+    """
+    Create a model containing only *node*. Inputs and outputs have symbolic
+    dimensions unless *input_shapes* is given, so the model could be run
+    with inputs of any shape.
+    """
+    graph_inputs = []
+    for i, (name, (kind, elem_type, rank)) in enumerate(zip(input_names, input_types)):
+        shape = [f"{name}_dim_{j}" for j in range(rank)]
+        if kind == "sequence":
+            graph_inputs.append(helper.make_tensor_sequence_value_info(name, elem_type, shape))
+        else:
+            graph_inputs.append(
+                helper.make_tensor_value_info(name, elem_type, input_shapes[i] if input_shapes else shape)
+            )
+
+    output_names = [name for name in node.output if name]
+    if outputs_types is None:
+        # Output types are inferred by onnxruntime.
+        graph_outputs = [helper.make_empty_tensor_value_info(name) for name in output_names]
+    else:
+        graph_outputs = [
+            helper.make_tensor_value_info(name, elem_type, [f"{name}_dim_{j}" for j in range(rank)])
+            for name, (elem_type, rank) in zip(output_names, outputs_types)
+        ]
+
+    opset_imports = [helper.make_opsetid(domain, opset_version)]
+    if domain != "":
+        opset_imports.append(helper.make_opsetid("", _get_latest_opset_version("")))
+    graph = helper.make_graph([node], f"{node.op_type}_node", graph_inputs, graph_outputs)
+    return helper.make_model(graph, opset_imports=opset_imports)
+
+
+# Marker in the session cache of run_node for signatures which need static input shapes.
+_STATIC_SHAPES_REQUIRED = object()
+
+
+class _SessionCache:
+    """
+    Bounded LRU cache of :class:`OnnxRuntimeBackendRep` keyed by
+    the digest of the serialized model, the device, the providers
+    and the session options. A maximum size of 0 disables the cache.
+    """
+
+    def __init__(self, max_size=0):
+        self._max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def max_size(self):
+        return self._max_size
+
+    @max_size.setter
+    def max_size(self, max_size):
+        if max_size < 0:
+            raise ValueError(f"Session cache size must be non-negative, got {max_size}")
+        with self._lock:
+            self._max_size = max_size
+            self._evict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        with self._lock:
+            rep = self._entries.get(key)
+            if rep is not None:
+                self._entries.move_to_end(key)
+            return rep
+
+    def put(self, key, rep):
+        with self._lock:
+            if self._max_size == 0:
+                return
+            self._entries[key] = rep
+            self._entries.move_to_end(key)
+            self._evict()
+
+    def clear(self, digest=None):
+        """
+        Remove all entries, or only the entries of the model with the given digest.
+        """
+        with self._lock:
+            if digest is None:
+                self._entries.clear()
+            else:
+                for key in [key for key in self._entries if key[0] == digest]:
+                    del self._entries[key]
+
+    def _evict(self):
+        while len(self._entries) > self._max_size:
+            self._entries.popitem(last=False)
 
 
 class OnnxRuntimeBackend(Backend):
@@ -31,6 +175,81 @@ class OnnxRuntimeBackend(Backend):
 
     allowReleasedOpsetsOnly = bool(os.getenv("ALLOW_RELEASED_ONNX_OPSET_ONLY", "1") == "1")  # noqa: N815
 
+    _session_cache = _SessionCache(int(os.getenv("ORT_ONNX_BACKEND_SESSION_CACHE_SIZE", "0")))
+    _node_session_cache = _SessionCache(int(os.getenv("ORT_ONNX_BACKEND_NODE_SESSION_CACHE_SIZE", "256")))
+
+    @classmethod
+    def set_session_cache_size(cls, max_size):
+        """
+        Enable the cache of prepared models with at most *max_size* entries.
+        When it is enabled, *prepare* and *run_model* reuse the session created
+        for the same model, device and session options instead of creating
+        a new one. The least recently used entries are evicted first.
+        The cache is disabled by default, and it could also be enabled by
+        environment variable ORT_ONNX_BACKEND_SESSION_CACHE_SIZE.
+
+        :param max_size: maximum number of cached sessions, 0 to disable
+            the cache and remove all entries
+        """
+        cls._session_cache.max_size = max_size
+
+    @classmethod
+    def clear_session_cache(cls, model=None):
+        """
+        Remove prepared models from the cache.
+
+        :param model: None to remove all entries including the sessions
+            cached by *run_node*, or ModelProto, string for a filename or
+            bytes for a serialized model to only remove the entries of this model
+        """
+        if model is None:
+            cls._session_cache.clear()
+            cls._node_session_cache.clear()
+        else:
+            cls._session_cache.clear(cls._get_model_digest(model))
+
+    @classmethod
+    def _get_providers(cls):
+        excluded_providers = os.getenv("ORT_ONNX_BACKEND_EXCLUDE_PROVIDERS", default="").split(",")
+        return [x for x in get_available_providers() if (x not in excluded_providers)]
+
+    @classmethod
+    def _create_session(cls, model, providers, **kwargs):
+        options = SessionOptions()
+        for k, v in kwargs.items():
+            if hasattr(options, k):
+                setattr(options, k, v)
+
+        inf = InferenceSession(model, sess_options=options, providers=providers)
+        # backend API is primarily used for ONNX test/validation. As such, we should disable session.run() fallback
+        # which may hide test failures.
+        inf.disable_fallback()
+        return inf
+
+    @classmethod
+    def _get_model_digest(cls, model):
+        if isinstance(model, str):
+            with open(model, "rb") as f:
+                content = f.read()
+        elif isinstance(model, bytes):
+            content = model
+        else:
+            content = model.SerializeToString()
+        return hashlib.sha256(content).hexdigest()
+
+    @classmethod
+    def _get_session_cache_key(cls, model, device, providers, **kwargs):
+        """
+        Return the key of the model in the session cache, or None when the cache is disabled.
+        """
+        if cls._session_cache.max_size == 0:
+            return None
+        options = SessionOptions()
+        session_options = tuple(sorted((k, repr(v)) for k, v in kwargs.items() if hasattr(options, k)))
+        # A model loaded from a file might have external data relative to its path.
+        path = os.path.abspath(model) if isinstance(model, str) else None
+        return (cls._get_model_digest(model), path, device, tuple(providers), session_options)
+
     @classmethod
     def is_compatible(cls, model, device=None, **kwargs):
         """
@@ -108,21 +327,20 @@ class OnnxRuntimeBackend(Backend):
         elif isinstance(model, InferenceSession):
             return OnnxRuntimeBackendRep(model)
         elif isinstance(model, (str, bytes)):
-            options = SessionOptions()
-            for k, v in kwargs.items():
-                if hasattr(options, k):
-                    setattr(options, k, v)
-
-            excluded_providers = os.getenv("ORT_ONNX_BACKEND_EXCLUDE_PROVIDERS", default="").split(",")
-            providers = [x for x in get_available_providers() if (x not in excluded_providers)]
-
-            inf = InferenceSession(model, sess_options=options, providers=providers)
-            # backend API is primarily used for ONNX test/validation. As such, we should disable session.run() fallback
-            # which may hide test failures.
-            inf.disable_fallback()
+            providers = cls._get_providers()
+            cache_key = cls._get_session_cache_key(model, device, providers, **kwargs)
+            if cache_key is not None:
+                rep = cls._session_cache.get(cache_key)
+                if rep is not None:
+                    return rep
+
+            inf = cls._create_session(model, providers, **kwargs)
             if device is not None and not cls.supports_device(device):
                 raise RuntimeError(f"Incompatible device expected '{device}', got '{get_device()}'")
-            return cls.prepare(inf, device, **kwargs)
+            rep = cls.prepare(inf, device, **kwargs)
+            if cache_key is not None:
+                cls._session_cache.put(cache_key, rep)
+            return rep
         else:
             # type: ModelProto
             # check_model serializes the model anyways, so serialize the model once here
@@ -131,6 +349,12 @@ class OnnxRuntimeBackend(Backend):
             onnx_version = packaging.version.parse(version.version) or packaging.version.Version("0")
             onnx_supports_serialized_model_check = onnx_version.release >= (1, 10, 0)
             bin_or_model = model.SerializeToString() if onnx_supports_serialized_model_check else model
+            if cls._session_cache.max_size > 0:
+                # A cached model has passed the checks below, so they are skipped for the same serialized model.
+                bin = bin_or_model if isinstance(bin_or_model, bytes) else bin_or_model.SerializeToString()
+                rep = cls._session_cache.get(cls._get_session_cache_key(bin, device, cls._get_providers(), **kwargs))
+                if rep is not None:
+                    return rep
             check_model(bin_or_model)
             opset_supported, error_message = cls.is_opset_supported(model)
             if not opset_supported:
@@ -162,13 +386,112 @@ class OnnxRuntimeBackend(Backend):
     @classmethod
     def run_node(cls, node, inputs, device=None, outputs_info=None, **kwargs):
         """
-        This method is not implemented as it is much more efficient
-        to run a whole model than every node independently.
+        Compute the outputs of a single node.
+        A model containing only the node is created with input types
+        inferred from *inputs*. Its session is cached by the operator,
+        its attributes, and the element types and ranks of the inputs,
+        so nodes with the same signature share one session.
+        The cache holds at most 256 sessions by default, and the size
+        could be changed by environment variable
+        ORT_ONNX_BACKEND_NODE_SESSION_CACHE_SIZE.
+
+        :param node: NodeProto to run
+        :param inputs: list of inputs, one for each non-empty input name
+            of the node, or a dictionary from input name to input
+        :param device: requested device for the computation,
+            None means the default one which depends on
+            the compilation settings
+        :param outputs_info: None, or a list of tuples (numpy dtype, shape)
+            for the outputs of the node when they cannot be inferred
+        :param kwargs: see :class:`onnxruntime.SessionOptions` and
+            :class:`onnxruntime.RunOptions`, and *opset_version* to override
+            the opset of the node domain, which is the latest version of the
+            operator implemented by onnxruntime by default
+        :return: list of outputs, one for each non-empty output name of the node
         """
-        raise NotImplementedError("It is much more efficient to run a whole model than every node independently.")
+        if device is not None and not cls.supports_device(device):
+            raise RuntimeError(f"Incompatible device expected '{device}', got '{get_device()}'")
+
+        opset_version = kwargs.pop("opset_version", None)
+        input_names = [name for name in node.input if name]
+        if isinstance(inputs, dict):
+            feeds = inputs
+        else:
+            if len(inputs) != len(input_names):
+                raise ValueError(f"Node {node.op_type} expects {len(input_names)} inputs, got {len(inputs)}")
+            feeds = dict(zip(input_names, inputs))
+        feeds = {name: value if isinstance(value, list) else numpy.asarray(value) for name, value in feeds.items()}
+        unique_input_names = list(dict.fromkeys(input_names))
+        input_types = tuple(_get_value_type(feeds[name]) for name in unique_input_names)
+
+        domain = "" if node.domain == "ai.onnx" else node.domain
+        if opset_version is None:
+            opset_version = _get_latest_opset_version(domain, node.op_type)
+
+        # Use canonical names so that nodes with different names share a session. Names are kept when
+        # there is a subgraph, which might refer to the node inputs.
+        node_copy = NodeProto()
+        node_copy.CopyFrom(node)
+        node_copy.ClearField("name")
+        node_copy.ClearField("doc_string")
+        if any(attr.type in (AttributeProto.GRAPH, AttributeProto.GRAPHS) for attr in node.attribute):
+            input_mapping = {name: name for name in unique_input_names}
+        else:
+            input_mapping = {name: f"input_{i}" for i, name in enumerate(unique_input_names)}
+            node_copy.input[:] = [input_mapping.get(name, "") for name in node.input]
+            node_copy.output[:] = [f"output_{i}" if name else "" for i, name in enumerate(node.output)]
+
+        providers = cls._get_providers()
+        options = SessionOptions()
+        session_options = tuple(sorted((k, repr(v)) for k, v in kwargs.items() if hasattr(options, k)))
+        outputs_types = (
+            None
+            if outputs_info is None
+            else tuple((_get_tensor_element_type(numpy.dtype(dtype)), len(shape)) for dtype, shape in outputs_info)
+        )
+        cache_key = (
+            node_copy.SerializeToString(),
+            input_types,
+            outputs_types,
+            opset_version,
+            device,
+            tuple(providers),
+            session_options,
+        )
+        graph_input_names = [input_mapping[name] for name in unique_input_names]
+        rep = cls._node_session_cache.get(cache_key)
+        if rep is _STATIC_SHAPES_REQUIRED:
+            input_shapes = tuple(_get_value_shape(feeds[name]) for name in unique_input_names)
+            cache_key += (input_shapes,)
+            rep = cls._node_session_cache.get(cache_key)
+        else:
+            input_shapes = None
+
+        if rep is None:
+            model = _make_node_model(
+                node_copy, graph_input_names, input_types, input_shapes, outputs_types, domain, opset_version
+            )
+            try:
+                rep = OnnxRuntimeBackendRep(cls._create_session(model.SerializeToString(), providers, **kwargs))
+            except Exception:
+                if input_shapes is not None:
+                    raise
+                # Shape inference of some operators fails without static dimensions, like the length
+                # of 'sizes' in Resize. Such signatures are cached per input shapes instead.
+                cls._node_session_cache.put(cache_key, _STATIC_SHAPES_REQUIRED)
+                input_shapes = tuple(_get_value_shape(feeds[name]) for name in unique_input_names)
+                cache_key += (input_shapes,)
+                model = _make_node_model(
+                    node_copy, graph_input_names, input_types, input_shapes, outputs_types, domain, opset_version
+                )
+                rep = OnnxRuntimeBackendRep(cls._create_session(model.SerializeToString(), providers, **kwargs))
+            cls._node_session_cache.put(cache_key, rep)
+        return rep.run([feeds[name] for name in unique_input_names], **kwargs)
 
 
 is_compatible = OnnxRuntimeBackend.is_compatible
 prepare = OnnxRuntimeBackend.prepare
 run = OnnxRuntimeBackend.run_model
 supports_device = OnnxRuntimeBackend.supports_device
+set_session_cache_size = OnnxRuntimeBackend.set_session_cache_size
+clear_session_cache = OnnxRuntimeBackend.clear_session_cache
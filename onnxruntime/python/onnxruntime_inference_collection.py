@@ -11,6 +11,8 @@ import typing
 import warnings
 from typing import Any, Sequence
 
+import numpy
+
 from onnxruntime.capi import _pybind_state as C
 
 if typing.TYPE_CHECKING:
@@ -119,6 +121,9 @@ class Session:
         # self._sess is managed by the derived class and relies on bindings from C.InferenceSession
         self._sess = None
         self._enable_fallback = True
+        # names of required inputs, which are computed again when the inputs metadata is replaced.
+        self._required_input_names = None
+        self._required_input_names_meta = None
 
     def get_session_options(self):
         "Return the session options. See :class:`onnxruntime.SessionOptions`."
@@ -186,14 +191,15 @@ class Session:
         self._enable_fallback = True
 
     def _validate_input(self, feed_input_names):
-        # import pdb; pdb.set_trace()
-        missing_input_names = []
-        for input in self._inputs_meta:
-            if input.name not in feed_input_names and not input.type.startswith("optional"):
-                missing_input_names.append(input.name)
+        if self._required_input_names is None or self._required_input_names_meta is not self._inputs_meta:
+            self._required_input_names = [
+                input.name for input in self._inputs_meta if not input.type.startswith("optional")
+            ]
+            self._required_input_names_meta = self._inputs_meta
+        missing_input_names = [name for name in self._required_input_names if name not in feed_input_names]
         if missing_input_names:
             raise ValueError(
-                f"Required inputs ({missing_input_names}) are missing from input feed ({feed_input_names})."
+                f"Required inputs ({missing_input_names}) are missing from input feed ({list(feed_input_names)})."
             )
 
     def run(self, output_names, input_feed, run_options=None):
@@ -210,7 +216,7 @@ class Session:
 
             sess.run([output_name], {input_name: x})
         """
-        self._validate_input(list(input_feed.keys()))
+        self._validate_input(input_feed.keys())
         if not output_names:
             output_names = [output.name for output in self._outputs_meta]
         try:
@@ -251,7 +257,7 @@ class Session:
             ort_values = [OrtValue(v) for v in result]
             return ort_values
 
-        self._validate_input(list(input_dict_ort_values.keys()))
+        self._validate_input(input_dict_ort_values.keys())
         if not output_names:
             output_names = [output.name for output in self._outputs_meta]
         try:
@@ -288,6 +294,23 @@ class Session:
         "Return an onnxruntime.IOBinding object`."
         return IOBinding(self)
 
+    def prepare_run(self, input_names=None, output_names=None, run_options=None):
+        """
+        Return an onnxruntime.PreparedRun object which runs the model repeatedly
+        with the same inputs and outputs and takes the input values as positional arguments.
+
+        :param input_names: names of the inputs given to each run, all the model inputs by default.
+        :param output_names: names of the outputs, all the model outputs by default.
+        :param run_options: See :class:`onnxruntime.RunOptions`.
+
+        ::
+
+            prepared_run = sess.prepare_run([input_name], [output_name])
+            for x in batches:
+                result = prepared_run.run(x)
+        """
+        return PreparedRun(self, input_names, output_names, run_options)
+
     def run_with_iobinding(self, iobinding, run_options=None):
         """
         Compute the predictions.
@@ -597,6 +620,163 @@ class IOBinding:
         self._iobinding.clear_binding_outputs()
 
 
+class PreparedRun:
+    """
+    This class runs a session repeatedly with fixed input and output names.
+    Inputs and outputs are validated and bound once. The arrays given to each run are bound without copy
+    when they are C contiguous, have the element type of the input and the session runs on CPU.
+    Otherwise they are converted, or copied to the device of the session.
+    Outputs with a static shape are allocated by the first run and reused by the following runs.
+
+    An instance is not thread safe. Create one instance per thread instead.
+    The instance must be created again after the providers of the session are changed.
+    """
+
+    def __init__(self, session: Session, input_names=None, output_names=None, run_options=None):
+        if input_names is None:
+            input_names = [input.name for input in session.get_inputs()]
+        if output_names is None:
+            output_names = [output.name for output in session.get_outputs()]
+
+        inputs_meta = {input.name: input for input in session.get_overridable_initializers()}
+        inputs_meta.update((input.name, input) for input in session.get_inputs())
+        unknown_input_names = [name for name in input_names if name not in inputs_meta]
+        if unknown_input_names:
+            raise ValueError(f"Inputs ({unknown_input_names}) are not inputs of the model.")
+        session._validate_input(input_names)
+
+        outputs_meta = {output.name: output for output in session.get_outputs()}
+        unknown_output_names = [name for name in output_names if name not in outputs_meta]
+        if unknown_output_names:
+            raise ValueError(f"Outputs ({unknown_output_names}) are not outputs of the model.")
+
+        self._sess = session._sess
+        self._iobinding = C.SessionIOBinding(self._sess)
+        self._input_names = list(input_names)
+        self._output_names = list(output_names)
+        self._output_indices = range(len(self._output_names))
+        self._run_options = run_options if run_options is not None else C.RunOptions()
+        self._device = _get_session_device(session)
+        self._on_cpu = self._device.device_type() == C.OrtDevice.cpu()
+
+        # Numpy type of each input, or None when it could not be shared with numpy.
+        self._input_dtypes = [_NUMPY_DTYPES.get(inputs_meta[name].type) for name in self._input_names]
+        # Arrays bound on CPU are referenced since the bound OrtValues use their data buffers.
+        self._input_arrays = [None] * len(self._input_names)
+
+        # The session reuses the output bound by the previous run, which fails if the shape changes.
+        # So outputs without a static shape are bound again before each run.
+        for name in self._output_names:
+            self._iobinding.bind_output(name, self._device)
+        self._dynamic_output_names = [
+            name
+            for name in self._output_names
+            if not outputs_meta[name].type.startswith("tensor(")
+            or not all(isinstance(dim, int) for dim in outputs_meta[name].shape)
+        ]
+
+    def get_input_names(self):
+        "Return the names of the inputs in the order expected by :meth:`run`."
+        return self._input_names
+
+    def get_output_names(self):
+        "Return the names of the outputs in the order returned by :meth:`run`."
+        return self._output_names
+
+    def _bind_input(self, index, value):
+        name = self._input_names[index]
+        if isinstance(value, OrtValue):
+            self._iobinding.bind_ortvalue_input(name, value._ortvalue)
+            self._input_arrays[index] = value
+            return
+        if not isinstance(value, numpy.ndarray):
+            raise TypeError(f"Input '{name}' must be a numpy.ndarray or an OrtValue, got {type(value).__name__}.")
+
+        dtype = self._input_dtypes[index]
+        if dtype is not None and value.dtype != dtype:
+            value = value.astype(dtype)
+        elif not value.flags.c_contiguous:
+            value = numpy.ascontiguousarray(value)
+        self._iobinding.bind_ortvalue_input(name, C.OrtValue.ortvalue_from_numpy(value, self._device))
+        self._input_arrays[index] = value
+
+    def run(self, *inputs):
+        """
+        Compute the predictions.
+
+        :param inputs: numpy arrays or :class:`onnxruntime.OrtValue` in the order of the input names.
+            Numpy arrays may be bound without copy, so they must not be changed while the run is in progress.
+        :return: list of numpy arrays in the order of the output names.
+        """
+        arrays = self._input_arrays
+        if len(inputs) != len(arrays):
+            raise ValueError(f"Expected {len(arrays)} inputs ({self._input_names}), got {len(inputs)}.")
+
+        # An array bound by the previous run is bound again only when it was copied.
+        for i, value in enumerate(inputs):
+            if value is not arrays[i] or not self._on_cpu:
+                self._bind_input(i, value)
+
+        iobinding = self._iobinding
+        for name in self._dynamic_output_names:
+            iobinding.bind_output(name, self._device)
+
+        self._sess.run_with_iobinding(iobinding, self._run_options)
+        outputs = iobinding.get_outputs()
+        # Indexing is much faster than iterating over OrtValueVector.
+        return [outputs[i].numpy() for i in self._output_indices]
+
+
+# Device type of the memory used by execution providers for inputs and outputs, CPU for the others.
+_PROVIDER_DEVICE_TYPES = {
+    "CUDAExecutionProvider": "cuda",
+    "ROCMExecutionProvider": "cuda",
+    "TensorrtExecutionProvider": "cuda",
+}
+
+
+def _get_session_device(session: Session) -> C.OrtDevice:
+    provider = session.get_providers()[0]
+    device_type = _PROVIDER_DEVICE_TYPES.get(provider, "cpu")
+    device_id = 0
+    if device_type != "cpu":
+        device_id = int(session.get_provider_options().get(provider, {}).get("device_id", 0))
+    return C.OrtDevice(get_ort_device_type(device_type, device_id), C.OrtDevice.default_memory(), device_id)
+
+
+# Numpy types of tensor element types that could be shared with numpy without copy.
+_NUMPY_DTYPES = {
+    "tensor(float)": numpy.float32,
+    "tensor(double)": numpy.float64,
+    "tensor(float16)": numpy.float16,
+    "tensor(int8)": numpy.int8,
+    "tensor(int16)": numpy.int16,
+    "tensor(int32)": numpy.int32,
+    "tensor(int64)": numpy.int64,
+    "tensor(uint8)": numpy.uint8,
+    "tensor(uint16)": numpy.uint16,
+    "tensor(uint32)": numpy.uint32,
+    "tensor(uint64)": numpy.uint64,
+    "tensor(bool)": numpy.bool_,
+}
+
+
+class _OrtValueBuffer:
+    """
+    Exposes the data buffer of a CPU tensor to numpy through the array interface.
+    It holds a reference to the OrtValue so that the buffer is alive as long as numpy arrays using it.
+    """
+
+    def __init__(self, ortvalue: C.OrtValue, dtype):
+        self._ortvalue = ortvalue
+        self.__array_interface__ = {
+            "shape": tuple(ortvalue.shape()),
+            "typestr": numpy.dtype(dtype).str,
+            "data": (ortvalue.data_ptr(), False),
+            "version": 3,
+        }
+
+
 class OrtValue:
     """
     A data structure that supports all ONNX data formats (tensors and non-tensors) that allows users
@@ -747,6 +927,77 @@ class OrtValue:
         """
         return self._ortvalue.numpy()
 
+    def _numpy_view(self):
+        """
+        Returns a numpy array sharing the data buffer of a tensor on CPU.
+        """
+        if not self.is_tensor() or self.device_name() != "cpu":
+            raise ValueError(
+                f"Only tensors on CPU could be shared without copy, got {self.data_type()} on {self.device_name()}"
+            )
+        dtype = _NUMPY_DTYPES.get(self.data_type())
+        if dtype is None:
+            raise ValueError(f"Tensor of {self.data_type()} could not be shared without copy")
+        if 0 in self.shape():
+            return numpy.empty(self.shape(), dtype=dtype)
+        return numpy.asarray(_OrtValueBuffer(self._ortvalue, dtype))
+
+    def to_dlpack(self):
+        """
+        Returns a DLPack capsule of the tensor in the OrtValue. The data buffer is not copied, and
+        it is kept alive until the consumer of the capsule (like torch.from_dlpack) releases it.
+        Without a native DLPack support in this build, only tensors on CPU are supported.
+        """
+        if hasattr(self._ortvalue, "to_dlpack"):
+            return self._ortvalue.to_dlpack()
+        return self._numpy_view().__dlpack__()
+
+    def __dlpack__(self, stream=None):
+        """
+        Returns a DLPack capsule of the tensor (part of __dlpack__ protocol), so that other frameworks
+        could consume the OrtValue without copy, like torch.from_dlpack(ortvalue).
+        """
+        if hasattr(self._ortvalue, "__dlpack__"):
+            return self._ortvalue.__dlpack__(stream)
+        return self._numpy_view().__dlpack__()
+
+    def __dlpack_device__(self):
+        """
+        Returns a tuple of (device type, device index) of the tensor (part of __dlpack__ protocol).
+        """
+        if hasattr(self._ortvalue, "__dlpack_device__"):
+            return self._ortvalue.__dlpack_device__()
+        return self._numpy_view().__dlpack_device__()
+
+    @staticmethod
+    def from_dlpack(data):
+        """
+        Factory method to construct an OrtValue (which holds a Tensor) from a DLPack capsule or
+        an object supporting __dlpack__ protocol (like a torch tensor). The data buffer is not copied.
+        Without a native DLPack support in this build, only tensors on CPU are supported.
+
+        :param data: a DLPack capsule or an object with __dlpack__ method
+        """
+        if hasattr(C.OrtValue, "from_dlpack"):
+            is_bool_tensor = False
+            if hasattr(data, "__dlpack__"):
+                # DLPack (version < 0.8) has no boolean type, so boolean tensors are exported as uint8.
+                is_bool_tensor = str(getattr(data, "dtype", "")) in ("torch.bool", "bool")
+                data = data.__dlpack__()
+            return OrtValue(C.OrtValue.from_dlpack(data, is_bool_tensor))
+
+        if not hasattr(numpy, "from_dlpack"):
+            raise RuntimeError(f"DLPack requires numpy >= 1.22, got {numpy.__version__}")
+        if not hasattr(data, "__dlpack__"):
+            # numpy only consumes objects with __dlpack__ protocol, so wrap the capsule in one.
+            data = _DLPackCapsule(data)
+        array = numpy.from_dlpack(data)
+        # The OrtValue is backed by the buffer of the numpy array which holds the DLPack tensor.
+        return OrtValue(
+            C.OrtValue.ortvalue_from_numpy(array, C.OrtDevice(C.OrtDevice.cpu(), C.OrtDevice.default_memory(), 0)),
+            array,
+        )
+
     def update_inplace(self, np_arr):
         """
         Update the OrtValue in place with a new Numpy array. The numpy contents
@@ -758,6 +1009,21 @@ class OrtValue:
         self._ortvalue.update_inplace(np_arr)
 
 
+class _DLPackCapsule:
+    """
+    Wraps a DLPack capsule on CPU in an object with __dlpack__ protocol.
+    """
+
+    def __init__(self, capsule):
+        self._capsule = capsule
+
+    def __dlpack__(self, stream=None):
+        return self._capsule
+
+    def __dlpack_device__(self):
+        return (1, 0)  # kDLCPU
+
+
 class OrtDevice:
     """
     A data structure that exposes the underlying C++ OrtDevice
@@ -64,20 +64,100 @@ def _shape_to_string(shape):
     return res
 
 
-def _json_to_df(profile_path, filter_matcher):
-    cpu_entries = []
-    gpu_entries = []
-
+class _JsonStreamReader:
+    """Read JSON values one at a time from a file, keeping only a chunk of the file in memory."""
+
+    WHITESPACE = " \t\r\n"
+
+    def __init__(self, opened_file, chunk_size):
+        self.file = opened_file
+        self.chunk_size = chunk_size
+        self.decoder = json.JSONDecoder()
+        self.buffer = ""
+        self.position = 0
+        self.end_of_file = False
+
+    def _read(self):
+        data = self.file.read(self.chunk_size)
+        self.end_of_file = not data
+        self.buffer = self.buffer[self.position :] + data
+        self.position = 0
+
+    def peek(self, skipped_characters=WHITESPACE):
+        """Skip the given characters, and return the next character or empty string at the end of file."""
+        while True:
+            while self.position < len(self.buffer) and self.buffer[self.position] in skipped_characters:
+                self.position += 1
+            if self.position < len(self.buffer) or self.end_of_file:
+                return self.buffer[self.position : self.position + 1]
+            self._read()
+
+    def expect(self, character):
+        next_character = self.peek()
+        if next_character != character:
+            raise ValueError(f"Invalid JSON: expect '{character}' but got '{next_character}'")
+        self.position += 1
+
+    def decode(self):
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.position)
+                # a number might continue in the next chunk, like "1." followed by "5"
+                is_number = isinstance(value, (int, float)) and not isinstance(value, bool)
+                if not is_number or self.end_of_file or (end < len(self.buffer) and self.buffer[end] in ",]} \t\r\n"):
+                    self.position = end
+                    return value
+            except json.JSONDecodeError:
+                if self.end_of_file:
+                    raise
+            self._read()
+
+    def iterate_list(self):
+        self.expect("[")
+        while self.peek(self.WHITESPACE + ",") not in ["]", ""]:
+            yield self.decode()
+        self.expect("]")
+
+
+def _iter_trace_events(profile_path, chunk_size=1 << 20):
+    # Iterate events one by one, so that a large trace does not need to fit in memory. The trace is a list of events,
+    # or an object with events in "traceEvents".
     with open(profile_path, encoding="utf-8") as file_obj:
-        data = json.load(file_obj)
-    if isinstance(data, dict):
-        data = data["traceEvents"]
+        reader = _JsonStreamReader(file_obj, chunk_size)
+        if reader.peek() != "{":
+            yield from reader.iterate_list()
+            return
+
+        reader.expect("{")
+        while reader.peek(reader.WHITESPACE + ",") not in ["}", ""]:
+            key = reader.decode()
+            reader.expect(":")
+            if key == "traceEvents":
+                yield from reader.iterate_list()
+            else:
+                reader.decode()
+
+
+def _add_entry(entries, entry, duration):
+    # entries with the same fields are merged, so that memory usage does not grow with the number of runs
+    key = tuple(entry.values())
+    if key in entries:
+        entries[key]["duration"] += duration
+        entries[key]["count"] += 1
+    else:
+        entries[key] = {**entry, "duration": duration, "count": 1}
+
+
+def _json_to_df(profile_path, filter_matcher):
+    cpu_entries = {}
+    gpu_entries = {}
 
     most_recent_kernel_launch_event = None
     num_missing_kernel_launch_events = 0
     total_kernel_events = 0
 
-    for item in data:
+    for item in _iter_trace_events(profile_path):
         cat = item.get("cat")
         if cat is None:
             continue
@@ -107,30 +187,33 @@ def _json_to_df(profile_path, filter_matcher):
         grid_z = arg.get("grid_z", -1)
 
         if cat == "Kernel":
-            gpu_entries.append(
+            input_type_shape = (
+                _shape_to_string(most_recent_kernel_launch_event["args"]["input_type_shape"])
+                if most_recent_kernel_launch_event is not None
+                else "unknown"
+            )
+            _add_entry(
+                gpu_entries,
                 {
                     "name": name,
-                    "duration": dur,
                     "dimensions": f"{block_x}_{block_y}_{block_z}_{grid_x}_{grid_y}_{grid_z}",
                     "op_name": op_name,
-                    "input_type_shape": (
-                        _shape_to_string(most_recent_kernel_launch_event["args"]["input_type_shape"])
-                        if most_recent_kernel_launch_event is not None
-                        else "unknown"
-                    ),
-                }
+                    "input_type_shape": input_type_shape,
+                },
+                dur,
             )
             total_kernel_events += 1
-            if gpu_entries[-1]["input_type_shape"] == "unknown" and "hipMem" not in gpu_entries[-1]["name"]:
+            if input_type_shape == "unknown" and "hipMem" not in name:
                 num_missing_kernel_launch_events += 1
         else:
-            cpu_entries.append(
+            _add_entry(
+                cpu_entries,
                 {
                     "name": item["args"]["op_name"],
-                    "duration": dur,
                     "input_type_shape": _shape_to_string(item["args"]["input_type_shape"]),
                     "output_type_shape": _shape_to_string(item["args"]["output_type_shape"]),
-                }
+                },
+                dur,
             )
 
     if num_missing_kernel_launch_events > 0:
@@ -138,10 +221,8 @@ def _json_to_df(profile_path, filter_matcher):
             f"WARNNG: Could not resolve shapes for {num_missing_kernel_launch_events} of {total_kernel_events} kernels."
         )
 
-    cpu_df = pd.DataFrame(cpu_entries)
-    gpu_df = pd.DataFrame(gpu_entries)
-    cpu_df["count"] = 1
-    gpu_df["count"] = 1
+    cpu_df = pd.DataFrame(list(cpu_entries.values()))
+    gpu_df = pd.DataFrame(list(gpu_entries.values()))
     return cpu_df, gpu_df
 
 
@@ -13,4 +13,5 @@ from .quantize import StaticQuantConfig  # noqa: F401
 from .quantize import quantize  # noqa: F401
 from .quantize import quantize_dynamic  # noqa: F401
 from .quantize import quantize_static  # noqa: F401
+from .quantize import quantize_weight_only  # noqa: F401
 from .shape_inference import quant_pre_process  # noqa: F401
@@ -5,7 +5,13 @@
 # license information.
 # --------------------------------------------------------------------------
 import abc
+import copy
 import itertools
+import json
+import multiprocessing
+import os
+import queue
+import traceback
 import uuid
 from enum import Enum
 from pathlib import Path
@@ -17,7 +23,7 @@ from onnx import ModelProto, TensorProto, helper, numpy_helper
 
 import onnxruntime
 
-from .quant_utils import apply_plot, clone_model_with_shape_infer, load_model, smooth_distribution
+from .quant_utils import apply_plot, clone_model_with_shape_infer, load_model, smooth_distributions
 
 
 class CalibrationMethod(Enum):
@@ -54,6 +60,9 @@ class CalibraterBase:
         augmented_model_path="augmented_model.onnx",
         symmetric=False,
         use_external_data_format=False,
+        num_workers=1,
+        checkpoint_path=None,
+        checkpoint_interval=100,
     ):
         """
         :param model: ONNX model to calibrate. It can be a ModelProto or a model path
@@ -61,6 +70,12 @@ class CalibraterBase:
         :param augmented_model_path: save augmented model to this path.
         :param symmetric: make range of tensor symmetric (central point is 0).
         :param use_external_data_format: use external data format to store model which size is >= 2Gb
+        :param num_workers: number of worker processes to run the calibration data through. Each worker owns an
+            inference session on the augmented model, and the batches of the data reader are dealt out to them
+            round robin.
+        :param checkpoint_path: if set, the calibration state is saved to this file with save_state every
+            checkpoint_interval batches and at the end of every collect_data call.
+        :param checkpoint_interval: number of batches between two checkpoints.
         """
         if isinstance(model, str):
             self.model = load_model(Path(model), False)
@@ -75,6 +90,15 @@ class CalibraterBase:
         self.augmented_model_path = augmented_model_path
         self.symmetric = symmetric
         self.use_external_data_format = use_external_data_format
+        if num_workers < 1:
+            raise ValueError("Invalid number of workers, which should be >= 1.")
+        self.num_workers = num_workers
+        if checkpoint_interval < 1:
+            raise ValueError("Invalid checkpoint interval, which should be >= 1.")
+        self.checkpoint_path = checkpoint_path
+        self.checkpoint_interval = checkpoint_interval
+        self.num_streamed_batches = 0
+        self.num_batches_to_skip = 0
 
         self.augment_model = None
         self.infer_session = None
@@ -148,6 +172,140 @@ class CalibraterBase:
         """
         raise NotImplementedError
 
+    def skip_checkpointed_batches(self, data_reader: CalibrationDataReader):
+        """
+        Skip the batches of the data reader which were already collected in the state restored by load_state,
+        so that resuming a calibration does not run them again.
+        """
+        for _ in range(self.num_batches_to_skip):
+            if not data_reader.get_next():
+                break
+        self.num_batches_to_skip = 0
+
+    def save_checkpoint(self, batch_done=False):
+        """
+        Save the calibration state to checkpoint_path, if set.
+        :param batch_done: only save if a whole checkpoint_interval of batches has been streamed since the last one.
+        """
+        if self.checkpoint_path is None:
+            return
+        if batch_done and self.num_streamed_batches % self.checkpoint_interval != 0:
+            return
+        self.save_state(self.checkpoint_path)
+
+    def save_state(self, path):
+        """
+        abstract method: save the data collected so far to path, so that the calibration can be resumed with load_state.
+        """
+        raise NotImplementedError
+
+    def load_state(self, path):
+        """
+        abstract method: restore the data saved by save_state. The next collect_data call skips the batches of the
+        data reader that were already collected when the state was saved.
+        """
+        raise NotImplementedError
+
+    def run_data_reader_in_workers(self, data_reader: CalibrationDataReader, output_names, collector, merge_collectors):
+        """
+        Deal the batches of the data reader out to num_workers processes round robin: batch i is the
+        (i // num_workers)-th batch of worker (i % num_workers). Each worker runs its batches through its own session
+        on the augmented model and feeds the outputs to its own copy of collector, so only the reduced data of the
+        workers comes back to this process.
+        The worker processes are spawned, so the calling script needs the usual `if __name__ == "__main__":` guard.
+        :param data_reader: calibration data reader. Its batches must be picklable.
+        :param output_names: names of the outputs to fetch.
+        :param collector: an empty, picklable CalibrationDataCollector.
+        :param merge_collectors: called with the collectors of the workers ordered by worker index. It is called once
+            all the batches are collected, and also every checkpoint_interval batches when checkpoint_path is set,
+            after which the workers start over from an empty collector and the checkpoint is saved.
+        """
+        context = multiprocessing.get_context("spawn")
+        input_queues = [context.Queue(maxsize=2) for _ in range(self.num_workers)]
+        output_queue = context.Queue()
+        intra_op_num_threads = max(1, (os.cpu_count() or 1) // self.num_workers)
+        workers = [
+            context.Process(
+                target=collect_data_worker,
+                args=(
+                    worker_index,
+                    self.augmented_model_path,
+                    self.execution_providers,
+                    intra_op_num_threads,
+                    output_names,
+                    collector,
+                    input_queues[worker_index],
+                    output_queue,
+                ),
+                daemon=True,
+            )
+            for worker_index in range(self.num_workers)
+        ]
+        for worker in workers:
+            worker.start()
+
+        def check_workers_alive():
+            for worker in workers:
+                if worker.exitcode is not None and worker.exitcode != 0:
+                    raise RuntimeError(f"Calibration worker exited unexpectedly with exit code {worker.exitcode}.")
+
+        def put(input_queue, item):
+            while True:
+                try:
+                    input_queue.put(item, timeout=1)
+                    return
+                except queue.Full:
+                    check_workers_alive()
+
+        def merge(message, num_batches):
+            for input_queue in input_queues:
+                put(input_queue, message)
+            collectors = [None] * self.num_workers
+            for _ in range(self.num_workers):
+                while True:
+                    try:
+                        worker_index, worker_collector, error = output_queue.get(timeout=1)
+                        break
+                    except queue.Empty:
+                        check_workers_alive()
+                if error:
+                    raise RuntimeError(f"Calibration worker {worker_index} failed:\n{error}")
+                collectors[worker_index] = worker_collector
+            merge_collectors(collectors)
+            self.num_streamed_batches += num_batches
+
+        completed = False
+        try:
+            num_batches = 0
+            while True:
+                inputs = data_reader.get_next()
+                if not inputs:
+                    break
+                put(input_queues[num_batches % self.num_workers], inputs)
+                num_batches += 1
+                if (
+                    self.checkpoint_path is not None
+                    and (self.num_streamed_batches + num_batches) % self.checkpoint_interval == 0
+                ):
+                    merge(_MERGE_COLLECTOR, num_batches)
+                    self.save_checkpoint()
+                    num_batches = 0
+            merge(None, num_batches)
+            completed = True
+        finally:
+            if not completed:
+                # Workers might wait for batches or be busy with queued ones, so stop them instead of waiting for them.
+                for worker in workers:
+                    worker.terminate()
+                # Batches left in the queues are not flushed to the stopped workers when this process exits.
+                for input_queue in input_queues:
+                    input_queue.cancel_join_thread()
+            for worker in workers:
+                # Workers have sent their collectors and are exiting, or are terminated.
+                worker.join(timeout=10)
+                if worker.is_alive():
+                    worker.terminate()
+
     def compute_range(self, data_reader: CalibrationDataReader):
         """
         abstract method: compute the [min, max] range for the tensors to calibrate based on the collected data.
@@ -165,6 +323,10 @@ class MinMaxCalibrater(CalibraterBase):
         use_external_data_format=False,
         moving_average=False,
         averaging_constant=0.01,
+        streaming=False,
+        num_workers=1,
+        checkpoint_path=None,
+        checkpoint_interval=100,
     ):
         """
         :param model: ONNX model to calibrate. It can be a ModelProto or a model path
@@ -174,6 +336,13 @@ class MinMaxCalibrater(CalibraterBase):
         :param use_external_data_format: use external data format to store model which size is >= 2Gb
         :param moving_average: compute the moving average of the minimum and maximum values instead of the global minimum and maximum.
         :param averaging_constant: constant smoothing factor to use when computing the moving average.
+        :param streaming: fold the outputs of each inference run into running min/max accumulators as they arrive
+            instead of keeping the outputs of every batch in memory until the data reader is exhausted.
+        :param num_workers: number of worker processes to run the calibration data through. Each worker folds the
+            outputs of its share of the batches into its own accumulators, which are combined when it is done.
+            This implies streaming.
+        :param checkpoint_path: save the calibration state to this file periodically. This implies streaming.
+        :param checkpoint_interval: number of batches between two checkpoints.
         """
         super().__init__(
             model,
@@ -181,6 +350,9 @@ class MinMaxCalibrater(CalibraterBase):
             augmented_model_path=augmented_model_path,
             symmetric=symmetric,
             use_external_data_format=use_external_data_format,
+            num_workers=num_workers,
+            checkpoint_path=checkpoint_path,
+            checkpoint_interval=checkpoint_interval,
         )
         self.intermediate_outputs = []
         self.calibrate_tensors_range = None
@@ -190,6 +362,8 @@ class MinMaxCalibrater(CalibraterBase):
         if moving_average and (averaging_constant < 0 or averaging_constant > 1):
             raise ValueError("Invalid averaging constant, which should not be < 0 or > 1.")
         self.averaging_constant = averaging_constant
+        self.streaming = streaming or num_workers > 1 or checkpoint_path is not None
+        self.streamed_outputs = {}
 
     def augment_graph(self):
         """
@@ -239,8 +413,14 @@ class MinMaxCalibrater(CalibraterBase):
 
     def clear_collected_data(self):
         self.intermediate_outputs = []
+        self.num_streamed_batches = 0
+        self.streamed_outputs = {}
 
     def collect_data(self, data_reader: CalibrationDataReader):
+        self.skip_checkpointed_batches(data_reader)
+        if self.streaming:
+            return self.collect_data_streaming(data_reader)
+
         while True:
             inputs = data_reader.get_next()
             if not inputs:
@@ -253,6 +433,99 @@ class MinMaxCalibrater(CalibraterBase):
         self.compute_range()
         self.clear_collected_data()
 
+    def collect_data_streaming(self, data_reader: CalibrationDataReader):
+        """
+        Run the data reader through the augmented model and fold the ReduceMin/ReduceMax outputs of each run into
+        running accumulators, so memory usage does not grow with the number of calibration samples.
+        With several workers, each worker folds its batches into a MinMaxCollector and the collectors are folded into
+        the accumulators of this calibrater.
+        """
+        added_output_names = [output.name for output in self.infer_session.get_outputs()][self.num_model_outputs :]
+        if self.num_workers > 1:
+            self.run_data_reader_in_workers(
+                data_reader, added_output_names, MinMaxCollector(self.moving_average), self.merge_collectors
+            )
+        else:
+            while True:
+                inputs = data_reader.get_next()
+                if not inputs:
+                    break
+                outputs = self.infer_session.run(added_output_names, inputs)
+                for name, value in zip(added_output_names, outputs):
+                    self.fold_streamed_output(name, value)
+                self.num_streamed_batches += 1
+                self.save_checkpoint(batch_done=True)
+
+        if self.num_streamed_batches == 0:
+            raise ValueError("No data is collected.")
+
+        self.compute_range()
+        self.clear_collected_data()
+        self.save_checkpoint()
+
+    def merge_collectors(self, collectors):
+        for collector in collectors:
+            for name, (value, count) in collector.streamed_outputs.items():
+                fold_min_max_output(self.streamed_outputs, name, value, self.moving_average, count)
+
+    def fold_streamed_output(self, name, value):
+        """
+        Fold the output of one ReduceMin/ReduceMax node into its accumulator.
+        """
+        fold_min_max_output(self.streamed_outputs, name, value, self.moving_average)
+
+    def reduce_streamed_outputs(self, output_names):
+        """
+        Turn the streaming accumulators into the same per output values compute_range gets from the buffered outputs.
+        """
+        reduced_outputs = {}
+        for name in output_names:
+            if name not in self.streamed_outputs:
+                reduced_outputs[name] = np.array([], dtype=np.float32)
+                continue
+            value, count = self.streamed_outputs[name]
+            reduced_outputs[name] = value / count if self.moving_average else value
+        return reduced_outputs
+
+    def save_state(self, path):
+        """
+        Save the ranges computed so far, and the accumulators of the batches streamed since the last compute_range,
+        to an .npz file.
+        """
+        names = list(self.streamed_outputs)
+        header = {
+            "calibrator": "MinMaxCalibrater",
+            "symmetric": self.symmetric,
+            "moving_average": self.moving_average,
+            "num_streamed_batches": self.num_streamed_batches,
+            "calibrate_tensors_range": self.calibrate_tensors_range,
+            "streamed_outputs": [[name, self.streamed_outputs[name][1]] for name in names],
+        }
+        arrays = {f"streamed_output_{i}": np.asarray(self.streamed_outputs[name][0]) for i, name in enumerate(names)}
+        write_calibration_state(path, header, arrays)
+
+    def load_state(self, path):
+        """
+        Restore the state saved by save_state.
+        """
+        header, arrays = read_calibration_state(path)
+        if header["calibrator"] != "MinMaxCalibrater":
+            raise ValueError(f"Calibration state {path} was saved by a {header['calibrator']}.")
+        if header["symmetric"] != self.symmetric or header["moving_average"] != self.moving_average:
+            raise ValueError(f"Calibration state {path} was saved with different symmetric or moving_average settings.")
+        if header["num_streamed_batches"] > 0 and not self.streaming:
+            raise ValueError("Resuming a partially collected calibration state requires streaming.")
+
+        calibrate_tensors_range = header["calibrate_tensors_range"]
+        if calibrate_tensors_range is not None:
+            calibrate_tensors_range = {name: tuple(pair) for name, pair in calibrate_tensors_range.items()}
+        self.calibrate_tensors_range = calibrate_tensors_range
+        self.streamed_outputs = {
+            name: [arrays[f"streamed_output_{i}"], count] for i, (name, count) in enumerate(header["streamed_outputs"])
+        }
+        self.num_streamed_batches = header["num_streamed_batches"]
+        self.num_batches_to_skip = self.num_streamed_batches
+
     def merge_range(self, old_range, new_range):
         if not old_range:
             return new_range
@@ -274,32 +547,44 @@ class MinMaxCalibrater(CalibraterBase):
         :return: dictionary mapping: {added node names: (ReduceMin, ReduceMax) pairs }
         """
 
-        if len(self.intermediate_outputs) == 0:
+        if self.streaming:
+            if self.num_streamed_batches == 0:
+                return self.calibrate_tensors_range
+            output_names = [output.name for output in self.infer_session.get_outputs()]
+        elif len(self.intermediate_outputs) == 0:
             return self.calibrate_tensors_range
+        else:
+            output_names = [self.infer_session.get_outputs()[i].name for i in range(len(self.intermediate_outputs[0]))]
 
-        output_names = [self.infer_session.get_outputs()[i].name for i in range(len(self.intermediate_outputs[0]))]
-        output_dicts_list = [
-            dict(zip(output_names, intermediate_output)) for intermediate_output in self.intermediate_outputs
-        ]
-
-        merged_output_dict = {}
-        for d in output_dicts_list:
-            for k, v in d.items():
-                merged_output_dict.setdefault(k, []).append(v)
         added_output_names = output_names[self.num_model_outputs :]
         calibrate_tensor_names = [
             added_output_names[i].rpartition("_")[0] for i in range(0, len(added_output_names), 2)
         ]  # output names
 
-        merged_added_output_dict = {
-            i: merged_output_dict[i] for i in merged_output_dict if i not in self.model_original_outputs
-        }
+        if self.streaming:
+            reduced_outputs = self.reduce_streamed_outputs(added_output_names)
+        else:
+            output_dicts_list = [
+                dict(zip(output_names, intermediate_output)) for intermediate_output in self.intermediate_outputs
+            ]
+
+            merged_output_dict = {}
+            for d in output_dicts_list:
+                for k, v in d.items():
+                    merged_output_dict.setdefault(k, []).append(v)
+
+            merged_added_output_dict = {
+                i: merged_output_dict[i] for i in merged_output_dict if i not in self.model_original_outputs
+            }
 
         pairs = []
         for i in range(0, len(added_output_names), 2):
             min_value = 0
             max_value = 0
-            if self.moving_average:
+            if self.streaming:
+                min_value_array = reduced_outputs[added_output_names[i]]
+                max_value_array = reduced_outputs[added_output_names[i + 1]]
+            elif self.moving_average:
                 min_value_array = np.mean(merged_added_output_dict[added_output_names[i]], axis=0)
                 max_value_array = np.mean(merged_added_output_dict[added_output_names[i + 1]], axis=0)
             else:
@@ -337,6 +622,10 @@ class HistogramCalibrater(CalibraterBase):
         num_bins=128,
         num_quantized_bins=2048,
         percentile=99.999,
+        streaming=False,
+        num_workers=1,
+        checkpoint_path=None,
+        checkpoint_interval=100,
     ):
         """
         :param model: ONNX model to calibrate. It can be a ModelProto or a model path
@@ -348,6 +637,13 @@ class HistogramCalibrater(CalibraterBase):
         :param num_bins: number of bins to create a new histogram for collecting tensor values.
         :param num_quantized_bins: number of quantized bins. Default 128.
         :param percentile: A float number between [0, 100]. Default 99.99.
+        :param streaming: add the outputs of each inference run to the histograms as they arrive instead of keeping
+            the outputs of every batch in memory until the data reader is exhausted.
+        :param num_workers: number of worker processes to run the calibration data through. Each worker builds
+            streaming histograms of its share of the batches on the bins laid out by the first batch, which are
+            merged in worker order. This implies streaming.
+        :param checkpoint_path: save the histograms to this file periodically. This implies streaming.
+        :param checkpoint_interval: number of batches between two checkpoints.
         """
         super().__init__(
             model,
@@ -355,6 +651,9 @@ class HistogramCalibrater(CalibraterBase):
             augmented_model_path=augmented_model_path,
             symmetric=symmetric,
             use_external_data_format=use_external_data_format,
+            num_workers=num_workers,
+            checkpoint_path=checkpoint_path,
+            checkpoint_interval=checkpoint_interval,
         )
         self.intermediate_outputs = []
         self.calibrate_tensors_range = None
@@ -366,6 +665,7 @@ class HistogramCalibrater(CalibraterBase):
         self.num_quantized_bins = num_quantized_bins
         self.percentile = percentile
         self.tensors_to_calibrate = None
+        self.streaming = streaming or num_workers > 1 or checkpoint_path is not None
 
     def augment_graph(self):
         """
@@ -393,6 +693,10 @@ class HistogramCalibrater(CalibraterBase):
         """
         Entropy Calibrator collects operators' tensors as well as generates tensor histogram for each operator.
         """
+        self.skip_checkpointed_batches(data_reader)
+        if self.streaming:
+            return self.collect_data_streaming(data_reader)
+
         while True:
             inputs = data_reader.get_next()
             if not inputs:
@@ -422,10 +726,109 @@ class HistogramCalibrater(CalibraterBase):
                 num_quantized_bins=self.num_quantized_bins,
                 percentile=self.percentile,
             )
+        print("Collecting tensor data and making histogram ...")
         self.collector.collect(clean_merged_dict)
 
         self.clear_collected_data()
 
+    def collect_data_streaming(self, data_reader: CalibrationDataReader):
+        """
+        Run the data reader through the augmented model and add the tensors of each run to the histograms right away,
+        so memory usage does not grow with the number of calibration samples.
+        """
+        output_names = [output.name for output in self.infer_session.get_outputs()]
+        calibrate_output_names = [name for name in output_names if name in self.tensors_to_calibrate]
+
+        if not self.collector:
+            self.collector = self.create_streaming_collector()
+
+        print("Collecting tensor data and making histogram ...")
+        while self.num_workers == 1 or not self.collector.histogram_dict:
+            # With several workers, the first batch lays out the bins all the workers start from, so that their
+            # histograms share bin edges and are merged without moving counts between bins.
+            inputs = data_reader.get_next()
+            if not inputs:
+                break
+            outputs = self.infer_session.run(calibrate_output_names, inputs)
+            self.collector.collect(dict(zip(calibrate_output_names, outputs)))
+            self.num_streamed_batches += 1
+            self.save_checkpoint(batch_done=True)
+
+        if self.num_workers > 1 and self.collector.histogram_dict:
+            self.run_data_reader_in_workers(
+                data_reader, calibrate_output_names, self.collector.copy_layout(), self.merge_collectors
+            )
+
+        if self.num_streamed_batches == 0:
+            raise ValueError("No data is collected.")
+
+        self.num_streamed_batches = 0
+        self.save_checkpoint()
+
+    def merge_collectors(self, collectors):
+        for collector in collectors:
+            self.collector.merge(collector)
+
+    def create_streaming_collector(self):
+        return StreamingHistogramCollector(
+            method=self.method,
+            symmetric=self.symmetric,
+            num_bins=self.num_bins,
+            num_quantized_bins=self.num_quantized_bins,
+            percentile=self.percentile,
+        )
+
+    def save_state(self, path):
+        """
+        Save the histograms collected so far to an .npz file.
+        """
+        histogram_dict = self.collector.get_histogram_dict() if self.collector else {}
+        names = list(histogram_dict)
+        header = {
+            "calibrator": "HistogramCalibrater",
+            "method": self.method,
+            "symmetric": self.symmetric,
+            "num_streamed_batches": self.num_streamed_batches,
+            "tensors": names,
+        }
+        arrays = {}
+        for i, name in enumerate(names):
+            histogram = histogram_dict[name]
+            arrays[f"hist_{i}"] = histogram[0]
+            arrays[f"hist_edges_{i}"] = histogram[1]
+            arrays[f"stats_{i}"] = np.array(histogram[2:])
+        write_calibration_state(path, header, arrays)
+
+    def load_state(self, path):
+        """
+        Restore the histograms saved by save_state.
+        """
+        header, arrays = read_calibration_state(path)
+        if header["calibrator"] != "HistogramCalibrater":
+            raise ValueError(f"Calibration state {path} was saved by a {header['calibrator']}.")
+        if header["method"] != self.method or header["symmetric"] != self.symmetric:
+            raise ValueError(f"Calibration state {path} was saved with a different method or symmetric setting.")
+        if header["num_streamed_batches"] > 0 and not self.streaming:
+            raise ValueError("Resuming a partially collected calibration state requires streaming.")
+
+        if self.streaming:
+            self.collector = self.create_streaming_collector()
+        else:
+            self.collector = HistogramCollector(
+                method=self.method,
+                symmetric=self.symmetric,
+                num_bins=self.num_bins,
+                num_quantized_bins=self.num_quantized_bins,
+                percentile=self.percentile,
+            )
+        for i, name in enumerate(header["tensors"]):
+            hist = arrays[f"hist_{i}"]
+            self.collector.histogram_dict[name] = (hist, arrays[f"hist_edges_{i}"], *arrays[f"stats_{i}"])
+            if self.streaming:
+                self.collector.count_buffers[name] = hist
+        self.num_streamed_batches = header["num_streamed_batches"]
+        self.num_batches_to_skip = self.num_streamed_batches
+
     def compute_range(self):
         """
         Compute the min-max range of tensor
@@ -448,6 +851,10 @@ class EntropyCalibrater(HistogramCalibrater):
         symmetric=False,
         num_bins=128,
         num_quantized_bins=128,
+        streaming=False,
+        num_workers=1,
+        checkpoint_path=None,
+        checkpoint_interval=100,
     ):
         """
         :param model: ONNX model to calibrate. It can be a ModelProto or a model path
@@ -458,6 +865,10 @@ class EntropyCalibrater(HistogramCalibrater):
         :param symmetric: make range of tensor symmetric (central point is 0).
         :param num_bins: number of bins to create a new histogram for collecting tensor values.
         :param num_quantized_bins: number of quantized bins. Default 128.
+        :param streaming: add the outputs of each inference run to the histograms as they arrive.
+        :param num_workers: number of worker processes to run the calibration data through.
+        :param checkpoint_path: save the histograms to this file periodically.
+        :param checkpoint_interval: number of batches between two checkpoints.
         """
         super().__init__(
             model,
@@ -468,6 +879,10 @@ class EntropyCalibrater(HistogramCalibrater):
             symmetric=symmetric,
             num_bins=num_bins,
             num_quantized_bins=num_quantized_bins,
+            streaming=streaming,
+            num_workers=num_workers,
+            checkpoint_path=checkpoint_path,
+            checkpoint_interval=checkpoint_interval,
         )
 
 
@@ -482,6 +897,10 @@ class PercentileCalibrater(HistogramCalibrater):
         symmetric=False,
         num_bins=2048,
         percentile=99.999,
+        streaming=False,
+        num_workers=1,
+        checkpoint_path=None,
+        checkpoint_interval=100,
     ):
         """
         :param model: ONNX model to calibrate. It can be a ModelProto or a model path
@@ -492,6 +911,10 @@ class PercentileCalibrater(HistogramCalibrater):
         :param symmetric: make range of tensor symmetric (central point is 0).
         :param num_quantized_bins: number of quantized bins. Default 128.
         :param percentile: A float number between [0, 100]. Default 99.99.
+        :param streaming: add the outputs of each inference run to the histograms as they arrive.
+        :param num_workers: number of worker processes to run the calibration data through.
+        :param checkpoint_path: save the histograms to this file periodically.
+        :param checkpoint_interval: number of batches between two checkpoints.
         """
         super().__init__(
             model,
@@ -502,6 +925,10 @@ class PercentileCalibrater(HistogramCalibrater):
             symmetric=symmetric,
             num_bins=num_bins,
             percentile=percentile,
+            streaming=streaming,
+            num_workers=num_workers,
+            checkpoint_path=checkpoint_path,
+            checkpoint_interval=checkpoint_interval,
         )
 
 
@@ -527,6 +954,47 @@ class CalibrationDataCollector(metaclass=abc.ABCMeta):
         raise NotImplementedError
 
 
+def fold_min_max_output(accumulators, name, value, moving_average, count=1):
+    """
+    Fold count ReduceMin/ReduceMax outputs, already combined into value, into the accumulator of the output name.
+    The accumulator keeps the running minimum (or maximum), or the running sum when moving_average is enabled,
+    together with the number of outputs folded into it.
+    """
+    if value.size == 0:
+        return
+
+    if name not in accumulators:
+        accumulators[name] = [value.astype(np.float64) if moving_average else value, count]
+        return
+
+    accumulator = accumulators[name]
+    if moving_average:
+        accumulator[0] = accumulator[0] + value
+    elif name.endswith("_ReduceMin"):
+        accumulator[0] = np.minimum(accumulator[0], value)
+    else:
+        accumulator[0] = np.maximum(accumulator[0], value)
+    accumulator[1] += count
+
+
+class MinMaxCollector(CalibrationDataCollector):
+    """
+    Collector folding the ReduceMin/ReduceMax outputs of each inference run into running accumulators, the same way
+    a streaming MinMaxCalibrater does. The worker processes of a parallel calibration collect with it.
+    """
+
+    def __init__(self, moving_average):
+        self.moving_average = moving_average
+        self.streamed_outputs = {}
+
+    def collect(self, name_to_arr):
+        for name, value in name_to_arr.items():
+            fold_min_max_output(self.streamed_outputs, name, value, self.moving_average)
+
+    def compute_collection_result(self):
+        return self.streamed_outputs
+
+
 class HistogramCollector(CalibrationDataCollector):
     """
     Collecting histogram for each tensor. Percentile and Entropy method are supported.
@@ -536,6 +1004,9 @@ class HistogramCollector(CalibrationDataCollector):
                  pytorch_quantization/calib/histogram.html
     """
 
+    # upper bound of the number of elements of the temporary arrays of get_entropy_threshold
+    max_entropy_block_elements = 1 << 22
+
     def __init__(self, method, symmetric, num_bins, num_quantized_bins, percentile):
         self.histogram_dict = {}
         self.method = method
@@ -548,8 +1019,6 @@ class HistogramCollector(CalibrationDataCollector):
         return self.histogram_dict
 
     def collect(self, name_to_arr):
-        print("Collecting tensor data and making histogram ...")
-
         # TODO: Currently we have different collect() for entropy and percentile method respectively.
         #       Need unified collect in the future.
         if self.method == "entropy":
@@ -750,86 +1219,44 @@ class HistogramCollector(CalibrationDataCollector):
         `q` is a truncated version of the original distribution.
         Ref: http://on-demand.gputechconf.com/gtc/2017/presentation/s7310-8-bit-inference-with-tensorrt.pdf
         """
-        import copy
-
-        from scipy.stats import entropy
-
         hist = histogram[0]
         hist_edges = histogram[1]
         num_bins = hist.size
         zero_bin_index = num_bins // 2
         num_half_quantized_bin = num_quantized_bins // 2
 
-        kl_divergence = np.zeros(zero_bin_index - num_half_quantized_bin + 1)
-        thresholds = [(0, 0) for i in range(kl_divergence.size)]
-
         # <------------ num bins ---------------->
         #        <--- quantized bins ---->
         # |======|===========|===========|=======|
         #              zero bin index
         #        ^                       ^
         #        |                       |
-        #   start index               end index          (start of iteration)
+        #   start index               end index          (first candidate)
         #     ^                             ^
         #     |                             |
         #  start index                  end index               ...
         # ^                                      ^
         # |                                      |
-        # start index                    end index       (end of iteration)
-
-        for i in range(num_half_quantized_bin, zero_bin_index + 1, 1):
-            start_index = zero_bin_index - i
-            end_index = zero_bin_index + i + 1 if (zero_bin_index + i + 1) <= num_bins else num_bins
-
-            thresholds[i - num_half_quantized_bin] = (
-                float(hist_edges[start_index]),
-                float(hist_edges[end_index]),
+        # start index                    end index       (last candidate)
+
+        half_widths = np.arange(num_half_quantized_bin, zero_bin_index + 1)
+        start_indices = zero_bin_index - half_widths
+        end_indices = np.minimum(zero_bin_index + half_widths + 1, num_bins)
+
+        # all the candidates are evaluated at once, in blocks of rows bounding the size of the temporary arrays
+        kl_divergence = np.empty(half_widths.size)
+        block_size = max(1, self.max_entropy_block_elements // num_bins)
+        for block_start in range(0, half_widths.size, block_size):
+            block = slice(block_start, block_start + block_size)
+            kl_divergence[block] = self.get_kl_divergences(
+                hist, start_indices[block], end_indices[block], num_quantized_bins
             )
 
-            sliced_distribution = copy.deepcopy(hist[start_index:end_index])
-
-            # reference distribution p
-            p = sliced_distribution.copy()  # a copy of np array
-            left_outliers_count = sum(hist[:start_index])
-            right_outliers_count = sum(hist[end_index:])
-            p[0] += left_outliers_count
-            p[-1] += right_outliers_count
-
-            # nonzeros[i] incidates whether p[i] is non-zero
-            nonzeros = (p != 0).astype(np.int64)
-
-            # quantize p.size bins into quantized bins (default 128 bins)
-            quantized_bins = np.zeros(num_quantized_bins, dtype=np.int64)
-            num_merged_bins = sliced_distribution.size // num_quantized_bins
-
-            # merge bins into quantized bins
-            for index in range(num_quantized_bins):
-                start = index * num_merged_bins
-                end = start + num_merged_bins
-                quantized_bins[index] = sum(sliced_distribution[start:end])
-            quantized_bins[-1] += sum(sliced_distribution[num_quantized_bins * num_merged_bins :])
-
-            # in order to compare p and q, we need to make length of q equals to length of p
-            # expand quantized bins into p.size bins
-            q = np.zeros(p.size, dtype=np.int64)
-            for index in range(num_quantized_bins):
-                start = index * num_merged_bins
-                end = start + num_merged_bins
-
-                norm = sum(nonzeros[start:end])
-                if norm != 0:
-                    q[start:end] = float(quantized_bins[index]) / float(norm)
-
-            p = smooth_distribution(p)
-            q = smooth_distribution(q)
-
-            if isinstance(q, np.ndarray):
-                kl_divergence[i - num_half_quantized_bin] = entropy(p, q)
-            else:
-                kl_divergence[i - num_half_quantized_bin] = float("inf")
-
         min_kl_divergence_idx = np.argmin(kl_divergence)
-        optimal_threshold = thresholds[min_kl_divergence_idx]
+        optimal_threshold = (
+            float(hist_edges[start_indices[min_kl_divergence_idx]]),
+            float(hist_edges[end_indices[min_kl_divergence_idx]]),
+        )
         min_value = histogram[2]
         max_value = histogram[3]
         if optimal_threshold[0] < min_value:
@@ -838,6 +1265,312 @@ class HistogramCollector(CalibrationDataCollector):
             optimal_threshold = (optimal_threshold[0], max_value)
         return optimal_threshold
 
+    @staticmethod
+    def get_kl_divergences(hist, start_indices, end_indices, num_quantized_bins):
+        """
+        Compute the KL divergence between the reference distribution `p` of hist[start_index:end_index], with the
+        outliers added to its first and last bins, and its quantized version `q`, for every candidate slice.
+        Every candidate is one row of 2D arrays padded with zeros, and the sums over merged bins are taken as
+        differences of cumulative sums, so there is no Python loop over candidates or quantized bins.
+        Candidates whose `q` is all zeros get an infinite divergence.
+        """
+        from scipy.special import rel_entr
+
+        num_bins = hist.size
+        lengths = end_indices - start_indices
+        num_merged_bins = lengths // num_quantized_bins
+        rows = np.arange(lengths.size)[:, None]
+        # Rows have the same width in every block, so that their sums are rounded the same way whatever the block size.
+        columns = np.arange(num_bins)
+        valid = columns < lengths[:, None]
+
+        hist_cumsum = np.concatenate(([0], np.cumsum(hist, dtype=np.int64)))
+
+        # reference distribution p
+        p = np.where(valid, hist[np.minimum(start_indices[:, None] + columns, num_bins - 1)], 0)
+        p[:, 0] += hist_cumsum[start_indices]
+        p[rows[:, 0], lengths - 1] += hist_cumsum[-1] - hist_cumsum[end_indices]
+        nonzeros_cumsum = np.concatenate(
+            (np.zeros((lengths.size, 1), dtype=np.int64), np.cumsum(p != 0, axis=1)), axis=1
+        )
+
+        # merge the bins of the slice into quantized bins, the remaining bins go to the last quantized bin
+        merged_bin_offsets = num_merged_bins[:, None] * np.arange(num_quantized_bins + 1)
+        merged_bin_edges = start_indices[:, None] + merged_bin_offsets
+        quantized_bins = hist_cumsum[merged_bin_edges[:, 1:]] - hist_cumsum[merged_bin_edges[:, :-1]]
+        quantized_bins[:, -1] += hist_cumsum[end_indices] - hist_cumsum[merged_bin_edges[:, -1]]
+
+        # expand the quantized bins back over the non-zero bins of p
+        norms = nonzeros_cumsum[rows, merged_bin_offsets[:, 1:]] - nonzeros_cumsum[rows, merged_bin_offsets[:, :-1]]
+        expanded_bins = np.where(norms != 0, quantized_bins / np.maximum(norms, 1), 0).astype(np.int64)
+        merged_bin_indices = np.minimum(columns // num_merged_bins[:, None], num_quantized_bins - 1)
+        q = np.where(
+            columns < (num_quantized_bins * num_merged_bins)[:, None], expanded_bins[rows, merged_bin_indices], 0
+        )
+
+        p, p_smoothable = smooth_distributions(p, lengths)
+        q, q_smoothable = smooth_distributions(q, lengths)
+
+        # scipy.stats.entropy(p, q) of every row. Entries past the length of a candidate are zeros after smoothing,
+        # so the sums are taken over whole rows.
+        kl_divergences = np.full(lengths.size, np.inf)
+        candidates = np.flatnonzero(p_smoothable & q_smoothable)
+        p = p[candidates]
+        q = q[candidates]
+        relative_entropies = rel_entr(p / p.sum(axis=1, keepdims=True), q / q.sum(axis=1, keepdims=True))
+        kl_divergences[candidates] = relative_entropies.sum(axis=1)
+        return kl_divergences
+
+
+class StreamingHistogramCollector(HistogramCollector):
+    """
+    Histogram collector which is fed the tensors of one inference run at a time.
+
+    HistogramCollector builds the histograms from the outputs of all the batches at once. This collector keeps one
+    histogram per tensor and adds the counts of every batch into it in place. The bins are only laid out again when a
+    batch falls outside of the current range, in which case the layout is extended by whole bins of the same width
+    so the counts already collected stay in their bins.
+    """
+
+    def __init__(self, method, symmetric, num_bins, num_quantized_bins, percentile):
+        super().__init__(method, symmetric, num_bins, num_quantized_bins, percentile)
+        self.count_buffers = {}
+
+    def collect_absolute_value(self, name_to_arr):
+        """
+        Collect histogram on absolute value. The histogram starts at 0 and only grows at the top, and its counts live
+        in a buffer which grows geometrically so that extending the range does not reallocate on every batch.
+        """
+        for tensor, data_arr in name_to_arr.items():
+            data_arr = np.asarray(data_arr).ravel()  # noqa: PLW2901
+            if data_arr.size > 0:
+                min_value = np.min(data_arr)
+                max_value = np.max(data_arr)
+            else:
+                min_value = 0
+                max_value = 0
+
+            data_arr = np.absolute(data_arr)  # only consider absolute value  # noqa: PLW2901
+            amax = max(abs(min_value), abs(max_value))
+
+            if tensor not in self.histogram_dict:
+                hist, hist_edges = np.histogram(data_arr, bins=self.num_bins, range=(0, amax))
+                self.count_buffers[tensor] = hist
+                self.histogram_dict[tensor] = (hist, hist_edges, min_value, max_value)
+                continue
+
+            old_hist, old_hist_edges, old_min, old_max = self.histogram_dict[tensor]
+            hist_edges = old_hist_edges
+            num_bins = old_hist.size
+            if amax > old_hist_edges[-1]:
+                # increase the number of bins, keeping the width of the existing ones
+                width = old_hist_edges[1] - old_hist_edges[0]
+                num_bins += int(np.ceil((amax - old_hist_edges[-1]) / width))
+                if old_hist_edges[0] + num_bins * width < amax:
+                    num_bins += 1
+                hist_edges = old_hist_edges[0] + width * np.arange(num_bins + 1)
+
+                buffer = self.count_buffers[tensor]
+                if num_bins > buffer.size:
+                    new_buffer = np.zeros(max(num_bins, 2 * buffer.size), dtype=buffer.dtype)
+                    new_buffer[: old_hist.size] = old_hist
+                    self.count_buffers[tensor] = new_buffer
+
+            hist = self.count_buffers[tensor][:num_bins]
+            hist += np.histogram(data_arr, bins=num_bins, range=(hist_edges[0], hist_edges[-1]))[0]
+            self.histogram_dict[tensor] = (hist, hist_edges, min(old_min, min_value), max(old_max, max_value))
+
+    def collect_value(self, name_to_arr):
+        """
+        Collect histogram on real value. Batches within the current threshold are added in place, wider ones extend
+        the histogram symmetrically the same way merge_histogram does.
+        """
+        for tensor, data_arr in name_to_arr.items():
+            data_arr = np.asarray(data_arr).ravel()  # noqa: PLW2901
+
+            if data_arr.size > 0:
+                min_value = np.min(data_arr)
+                max_value = np.max(data_arr)
+            else:
+                min_value = 0
+                max_value = 0
+
+            threshold = max(abs(min_value), abs(max_value))
+
+            if tensor not in self.histogram_dict:
+                hist, hist_edges = np.histogram(data_arr, self.num_bins, range=(-threshold, threshold))
+                self.histogram_dict[tensor] = (hist, hist_edges, min_value, max_value, threshold)
+                continue
+
+            old_histogram = self.histogram_dict[tensor]
+            (old_hist, old_hist_edges, old_min, old_max, old_threshold) = old_histogram
+            if threshold <= old_threshold:
+                old_hist += np.histogram(data_arr, old_hist.size, range=(-old_threshold, old_threshold))[0]
+                self.histogram_dict[tensor] = (
+                    old_hist,
+                    old_hist_edges,
+                    min(old_min, min_value),
+                    max(old_max, max_value),
+                    old_threshold,
+                )
+            else:
+                self.histogram_dict[tensor] = self.merge_histogram(
+                    old_histogram, data_arr, min_value, max_value, threshold
+                )
+
+    def copy_layout(self):
+        """
+        Return an empty StreamingHistogramCollector with the bins of this one. The histograms of collectors created
+        from the same layout keep sharing bin edges as they grow, since their ranges are only extended by whole bins
+        of the same width.
+        """
+        collector = StreamingHistogramCollector(
+            self.method, self.symmetric, self.num_bins, self.num_quantized_bins, self.percentile
+        )
+        for tensor, histogram in self.histogram_dict.items():
+            collector.histogram_dict[tensor] = (np.zeros_like(histogram[0]), *histogram[1:])
+            collector.count_buffers[tensor] = collector.histogram_dict[tensor][0]
+        return collector
+
+    def merge(self, other):
+        """
+        Merge the histograms collected by another StreamingHistogramCollector into this one.
+        When the bin edges of one histogram are a subset of the bin edges of the other one, as with collectors created
+        by copy_layout, the counts are added bin by bin. Otherwise, the counts of the histogram with the narrower
+        range are moved, by bin center, into the bins of the one with the wider range.
+        The result only depends on the order of the merges.
+        """
+        for tensor, histogram in other.histogram_dict.items():
+            if tensor not in self.histogram_dict:
+                self.histogram_dict[tensor] = (histogram[0].copy(), *histogram[1:])
+            else:
+                self.histogram_dict[tensor] = self.merge_histograms(self.histogram_dict[tensor], histogram)
+            self.count_buffers[tensor] = self.histogram_dict[tensor][0]
+
+    def merge_histograms(self, histogram, other_histogram):
+        if other_histogram[1][-1] - other_histogram[1][0] > histogram[1][-1] - histogram[1][0]:
+            histogram, other_histogram = other_histogram, histogram
+        hist, hist_edges = histogram[:2]
+        other_hist, other_hist_edges = other_histogram[:2]
+
+        offset = get_bin_offset(hist_edges, other_hist_edges)
+        if offset is not None:
+            merged_hist = hist.copy()
+            merged_hist[offset : offset + other_hist.size] += other_hist
+        else:
+            if max(abs(other_histogram[2]), abs(other_histogram[3])) == 0:
+                # all the values of a histogram with an empty range are 0, whatever its edges are
+                other_bin_centers = np.zeros(other_hist.size)
+            else:
+                other_bin_centers = np.clip(
+                    (other_hist_edges[:-1] + other_hist_edges[1:]) / 2, hist_edges[0], hist_edges[-1]
+                )
+            other_counts, _ = np.histogram(
+                other_bin_centers, hist.size, range=(hist_edges[0], hist_edges[-1]), weights=other_hist
+            )
+            merged_hist = hist + other_counts.astype(hist.dtype)
+
+        min_value = min(histogram[2], other_histogram[2])
+        max_value = max(histogram[3], other_histogram[3])
+        if len(histogram) == 5:
+            return (merged_hist, hist_edges, min_value, max_value, histogram[4])
+        return (merged_hist, hist_edges, min_value, max_value)
+
+
+def get_bin_offset(hist_edges, other_hist_edges):
+    """
+    Return the index of the bin of hist_edges where the bins of other_hist_edges start, if other_hist_edges are
+    consecutive edges of hist_edges, None otherwise.
+    """
+    width = hist_edges[1] - hist_edges[0]
+    if not width > 0:
+        return None
+    offset = int(np.round((other_hist_edges[0] - hist_edges[0]) / width))
+    if offset < 0 or offset + other_hist_edges.size > hist_edges.size:
+        return None
+    if not np.allclose(
+        other_hist_edges, hist_edges[offset : offset + other_hist_edges.size], rtol=0, atol=width * 1e-6
+    ):
+        return None
+    return offset
+
+
+def write_calibration_state(path, header, arrays):
+    """
+    Write a calibration state to an .npz file: the JSON encoded header plus the given arrays.
+    The file is written next to path first and then moved over it, so an interrupted save never leaves a
+    truncated checkpoint behind.
+    """
+    path = str(path)
+    temp_path = path + ".tmp"
+    with open(temp_path, "wb") as f:
+        np.savez_compressed(f, header=np.array(json.dumps(header)), **arrays)
+    os.replace(temp_path, path)
+
+
+def read_calibration_state(path):
+    """
+    Read a calibration state written by write_calibration_state.
+    :return: (header, dictionary of arrays)
+    """
+    with np.load(path, allow_pickle=False) as data:
+        arrays = {key: data[key] for key in data.files}
+    header = json.loads(str(arrays.pop("header")))
+    return header, arrays
+
+
+# Message telling a calibration worker to send back its collector and start over from an empty one.
+_MERGE_COLLECTOR = "merge"
+
+
+def collect_data_worker(
+    worker_index,
+    augmented_model_path,
+    execution_providers,
+    intra_op_num_threads,
+    output_names,
+    collector,
+    input_queue,
+    output_queue,
+):
+    """
+    Entry point of the worker processes of CalibraterBase.run_data_reader_in_workers.
+    It runs the batches it receives from input_queue and feeds their outputs to a copy of collector. When it gets
+    _MERGE_COLLECTOR or None, it puts (worker_index, collector, formatted exception or None) to output_queue. After
+    _MERGE_COLLECTOR it starts over from a new copy of collector, after None it stops.
+    """
+    empty_collector = collector
+    collector = copy.deepcopy(empty_collector)
+    error = None
+    try:
+        sess_options = onnxruntime.SessionOptions()
+        sess_options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_DISABLE_ALL
+        sess_options.intra_op_num_threads = intra_op_num_threads
+        infer_session = onnxruntime.InferenceSession(
+            augmented_model_path,
+            sess_options=sess_options,
+            providers=execution_providers,
+        )
+    except Exception:
+        error = traceback.format_exc()
+
+    while True:
+        inputs = input_queue.get()
+        if inputs is None or isinstance(inputs, str):
+            output_queue.put((worker_index, collector, error))
+            if inputs is None:
+                break
+            collector = copy.deepcopy(empty_collector)
+            continue
+        if error:
+            # keep draining the queue so the main process does not block on a full queue
+            continue
+        try:
+            outputs = infer_session.run(output_names, inputs)
+            collector.collect(dict(zip(output_names, outputs)))
+        except Exception:
+            error = traceback.format_exc()
+
 
 def create_calibrator(
     model,
@@ -848,11 +1581,18 @@ def create_calibrator(
     extra_options={},  # noqa: B006
 ):
     calibrator = None
+    num_workers = extra_options.get("num_workers", 1)
+    checkpoint_path = extra_options.get("checkpoint_path")
+    checkpoint_interval = extra_options.get("checkpoint_interval", 100)
+    resume_from_checkpoint = extra_options.get("resume_from_checkpoint", False)
+    if resume_from_checkpoint and checkpoint_path is None:
+        raise ValueError("resume_from_checkpoint requires checkpoint_path.")
     if calibrate_method == CalibrationMethod.MinMax:
         # default settings for min-max algorithm
-        symmetric = False if "symmetric" not in extra_options else extra_options["symmetric"]
-        moving_average = False if "moving_average" not in extra_options else extra_options["moving_average"]
-        averaging_constant = 0.01 if "averaging_constant" not in extra_options else extra_options["averaging_constant"]
+        symmetric = extra_options.get("symmetric", False)
+        moving_average = extra_options.get("moving_average", False)
+        averaging_constant = extra_options.get("averaging_constant", 0.01)
+        streaming = extra_options.get("streaming", False)
         calibrator = MinMaxCalibrater(
             model,
             op_types_to_calibrate,
@@ -861,12 +1601,17 @@ def create_calibrator(
             symmetric=symmetric,
             moving_average=moving_average,
             averaging_constant=averaging_constant,
+            streaming=streaming,
+            num_workers=num_workers,
+            checkpoint_path=checkpoint_path,
+            checkpoint_interval=checkpoint_interval,
         )
     elif calibrate_method == CalibrationMethod.Entropy:
         # default settings for entropy algorithm
-        num_bins = 128 if "num_bins" not in extra_options else extra_options["num_bins"]
-        num_quantized_bins = 128 if "num_quantized_bins" not in extra_options else extra_options["num_quantized_bins"]
-        symmetric = False if "symmetric" not in extra_options else extra_options["symmetric"]
+        num_bins = extra_options.get("num_bins", 128)
+        num_quantized_bins = extra_options.get("num_quantized_bins", 128)
+        symmetric = extra_options.get("symmetric", False)
+        streaming = extra_options.get("streaming", False)
         calibrator = EntropyCalibrater(
             model,
             op_types_to_calibrate,
@@ -875,12 +1620,17 @@ def create_calibrator(
             symmetric=symmetric,
             num_bins=num_bins,
             num_quantized_bins=num_quantized_bins,
+            streaming=streaming,
+            num_workers=num_workers,
+            checkpoint_path=checkpoint_path,
+            checkpoint_interval=checkpoint_interval,
         )
     elif calibrate_method == CalibrationMethod.Percentile:
         # default settings for percentile algorithm
-        num_bins = 2048 if "num_bins" not in extra_options else extra_options["num_bins"]
-        percentile = 99.999 if "percentile" not in extra_options else extra_options["percentile"]
-        symmetric = True if "symmetric" not in extra_options else extra_options["symmetric"]
+        num_bins = extra_options.get("num_bins", 2048)
+        percentile = extra_options.get("percentile", 99.999)
+        symmetric = extra_options.get("symmetric", True)
+        streaming = extra_options.get("streaming", False)
         calibrator = PercentileCalibrater(
             model,
             op_types_to_calibrate,
@@ -889,11 +1639,17 @@ def create_calibrator(
             symmetric=symmetric,
             num_bins=num_bins,
             percentile=percentile,
+            streaming=streaming,
+            num_workers=num_workers,
+            checkpoint_path=checkpoint_path,
+            checkpoint_interval=checkpoint_interval,
         )
 
     if calibrator:
         calibrator.augment_graph()
         calibrator.create_inference_session()
+        if resume_from_checkpoint and os.path.exists(checkpoint_path):
+            calibrator.load_state(checkpoint_path)
         return calibrator
 
     raise ValueError(f"Unsupported calibration method {calibrate_method}")
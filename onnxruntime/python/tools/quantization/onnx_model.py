@@ -1,3 +1,4 @@
+import logging
 from pathlib import Path
 
 import onnx
@@ -88,6 +89,105 @@ def _clean_initializers_helper(graph, model):
 class ONNXModel:
     def __init__(self, model):
         self.model = model
+        self.invalidate_index()
+
+    def invalidate_index(self):
+        """Drop the index of the graph, so that it is rebuilt on next lookup.
+
+        The index (initializers, value infos, producer and consumers of tensors) is kept up to date by the methods of
+        this class that change the graph. Adding or removing nodes, initializers, inputs, outputs or value infos
+        directly through the protobuf is detected. Code that changes inputs or outputs of a node in place shall use
+        replace_input_of_node/replace_output_of_node or call reindex_node afterwards, and code that replaces nodes of
+        the graph shall call this method afterwards. Other changes in place are detected when looking up the changed
+        names, at the cost of a scan of the graph.
+        """
+        self._index_fingerprint = None
+
+    def _graph_fingerprint(self):
+        graph = self.model.graph
+        return (
+            id(self.model),
+            len(graph.node),
+            len(graph.initializer),
+            len(graph.input),
+            len(graph.output),
+            len(graph.value_info),
+        )
+
+    def _ensure_index(self):
+        if self._index_fingerprint is None or self._index_fingerprint != self._graph_fingerprint():
+            self._build_index()
+
+    def _build_index(self):
+        graph = self.model.graph
+        self._producers = {}  # output name to node
+        self._consumers = {}  # input name to nodes in graph order
+        self._node_io = {}  # id of node in the graph to its inputs and outputs when it is indexed
+        self._initializers = {}
+        self._value_infos = {}  # graph input has priority over graph output and value_info, like ONNXQuantizer
+        self._graph_inputs = set()
+        self._graph_outputs = set()
+
+        for node in graph.node:
+            self._index_node(node)
+        for tensor in graph.initializer:
+            self._initializers.setdefault(tensor.name, tensor)
+        for value_infos in (graph.value_info, graph.output, graph.input):
+            self._value_infos.update({value_info.name: value_info for value_info in value_infos})
+        self._graph_inputs.update(input.name for input in graph.input)
+        self._graph_outputs.update(output.name for output in graph.output)
+        self._index_fingerprint = self._graph_fingerprint()
+
+    def _index_node(self, node):
+        self._node_io[id(node)] = (tuple(node.input), tuple(node.output))
+        for input_name in node.input:
+            self._consumers.setdefault(input_name, []).append(node)
+        for output_name in node.output:
+            self._producers[output_name] = node
+
+    def _unindex_node(self, node):
+        # Use names when the node was indexed, since they might be changed in place after that.
+        node_inputs, node_outputs = self._node_io.pop(id(node))
+        for input_name in node_inputs:
+            consumers = self._consumers.get(input_name, [])
+            for i, consumer in enumerate(consumers):
+                if consumer is node:
+                    del consumers[i]
+                    break
+            if not consumers:
+                self._consumers.pop(input_name, None)
+        for output_name in node_outputs:
+            if self._producers.get(output_name) is node:
+                del self._producers[output_name]
+
+    def reindex_node(self, node):
+        """Update the index after inputs or outputs of a node in the graph are changed in place."""
+        if self._index_fingerprint is not None and id(node) in self._node_io:
+            self._unindex_node(node)
+            self._index_node(node)
+
+    def _reindex_changed_nodes(self):
+        """Update the index for nodes whose inputs or outputs were changed in place without reindex_node."""
+        changed_nodes = []
+        for node in self.model.graph.node:
+            node_io = self._node_io.get(id(node))
+            if node_io is None:
+                # a node is replaced directly through the protobuf.
+                self._build_index()
+                return
+            if node_io != (tuple(node.input), tuple(node.output)):
+                changed_nodes.append(node)
+        if changed_nodes:
+            logging.debug(f"Update index of nodes changed in place: {[node.name for node in changed_nodes]}")
+            for node in changed_nodes:
+                self.reindex_node(node)
+
+    @staticmethod
+    def _remove_from_repeated_field(field, items):
+        # Messages compare by value, so remove items by identity instead of using field.remove.
+        item_ids = {id(item) for item in items}
+        for i in reversed([i for i, item in enumerate(field) if id(item) in item_ids]):
+            del field[i]
 
     def nodes(self):
         return self.model.graph.node
@@ -105,43 +205,100 @@ class ONNXModel:
         return self.model.opset_import
 
     def remove_node(self, node):
-        if node in self.model.graph.node:
-            self.model.graph.node.remove(node)
+        self.remove_nodes([node])
 
     def remove_nodes(self, nodes_to_remove):
+        self._ensure_index()
+        indexed_nodes = []
         for node in nodes_to_remove:
-            self.remove_node(node)
+            if id(node) in self._node_io:
+                self._unindex_node(node)
+                indexed_nodes.append(node)
+            elif node in self.model.graph.node:
+                # A copy of a node in the graph is removed by value.
+                self.model.graph.node.remove(node)
+                self.invalidate_index()
+        self._remove_from_repeated_field(self.model.graph.node, indexed_nodes)
+        if self._index_fingerprint is not None:
+            self._index_fingerprint = self._graph_fingerprint()
 
     def add_node(self, node):
-        self.model.graph.node.extend([node])
+        self.add_nodes([node])
 
     def add_nodes(self, nodes_to_add):
+        self._ensure_index()
+        start = len(self.model.graph.node)
         self.model.graph.node.extend(nodes_to_add)
+        # extend adds copies of the nodes, so index the nodes in the graph.
+        for i in range(start, len(self.model.graph.node)):
+            self._index_node(self.model.graph.node[i])
+        self._index_fingerprint = self._graph_fingerprint()
 
     def add_initializer(self, tensor):
-        if find_by_name(tensor.name, self.model.graph.initializer) is None:
-            self.model.graph.initializer.extend([tensor])
+        self.add_initializers([tensor])
+
+    def add_initializers(self, tensors):
+        """Add initializers to the graph.
+
+        Like add_initializer, an initializer is skipped when the graph has one with the same name, since initializer
+        names shall be unique in a graph. Use remove_initializer first to replace an initializer.
+        """
+        self._ensure_index()
+        for tensor in tensors:
+            if tensor.name not in self._initializers:
+                self.model.graph.initializer.extend([tensor])
+                self._initializers[tensor.name] = self.model.graph.initializer[-1]
+        self._index_fingerprint = self._graph_fingerprint()
 
     def get_initializer(self, name):
-        for tensor in self.model.graph.initializer:
-            if tensor.name == name:
-                return tensor
-        return None
+        self._ensure_index()
+        return self._initializers.get(name)
 
     def get_initializer_name_set(self):
-        return {initializer.name for initializer in self.model.graph.initializer}
+        self._ensure_index()
+        return set(self._initializers)
 
     def remove_initializer(self, tensor):
-        if tensor in self.model.graph.initializer:
-            self.model.graph.initializer.remove(tensor)
-            for input in self.model.graph.input:
-                if input.name == tensor.name:
-                    self.model.graph.input.remove(input)
-                    break
+        self.remove_initializers([tensor])
 
     def remove_initializers(self, init_to_remove):
-        for initializer in init_to_remove:
-            self.remove_initializer(initializer)
+        """Remove initializers, and graph inputs of the same names, in a single pass over the graph."""
+        self._ensure_index()
+        graph = self.model.graph
+        indexed_tensors = []
+        removed_names = set()
+        for tensor in init_to_remove:
+            if self._initializers.get(tensor.name) is tensor:
+                indexed_tensors.append(tensor)
+            elif tensor in graph.initializer:
+                # A duplicated name or a copy of an initializer is removed by value.
+                graph.initializer.remove(tensor)
+                self.invalidate_index()
+            else:
+                continue
+            removed_names.add(tensor.name)
+        if not removed_names:
+            return
+
+        self._remove_from_repeated_field(graph.initializer, indexed_tensors)
+        removed_inputs = [input for input in graph.input if input.name in removed_names]
+        if removed_inputs:
+            self._remove_from_repeated_field(graph.input, removed_inputs)
+            self.invalidate_index()
+        if self._index_fingerprint is None:
+            return
+        for tensor in indexed_tensors:
+            del self._initializers[tensor.name]
+        # an initializer with the same name might still be in the graph
+        for tensor in graph.initializer:
+            if tensor.name in removed_names:
+                self._initializers.setdefault(tensor.name, tensor)
+        self._index_fingerprint = self._graph_fingerprint()
+
+    def get_value_info(self, name):
+        """Get value info of a graph input, graph output or intermediate tensor."""
+        self._ensure_index()
+        return self._value_infos.get(name)
 
     def get_non_initializer_inputs(self):
         initializer_names = self.get_initializer_name_set()
@@ -151,37 +308,52 @@ class ONNXModel:
                 non_initializer_inputs.add(input.name)
         return non_initializer_inputs
 
+    def get_producer(self, tensor_name):
+        """Get the node that outputs a tensor, or None for graph inputs and initializers."""
+        self._ensure_index()
+        return self._get_indexed_producer(tensor_name)
+
+    def get_consumers(self, tensor_name):
+        """Get nodes in the graph that take a tensor as input. A node is listed once for each time it uses it."""
+        self._ensure_index()
+        return list(self._get_indexed_consumers(tensor_name))
+
     def input_name_to_nodes(self):
-        input_name_to_nodes = {}
-        for node in self.model.graph.node:
-            for input_name in node.input:
-                if input_name not in input_name_to_nodes:
-                    input_name_to_nodes[input_name] = [node]
-                else:
-                    input_name_to_nodes[input_name].append(node)
-        return input_name_to_nodes
+        self._ensure_index()
+        self._reindex_changed_nodes()
+        return {input_name: list(nodes) for input_name, nodes in self._consumers.items()}
 
     def output_name_to_node(self):
-        output_name_to_node = {}
-        for node in self.model.graph.node:
-            for output_name in node.output:
-                output_name_to_node[output_name] = node
-        return output_name_to_node
+        self._ensure_index()
+        self._reindex_changed_nodes()
+        return dict(self._producers)
+
+    def _get_indexed_producer(self, name):
+        node = self._producers.get(name)
+        if node is not None and name not in node.output:
+            self._reindex_changed_nodes()
+            node = self._producers.get(name)
+        return node
 
-    def get_children(self, node, input_name_to_nodes=None):
-        if input_name_to_nodes is None:
-            input_name_to_nodes = self.input_name_to_nodes()
+    def _get_indexed_consumers(self, name):
+        nodes = self._consumers.get(name, [])
+        if any(name not in node.input for node in nodes):
+            self._reindex_changed_nodes()
+            nodes = self._consumers.get(name, [])
+        return nodes
 
+    def get_children(self, node, input_name_to_nodes=None):
         children = []
         for output in node.output:
-            if output in input_name_to_nodes:
-                for node in input_name_to_nodes[output]:
-                    children.append(node)
+            if input_name_to_nodes is None:
+                children.extend(self.get_consumers(output))
+            elif output in input_name_to_nodes:
+                children.extend(input_name_to_nodes[output])
         return children
 
     def get_parents(self, node, output_name_to_node=None):
         if output_name_to_node is None:
-            output_name_to_node = self.output_name_to_node()
+            return [parent for parent in map(self.get_producer, node.input) if parent is not None]
 
         parents = []
         for input in node.input:
@@ -190,12 +362,12 @@ class ONNXModel:
         return parents
 
     def get_parent(self, node, idx, output_name_to_node=None):
-        if output_name_to_node is None:
-            output_name_to_node = self.output_name_to_node()
-
         if len(node.input) <= idx:
             return None
 
+        if output_name_to_node is None:
+            return self.get_producer(node.input[idx])
+
         input = node.input[idx]
         if input not in output_name_to_node:
             return None
@@ -218,6 +390,8 @@ class ONNXModel:
         """
         Find all nodes with given initializer as an input.
         """
+        if graph is self.model.graph:
+            return list({id(node): node for node in self.get_consumers(initializer.name)}.values())
         nodes = []
         for node in graph.node:
             for node_input in node.input:
@@ -331,6 +505,7 @@ class ONNXModel:
     def replace_gemm_with_matmul(self):
         graph_path = [self.graph()]
         ONNXModel.__replace_gemm_with_matmul(graph_path)
+        self.invalidate_index()
 
     def save_model_to_file(self, output_path, use_external_data_format=False):
         """
@@ -352,9 +527,17 @@ class ONNXModel:
             if node.input[j] == old_input_name:
                 node.input[j] = new_input_name
 
+    def replace_input_of_node(self, node, old_input_name, new_input_name):
+        """Like replace_node_input, and also update the index of the model."""
+        ONNXModel.replace_node_input(node, old_input_name, new_input_name)
+        self.reindex_node(node)
+
     def replace_input_of_all_nodes(self, old_input_name, new_input_name):
-        for node in self.model.graph.node:
-            ONNXModel.replace_node_input(node, old_input_name, new_input_name)
+        self._ensure_index()
+        # Consumers of a node that uses the input several times are listed several times.
+        consumers = {id(node): node for node in self._consumers.get(old_input_name, [])}
+        for node in consumers.values():
+            self.replace_input_of_node(node, old_input_name, new_input_name)
 
     @staticmethod
     def replace_node_output(node, old_output_name, new_output_name):
@@ -363,9 +546,15 @@ class ONNXModel:
             if node.output[j] == old_output_name:
                 node.output[j] = new_output_name
 
+    def replace_output_of_node(self, node, old_output_name, new_output_name):
+        """Like replace_node_output, and also update the index of the model."""
+        ONNXModel.replace_node_output(node, old_output_name, new_output_name)
+        self.reindex_node(node)
+
     def replace_output_of_all_nodes(self, old_output_name, new_output_name):
-        for node in self.model.graph.node:
-            ONNXModel.replace_node_output(node, old_output_name, new_output_name)
+        producer = self.get_producer(old_output_name)
+        if producer is not None:
+            self.replace_output_of_node(producer, old_output_name, new_output_name)
 
     def remove_unused_constant(self):
         input_name_to_nodes = self.input_name_to_nodes()
@@ -395,10 +584,12 @@ class ONNXModel:
         self.remove_initializers(ununsed_weights)
 
     def is_graph_output(self, output_name):
-        return any(output.name == output_name for output in self.model.graph.output)
+        self._ensure_index()
+        return output_name in self._graph_outputs
 
     def is_graph_input(self, tensor_name: str) -> bool:
-        return any(input.name == tensor_name for input in self.model.graph.input)
+        self._ensure_index()
+        return tensor_name in self._graph_inputs
 
     # TODO:use OnnxModel.graph_topological_sort(self.model.graph) from transformers.onnx_model
     # Currently it breaks Openvino/Linux training gpu pipeline so hold off for 1.8 release
@@ -453,6 +644,9 @@ class ONNXModel:
         assert end == len(self.graph().node), "Graph is not a DAG"
         self.graph().ClearField("node")
         self.graph().node.extend(sorted_nodes)
+        self.invalidate_index()
 
     def clean_initializers(self):
-        return _clean_initializers_helper(self.graph(), self.model)
+        result = _clean_initializers_helper(self.graph(), self.model)
+        self.invalidate_index()
+        return result
@@ -4,6 +4,7 @@
 # license information.
 # --------------------------------------------------------------------------
 import logging
+from concurrent.futures import ThreadPoolExecutor
 
 import numpy as np
 import onnx
@@ -11,7 +12,9 @@ import onnx.numpy_helper
 from onnx import onnx_pb as onnx_proto
 
 from .onnx_model import ONNXModel
+from .operators.gemm import is_B_transposed
 from .quant_utils import (
+    DEQUANT_BLOCKWISE_SUFFIX,
     TENSOR_NAME_QUANT_SUFFIX,
     QuantizationMode,
     QuantizedValue,
@@ -22,10 +25,10 @@ from .quant_utils import (
     add_infer_metadata,
     attribute_to_kwarg,
     compute_scale_zp,
-    find_by_name,
     get_qmin_qmax_for_qType,
     get_qrange_for_qType,
     model_has_infer_metadata,
+    quantize_blockwise_4bits,
     quantize_data,
     save_and_reload_model,
     tensor_proto_to_array,
@@ -135,6 +138,20 @@ class ONNXQuantizer:
         # to store specified scale and zeropoint instead of calculated value, tensor_name->(scale, zeropoint)
         self.used_scale_zp_map = {}
 
+        # Number of threads to quantize weights concurrently before quantizing nodes. 1 means weights are quantized
+        # one by one when nodes are quantized.
+        self.weight_quant_num_workers = self.extra_options.get("WeightQuantNumWorkers", 1)
+        if self.weight_quant_num_workers < 1:
+            raise ValueError(f"WeightQuantNumWorkers shall be at least 1, got {self.weight_quant_num_workers}")
+        # Results of prequantize_weights, which are taken by quantize_initializer and quantize_weight_per_channel.
+        self.prequantized_weights = {}
+
+        # Number of elements sharing a scale and whether zero point is fixed in QuantizationMode.WeightOnly.
+        self.weight_only_block_size = self.extra_options.get("WeightOnlyBlockSize", 32)
+        self.weight_only_symmetric = self.extra_options.get("WeightOnlySymmetric", True)
+        if self.weight_only_block_size <= 0 or self.weight_only_block_size % 2 != 0:
+            raise ValueError(f"WeightOnlyBlockSize shall be a positive even number, got {self.weight_only_block_size}")
+
     # routines for subgraph support
     def quantize_subgraph(self, subgraph, graph_key):
         """
@@ -239,7 +256,7 @@ class ONNXQuantizer:
         )
 
     def find_initializer_in_path(self, initializer_name):
-        if find_by_name(initializer_name, self.model.initializer()) is not None:
+        if self.model.get_initializer(initializer_name) is not None:
             return True
         if self.parent is not None:
             return self.parent.find_initializer_in_path(initializer_name)
@@ -258,6 +275,8 @@ class ONNXQuantizer:
                 "Note you don't need to quantize a QAT model. OnnxRuntime support to run QAT model directly."
             )
 
+        self.prequantize_weights(self._get_weights_to_prequantize())
+
         for node in self.model.nodes():
             # quantize subgraphes if have
             if self.enable_subgraph_quantization:
@@ -276,6 +295,7 @@ class ONNXQuantizer:
         # https://developers.google.com/protocol-buffers/docs/reference/python-generated?csw=1#fields
         self.model.graph().ClearField("node")
         self.model.graph().node.extend(self.new_nodes)
+        self.model.invalidate_index()
 
         # Remove ununsed initializers from graph, starting from the top level graph.
         if self.parent is None:
@@ -283,20 +303,22 @@ class ONNXQuantizer:
             if len(initializers_not_found) > 0:
                 raise RuntimeError("Invalid model with unknown initializers/tensors." + str(initializers_not_found))
 
+        self.release_prequantized_weights()
+
         self.model.model.producer_name = __producer__
         self.model.model.producer_version = __version__
 
         return self.model.model
 
     def is_input_a_initializer(self, input_name):
-        initializer = find_by_name(input_name, self.model.initializer())
+        initializer = self.model.get_initializer(input_name)
         return initializer is not None
 
     def is_per_channel(self):
         return self.per_channel
 
     def is_valid_quantize_weight(self, weight_name):
-        weight = find_by_name(weight_name, self.model.initializer())
+        weight = self.model.get_initializer(weight_name)
         if weight is not None:
             return weight.data_type == onnx_proto.TensorProto.FLOAT
         if (not self.enable_subgraph_quantization) or (self.parent is None):
@@ -657,11 +679,11 @@ class ONNXQuantizer:
 
         # get scale for weight
         weight_scale_name = self.quantized_value_map[weight_name].scale_name
-        weight_initializer = find_by_name(weight_scale_name, self.model.initializer())
+        weight_initializer = self.model.get_initializer(weight_scale_name)
         weight_scale = tensor_proto_to_array(weight_initializer)
 
         # get bias
-        bias_initializer = find_by_name(bias_name, self.model.initializer())
+        bias_initializer = self.model.get_initializer(bias_name)
         bias_data = tensor_proto_to_array(bias_initializer)
         quantized_bias_name = bias_name + TENSOR_NAME_QUANT_SUFFIX
 
@@ -673,7 +695,7 @@ class ONNXQuantizer:
         else:
             raise ValueError(f"Expected {input_name} to be in quantized value map for static quantization")
 
-        inputscale_initializer = find_by_name(input_scale_name, self.model.initializer())
+        inputscale_initializer = self.model.get_initializer(input_scale_name)
         input_scale = tensor_proto_to_array(inputscale_initializer)
 
         # calcuate scale for bias
@@ -685,7 +707,7 @@ class ONNXQuantizer:
         # update bias initializer
         bias_np_data = np.asarray(quantized_data, dtype=np.int32).reshape(bias_initializer.dims)
         packed_bias_initializer = onnx.numpy_helper.from_array(bias_np_data, quantized_bias_name)
-        self.model.initializer().extend([packed_bias_initializer])
+        self.model.add_initializer(packed_bias_initializer)
 
         # update scale initializer
         quantized_bias_scale_name = quantized_bias_name + "_scale"
@@ -696,7 +718,7 @@ class ONNXQuantizer:
             packed_bias_scale_initializer = onnx.helper.make_tensor(
                 quantized_bias_scale_name, onnx_proto.TensorProto.FLOAT, [], bias_scale_data
             )
-        self.model.initializer().extend([packed_bias_scale_initializer])
+        self.model.add_initializer(packed_bias_scale_initializer)
 
         # update zero initializer
         quantized_bias_zp_name = quantized_bias_name + "_zero_point"
@@ -707,7 +729,7 @@ class ONNXQuantizer:
             packed_bias_zp_initializer = onnx.helper.make_tensor(
                 quantized_bias_zp_name, onnx_proto.TensorProto.INT32, [], bias_zp_data
             )
-        self.model.initializer().extend([packed_bias_zp_initializer])
+        self.model.add_initializer(packed_bias_zp_initializer)
 
         assert bias_name not in self.quantized_value_map
         quantized_value = QuantizedValue(
@@ -809,7 +831,7 @@ class ONNXQuantizer:
                 zero_point_names.append("")
                 continue
             # Quantize the input
-            initializer = find_by_name(node_input, self.model.initializer())
+            initializer = self.model.get_initializer(node_input)
             if initializer is not None:
                 if self.per_channel and op_level_per_channel:
                     (
@@ -879,6 +901,81 @@ class ONNXQuantizer:
 
         return quantized_input_names, zero_point_names, scale_names, nodes
 
+    def _get_weights_to_prequantize(self):
+        """
+        Predict the weights that op quantizers will quantize, and the parameters they use.
+        Only B of MatMul, Attention and Gemm and W of Conv are predicted. Other weights are quantized on demand.
+            return: list of (initializer, qType, symmetric, reduce_range, axis) for prequantize_weights.
+        """
+        if self.weight_quant_num_workers <= 1 or self.mode == QuantizationMode.WeightOnly:
+            return []
+
+        initializers = {initializer.name: initializer for initializer in self.model.initializer()}
+        weights = []
+        for node in self.model.nodes():
+            if node.op_type not in ["Conv", "Gemm", "MatMul", "Attention"] or not self.should_quantize_node(node):
+                continue
+            weight = initializers.get(node.input[1]) if len(node.input) > 1 else None
+            if weight is None or weight.data_type != onnx_proto.TensorProto.FLOAT:
+                continue
+
+            if node.op_type in ["Conv", "Gemm"] and self.static and self.per_channel:
+                axis = 0 if node.op_type == "Conv" or is_B_transposed(node) else 1
+                weights.append((weight, onnx_proto.TensorProto.INT8, True, self.reduce_range, axis))
+            elif node.op_type in ["MatMul", "Attention"] and self.per_channel:
+                symmetric = self.is_weight_symmetric or self.weight_qType == onnx_proto.TensorProto.INT8
+                weights.append((weight, self.weight_qType, symmetric, self.reduce_range, -1))
+            else:
+                weights.append((weight, self.weight_qType, self.is_weight_symmetric, self.reduce_range, None))
+        return weights
+
+    def prequantize_weights(self, weights):
+        """
+        Quantize weights concurrently with WeightQuantNumWorkers threads. NumPy releases the GIL in the heavy
+        part of quantization, so independent weights are quantized in parallel. quantize_initializer and
+        quantize_weight_per_channel take the results later, so the quantized model is the same as quantizing
+        weights one by one. A weight quantized with other parameters than predicted is quantized on demand.
+            parameter weights: list of (initializer, qType, symmetric, reduce_range, axis). axis is None for
+                               per-tensor quantization.
+        """
+        if self.weight_quant_num_workers <= 1:
+            return
+
+        tasks = {}
+        for weight, qType, symmetric, reduce_range, axis in weights:  # noqa: N806
+            key = self._get_weight_quantization_key(weight, qType, symmetric, reduce_range, axis)
+            if key not in self.prequantized_weights and weight.name not in self.quantized_value_map:
+                tasks[key] = (weight, qType, symmetric, reduce_range, axis)
+        if not tasks:
+            return
+
+        def quantize(task):
+            weight, qType, symmetric, reduce_range, axis = task  # noqa: N806
+            return quantize_data(tensor_proto_to_array(weight), qType, symmetric, reduce_range, axis=axis)
+
+        with ThreadPoolExecutor(max_workers=self.weight_quant_num_workers) as executor:
+            self.prequantized_weights.update(zip(tasks, executor.map(quantize, tasks.values())))
+
+    def release_prequantized_weights(self):
+        """
+        Drop results of prequantize_weights that no op quantizer took, like weights of nodes that were not quantized
+        after all, so that they are not kept alive with the quantizer.
+        """
+        if self.prequantized_weights:
+            logging.debug(f"{len(self.prequantized_weights)} prequantized weights are not used.")
+            self.prequantized_weights.clear()
+
+    @staticmethod
+    def _get_weight_quantization_key(weight, qType, symmetric, reduce_range, axis):
+        # Shape is in the key since some op quantizers (like LSTM) reshape weights before quantization.
+        return (weight.name, tuple(weight.dims), qType, bool(symmetric), bool(reduce_range), axis)
+
+    def _quantize_weight_data(self, weight, qType, symmetric, reduce_range, axis=None):
+        key = self._get_weight_quantization_key(weight, qType, symmetric, reduce_range, axis)
+        if key in self.prequantized_weights:
+            return self.prequantized_weights.pop(key)
+        return quantize_data(tensor_proto_to_array(weight), qType, symmetric, reduce_range, axis=axis)
+
     def quantize_initializer(self, weight, qType, reduce_range=False, keep_float_weight=False):
         """
         :param weight: TensorProto initializer
@@ -901,23 +998,22 @@ class ONNXQuantizer:
         scale_name = weight.name + "_scale"
 
         # Update packed weight, zero point, and scale initializers
-        weight_data = tensor_proto_to_array(weight)
-        _, _, zero_point, scale, q_weight_data = quantize_data(
-            weight_data.flatten().tolist(),
+        _, _, zero_point, scale, q_weight_data = self._quantize_weight_data(
+            weight,
             qType,
             self.is_weight_symmetric,
             self.reduce_range and reduce_range,
         )
         scale_initializer = onnx.helper.make_tensor(scale_name, onnx_proto.TensorProto.FLOAT, [], [scale])
         zero_initializer = onnx.helper.make_tensor(zp_name, qType, [], [zero_point])
-        self.model.initializer().extend([scale_initializer, zero_initializer])
+        self.model.add_initializers([scale_initializer, zero_initializer])
 
         if not keep_float_weight:
             q_weight_data = np.asarray(q_weight_data, dtype=onnx.mapping.TENSOR_TYPE_TO_NP_TYPE[qType]).reshape(
                 weight.dims
             )
             q_weight_initializer = onnx.numpy_helper.from_array(q_weight_data, q_weight_name)
-            self.model.initializer().extend([q_weight_initializer])
+            self.model.add_initializer(q_weight_initializer)
 
         # Log entry for this quantized weight
         quantized_value = QuantizedValue(
@@ -949,38 +1045,17 @@ class ONNXQuantizer:
                 quantized_value.scale_name,
             )
 
-        initializer = find_by_name(weight_name, self.model.initializer())
+        initializer = self.model.get_initializer(weight_name)
         if initializer is None:
             raise ValueError("{} is not an initializer", weight_name)
 
-        weights = tensor_proto_to_array(initializer)
-        channel_count = weights.shape[channel_axis]
-        rmin_list = []
-        rmax_list = []
-        zero_point_list = []
-        scale_list = []
-        quantized_per_channel_data_list = []
-        for i in range(channel_count):
-            per_channel_data = weights.take(i, channel_axis)
-            rmin, rmax, zero_point, scale, quantized_per_channel_data = quantize_data(
-                per_channel_data.flatten().tolist(),
-                weight_qType,
-                self.is_weight_symmetric or weight_qType == onnx_proto.TensorProto.INT8,
-                self.reduce_range and reduce_range,
-            )
-            rmin_list.append(rmin)
-            rmax_list.append(rmax)
-            zero_point_list.append(zero_point)
-            scale_list.append(scale)
-            quantized_per_channel_data_list.append(quantized_per_channel_data)
-
-        # combine per_channel_data into one
-        reshape_dims = list(weights.shape)  # deep copy
-        reshape_dims[channel_axis] = 1  # only one per channel for reshape
-        quantized_weights = np.asarray(quantized_per_channel_data_list[0]).reshape(reshape_dims)
-        for i in range(1, len(quantized_per_channel_data_list)):
-            channel_weights = np.asarray(quantized_per_channel_data_list[i]).reshape(reshape_dims)
-            quantized_weights = np.concatenate((quantized_weights, channel_weights), channel_axis)
+        _, _, zero_points, scales, quantized_weights = self._quantize_weight_data(
+            initializer,
+            weight_qType,
+            self.is_weight_symmetric or weight_qType == onnx_proto.TensorProto.INT8,
+            self.reduce_range and reduce_range,
+            axis=channel_axis,
+        )
 
         q_weight_name = weight_name + TENSOR_NAME_QUANT_SUFFIX
         zp_name = weight_name + "_zero_point"
@@ -999,11 +1074,11 @@ class ONNXQuantizer:
         # Update packed weight, zero point, and scale initializers
         zero_scale_shape = [initializer.dims[channel_axis]]
         scale_initializer = onnx.helper.make_tensor(
-            scale_name, onnx_proto.TensorProto.FLOAT, zero_scale_shape, scale_list
+            scale_name, onnx_proto.TensorProto.FLOAT, zero_scale_shape, scales.tolist()
         )
-        zero_initializer = onnx.helper.make_tensor(zp_name, weight_qType, zero_scale_shape, zero_point_list)
+        zero_initializer = onnx.helper.make_tensor(zp_name, weight_qType, zero_scale_shape, zero_points.tolist())
 
-        self.model.initializer().extend([scale_initializer, zero_initializer])
+        self.model.add_initializers([scale_initializer, zero_initializer])
 
         if not keep_float_weight:
             quantized_weights = np.asarray(
@@ -1011,10 +1086,126 @@ class ONNXQuantizer:
                 dtype=onnx.mapping.TENSOR_TYPE_TO_NP_TYPE[weight_qType],
             ).reshape(initializer.dims)
             q_weight_initializer = onnx.numpy_helper.from_array(quantized_weights, q_weight_name)
-            self.model.initializer().extend([q_weight_initializer])
+            self.model.add_initializer(q_weight_initializer)
 
         return q_weight_name, zp_name, scale_name
 
+    def _get_or_create_constant(self, name, value):
+        # add_initializer keeps the existing initializer when the name is used already.
+        self.model.add_initializer(onnx.numpy_helper.from_array(value, name))
+        return name
+
+    def quantize_weight_blockwise(self, weight_name):
+        """
+        Quantize a 2-D weight of shape [K, N] to 4 bits with a scale (and a zero point) for every WeightOnlyBlockSize
+        elements along K, and add nodes to dequantize it to float32 for MatMul. Two 4-bit values are packed in one
+        byte of a uint8 initializer, which is cast to float and unpacked with Floor and elementwise ops. All inputs of
+        these nodes are initializers, so graph optimization folds them to the float weight once when the session is
+        created. Only the model file is compressed: MatMul runs on the float weight with the same speed and memory as
+        the float model.
+            parameter weight_name: name of the initializer to quantize
+            return: name of the dequantized weight
+        """
+        prefix = weight_name + DEQUANT_BLOCKWISE_SUFFIX
+        dequantized_weight_name = prefix + "_Output"
+        if weight_name in self.quantized_value_map:
+            return dequantized_weight_name
+
+        initializer = self.model.get_initializer(weight_name)
+        if initializer is None:
+            raise ValueError(f"{weight_name} is not an initializer")
+        rows, columns = initializer.dims
+        packed, scale, zero_point = quantize_blockwise_4bits(
+            tensor_proto_to_array(initializer), self.weight_only_block_size, self.weight_only_symmetric
+        )
+
+        q_weight_name = weight_name + TENSOR_NAME_QUANT_SUFFIX
+        scale_name = weight_name + "_scale"
+        zp_name = weight_name + "_zero_point"
+        self.model.add_initializers(
+            [
+                onnx.numpy_helper.from_array(packed, q_weight_name),
+                onnx.numpy_helper.from_array(scale, scale_name),
+                # Zero point is 8 for all blocks in symmetric quantization, so a scalar is enough.
+                onnx.numpy_helper.from_array(
+                    np.array(8, dtype=np.float32) if self.weight_only_symmetric else zero_point, zp_name
+                ),
+            ]
+        )
+        shift_name = self._get_or_create_constant("fixed_blockwise_shift_4bits", np.array(16, dtype=np.float32))
+        inverse_shift_name = self._get_or_create_constant(
+            "fixed_blockwise_inverse_shift_4bits", np.array(1 / 16, dtype=np.float32)
+        )
+
+        # bytes = high * 16 + low, and a block is the low bits of its bytes followed by the high bits.
+        nodes = [
+            onnx.helper.make_node(
+                "Cast", [q_weight_name], [prefix + "_bytes"], prefix, to=onnx_proto.TensorProto.FLOAT
+            ),
+            onnx.helper.make_node(
+                "Mul", [prefix + "_bytes", inverse_shift_name], [prefix + "_shifted"], prefix + "_Mul_0"
+            ),
+            onnx.helper.make_node("Floor", [prefix + "_shifted"], [prefix + "_high"], prefix + "_Floor"),
+            onnx.helper.make_node("Mul", [prefix + "_high", shift_name], [prefix + "_high_bytes"], prefix + "_Mul_1"),
+            onnx.helper.make_node(
+                "Sub", [prefix + "_bytes", prefix + "_high_bytes"], [prefix + "_low"], prefix + "_Sub_0"
+            ),
+            onnx.helper.make_node(
+                "Concat", [prefix + "_low", prefix + "_high"], [prefix + "_blocks"], prefix + "_Concat", axis=1
+            ),
+        ]
+        if not self.weight_only_symmetric:
+            nodes.append(
+                onnx.helper.make_node(
+                    "Cast", [zp_name], [prefix + "_zero_point"], prefix + "_ZeroPoint", to=onnx_proto.TensorProto.FLOAT
+                )
+            )
+        nodes.extend(
+            [
+                onnx.helper.make_node(
+                    "Sub",
+                    [prefix + "_blocks", zp_name if self.weight_only_symmetric else prefix + "_zero_point"],
+                    [prefix + "_centered"],
+                    prefix + "_Sub_1",
+                ),
+                onnx.helper.make_node(
+                    "Mul", [prefix + "_centered", scale_name], [prefix + "_scaled"], prefix + "_Mul_2"
+                ),
+            ]
+        )
+
+        # Merge blocks to [K, N], and remove rows padded to a multiple of block size.
+        padded_rows = packed.shape[0] * self.weight_only_block_size
+        shape_name = self._get_or_create_constant(prefix + "_shape", np.array([padded_rows, columns], dtype=np.int64))
+        reshape_output = dequantized_weight_name if padded_rows == rows else prefix + "_padded"
+        nodes.append(
+            onnx.helper.make_node("Reshape", [prefix + "_scaled", shape_name], [reshape_output], prefix + "_Reshape")
+        )
+        if padded_rows != rows:
+            starts_name = self._get_or_create_constant(prefix + "_starts", np.array([0], dtype=np.int64))
+            axes_name = self._get_or_create_constant(prefix + "_axes", np.array([0], dtype=np.int64))
+            ends_name = self._get_or_create_constant(prefix + "_ends", np.array([rows], dtype=np.int64))
+            nodes.append(
+                onnx.helper.make_node(
+                    "Slice",
+                    [reshape_output, starts_name, ends_name, axes_name],
+                    [dequantized_weight_name],
+                    prefix + "_Slice",
+                )
+            )
+        self.new_nodes.extend(nodes)
+
+        self.quantized_value_map[weight_name] = QuantizedValue(
+            weight_name,
+            q_weight_name,
+            scale_name,
+            zp_name,
+            QuantizedValueType.Initializer,
+            axis=0,
+            block_size=self.weight_only_block_size,
+        )
+        return dequantized_weight_name
+
     def _dequantize_value(self, value_name):
         """
         Given a value (input/output) which is quantized, add a DequantizeLinear node to dequantize
@@ -1026,6 +1217,9 @@ class ONNXQuantizer:
         """
         if (value_name in self.quantized_value_map) and (value_name not in self.generated_value_names):
             quantized_value = self.quantized_value_map[value_name]
+            if quantized_value.block_size is not None:
+                # Block-wise quantized weight is used by other nodes in float, which is kept in initializers.
+                return None
             # Add DequantizeLinear Node for this input
             dqlinear_name = value_name + "_DequantizeLinear"
             dqlinear_node = self.model.find_node_by_name(dqlinear_name, self.new_nodes, self.model.graph())
@@ -1068,7 +1262,7 @@ class ONNXQuantizer:
                 continue
             if not self.should_quantize_node(node):
                 continue
-            if len(self.model.input_name_to_nodes()[node.input[0]]) != 1:
+            if len(self.model.get_consumers(node.input[0])) != 1:
                 continue
             if node.input[0] not in self.tensors_range.keys() or node.output[0] not in self.tensors_range.keys():
                 continue
@@ -14,5 +14,5 @@ class QArgMax(QuantOperatorBase):
             self.quantizer.new_nodes += [node]
             return
 
-        node.input[0] = quantized_input_value.q_name
+        self.quantizer.model.replace_input_of_node(node, node.input[0], quantized_input_value.q_name)
         self.quantizer.new_nodes += [node]
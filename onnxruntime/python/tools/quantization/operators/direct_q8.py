@@ -29,8 +29,8 @@ class Direct8BitOp(QuantOperatorBase):
             )
             self.quantizer.quantized_value_map[node.output[0]] = quantized_output_value
 
-            node.input[0] = quantized_input_value.q_name
-            node.output[0] = quantized_output_value.q_name
+            self.quantizer.model.replace_input_of_node(node, node.input[0], quantized_input_value.q_name)
+            self.quantizer.model.replace_output_of_node(node, node.output[0], quantized_output_value.q_name)
             self.quantizer.new_nodes += [node]
 
         else:
@@ -58,8 +58,8 @@ class Direct8BitOp(QuantOperatorBase):
             )
             self.quantizer.quantized_value_map[node.output[0]] = quantized_output_value
 
-            node.input[0] = quantized_input_names[0]
-            node.output[0] = quantized_output_value.q_name
+            self.quantizer.model.replace_input_of_node(node, node.input[0], quantized_input_names[0])
+            self.quantizer.model.replace_output_of_node(node, node.output[0], quantized_output_value.q_name)
             nodes.append(node)
 
             self.quantizer.new_nodes += nodes
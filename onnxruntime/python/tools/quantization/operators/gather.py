@@ -42,8 +42,8 @@ class GatherQuant(QuantOperatorBase):
         )
         self.quantizer.quantized_value_map[node.output[0]] = q_output
 
-        node.output[0] = gather_new_output
-        node.input[0] = quantized_input_names[0]
+        self.quantizer.model.replace_output_of_node(node, node.output[0], gather_new_output)
+        self.quantizer.model.replace_input_of_node(node, node.input[0], quantized_input_names[0])
         nodes.append(node)
 
         self.quantizer.new_nodes += nodes
@@ -189,6 +189,33 @@ class QLinearMatMul(QOpMatMul):
         self.quantizer.new_nodes += nodes
 
 
+"""
+    Used when quantize mode is QuantizationMode.WeightOnly, which compresses weights in the model file only.
+    MatMul still runs in float on a weight dequantized from the packed 4-bit initializer.
+"""
+
+
+class MatMulWeightOnly(QuantOperatorBase):
+    def __init__(self, onnx_quantizer, onnx_node):
+        super().__init__(onnx_quantizer, onnx_node)
+
+    def should_quantize(self):
+        if not self.quantizer.should_quantize_node(self.node):
+            return False
+
+        # Only 2-D float B in initializers is quantized. A and the output stay float.
+        weight = self.quantizer.model.get_initializer(self.node.input[1])
+        return weight is not None and weight.data_type == onnx_proto.TensorProto.FLOAT and len(weight.dims) == 2
+
+    def quantize(self):
+        node = self.node
+        assert node.op_type == "MatMul"
+
+        dequantized_weight_name = self.quantizer.quantize_weight_blockwise(node.input[1])
+        matmul_node = onnx.helper.make_node("MatMul", [node.input[0], dequantized_weight_name], node.output, node.name)
+        self.quantizer.new_nodes.append(matmul_node)
+
+
 class QDQMatMul(QDQOperatorBase):
     def __init__(self, onnx_quantizer, onnx_node):
         super().__init__(onnx_quantizer, onnx_node)
@@ -204,7 +231,7 @@ class QDQMatMul(QDQOperatorBase):
 
         for tensor_name in nodes_to_iterate:
             # only support per-channel quantization on weight
-            if self.quantizer.is_per_channel() and find_by_name(tensor_name, self.quantizer.model.initializer()):
+            if self.quantizer.is_per_channel() and self.quantizer.model.get_initializer(tensor_name):
                 channel_axis = self.quantizer.qdq_op_type_per_channel_support_to_axis.get(node.op_type, 1)
                 self.quantizer.quantize_weight_tensor_per_channel(tensor_name, channel_axis)
             else:
@@ -59,7 +59,7 @@ class QPad(QuantOperatorBase):
                     # Suppose this padding constant initializer only used by the node
                     self.quantizer.model.remove_initializer(padding_constant_initializer)
                     self.quantizer.model.add_initializer(quantized_padding_constant_initializer)
-                    node.input[2] = quantized_padding_constant_name
+                    self.quantizer.model.replace_input_of_node(node, node.input[2], quantized_padding_constant_name)
                 else:
                     # TODO: check quantize_inputs after sub graph is supported
                     pad_value_qnodes = self.quantizer._get_quantize_input_nodes(
@@ -70,9 +70,10 @@ class QPad(QuantOperatorBase):
                         quantized_input_value.zp_name,
                     )
                     self.quantizer.new_nodes.extend(pad_value_qnodes)
-                    node.input[2] = pad_value_qnodes[0].output[0]
+                    self.quantizer.model.replace_input_of_node(node, node.input[2], pad_value_qnodes[0].output[0])
             else:
                 node.input.extend([quantized_input_value.zp_name])  # pad zero_point for original zero
+                self.quantizer.model.reindex_node(node)
 
         # Create an entry for output quantized value
         quantized_output_value = QuantizedValue(
@@ -84,6 +85,6 @@ class QPad(QuantOperatorBase):
         )
         self.quantizer.quantized_value_map[node.output[0]] = quantized_output_value
 
-        node.input[0] = quantized_input_value.q_name
-        node.output[0] = quantized_output_value.q_name
+        self.quantizer.model.replace_input_of_node(node, node.input[0], quantized_input_value.q_name)
+        self.quantizer.model.replace_output_of_node(node, node.output[0], quantized_output_value.q_name)
         self.quantizer.new_nodes += [node]
@@ -37,13 +37,17 @@ Example Usage:
 `tensor_dict` points to a dictionary where the keys are tensor names and each value
 is a list of tensors, one from each model run
 
+When there are many inputs, `compute_activation_error_streaming` runs the augmented
+float32 and quantized models batch by batch, and computes errors of activations
+without keeping tensors of all model runs in memory.
+
 """
 
 import logging
 import math
 import time
 from pathlib import Path
-from typing import Callable, Dict, List, Optional, Sequence, Union
+from typing import Callable, Dict, List, Optional, Sequence, Tuple, Union
 
 import numpy
 import onnx
@@ -54,12 +58,13 @@ import onnxruntime
 from .calibrate import CalibraterBase, CalibrationDataReader
 from .onnx_model import ONNXModel
 from .quant_utils import (
+    DEQUANT_BLOCKWISE_SUFFIX,
     DEQUANT_OP_NAME,
     DEQUANT_OUTPUT_SUFFIX,
     QUANT_INPUT_SUFFIX,
     TENSOR_NAME_QUANT_SUFFIX,
     clone_model_with_shape_infer,
-    find_by_name,
+    dequantize_blockwise_4bits,
     load_model,
 )
 
@@ -108,6 +113,22 @@ def modify_model_output_intermediate_tensors(
     return model
 
 
+def _create_inference_session(
+    augmented_model: str, session_options=None, execution_providers: Optional[Sequence[str]] = None
+) -> onnxruntime.InferenceSession:
+    if session_options is None:
+        session_options = onnxruntime.SessionOptions()
+        session_options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_DISABLE_ALL
+    if execution_providers is None:
+        execution_providers = ["CPUExecutionProvider"]
+
+    return onnxruntime.InferenceSession(
+        augmented_model,
+        sess_options=session_options,
+        providers=execution_providers,
+    )
+
+
 def collect_activations(
     augmented_model: str,
     input_reader: CalibrationDataReader,
@@ -129,17 +150,7 @@ def collect_activations(
         A dictionary where the key is tensor name and values are list of tensors from each batch
     """
 
-    if session_options is None:
-        session_options = onnxruntime.SessionOptions()
-        session_options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_DISABLE_ALL
-    if execution_providers is None:
-        execution_providers = ["CPUExecutionProvider"]
-
-    inference_session = onnxruntime.InferenceSession(
-        augmented_model,
-        sess_options=session_options,
-        providers=execution_providers,
-    )
+    inference_session = _create_inference_session(augmented_model, session_options, execution_providers)
 
     intermediate_outputs = []
     for input_d in input_reader:
@@ -161,16 +172,30 @@ def collect_activations(
 _POST_QDQ_POSTFIX1 = DEQUANT_OUTPUT_SUFFIX + "_1"
 
 
-def _add_pre_post_qdq_pair(
-    qdq_cmp: Dict[str, Dict[str, Sequence[numpy.ndarray]]],
-    activation_name: str,
-    pre_qdq_tensors: Optional[Sequence[numpy.ndarray]],
-    post_qdq_tensors: Optional[Sequence[numpy.ndarray]],
-) -> None:
-    if post_qdq_tensors is not None and pre_qdq_tensors is not None:
-        qdq_cmp[activation_name] = {}
-        qdq_cmp[activation_name]["pre_qdq"] = pre_qdq_tensors
-        qdq_cmp[activation_name]["post_qdq"] = post_qdq_tensors
+def _match_pre_post_qdq_names(qdq_tensor_names: Sequence[str]) -> Dict[str, Tuple[str, str]]:
+    """Find activations in the QDQ model with tensors saved before and after QDQ operation.
+
+    Returns:
+        Dict of activation name to names of tensors before and after QDQ operation.
+    """
+    saved_names = set(qdq_tensor_names)
+    matches: Dict[str, Tuple[str, str]] = {}
+    for tensor_name in qdq_tensor_names:
+        if tensor_name.endswith(QUANT_INPUT_SUFFIX):
+            activation_name = tensor_name[: -len(QUANT_INPUT_SUFFIX)]
+            pre_name, post_name = tensor_name, activation_name
+        elif tensor_name.endswith(DEQUANT_OUTPUT_SUFFIX):
+            activation_name = tensor_name[: -len(DEQUANT_OUTPUT_SUFFIX)]
+            pre_name, post_name = activation_name, tensor_name
+        elif tensor_name.endswith(_POST_QDQ_POSTFIX1):
+            activation_name = tensor_name[: -len(_POST_QDQ_POSTFIX1)]
+            pre_name, post_name = activation_name, tensor_name
+        else:
+            continue
+
+        if pre_name in saved_names and post_name in saved_names:
+            matches[activation_name] = (pre_name, post_name)
+    return matches
 
 
 def create_activation_matching(
@@ -207,22 +232,10 @@ def create_activation_matching(
     """
 
     qdq_cmp: Dict[str, Dict[str, Sequence[numpy.ndarray]]] = {}
-    for tensor_name, tensors in qdq_activations.items():
-        if tensor_name.endswith(QUANT_INPUT_SUFFIX):
-            pre_name = tensor_name[: -len(QUANT_INPUT_SUFFIX)]
-            post_qdq_tensors = qdq_activations.get(pre_name)
-            pre_qdq_tensors = tensors
-            _add_pre_post_qdq_pair(qdq_cmp, pre_name, pre_qdq_tensors, post_qdq_tensors)
-        elif tensor_name.endswith(DEQUANT_OUTPUT_SUFFIX):
-            pre_name = tensor_name[: -len(DEQUANT_OUTPUT_SUFFIX)]
-            pre_qdq_tensors = qdq_activations.get(pre_name)
-            post_qdq_tensors = tensors
-            _add_pre_post_qdq_pair(qdq_cmp, pre_name, pre_qdq_tensors, post_qdq_tensors)
-        elif tensor_name.endswith(_POST_QDQ_POSTFIX1):
-            pre_name = tensor_name[: -len(_POST_QDQ_POSTFIX1)]
-            pre_qdq_tensors = qdq_activations.get(pre_name)
-            post_qdq_tensors = tensors
-            _add_pre_post_qdq_pair(qdq_cmp, pre_name, pre_qdq_tensors, post_qdq_tensors)
+    for activation_name, (pre_name, post_name) in _match_pre_post_qdq_names(list(qdq_activations)).items():
+        qdq_cmp[activation_name] = {}
+        qdq_cmp[activation_name]["pre_qdq"] = qdq_activations[pre_name]
+        qdq_cmp[activation_name]["post_qdq"] = qdq_activations[post_name]
 
     if not float_activations:
         return qdq_cmp
@@ -285,27 +298,37 @@ def create_weight_matching(float_model_path: str, qdq_model_path: str) -> Dict[s
     qdq_onnx_model = ONNXModel(load_model(Path(qdq_model_path), need_optimize=False))
 
     matched_weights: Dict[str, Dict[str, numpy.ndarray]] = {}
-    initializers = qdq_onnx_model.initializer()
     for node in qdq_onnx_model.nodes():
-        if node.op_type != DEQUANT_OP_NAME:
+        # Block-wise quantized weight is unpacked from a Cast node instead of DQ node.
+        is_blockwise = node.op_type == "Cast" and node.name.endswith(DEQUANT_BLOCKWISE_SUFFIX)
+        if node.op_type != DEQUANT_OP_NAME and not is_blockwise:
             continue  # Only care about DQ node
         weight_name: str = node.input[0]
-        weight_values = find_by_name(weight_name, initializers)
+        weight_values = qdq_onnx_model.get_initializer(weight_name)
         if not weight_values:
             continue  # Only care about DQ node with const inputs
         if not weight_name.endswith(TENSOR_NAME_QUANT_SUFFIX):
             logging.error(f"Model Error in '{qdq_model_path}': Dequantized tensor name '{weight_name}' not recognized!")
             continue
 
+        if is_blockwise:
+            weight_name = weight_name[: -len(TENSOR_NAME_QUANT_SUFFIX)]
+            weight_match = _match_blockwise_weight(weight_name, weight_values, qdq_onnx_model, float_onnx_model)
+            if weight_match is None:
+                logging.error(f"Model Error in '{float_model_path}': weight tensor '{weight_name}' not found!")
+                continue
+            matched_weights[weight_name] = weight_match
+            continue
+
         axis = -1
         for attr in node.attribute:
             if attr.name == "axis":
                 axis = attr.i
 
         weight_tensor = numpy_helper.to_array(weight_values)
-        weight_scale = numpy_helper.to_array(find_by_name(node.input[1], initializers))
+        weight_scale = numpy_helper.to_array(qdq_onnx_model.get_initializer(node.input[1]))
         if len(node.input) > 2:
-            weight_zp = numpy_helper.to_array(find_by_name(node.input[2], initializers))
+            weight_zp = numpy_helper.to_array(qdq_onnx_model.get_initializer(node.input[2]))
         else:
             weight_zp = numpy.zeros(weight_scale.shape, dtype=numpy.int32)
 
@@ -316,7 +339,7 @@ def create_weight_matching(float_model_path: str, qdq_model_path: str) -> Dict[s
             logging.error(f"Model Error in '{qdq_model_path}': '{weight_name}' per-channel quantization on 0 channel")
             continue
 
-        float_values = find_by_name(weight_name, float_onnx_model.initializer())
+        float_values = float_onnx_model.get_initializer(weight_name)
         if not float_values:
             logging.error(f"Model Error in '{float_model_path}': weight tensor '{weight_name}' not found!")
             continue
@@ -326,6 +349,25 @@ def create_weight_matching(float_model_path: str, qdq_model_path: str) -> Dict[s
     return matched_weights
 
 
+def _match_blockwise_weight(
+    weight_name: str, weight_values: TensorProto, qdq_onnx_model: ONNXModel, float_onnx_model: ONNXModel
+) -> Optional[Dict[str, numpy.ndarray]]:
+    """Unpack a weight quantized by quantize_weight_only, and match it with the float weight."""
+    float_values = float_onnx_model.get_initializer(weight_name)
+    if not float_values:
+        return None
+    weight_float = numpy_helper.to_array(float_values)
+
+    packed = numpy_helper.to_array(weight_values)
+    weight_scale = numpy_helper.to_array(qdq_onnx_model.get_initializer(weight_name + "_scale"))
+    weight_zp = numpy_helper.to_array(qdq_onnx_model.get_initializer(weight_name + "_zero_point"))
+    if weight_float.shape[-1] != packed.shape[-1]:
+        # B of Gemm with transB is transposed when Gemm is converted to MatMul before quantization.
+        weight_float = weight_float.T
+    weight_quant = dequantize_blockwise_4bits(packed, weight_scale, weight_zp, weight_float.shape[0])
+    return {"float": weight_float, "dequantized": weight_quant}
+
+
 def compute_signal_to_quantization_noice_ratio(
     x: Union[Sequence[numpy.ndarray], numpy.ndarray], y: Union[Sequence[numpy.ndarray], numpy.ndarray]
 ) -> float:
@@ -375,3 +417,98 @@ def compute_activation_error(
             err_result["xmodel_err"] = err_func(float_activation, match["post_qdq"])
         result[name] = err_result
     return result
+
+
+class _RunningSignalToQuantizationNoiseRatio:
+    """Running sums of compute_signal_to_quantization_noice_ratio. The result is the same as comparing all updated
+    tensors at once, while only two numbers are kept."""
+
+    def __init__(self):
+        self.signal = 0.0  # squared norm of tensors
+        self.noise = 0.0  # squared norm of differences
+
+    def update(self, x: numpy.ndarray, y: numpy.ndarray):
+        x = numpy.asarray(x, dtype=numpy.float64).reshape(-1)
+        diff = x - numpy.asarray(y, dtype=numpy.float64).reshape(-1)
+        self.signal += float(numpy.dot(x, x))
+        self.noise += float(numpy.dot(diff, diff))
+
+    def get(self) -> float:
+        epsilon = numpy.finfo("float").eps
+        tensor_norm = max(math.sqrt(self.signal), epsilon)
+        diff_norm = max(math.sqrt(self.noise), epsilon)
+        return 20 * math.log10(tensor_norm / diff_norm)
+
+
+def compute_activation_error_streaming(
+    qdq_augmented_model: str,
+    input_reader: CalibrationDataReader,
+    float_augmented_model: Optional[str] = None,
+    session_options=None,
+    execution_providers: Optional[Sequence[str]] = None,
+) -> Dict[str, Dict[str, float]]:
+    """Compute activation errors like compute_activation_error with the default error function, without keeping
+    activations of all batches in memory.
+
+    Models run batch by batch, and each activation only keeps running sums of signal to quantization noise ratio.
+    It has the same result as collect_activations, create_activation_matching and compute_activation_error, while
+    memory does not grow with the number of batches.
+
+    Args:
+        qdq_augmented_model: Path to augmented QDQ model created by modify_model_output_intermediate_tensors ()
+        input_reader: Logic for reading input for both models.
+        float_augmented_model: Path to augmented float model created by modify_model_output_intermediate_tensors ().
+            Cross model errors are not computed when it is None.
+        session_options: Optional OnnxRuntime session options for both models, like collect_activations.
+        execution_providers: Collection of execution providers for running the models, like collect_activations.
+
+    Returns:
+        Dict of activation name to errors in dB. "qdq_err" compares activations before and after QDQ operation in
+        the QDQ model, and "xmodel_err" compares activations of the float model and the QDQ model.
+    """
+    qdq_session = _create_inference_session(qdq_augmented_model, session_options, execution_providers)
+    qdq_names = [
+        output.name[:-_TENSOR_SAVE_POSTFIX_LEN]
+        for output in qdq_session.get_outputs()
+        if output.name.endswith(_TENSOR_SAVE_POSTFIX)
+    ]
+    matches = _match_pre_post_qdq_names(qdq_names)
+    qdq_fetches = list(dict.fromkeys(name + _TENSOR_SAVE_POSTFIX for names in matches.values() for name in names))
+    qdq_errors = {activation_name: _RunningSignalToQuantizationNoiseRatio() for activation_name in matches}
+
+    float_session = None
+    float_fetches = []
+    xmodel_errors = {}
+    if float_augmented_model is not None:
+        float_session = _create_inference_session(float_augmented_model, session_options, execution_providers)
+        float_outputs = {output.name for output in float_session.get_outputs()}
+        for activation_name in matches:
+            if activation_name + _TENSOR_SAVE_POSTFIX in float_outputs:
+                float_fetches.append(activation_name + _TENSOR_SAVE_POSTFIX)
+                xmodel_errors[activation_name] = _RunningSignalToQuantizationNoiseRatio()
+
+    has_data = False
+    for input_d in input_reader:
+        has_data = True
+        qdq_outputs = dict(zip(qdq_fetches, qdq_session.run(qdq_fetches, input_d)))
+        for activation_name, (pre_name, post_name) in matches.items():
+            qdq_errors[activation_name].update(
+                qdq_outputs[pre_name + _TENSOR_SAVE_POSTFIX], qdq_outputs[post_name + _TENSOR_SAVE_POSTFIX]
+            )
+
+        if float_session is not None:
+            float_outputs = dict(zip(float_fetches, float_session.run(float_fetches, input_d)))
+            for activation_name, error in xmodel_errors.items():
+                post_name = matches[activation_name][1]
+                error.update(
+                    float_outputs[activation_name + _TENSOR_SAVE_POSTFIX], qdq_outputs[post_name + _TENSOR_SAVE_POSTFIX]
+                )
+    if not has_data:
+        raise RuntimeError("No data is collected while running augmented model!")
+
+    result: Dict[str, Dict[str, float]] = {}
+    for activation_name, error in qdq_errors.items():
+        result[activation_name] = {"qdq_err": error.get()}
+        if activation_name in xmodel_errors:
+            result[activation_name]["xmodel_err"] = xmodel_errors[activation_name].get()
+    return result
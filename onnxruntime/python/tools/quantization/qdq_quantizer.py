@@ -24,7 +24,6 @@ from .quant_utils import (
     add_quant_input_suffix,
     add_quant_output_suffix,
     add_quant_suffix,
-    find_by_name,
 )
 from .registry import CreateQDQQuantizer
 
@@ -123,7 +122,7 @@ class QDQQuantizer(ONNXQuantizer):
         """
         Check if tensor can be quantized
         """
-        weight = find_by_name(tensor_name, self.model.initializer())
+        weight = self.model.get_initializer(tensor_name)
         if weight is not None:
             if weight.data_type == onnx_proto.TensorProto.FLOAT:
                 return True
@@ -179,7 +178,7 @@ class QDQQuantizer(ONNXQuantizer):
         return self.__quantize_tensor(tensor_name, quant_sharing_param, QDQQuantTensorType.WEIGHT)
 
     def quantize_weight_tensor_per_channel(self, tensor_name, axis):
-        weight = find_by_name(tensor_name, self.model.initializer())
+        weight = self.model.get_initializer(tensor_name)
         if weight:
             if weight.data_type == onnx_proto.TensorProto.FLOAT:
                 self.tensors_to_quantize[tensor_name] = QDQTensorQuantInfo(
@@ -189,7 +188,7 @@ class QDQQuantizer(ONNXQuantizer):
             logging.warning(f"only support per-channel quantization on weight. Tensor: {tensor_name} is not quantized.")
 
     def quantize_bias_tensor(self, bias_name, input_name, weight_name, beta=1.0):
-        weight = find_by_name(bias_name, self.model.initializer())
+        weight = self.model.get_initializer(bias_name)
         if weight is not None:
             if weight.data_type == onnx_proto.TensorProto.FLOAT:
                 self.bias_to_quantize.append((bias_name, input_name, weight_name, beta))
@@ -222,6 +221,8 @@ class QDQQuantizer(ONNXQuantizer):
         if not self.add_qdq_pair_to_weight:
             self.model.clean_initializers()
 
+        self.release_prequantized_weights()
+
         self.model.model.producer_name = __producer__
         self.model.model.producer_version = __version__
 
@@ -230,7 +231,7 @@ class QDQQuantizer(ONNXQuantizer):
     def try_replacing_upstream_output(self, upstream_output_name, output_name):
         if (
             output_name in self.quantization_params
-            and len(self.model.input_name_to_nodes()[upstream_output_name]) == 1
+            and len(self.model.get_consumers(upstream_output_name)) == 1
             and not self.model.is_graph_output(upstream_output_name)
             and not self.model.is_graph_input(upstream_output_name)
         ):
@@ -325,7 +326,7 @@ class QDQQuantizer(ONNXQuantizer):
                 )
 
                 node = self.tensor_to_its_receiving_nodes[tensor_name][i]
-                self.model.replace_node_input(node, tensor_name, tensor_name_dequant_output_postfix)
+                self.model.replace_input_of_node(node, tensor_name, tensor_name_dequant_output_postfix)
                 if i == 0:
                     quantized_value = QuantizedValue(
                         tensor_name,
@@ -365,14 +366,36 @@ class QDQQuantizer(ONNXQuantizer):
             )
             self.quantized_value_map[tensor_name] = quantized_value
 
+    def _get_weights_to_prequantize(self):
+        # Weights are quantized after all nodes are visited, so they are known exactly from tensors_to_quantize.
+        if self.weight_quant_num_workers <= 1:
+            return []
+
+        initializers = {initializer.name: initializer for initializer in self.model.initializer()}
+        weights = []
+        for tensor_name, tensor_info in self.tensors_to_quantize.items():
+            initializer = initializers.get(tensor_name)
+            if initializer is None or tensor_info.is_shared or tensor_name in self.quantized_value_map:
+                continue
+            if tensor_info.axis is not None:
+                weights.append((initializer, onnx_proto.TensorProto.INT8, True, self.reduce_range, tensor_info.axis))
+            else:
+                qType = (  # noqa: N806
+                    self.weight_qType if tensor_info.tensor_type is QDQQuantTensorType.WEIGHT else self.activation_qType
+                )
+                weights.append((initializer, qType, self.is_weight_symmetric, False, None))
+        return weights
+
     def _quantize_normal_tensors(self):
+        self.prequantize_weights(self._get_weights_to_prequantize())
+
         for tensor_name, tensor_info in self.tensors_to_quantize.copy().items():
             if tensor_name in self.quantized_value_map:
                 continue
 
             if not tensor_info.is_shared:
                 # Quantize the input
-                initializer = find_by_name(tensor_name, self.model.initializer())
+                initializer = self.model.get_initializer(tensor_name)
                 if initializer:
                     self._add_qdq_pair_for_initializer(initializer, tensor_info.tensor_type, tensor_info.axis)
                 else:
@@ -400,18 +423,19 @@ class QDQQuantizer(ONNXQuantizer):
 
                     quantized_value = self.quantized_value_map[tensor_provider_name]
                     # Quantize the input
-                    initializer = find_by_name(tensor_name, self.model.initializer())
+                    initializer = self.model.get_initializer(tensor_name)
                     if initializer is not None:
                         raise ValueError("Quantization parameter shared mode is not supported for weight yet")
                     self._add_qdq_pair_for_activation(tensor_name, quantized_value.scale_name, quantized_value.zp_name)
 
     def _quantize_bias_tensors(self):
+        quantized_biases = []
         for bias_name, input_name, weight_name, beta in self.bias_to_quantize:
             if bias_name in self.quantized_value_map:
                 continue
             # Quantize the input
             self.quantize_bias_static(bias_name, input_name, weight_name, beta)
-            self.model.remove_initializer(find_by_name(bias_name, self.model.initializer()))
+            quantized_biases.append(self.model.get_initializer(bias_name))
             quant_value = self.quantized_value_map[bias_name]
             inputs = [quant_value.q_name, quant_value.scale_name, quant_value.zp_name]
             node_name = add_dequant_suffix(bias_name)
@@ -431,6 +455,7 @@ class QDQQuantizer(ONNXQuantizer):
                     node_name,
                 )
             self.model.add_node(dequant_node)
+        self.model.remove_initializers(quantized_biases)
 
     def is_tensor_quantized(self, tensor_name):
         return tensor_name in self.tensors_to_quantize or tensor_name in self.bias_to_quantize
@@ -19,6 +19,7 @@ QUANT_INPUT_SUFFIX = "_QuantizeLinear_Input"
 DEQUANT_OP_NAME = "DequantizeLinear"
 DEQUANT_OUTPUT_SUFFIX = "_DequantizeLinear_Output"
 TENSOR_NAME_QUANT_SUFFIX = "_quantized"
+DEQUANT_BLOCKWISE_SUFFIX = "_DequantizeBlockwise"
 
 
 type_to_name = {
@@ -42,11 +43,14 @@ type_to_name = {
 # Quantization mode
 # IntegerOps: Use IntegerOps in quantized model. Only ConvInteger and MatMulInteger ops are supported now.
 # QLinearOps: Use QLinearOps in quantized model. Only QLinearConv and QLinearMatMul ops are supported now.
+# WeightOnly: Store MatMul weights in 4 bits to compress the model file. Weights are dequantized to float when the
+#             session is created, so inference uses float weights and does not save memory or memory bandwidth.
 
 
 class QuantizationMode(Enum):
     IntegerOps = 0
     QLinearOps = 1
+    WeightOnly = 2
 
     def __str__(self):
         return self.name
@@ -163,11 +167,44 @@ def compute_scale_zp(rmin, rmax, qmin, qmax, symmetric=False):
     return [zero_point, scale]
 
 
-def quantize_data(data, qType, symmetric, reduce_range=False):
+def compute_scale_zp_array(rmin, rmax, qmin, qmax, symmetric=False):
+    """Calculate the scale and zero point for arrays of rmin and rmax element-wise,
+    like ranges of all channels in per-channel quantization. It has the same
+    result as calling compute_scale_zp for each pair of rmin and rmax.
+
+    :parameter rmin: numpy array of minimum values of r
+    :parameter rmax: numpy array of maximum values of r
+    :parameter qmin: minimum value representable by the target quantization data type
+    :parameter qmax: maximum value representable by the target quantization data type
+    :return: zero points and scales [z, s] as numpy arrays of int64 and float64
+    """
+    if qmin > 0 or qmax < 0:
+        raise ValueError(f"qmin and qmax must meet requirement: qmin <= 0 <= qmax while qmin:{qmin}, qmmax:{qmax}")
+
+    rmin = numpy.minimum(numpy.asarray(rmin, dtype=numpy.float64), 0)
+    rmax = numpy.maximum(numpy.asarray(rmax, dtype=numpy.float64), 0)
+
+    if symmetric:
+        absmax = numpy.maximum(numpy.abs(rmin), numpy.abs(rmax))
+        rmin = -absmax
+        rmax = +absmax
+
+    scale = (rmax - rmin) / float(qmax - qmin)
+    too_small = scale < numpy.finfo(numpy.float32).tiny
+    scale[too_small] = 1.0
+    zero_point = numpy.round(qmin - rmin / scale).astype(numpy.int64)
+    zero_point[too_small] = 0
+
+    return [zero_point, scale]
+
+
+def quantize_data(data, qType, symmetric, reduce_range=False, axis=None):
     """
-    :param data: data to quantize
+    :param data: data to quantize, a numpy array or a list
     :param qType: data type to quantize to. Supported types UINT8 and INT8
     :param symmetric: whether symmetric quantization is used or not. This is applied to INT8.
+    :param axis: when it is not None, each slice of data along this axis (like a channel) is quantized with its
+        own range, and minimum, maximum, zero point and scale are 1-D numpy arrays with one value per slice.
     :return: minimum, maximum, zero point, scale, and quantized weights
 
     To pack weights, we compute a linear transformation
@@ -185,23 +222,116 @@ def quantize_data(data, qType, symmetric, reduce_range=False):
     - *S*: scale
     - *z*: zero point
     """
+    data = numpy.asarray(data)
+    if axis is not None:
+        return _quantize_data_per_axis(data, qType, symmetric, reduce_range, axis)
 
     rmin = 0
     rmax = 0
     zero_point = 0
     scale = 1.0
-    if len(data):
-        rmin = min(data)
-        rmax = max(data)
+    if data.size:
+        rmin = data.min().item()
+        rmax = data.max().item()
         qmin, qmax = get_qmin_qmax_for_qType(qType, reduce_range, symmetric=symmetric)
 
         zero_point, scale = compute_scale_zp(rmin, rmax, qmin, qmax, symmetric)
 
-    quantized_data = quantize_nparray(qType, numpy.asarray(data), scale, zero_point)
+    quantized_data = quantize_nparray(qType, data, scale, zero_point)
 
     return rmin, rmax, zero_point, scale, quantized_data
 
 
+def _quantize_data_per_axis(data, qType, symmetric, reduce_range, axis):
+    if not -data.ndim <= axis < data.ndim:
+        raise ValueError(f"axis {axis} is out of range for data of shape {data.shape}")
+    axis = axis % data.ndim
+    channel_count = data.shape[axis]
+
+    # Reduce over all axes except the channel axis, so that ranges of all channels are computed in one pass.
+    reduce_axes = tuple(i for i in range(data.ndim) if i != axis)
+    if data.size:
+        rmin = data.min(axis=reduce_axes).astype(numpy.float64)
+        rmax = data.max(axis=reduce_axes).astype(numpy.float64)
+        qmin, qmax = get_qmin_qmax_for_qType(qType, reduce_range, symmetric=symmetric)
+        zero_point, scale = compute_scale_zp_array(rmin, rmax, qmin, qmax, symmetric)
+    else:
+        rmin = numpy.zeros(channel_count)
+        rmax = numpy.zeros(channel_count)
+        zero_point = numpy.zeros(channel_count, dtype=numpy.int64)
+        scale = numpy.ones(channel_count)
+
+    # Broadcast per channel scale and zero point. Scale is float32 so that the result is same as per-tensor
+    # quantization of each channel, where a scalar scale does not change the float32 precision of division.
+    broadcast_shape = [1] * data.ndim
+    broadcast_shape[axis] = channel_count
+    quantized_data = quantize_nparray(
+        qType,
+        data,
+        scale.astype(numpy.float32).reshape(broadcast_shape),
+        zero_point.astype(numpy.float32).reshape(broadcast_shape),
+    )
+
+    return rmin, rmax, zero_point, scale, quantized_data
+
+
+def quantize_blockwise_4bits(data, block_size, symmetric):
+    """
+    Quantize a 2-D weight of shape [K, N] to 4 bits in blocks of block_size elements along K, which is the reduction
+    axis of MatMul. K is padded with zeros to a multiple of block_size.
+
+    :param data: 2-D numpy array of float32
+    :param block_size: number of elements sharing a scale (and a zero point). It shall be a positive even number.
+    :param symmetric: quantize [-m, m] to [1, 15] with zero point 8, where m is the maximum absolute value of a block.
+        Otherwise [rmin, rmax] is quantized to [0, 15].
+    :return: packed weight, scales and zero points. Packed weight is uint8 of shape [K / block_size, block_size / 2, N],
+        where the low 4 bits hold the first half of a block and the high 4 bits hold the second half. Scales (float32)
+        and zero points (uint8) have shape [K / block_size, 1, N].
+    """
+    data = numpy.asarray(data, dtype=numpy.float32)
+    if data.ndim != 2:
+        raise ValueError(f"Only 2-D weight could be quantized block-wise, got shape {data.shape}")
+    if block_size <= 0 or block_size % 2 != 0:
+        raise ValueError(f"block_size shall be a positive even number, got {block_size}")
+
+    rows, columns = data.shape
+    num_blocks = (rows + block_size - 1) // block_size
+    blocks = numpy.zeros((num_blocks * block_size, columns), dtype=numpy.float32)
+    blocks[:rows] = data
+    blocks = blocks.reshape(num_blocks, block_size, columns)
+
+    qmin, qmax = (-7, 7) if symmetric else (0, 15)
+    zero_point, scale = compute_scale_zp_array(
+        blocks.min(axis=1, keepdims=True), blocks.max(axis=1, keepdims=True), qmin, qmax, symmetric
+    )
+    scale = scale.astype(numpy.float32)
+    quantized = numpy.clip(numpy.round(blocks / scale) + zero_point, qmin, qmax)
+    if symmetric:
+        quantized += 8
+        zero_point = zero_point + 8
+    quantized = quantized.astype(numpy.uint8)
+
+    half = block_size // 2
+    packed = quantized[:, :half, :] | (quantized[:, half:, :] << 4)
+    return packed, scale, zero_point.astype(numpy.uint8)
+
+
+def dequantize_blockwise_4bits(packed, scale, zero_point, rows):
+    """
+    Reference of dequantizing the result of quantize_blockwise_4bits, which is also computed by the nodes added in
+    ONNXQuantizer.quantize_weight_blockwise.
+
+    :param packed: packed weight of shape [K / block_size, block_size / 2, N]
+    :param scale: scales of shape [K / block_size, 1, N]
+    :param zero_point: zero points of shape [K / block_size, 1, N], or a scalar
+    :param rows: K before padding
+    :return: float32 weight of shape [K, N]
+    """
+    quantized = numpy.concatenate([packed & 0x0F, packed >> 4], axis=1).astype(numpy.float32)
+    data = (quantized - numpy.asarray(zero_point, dtype=numpy.float32)) * scale
+    return data.reshape(-1, data.shape[-1])[:rows]
+
+
 def get_qmin_qmax_for_qType(qType, reduce_range=False, symmetric=False):  # noqa: N802
     """
     Return qmin and qmax, the minimum and maximum value representable by the given qType
@@ -274,6 +404,7 @@ class QuantizedValue:
         zero_point_name,
         quantized_value_type,
         axis=None,
+        block_size=None,
     ):
         self.original_name = name
         self.q_name = new_quantized_name
@@ -281,6 +412,7 @@ class QuantizedValue:
         self.zp_name = zero_point_name
         self.value_type = quantized_value_type
         self.axis = axis
+        self.block_size = block_size  # not None for block-wise quantized weight, which has no DequantizeLinear form
 
 
 class BiasToQuantize:
@@ -487,6 +619,29 @@ def smooth_distribution(p, eps=0.0001):
     return hist
 
 
+def smooth_distributions(p, lengths, eps=0.0001):
+    """Batched version of smooth_distribution.
+    p is a 2D array holding one discrete distribution per row, where only the first lengths[i] entries of row i
+    belong to the distribution. Entries past the length of their row are set to 0.
+    Returns the smoothed distributions, with the same float32 values smooth_distribution gives for each row,
+    and a boolean array telling which rows could be smoothed, that is which rows are not all zeros.
+    """
+    valid = numpy.arange(p.shape[1]) < lengths[:, None]
+    is_zeros = (p == 0) & valid
+    n_zeros = is_zeros.sum(axis=1)
+    n_nonzeros = lengths - n_zeros
+    smoothable = n_nonzeros > 0
+
+    eps1 = eps * n_zeros.astype(numpy.float64) / numpy.maximum(n_nonzeros, 1)
+    index = eps1.argmax()
+    assert (eps1 < 1.0).all(), f"n_zeros={n_zeros[index]}, n_nonzeros={n_nonzeros[index]}, eps1={eps1[index]:f}"
+
+    hist = p.astype(numpy.float32)
+    hist += numpy.where(is_zeros, numpy.float32(eps), (-eps1).astype(numpy.float32)[:, None])
+    hist[~valid] = 0
+    return hist, smoothable
+
+
 def model_has_external_data(model_path: Path):
     model = onnx.load(model_path.as_posix(), load_external_data=False)
     for intializer in model.graph.initializer:
@@ -11,7 +11,7 @@ from .calibrate import CalibrationDataReader, CalibrationMethod, create_calibrat
 from .onnx_quantizer import ONNXQuantizer
 from .qdq_quantizer import QDQQuantizer
 from .quant_utils import QuantFormat, QuantizationMode, QuantType, load_model, model_has_pre_process_metadata
-from .registry import IntegerOpsRegistry, QDQRegistry, QLinearOpsRegistry
+from .registry import IntegerOpsRegistry, QDQRegistry, QLinearOpsRegistry, WeightOnlyOpsRegistry
 
 
 class QuantConfig:
@@ -139,11 +139,34 @@ class StaticQuantConfig(QuantConfig):
                         Default is 0.01. Constant smoothing factor to use when computing the moving average of the
                         minimum and maximum values. Effective only when the calibration method selected is MinMax and
                         when CalibMovingAverage is set to True.
+                    CalibStreaming = True/False :
+                        Default is False. If enabled, the calibrator folds the outputs of each calibration batch into
+                        running accumulators instead of keeping the outputs of every batch in memory, so that memory
+                        usage does not grow with the number of calibration samples.
+                    CalibNumWorkers = int :
+                        Default is 1. Number of worker processes to run the calibration data through. The batches of
+                        the calibration data reader are dealt out to the workers round robin, so they need to be
+                        picklable, and the calling script needs an `if __name__ == "__main__":` guard. Each worker
+                        reduces the outputs of its batches itself. This implies CalibStreaming.
+                    CalibCheckpointPath = str :
+                        Default is None. If set, the calibration state (ranges or histograms collected so far) is saved
+                        to this .npz file every CalibCheckpointInterval batches and when calibration finishes. This
+                        implies CalibStreaming.
+                    CalibCheckpointInterval = int :
+                        Default is 100. Number of calibration batches between two checkpoints.
+                    CalibResumeFromCheckpoint = True/False :
+                        Default is False. If enabled and CalibCheckpointPath exists, the calibrator starts from the
+                        saved state and skips the batches of the calibration data reader that were already collected. A
+                        checkpoint saved at the end of a calibration can be resumed with a new data reader to add more
+                        calibration data to it.
                     QuantizeBias = True/False :
                         Default is True which quantizes floating-point biases and it solely inserts
                         a DeQuantizeLinear node. If False, it remains floating-point bias and does not insert
                         any quantization nodes associated with biases.
                         This extra option is only effective when quant_format is QuantFormat.QDQ.
+                    WeightQuantNumWorkers = int :
+                        Default is 1. Number of threads to quantize weights concurrently before the quantized model is
+                        built. The quantized model is the same for any number of threads.
             execution_provider : A enum indicates the Execution Provider such as: CPU, TRT, NNAPI, SNE, etc.
         Raises:
             ValueError: Raise ValueError if execution provider is unknown
@@ -196,6 +219,9 @@ class DynamicQuantConfig(QuantConfig):
                     quantized output. Also the True behavior could be disabled per node using the nodes_to_exclude.
                 MatMulConstBOnly = True/False:
                     Default is True for dynamic mode. If enabled, only MatMul with const B will be quantized.
+                WeightQuantNumWorkers = int :
+                    Default is 1. Number of threads to quantize weights concurrently before the quantized model is
+                    built. The quantized model is the same for any number of threads.
             execution_provider : A enum indicates the Execution Provider such as: CPU, TRT, NNAPI, SNE, etc.
 
         Raises:
@@ -330,6 +356,29 @@ def quantize_static(
                     Default is 0.01. Constant smoothing factor to use when computing the moving average of the
                     minimum and maximum values. Effective only when the calibration method selected is MinMax and
                     when CalibMovingAverage is set to True.
+                CalibStreaming = True/False :
+                    Default is False. If enabled, the calibrator folds the outputs of each calibration batch into
+                    running accumulators instead of keeping the outputs of every batch in memory, so that memory
+                    usage does not grow with the number of calibration samples.
+                CalibNumWorkers = int :
+                    Default is 1. Number of worker processes to run the calibration data through. The batches of
+                    the calibration data reader are dealt out to the workers round robin, so they need to be
+                    picklable, and the calling script needs an `if __name__ == "__main__":` guard. Each worker
+                    reduces the outputs of its batches itself. This implies CalibStreaming.
+                CalibCheckpointPath = str :
+                    Default is None. If set, the calibration state (ranges or histograms collected so far) is saved to
+                    this .npz file every CalibCheckpointInterval batches and when calibration finishes. This implies
+                    CalibStreaming.
+                CalibCheckpointInterval = int :
+                    Default is 100. Number of calibration batches between two checkpoints.
+                CalibResumeFromCheckpoint = True/False :
+                    Default is False. If enabled and CalibCheckpointPath exists, the calibrator starts from the saved
+                    state and skips the batches of the calibration data reader that were already collected. A checkpoint
+                    saved at the end of a calibration can be resumed with a new data reader to add more calibration data
+                    to it.
+                WeightQuantNumWorkers = int :
+                    Default is 1. Number of threads to quantize weights concurrently before the quantized model is
+                    built. The quantized model is the same for any number of threads.
     """
 
     extra_options = extra_options or {}
@@ -357,6 +406,11 @@ def quantize_static(
         ("CalibTensorRangeSymmetric", "symmetric"),
         ("CalibMovingAverage", "moving_average"),
         ("CalibMovingAverageConstant", "averaging_constant"),
+        ("CalibStreaming", "streaming"),
+        ("CalibNumWorkers", "num_workers"),
+        ("CalibCheckpointPath", "checkpoint_path"),
+        ("CalibCheckpointInterval", "checkpoint_interval"),
+        ("CalibResumeFromCheckpoint", "resume_from_checkpoint"),
     ]
     calib_extra_options = {
         key: extra_options.get(name) for (name, key) in calib_extra_options_keys if name in extra_options
@@ -474,6 +528,9 @@ def quantize_dynamic(
                     quantized output. Also the True behavior could be disabled per node using the nodes_to_exclude.
                 MatMulConstBOnly = True/False:
                     Default is True for dynamic mode. If enabled, only MatMul with const B will be quantized.
+                WeightQuantNumWorkers = int :
+                    Default is 1. Number of threads to quantize weights concurrently before the quantized model is
+                    built. The quantized model is the same for any number of threads.
     """
     extra_options = extra_options or {}
     nodes_to_exclude = nodes_to_exclude or []
@@ -509,6 +566,77 @@ def quantize_dynamic(
     quantizer.model.save_model_to_file(model_output, use_external_data_format)
 
 
+def quantize_weight_only(
+    model_input: Path,
+    model_output: Path,
+    op_types_to_quantize=None,
+    block_size=32,
+    is_symmetric=True,
+    nodes_to_quantize=None,
+    nodes_to_exclude=None,
+    use_external_data_format=False,
+    extra_options=None,
+):
+    """Given an onnx model, compress its MatMul weights to 4 bits on disk and save it into a file.
+    Only constant B of MatMul is compressed, and Gemm is converted to MatMul when possible. Each block of block_size
+    elements along the reduction axis has its own scale (and zero point), and two 4-bit values are packed in one byte.
+
+    This only makes the model file smaller (like for download or storage), with the accuracy loss of 4-bit weights.
+    It is not a runtime optimization: there is no kernel that runs MatMul on packed 4-bit weights, so the weights are
+    dequantized by float ops that only depend on initializers. Graph optimization (enabled by default) folds them into
+    float weights when an inference session is created, so session creation is slower than the float model, and
+    latency, memory usage and memory bandwidth of inference are the same as the float model. With graph optimization
+    disabled, dequantization runs in every inference instead.
+
+    Args:
+        model_input: file path of model to quantize
+        model_output: file path of quantized model
+        op_types_to_quantize:
+            specify the types of operators to quantize, like ['MatMul']. It quantizes all supported operators by
+            default.
+        block_size: number of weight elements sharing a scale. It shall be a positive even number. Smaller blocks
+            are more accurate, and larger blocks have smaller model.
+        is_symmetric: quantize weights with fixed zero point. Otherwise, every block has a zero point.
+        nodes_to_quantize:
+            List of nodes names to quantize. When this list is not None only the nodes in this list
+            are quantized.
+        nodes_to_exclude:
+            List of nodes names to exclude. The nodes in this list will be excluded from quantization
+            when it is not None.
+        use_external_data_format: option used for large size (>2GB) model. Set to False by default.
+        extra_options:
+            key value pair dictionary for various options in different case. Current used:
+                EnableSubgraph = True/False :
+                    Default is False. If enabled, subgraph will be quantized.
+    """
+    extra_options = dict(extra_options or {})
+    extra_options["WeightOnlyBlockSize"] = block_size
+    extra_options["WeightOnlySymmetric"] = is_symmetric
+    nodes_to_exclude = nodes_to_exclude or []
+    nodes_to_quantize = nodes_to_quantize or []
+    op_types_to_quantize = op_types_to_quantize or list(WeightOnlyOpsRegistry.keys())
+
+    model = load_model(Path(model_input), False)
+
+    quantizer = ONNXQuantizer(
+        model,
+        False,  # per_channel
+        False,  # reduce_range
+        QuantizationMode.WeightOnly,
+        False,  # static. Activations are not quantized in WeightOnly mode, and Gemm is converted to MatMul when False.
+        QuantType.QUInt8,  # weight type is not used
+        QuantType.QUInt8,  # activations are not quantized
+        None,
+        nodes_to_quantize,
+        nodes_to_exclude,
+        op_types_to_quantize,
+        extra_options,
+    )
+
+    quantizer.quantize_model()
+    quantizer.model.save_model_to_file(model_output, use_external_data_format)
+
+
 def quantize(
     model_input: Path,
     model_output: Path,
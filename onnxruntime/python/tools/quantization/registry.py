@@ -12,7 +12,7 @@ from .operators.gavgpool import QGlobalAveragePool
 from .operators.gemm import QDQGemm, QLinearGemm
 from .operators.instnorm import QDQInstanceNormalization
 from .operators.lstm import LSTMQuant
-from .operators.matmul import MatMulInteger, QDQMatMul, QLinearMatMul
+from .operators.matmul import MatMulInteger, MatMulWeightOnly, QDQMatMul, QLinearMatMul
 from .operators.maxpool import QDQMaxPool, QMaxPool
 from .operators.pad import QPad
 from .operators.pooling import QLinearPool
@@ -63,6 +63,10 @@ QLinearOpsRegistry = {
 }
 QLinearOpsRegistry.update(CommonOpsRegistry)
 
+WeightOnlyOpsRegistry = {
+    "MatMul": MatMulWeightOnly,
+}
+
 QDQRegistry = {
     "Conv": QDQConv,
     "ConvTranspose": QDQConv,
@@ -90,7 +94,12 @@ def CreateDefaultOpQuantizer(onnx_quantizer, node):  # noqa: N802
 
 
 def CreateOpQuantizer(onnx_quantizer, node):  # noqa: N802
-    registry = IntegerOpsRegistry if onnx_quantizer.mode == QuantizationMode.IntegerOps else QLinearOpsRegistry
+    if onnx_quantizer.mode == QuantizationMode.IntegerOps:
+        registry = IntegerOpsRegistry
+    elif onnx_quantizer.mode == QuantizationMode.WeightOnly:
+        registry = WeightOnlyOpsRegistry
+    else:
+        registry = QLinearOpsRegistry
     if node.op_type in registry:
         op_quantizer = registry[node.op_type](onnx_quantizer, node)
         if op_quantizer.should_quantize():
@@ -3,6 +3,7 @@
 
 # -*- coding: UTF-8 -*-
 import argparse
+import heapq
 import logging
 
 import numpy as np
@@ -67,6 +68,17 @@ def make_named_value_info(name):
     return vi
 
 
+def get_dim_params_from_type_proto(type_proto):
+    cls_type = type_proto.WhichOneof("value")
+    if cls_type in ["tensor_type", "sparse_tensor_type"]:
+        return {d.dim_param for d in getattr(type_proto, cls_type).shape.dim if d.HasField("dim_param")}
+    if cls_type in ["sequence_type", "optional_type"]:
+        return get_dim_params_from_type_proto(getattr(type_proto, cls_type).elem_type)
+    if cls_type == "map_type":
+        return get_dim_params_from_type_proto(type_proto.map_type.value_type)
+    return set()
+
+
 def get_shape_from_sympy_shape(sympy_shape):
     return [None if i is None else (int(i) if is_literal(i) else str(i)) for i in sympy_shape]
 
@@ -123,7 +135,7 @@ def sympy_reduce_product(x):
 
 
 class SymbolicShapeInference:
-    def __init__(self, int_max, auto_merge, guess_output_rank, verbose, prefix=""):
+    def __init__(self, int_max, auto_merge, guess_output_rank, verbose, prefix="", onnx_infer_batch_size=1):
         self.dispatcher_ = {
             "Add": self._infer_symbolic_compute_ops,
             "ArrayFeatureExtractor": self._infer_ArrayFeatureExtractor,
@@ -240,6 +252,27 @@ class SymbolicShapeInference:
         self.int_max_ = int_max
         self.subgraph_id_ = 0
         self.prefix_ = prefix
+        self.onnx_infer_batch_size_ = onnx_infer_batch_size
+        self.onnx_infer_batch_results_ = {}
+        self.onnx_infer_batch_value_dependent_ops_ = {
+            "CenterCropPad",
+            "Compress",
+            "ConstantOfShape",
+            "Expand",
+            "NonZero",
+            "OneHot",
+            "Pad",
+            "Range",
+            "Reshape",
+            "Resize",
+            "Slice",
+            "Split",
+            "Squeeze",
+            "Tile",
+            "TopK",
+            "Unsqueeze",
+            "Upsample",
+        }
 
     def _add_suggested_merge(self, symbols, apply=False):
         assert all([(type(s) == str and s in self.symbolic_dims_) or is_literal(s) for s in symbols])
@@ -432,9 +465,9 @@ class SymbolicShapeInference:
                     if str(new_dim) not in self.symbolic_dims_:
                         self.symbolic_dims_[str(new_dim)] = new_dim
 
-    def _onnx_infer_single_node(self, node):
+    def _skip_onnx_infer(self, node):
         # skip onnx shape inference for some ops, as they are handled in _infer_*
-        skip_infer = node.op_type in [
+        return node.op_type in [
             "If",
             "Loop",
             "Scan",
@@ -463,39 +496,121 @@ class SymbolicShapeInference:
             "NhwcConv",
         ]
 
-        if not skip_infer:
-            # Only pass initializers that satisfy the following condition:
-            # (1) Operator need value of some input for shape inference.
-            #     For example, Unsqueeze in opset 13 uses the axes input to calculate shape of output.
-            # (2) opset version >= 9. In older version, initializer is required in graph input by onnx spec.
-            # (3) The initializer is not in graph input. The means the node input is "constant" in inference.
-            initializers = []
-            if (get_opset(self.out_mp_) >= 9) and node.op_type in ["Unsqueeze"]:
-                initializers = [
-                    self.initializers_[name]
-                    for name in node.input
-                    if (name in self.initializers_ and name not in self.graph_inputs_)
-                ]
+    def _get_onnx_infer_initializers(self, node):
+        # Only pass initializers that satisfy the following condition:
+        # (1) Operator need value of some input for shape inference.
+        #     For example, Unsqueeze in opset 13 uses the axes input to calculate shape of output.
+        # (2) opset version >= 9. In older version, initializer is required in graph input by onnx spec.
+        # (3) The initializer is not in graph input. The means the node input is "constant" in inference.
+        if (get_opset(self.out_mp_) >= 9) and node.op_type in ["Unsqueeze"]:
+            return [
+                self.initializers_[name]
+                for name in node.input
+                if (name in self.initializers_ and name not in self.graph_inputs_)
+            ]
+        return []
+
+    def _onnx_infer_batch(self, sorted_nodes, start):
+        # run onnx shape inference on consecutive nodes in one graph, and keep the results per node
+        # the results are only used in _onnx_infer_single_node when they match single node inference,
+        # i.e. inputs have the same value info as in self.known_vi_, and no new symbolic dims are generated
+        batch_nodes = []
+        batch_inputs = {}
+        produced = set()
+        initializers = {}
+        consumed = set()
+        for node in sorted_nodes[start : start + self.onnx_infer_batch_size_]:
+            if self._skip_onnx_infer(node):
+                break
+            inputs = [i for i in node.input if i]
+            if not all([i in produced or i in self.known_vi_ for i in inputs]):
+                break
+            outputs = [o for o in node.output if o]
+            if any([o in produced or o in batch_inputs or o in self.known_vi_ for o in outputs]):
+                break
+            node_initializers = self._get_onnx_infer_initializers(node)
+            if node_initializers:
+                if any([i.name in consumed for i in node_initializers]):
+                    break
+            elif any([i in initializers for i in inputs]):
+                break
+            batch_nodes.append(node)
+            for i in inputs:
+                if i not in produced:
+                    batch_inputs[i] = self.known_vi_[i]
+            initializers.update({i.name: i for i in node_initializers})
+            if not node_initializers:
+                consumed.update(inputs)
+            # onnx shape inference reads values of Constant outputs, which is not available to single node inference
+            # output shapes of ops that depend on input values are usually refined by symbolic inference afterwards
+            if node.op_type != "Constant" and node.op_type not in self.onnx_infer_batch_value_dependent_ops_:
+                produced.update(outputs)
+
+        if len(batch_nodes) < 2:
+            return
+
+        tmp_graph = helper.make_graph(
+            batch_nodes,
+            "tmp",
+            list(batch_inputs.values()),
+            [make_named_value_info(o) for n in batch_nodes for o in n.output if o],
+            list(initializers.values()),
+        )
+        self.tmp_mp_.graph.CopyFrom(tmp_graph)
+        try:
+            inferred_mp = shape_inference.infer_shapes(self.tmp_mp_)
+        except Exception:
+            # fall back to single node inference
+            return
 
-            # run single node inference with self.known_vi_ shapes
-            tmp_graph = helper.make_graph(
-                [node],
-                "tmp",
-                [self.known_vi_[i] for i in node.input if i],
-                [make_named_value_info(i) for i in node.output],
-                initializers,
+        vi_by_name = {vi.name: vi for vi in inferred_mp.graph.input}
+        vi_by_name.update({vi.name: vi for vi in inferred_mp.graph.output})
+        for node in batch_nodes:
+            self.onnx_infer_batch_results_[id(node)] = (
+                {i: vi_by_name[i] for i in node.input if i},
+                {o: vi_by_name[o] for o in node.output if o},
             )
 
-            self.tmp_mp_.graph.CopyFrom(tmp_graph)
+    def _get_onnx_infer_batch_result(self, node):
+        result = self.onnx_infer_batch_results_.pop(id(node), None)
+        if result is None:
+            return None
+        input_vis, output_vis = result
+        if any([self.known_vi_[i] != vi for i, vi in input_vis.items()]):
+            return None
+        input_dim_params = set()
+        for vi in input_vis.values():
+            input_dim_params.update(get_dim_params_from_type_proto(vi.type))
+        for vi in output_vis.values():
+            if not get_dim_params_from_type_proto(vi.type).issubset(input_dim_params):
+                return None
+        return output_vis
+
+    def _onnx_infer_single_node(self, node):
+        skip_infer = self._skip_onnx_infer(node)
 
-            self.tmp_mp_ = shape_inference.infer_shapes(self.tmp_mp_)
+        if not skip_infer:
+            output_vis = self._get_onnx_infer_batch_result(node)
+            if output_vis is None:
+                # run single node inference with self.known_vi_ shapes
+                tmp_graph = helper.make_graph(
+                    [node],
+                    "tmp",
+                    [self.known_vi_[i] for i in node.input if i],
+                    [make_named_value_info(i) for i in node.output],
+                    self._get_onnx_infer_initializers(node),
+                )
 
-        for i_o in range(len(node.output)):
-            o = node.output[i_o]
+                self.tmp_mp_.graph.CopyFrom(tmp_graph)
+
+                self.tmp_mp_ = shape_inference.infer_shapes(self.tmp_mp_)
+                output_vis = {o: vi for o, vi in zip(node.output, self.tmp_mp_.graph.output)}
+
+        for o in node.output:
             if o:  # skip optional output
                 vi = self.out_mp_.graph.value_info.add()
                 if not skip_infer:
-                    vi.CopyFrom(self.tmp_mp_.graph.output[i_o])
+                    vi.CopyFrom(output_vis[o])
                 else:
                     vi.name = o
                 self.known_vi_[o] = vi
@@ -525,6 +640,7 @@ class SymbolicShapeInference:
             self.guess_output_rank_,
             self.verbose_,
             prefix=self.prefix_ + "_" + str(self.subgraph_id_),
+            onnx_infer_batch_size=self.onnx_infer_batch_size_,
         )
         if inc_subgraph_id:
             self.subgraph_id_ += 1
@@ -2379,6 +2495,52 @@ class SymbolicShapeInference:
                 return out
         return None
 
+    @staticmethod
+    def _topological_sort(graph, prereq_for_node, known_names):
+        """
+        Sort nodes in the same order as scanning graph.node repeatedly, and taking every node whose prerequisites
+        are known, until all graph outputs are known. A node made ready by an earlier node in the same scan is taken
+        in that scan, otherwise in the next one. Each node is visited once with the help of a consumer index.
+        """
+        nodes = list(graph.node)
+        node_outputs = [list(node.output) for node in nodes]
+        num_unknown_prereqs = []
+        consumers = {}  # map from name to indices of nodes that need it
+        ready = []  # heap of indices of nodes ready in current scan
+        for i, outputs in enumerate(node_outputs):
+            unknown_prereqs = {name for name in prereq_for_node[outputs[0]] if name and name not in known_names}
+            num_unknown_prereqs.append(len(unknown_prereqs))
+            for name in unknown_prereqs:
+                consumers.setdefault(name, []).append(i)
+            if not unknown_prereqs:
+                ready.append(i)
+
+        output_names = [o.name for o in graph.output]
+        sorted_nodes = []
+        while not all([name in known_names for name in output_names]):
+            if not ready:
+                raise Exception("Invalid model with cyclic graph")
+            ready_in_next_scan = []
+            while ready:
+                i = heapq.heappop(ready)
+                if node_outputs[i][0] in known_names:
+                    continue
+                sorted_nodes.append(nodes[i])
+                for name in node_outputs[i]:
+                    if name in known_names:
+                        continue
+                    known_names.add(name)
+                    for consumer in consumers.pop(name, []):
+                        num_unknown_prereqs[consumer] -= 1
+                        if num_unknown_prereqs[consumer] == 0:
+                            if consumer > i:
+                                heapq.heappush(ready, consumer)
+                            else:
+                                ready_in_next_scan.append(consumer)
+            heapq.heapify(ready_in_next_scan)
+            ready = ready_in_next_scan
+        return sorted_nodes
+
     def _infer_impl(self, start_sympy_data=None):
         self.sympy_data_ = start_sympy_data or {}
         self.out_mp_.graph.ClearField("value_info")
@@ -2410,11 +2572,18 @@ class SymbolicShapeInference:
                 # Since inputs are not produced by other ops, we can assume positivity
                 self.symbolic_dims_[s] = sympy.Symbol(s, integer=True, positive=True)
         # create a temporary ModelProto for single node inference
-        # note that we remove initializer to have faster inference
+        # note that the graph is not copied since it is replaced for each node, which also avoids copying initializers
         # for tensor ops like Reshape/Tile/Expand that read initializer, we need to do sympy computation based inference anyways
         self.tmp_mp_ = onnx.ModelProto()
-        self.tmp_mp_.CopyFrom(self.out_mp_)
-        self.tmp_mp_.graph.ClearField("initializer")
+        for field, value in self.out_mp_.ListFields():
+            if field.name == "graph":
+                continue
+            if field.label == field.LABEL_REPEATED:
+                getattr(self.tmp_mp_, field.name).extend(value)
+            elif field.type == field.TYPE_MESSAGE:
+                getattr(self.tmp_mp_, field.name).CopyFrom(value)
+            else:
+                setattr(self.tmp_mp_, field.name, value)
 
         # compute prerequesite for node for topological sort
         # node with subgraphs may have dependency on implicit inputs, which will affect topological sort
@@ -2444,31 +2613,22 @@ class SymbolicShapeInference:
                         names.remove(i.name)
             return names
 
-        for n in self.tmp_mp_.graph.node:
+        for n in self.out_mp_.graph.node:
             prereq_for_node[n.output[0]] = get_prereq(n)
 
         # topological sort nodes, note there might be dead nodes so we check if all graph outputs are reached to terminate
-        sorted_nodes = []
         sorted_known_vi = {i.name for i in list(self.out_mp_.graph.input) + list(self.out_mp_.graph.initializer)}
         if any([o.name in sorted_known_vi for o in self.out_mp_.graph.output]):
             # Loop/Scan will have some graph output in graph inputs, so don't do topological sort
             sorted_nodes = self.out_mp_.graph.node
         else:
-            while not all([o.name in sorted_known_vi for o in self.out_mp_.graph.output]):
-                old_sorted_nodes_len = len(sorted_nodes)
-                for node in self.out_mp_.graph.node:
-                    if (node.output[0] not in sorted_known_vi) and all(
-                        [i in sorted_known_vi for i in prereq_for_node[node.output[0]] if i]
-                    ):
-                        sorted_known_vi.update(node.output)
-                        sorted_nodes.append(node)
-                if old_sorted_nodes_len == len(sorted_nodes) and not all(
-                    [o.name in sorted_known_vi for o in self.out_mp_.graph.output]
-                ):
-                    raise Exception("Invalid model with cyclic graph")
-
-        for node in sorted_nodes:
+            sorted_nodes = self._topological_sort(self.out_mp_.graph, prereq_for_node, sorted_known_vi)
+
+        self.onnx_infer_batch_results_ = {}
+        for i_node, node in enumerate(sorted_nodes):
             assert all([i in self.known_vi_ for i in node.input if i])
+            if self.onnx_infer_batch_size_ > 1 and id(node) not in self.onnx_infer_batch_results_:
+                self._onnx_infer_batch(sorted_nodes, i_node)
             self._onnx_infer_single_node(node)
             known_aten_op = False
             if node.op_type in self.dispatcher_:
@@ -2706,12 +2866,16 @@ class SymbolicShapeInference:
                 output.CopyFrom(self.known_vi_[output.name])
 
     @staticmethod
-    def infer_shapes(in_mp, int_max=2**31 - 1, auto_merge=False, guess_output_rank=False, verbose=0):
+    def infer_shapes(
+        in_mp, int_max=2**31 - 1, auto_merge=False, guess_output_rank=False, verbose=0, onnx_infer_batch_size=1
+    ):
         onnx_opset = get_opset(in_mp)
         if (not onnx_opset) or onnx_opset < 7:
             logger.warning("Only support models of onnx opset 7 and above.")
             return None
-        symbolic_shape_inference = SymbolicShapeInference(int_max, auto_merge, guess_output_rank, verbose)
+        symbolic_shape_inference = SymbolicShapeInference(
+            int_max, auto_merge, guess_output_rank, verbose, onnx_infer_batch_size=onnx_infer_batch_size
+        )
         all_shapes_inferred = False
         symbolic_shape_inference._preprocess(in_mp)
         while symbolic_shape_inference.run_:
@@ -2751,6 +2915,12 @@ def parse_arguments():
         type=int,
         default=0,
     )
+    parser.add_argument(
+        "--onnx_infer_batch_size",
+        help="Maximum number of consecutive nodes to run onnx shape inference on at once, 1: one node at a time",
+        type=int,
+        default=1,
+    )
     parser.add_argument(
         "--save_as_external_data",
         help="Saving an ONNX model to external data",
@@ -2789,6 +2959,7 @@ if __name__ == "__main__":
         args.auto_merge,
         args.guess_output_rank,
         args.verbose,
+        args.onnx_infer_batch_size,
     )
     if args.output and out_mp:
         if args.save_as_external_data:
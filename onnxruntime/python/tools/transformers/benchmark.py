@@ -43,7 +43,6 @@
 import argparse
 import logging
 import os
-import timeit
 from datetime import datetime
 from enum import Enum  # noqa: F401
 
@@ -56,15 +55,17 @@ from benchmark_helper import (
     OptimizerInfo,
     Precision,
     create_onnxruntime_session,
-    get_latency_result,
     inference_ort,
     inference_ort_with_io_binding,
+    measure_latency,
     output_details,
     output_fusion_statistics,
+    output_json,
     output_summary,
     setup_logger,
 )
 from fusion_options import FusionOptions
+from latency_benchmark import LatencyBenchmark
 from onnx_exporter import (
     create_onnxruntime_input,
     export_onnx_model_from_pt,
@@ -111,6 +112,7 @@ def run_onnxruntime(
     model_fusion_statistics,
     model_source,
     args,
+    latency_benchmark=None,
 ):
     import onnxruntime
 
@@ -277,6 +279,7 @@ def run_onnxruntime(
                             repeat_times,
                             batch_size,
                             warm_up_repeat,
+                            latency_benchmark,
                         )
                     else:
                         # Get output sizes from a dummy ort run
@@ -303,6 +306,7 @@ def run_onnxruntime(
                             device,
                             data_type,
                             warm_up_repeat,
+                            latency_benchmark,
                         )
                     logger.info(result)
                     results.append(result)
@@ -324,6 +328,7 @@ def run_pytorch(
     torch2,
     cache_dir,
     verbose,
+    latency_benchmark=None,
 ):
     results = []
     if use_gpu and not torch.cuda.is_available():
@@ -396,7 +401,12 @@ def run_pytorch(
                     )
                     inference(input_ids)
 
-                    runtimes = timeit.repeat(lambda: inference(input_ids), repeat=repeat_times, number=1)  # noqa: B023
+                    latency_result = measure_latency(
+                        lambda: inference(input_ids),  # noqa: B023
+                        repeat_times,
+                        batch_size,
+                        latency_benchmark=latency_benchmark,
+                    )
 
                     result = {
                         "engine": "torchscript" if torchscript else "torch2" if torch2 else "torch",
@@ -414,7 +424,7 @@ def run_pytorch(
                         "custom_layer_num": config_modifier.get_layer_num(),
                         "datetime": str(datetime.now()),
                     }
-                    result.update(get_latency_result(runtimes, batch_size))
+                    result.update(latency_result)
                     logger.info(result)
                     results.append(result)
                 except RuntimeError as e:
@@ -462,6 +472,7 @@ def run_tensorflow(
     repeat_times,
     cache_dir,
     verbose,
+    latency_benchmark=None,
 ):
     results = []
 
@@ -551,7 +562,12 @@ def run_tensorflow(
 
                     inference()
 
-                    runtimes = timeit.repeat(lambda: inference(), repeat=repeat_times, number=1)  # noqa: B023
+                    latency_result = measure_latency(
+                        lambda: inference(),  # noqa: B023
+                        repeat_times,
+                        batch_size,
+                        latency_benchmark=latency_benchmark,
+                    )
 
                     result = {
                         "engine": "tensorflow",
@@ -569,7 +585,7 @@ def run_tensorflow(
                         "custom_layer_num": config_modifier.get_layer_num(),
                         "datetime": str(datetime.now()),
                     }
-                    result.update(get_latency_result(runtimes, batch_size))
+                    result.update(latency_result)
                     logger.info(result)
                     results.append(result)
                 except RuntimeError as e:
@@ -770,6 +786,8 @@ def parse_arguments():
 
     FusionOptions.add_arguments(parser)
 
+    LatencyBenchmark.add_arguments(parser)
+
     args = parser.parse_args()
     return args
 
@@ -811,6 +829,7 @@ def main():
         return
 
     config_modifier = ConfigModifier(args.force_num_layers)
+    latency_benchmark = LatencyBenchmark.parse(args)
 
     results = []
 
@@ -836,6 +855,7 @@ def main():
                     False,
                     args.cache_dir,
                     args.verbose,
+                    latency_benchmark,
                 )
 
             if enable_torch:
@@ -853,6 +873,7 @@ def main():
                     False,
                     args.cache_dir,
                     args.verbose,
+                    latency_benchmark,
                 )
 
             if enable_torch2:
@@ -870,6 +891,7 @@ def main():
                     True,
                     args.cache_dir,
                     args.verbose,
+                    latency_benchmark,
                 )
 
         if enable_tensorflow:
@@ -885,6 +907,7 @@ def main():
                 args.test_times,
                 args.cache_dir,
                 args.verbose,
+                latency_benchmark,
             )
 
         model_fusion_statistics = {}
@@ -914,6 +937,7 @@ def main():
                     model_fusion_statistics,
                     args.model_source,
                     args,
+                    latency_benchmark,
                 )
             except Exception:
                 logger.error("Exception", exc_info=True)
@@ -934,6 +958,9 @@ def main():
     csv_filename = args.result_csv or f"benchmark_summary_{time_stamp}.csv"
     output_summary(results, csv_filename, args)
 
+    if args.latency_json:
+        output_json(results, args.latency_json)
+
 
 if __name__ == "__main__":
     main()
@@ -5,6 +5,7 @@
 # --------------------------------------------------------------------------
 
 import csv
+import json
 import logging
 import os
 import random
@@ -13,7 +14,7 @@ from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from enum import Enum
 from time import sleep
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Tuple
 
 import coloredlogs
 import numpy
@@ -218,6 +219,14 @@ def output_details(results, csv_filename):
             "latency_90_percentile",
             "latency_95_percentile",
             "latency_99_percentile",
+            # Columns below are only available in adaptive latency measurement
+            "latency_50_percentile",
+            "latency_std_ms",
+            "latency_ci_ms",
+            "confidence",
+            "converged",
+            "warmup_times",
+            "outlier_times",
         ]
 
         csv_writer = csv.DictWriter(csv_file, fieldnames=column_names)
@@ -228,6 +237,13 @@ def output_details(results, csv_filename):
     logger.info(f"Detail results are saved to csv file: {csv_filename}")
 
 
+def output_json(results, json_filename):
+    with open(json_filename, mode="w", encoding="utf-8") as json_file:
+        json.dump(results, json_file, indent=2, default=str)
+
+    logger.info(f"Results are saved to json file: {json_filename}")
+
+
 def output_summary(results, csv_filename, args):
     with open(csv_filename, mode="a", newline="", encoding="ascii") as csv_file:
         header_names = [
@@ -306,13 +322,27 @@ def output_fusion_statistics(model_fusion_statistics, csv_filename):
     logger.info(f"Fusion statistics is saved to csv file: {csv_filename}")
 
 
-def inference_ort(ort_session, ort_inputs, result_template, repeat_times, batch_size, warm_up_repeat=0):
+def measure_latency(func, repeat_times, batch_size, warm_up_repeat=0, latency_benchmark=None):
+    """Measure latency of func with fixed repeat times, or with latency_benchmark when it is not None."""
+    if latency_benchmark is not None:
+        return latency_benchmark.measure(func, warm_up_repeat).to_dict(batch_size)
+
+    timeit.repeat(func, number=1, repeat=warm_up_repeat)  # Dry run
+    latency_list = timeit.repeat(func, number=1, repeat=repeat_times)
+    return get_latency_result(latency_list, batch_size)
+
+
+def inference_ort(
+    ort_session, ort_inputs, result_template, repeat_times, batch_size, warm_up_repeat=0, latency_benchmark=None
+):
     result = {}
-    timeit.repeat(lambda: ort_session.run(None, ort_inputs), number=1, repeat=warm_up_repeat)  # Dry run
-    latency_list = timeit.repeat(lambda: ort_session.run(None, ort_inputs), number=1, repeat=repeat_times)
     result.update(result_template)
     result.update({"io_binding": False})
-    result.update(get_latency_result(latency_list, batch_size))
+    result.update(
+        measure_latency(
+            lambda: ort_session.run(None, ort_inputs), repeat_times, batch_size, warm_up_repeat, latency_benchmark
+        )
+    )
     return result
 
 
@@ -329,6 +359,7 @@ def inference_ort_with_io_binding(
     device,
     data_type=numpy.longlong,
     warm_up_repeat=0,
+    latency_benchmark=None,
 ):
     result = {}
 
@@ -364,20 +395,17 @@ def inference_ort_with_io_binding(
             output_buffers[i].data_ptr(),
         )
 
-    timeit.repeat(
-        lambda: ort_session.run_with_iobinding(io_binding),
-        number=1,
-        repeat=warm_up_repeat,
-    )  # Dry run
-
-    latency_list = timeit.repeat(
-        lambda: ort_session.run_with_iobinding(io_binding),
-        number=1,
-        repeat=repeat_times,
-    )
     result.update(result_template)
     result.update({"io_binding": True})
-    result.update(get_latency_result(latency_list, batch_size))
+    result.update(
+        measure_latency(
+            lambda: ort_session.run_with_iobinding(io_binding),
+            repeat_times,
+            batch_size,
+            warm_up_repeat,
+            latency_benchmark,
+        )
+    )
     return result
 
 
@@ -439,14 +467,41 @@ def get_gpu_info() -> Optional[List[Dict[str, Any]]]:
         return None
 
 
-def measure_memory(is_gpu, func):
+def reset_peak_rss() -> bool:
+    """Reset the peak resident set size (VmHWM) of current process to its current resident set size.
+
+    Returns:
+        bool: True if it is reset. It requires Linux 4.0 or later.
+    """
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def get_rss_status() -> Dict[str, float]:
+    """Get current (VmRSS) and peak (VmHWM) resident set size in MB of current process from /proc/self/status"""
+    status = {}
+    with open("/proc/self/status") as f:
+        for line in f:
+            name, _, value = line.partition(":")
+            if name in ["VmRSS", "VmHWM"]:
+                status[name] = int(value.split()[0]) / 1024  # value is in kB
+    return status
+
+
+def _measure_peak_rss_by_polling(func) -> Tuple[float, Any]:
+    """Run func, and poll resident set size every 5ms in another thread to get the peak. It is only used when
+    the peak counter of resident set size could not be reset. Returns the peak in MB and the result of func."""
+    import psutil
+
     class MemoryMonitor:
         def __init__(self, keep_measuring=True):
             self.keep_measuring = keep_measuring
 
         def measure_cpu_usage(self):
-            import psutil
-
             max_usage = 0
             while True:
                 max_usage = max(max_usage, psutil.Process(os.getpid()).memory_info().rss / 1024**2)
@@ -455,98 +510,86 @@ def measure_memory(is_gpu, func):
                     break
             return max_usage
 
-        def measure_gpu_usage(self) -> Optional[List[Dict[str, Any]]]:
-            from py3nvml.py3nvml import (
-                NVMLError,
-                nvmlDeviceGetCount,
-                nvmlDeviceGetHandleByIndex,
-                nvmlDeviceGetMemoryInfo,
-                nvmlDeviceGetName,
-                nvmlInit,
-                nvmlShutdown,
-            )
+    with ThreadPoolExecutor() as executor:
+        monitor = MemoryMonitor()
+        mem_thread = executor.submit(monitor.measure_cpu_usage)
+        try:
+            fn_thread = executor.submit(func)
+            result = fn_thread.result()
+        finally:
+            monitor.keep_measuring = False
+            max_usage = mem_thread.result()
+    return max_usage, result
 
-            max_gpu_usage = []
-            gpu_name = []
-            try:
-                nvmlInit()
-                device_count = nvmlDeviceGetCount()
-                if not isinstance(device_count, int):
-                    logger.error(f"nvmlDeviceGetCount result is not integer: {device_count}")
-                    return None
-
-                max_gpu_usage = [0 for i in range(device_count)]
-                gpu_name = [nvmlDeviceGetName(nvmlDeviceGetHandleByIndex(i)) for i in range(device_count)]
-                while True:
-                    for i in range(device_count):
-                        info = nvmlDeviceGetMemoryInfo(nvmlDeviceGetHandleByIndex(i))
-                        if isinstance(info, str):
-                            logger.error(f"nvmlDeviceGetMemoryInfo returns str: {info}")
-                            return None
-                        max_gpu_usage[i] = max(max_gpu_usage[i], info.used / 1024**2)
-                    sleep(0.005)  # 5ms
-                    if not self.keep_measuring:
-                        break
-                nvmlShutdown()
-                return [
-                    {
-                        "device_id": i,
-                        "name": gpu_name[i],
-                        "max_used_MB": max_gpu_usage[i],
-                    }
-                    for i in range(device_count)
-                ]
-            except NVMLError as error:
-                logger.error("Error fetching GPU information using nvml: %s", error)
-                return None
 
-    monitor = MemoryMonitor(False)
+def measure_memory_usage(is_gpu, func) -> Optional[Dict[str, float]]:
+    """Run func in current thread, and measure the memory usage.
 
+    For CPU, the peak resident set size counter of the process is reset before running func, and read after func,
+    so there is no polling thread to perturb the latency. On platforms other than Linux, it falls back to polling.
+    For GPU, memory used in each device is read with nvml before and after running func, so there is no polling thread
+    either. The arena of CUDA execution provider keeps the memory it reserved, so the memory used after running func
+    is also the peak of arena allocations. This does not hold for memory released before func returns, like when arena
+    shrinkage is enabled in run options or for allocations outside the arena, and then the peak is under-reported.
+    The result of func (like an inference session) is kept alive until memory is measured.
+
+    Returns:
+        Optional[Dict[str, float]]: memory usage in MB before running func ("before_MB"), increase of peak usage
+                                    during func ("peak_MB") and increase of usage after func ("steady_MB").
+                                    None if memory usage is not available.
+    """
     if is_gpu:
-        memory_before_test = monitor.measure_gpu_usage()
+        memory_before_test = get_gpu_info()
         if memory_before_test is None:
             return None
 
-        with ThreadPoolExecutor() as executor:
-            monitor = MemoryMonitor()
-            mem_thread = executor.submit(monitor.measure_gpu_usage)
-            try:
-                fn_thread = executor.submit(func)
-                _ = fn_thread.result()
-            finally:
-                monitor.keep_measuring = False
-                max_usage = mem_thread.result()
-
-            if max_usage is None:
-                return None
+        result = func()
+        memory_after_test = get_gpu_info()
+        del result
+        if memory_after_test is None:
+            return None
 
-            print(f"GPU memory usage: before={memory_before_test}  peak={max_usage}")
-            if len(memory_before_test) >= 1 and len(max_usage) >= 1 and len(memory_before_test) == len(max_usage):
-                # When there are multiple GPUs, we will check the one with maximum usage.
-                max_used = 0
-                for i, memory_before in enumerate(memory_before_test):
-                    before = memory_before["max_used_MB"]
-                    after = max_usage[i]["max_used_MB"]
-                    used = after - before
-                    max_used = max(max_used, used)
-                return max_used
+        print(f"GPU memory usage: before={memory_before_test}  after={memory_after_test}")
+        if len(memory_before_test) >= 1 and len(memory_before_test) == len(memory_after_test):
+            # When there are multiple GPUs, we will check the one with maximum usage.
+            usage = None
+            for before, after in zip(memory_before_test, memory_after_test):
+                used = (after["used"] - before["used"]) / 1024**2
+                if usage is None or used > usage["peak_MB"]:
+                    usage = {"before_MB": before["used"] / 1024**2, "peak_MB": used, "steady_MB": used}
+            return usage
         return None
 
     # CPU memory
-    memory_before_test = monitor.measure_cpu_usage()
+    if reset_peak_rss():
+        memory_before_test = get_rss_status()["VmRSS"]
+        result = func()
+        status = get_rss_status()
+        del result
+        max_usage, memory_after_test = status["VmHWM"], status["VmRSS"]
+    else:
+        import psutil
 
-    with ThreadPoolExecutor() as executor:
-        monitor = MemoryMonitor()
-        mem_thread = executor.submit(monitor.measure_cpu_usage)
-        try:
-            fn_thread = executor.submit(func)
-            _ = fn_thread.result()
-        finally:
-            monitor.keep_measuring = False
-            max_usage = mem_thread.result()
+        memory_before_test = psutil.Process(os.getpid()).memory_info().rss / 1024**2
+        max_usage, result = _measure_peak_rss_by_polling(func)
+        memory_after_test = psutil.Process(os.getpid()).memory_info().rss / 1024**2
+        del result
 
-        print(f"CPU memory usage: before={memory_before_test:.1f} MB, peak={max_usage:.1f} MB")
-        return max_usage - memory_before_test
+    print(
+        f"CPU memory usage: before={memory_before_test:.1f} MB, peak={max_usage:.1f} MB, "
+        f"after={memory_after_test:.1f} MB"
+    )
+    return {
+        "before_MB": memory_before_test,
+        "peak_MB": max_usage - memory_before_test,
+        "steady_MB": memory_after_test - memory_before_test,
+    }
+
+
+def measure_memory(is_gpu, func):
+    """Run func, and return the increase of peak memory usage in MB. See measure_memory_usage for details."""
+    usage = measure_memory_usage(is_gpu, func)
+    return None if usage is None else usage["peak_MB"]
 
 
 def get_ort_environment_variables():
@@ -14,6 +14,7 @@
 
 import argparse
 import csv
+import itertools
 import json
 import multiprocessing
 import os
@@ -29,6 +30,7 @@ import numpy as np
 import psutil
 import torch
 from bert_test_data import generate_test_data, get_bert_inputs
+from latency_benchmark import LatencyBenchmark
 
 
 @dataclass
@@ -44,6 +46,7 @@ class TestSetting:
     seed: int
     verbose: bool
     log_severity: int
+    latency_benchmark: Optional[LatencyBenchmark] = None
 
 
 @dataclass
@@ -226,6 +229,25 @@ def onnxruntime_inference(session, all_inputs, output_names):
     return results, latency_list
 
 
+def measure_latency(session, all_inputs, output_names, test_setting):
+    """Measure latency with test_setting.latency_benchmark. Each run uses the next test case in turn."""
+    if test_setting.use_io_binding:
+        device = "cuda" if test_setting.use_gpu else "cpu"
+        io_bindings = []
+        for inputs in all_inputs:
+            outputs = dict(zip(output_names, session.run(output_names, inputs)))
+            input_tensors, output_tensors = create_input_output_tensors(inputs, outputs, device)
+            # Keep the tensors alive since the IO binding uses their memory.
+            io_bindings.append(
+                (create_io_binding(session, input_tensors, output_tensors), input_tensors, output_tensors)
+            )
+        test_cases = itertools.cycle(io_bindings)
+        return test_setting.latency_benchmark.measure(lambda: session.run_with_iobinding(next(test_cases)[0]))
+
+    test_cases = itertools.cycle(all_inputs)
+    return test_setting.latency_benchmark.measure(lambda: session.run(output_names, next(test_cases)))
+
+
 def to_string(model_path, session, test_setting):
     sess_options = session.get_session_options()
     option = f"model={os.path.basename(model_path)},"
@@ -256,7 +278,13 @@ def run_one_test(model_setting, test_setting, perf_results, all_inputs, intra_op
     print("Running test:", key)
 
     all_latency_list = []
-    if test_setting.use_io_binding:
+    average_latency = None
+    if test_setting.latency_benchmark is not None:
+        latency_result = measure_latency(session, all_inputs, output_names, test_setting)
+        # Percentiles include outliers, while average latency does not.
+        all_latency_list = latency_result.raw_latencies
+        average_latency = latency_result.to_dict()["average_latency_ms"]
+    elif test_setting.use_io_binding:
         for _i in range(test_setting.test_times):
             results, latency_list = onnxruntime_inference_with_io_binding(
                 session, all_inputs, output_names, test_setting
@@ -270,7 +298,8 @@ def run_one_test(model_setting, test_setting, perf_results, all_inputs, intra_op
     # latency in miliseconds
     latency_ms = np.array(all_latency_list) * 1000
 
-    average_latency = statistics.mean(latency_ms)
+    if average_latency is None:
+        average_latency = statistics.mean(latency_ms)
     latency_50 = np.percentile(latency_ms, 50)
     latency_75 = np.percentile(latency_ms, 75)
     latency_90 = np.percentile(latency_ms, 90)
@@ -501,6 +530,8 @@ def parse_arguments():
         help="tuning results (json) to be saved after benchmark",
     )
 
+    LatencyBenchmark.add_arguments(parser)
+
     args = parser.parse_args()
     return args
 
@@ -541,6 +572,7 @@ def main():
             args.seed,
             args.verbose,
             args.log_severity,
+            LatencyBenchmark.parse(args),
         )
 
         print("test setting", test_setting)
@@ -558,6 +590,7 @@ def main():
             datetime.now().strftime("%Y%m%d-%H%M%S"),
         ),
     )
+    json_results = []
     with open(summary_file, "w+", newline="") as tsv_file:
         tsv_writer = csv.writer(tsv_file, delimiter="\t", lineterminator="\n")
         headers = None
@@ -579,9 +612,15 @@ def main():
             values = [format(x, ".2f") for x in perf_result]
             values.extend([x.split("=")[1] for x in params])
             tsv_writer.writerow(values)
+            json_results.append(dict(zip(headers, [*perf_result, *values[len(perf_result) :]])))
 
     print("Test summary is saved to", summary_file)
 
+    if args.latency_json:
+        with open(args.latency_json, "w", encoding="utf-8") as json_file:
+            json.dump(json_results, json_file, indent=2, default=str)
+        print("Test results are saved to", args.latency_json)
+
 
 if __name__ == "__main__":
     # work around for AnaConda Jupyter. See https://stackoverflow.com/questions/45720153/python-multiprocessing-error-attributeerror-module-main-has-no-attribute
@@ -1463,9 +1463,11 @@ def pack_qkv_for_decoder_masked_mha(model_proto: ModelProto):
                 name=matmul_node_name,
             )
 
+            # Inputs are updated by position since new inputs of key and value are empty.
             node.input[0] = matmul_node.output[0]
             node.input[1] = ""
             node.input[2] = ""
+            onnx_model.reindex_node(node)
 
             nodes_to_add.extend([matmul_node])
             nodes_to_remove.extend([q_matmul, k_matmul, v_matmul])
@@ -1764,8 +1766,10 @@ def generate_gpt2_init_decoder(
     gpt2_init_decoder_model.add_node(slice_node_1)
 
     # Adjust the input(s) to the nodes consuming the outputs of the added Slice nodes
-    gpt2_init_decoder_model.replace_node_input(matmul_after_attention, attention.output[0], slice_0_output_name)
-    gpt2_init_decoder_model.replace_node_input(residual_add_node, add_before_residual_add_output, slice_1_output_name)
+    gpt2_init_decoder_model.replace_input_of_node(matmul_after_attention, attention.output[0], slice_0_output_name)
+    gpt2_init_decoder_model.replace_input_of_node(
+        residual_add_node, add_before_residual_add_output, slice_1_output_name
+    )
 
     # Topologically sort the updated graph
     gpt2_init_decoder_model.topological_sort()
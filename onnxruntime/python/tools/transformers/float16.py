@@ -11,17 +11,19 @@
 # (4) add force_fp16_initializers option
 # (5) handle Resize and GroupNorm with mixed float inputs
 # (6) allow convert_float_to_float16 to accept model path
+# (7) add convert_float_to_float16_streaming for models with external data
 
 import itertools
 import logging
 import os
 import tempfile
-from typing import Dict
+from typing import Dict, List, Optional
 
 import numpy as np
 import onnx
-from onnx import helper, numpy_helper
+from onnx import helper
 from onnx import onnx_pb as onnx_proto
+from onnx.external_data_helper import ExternalDataInfo, uses_external_data
 from onnx.shape_inference import infer_shapes, infer_shapes_path
 from packaging import version
 
@@ -35,7 +37,7 @@ def _npfloat16_to_int(np_list):
     :param np_list: numpy float16 list
     :return int_list: python int list
     """
-    return [int(bin(_.view("H"))[2:].zfill(16), 2) for _ in np_list]
+    return np.asarray(np_list, dtype=np.float16).view(np.uint16).tolist()
 
 
 def convert_np_to_float16(np_array, min_positive_val=5.96e-08, max_finite_val=65504.0):
@@ -49,26 +51,29 @@ def convert_np_to_float16(np_array, min_positive_val=5.96e-08, max_finite_val=65
     def between(a, b, c):
         return np.logical_and(a < b, b < c)
 
-    if np_array[np.where(np_array > 0)].shape[0] > 0:
-        positive_max = np_array[np.where(np_array > 0)].max()
-        positive_min = np_array[np.where(np_array > 0)].min()
-        if positive_max >= max_finite_val:
-            logger.debug(f"the float32 number {positive_max} will be truncated to {max_finite_val}")
-        if positive_min <= min_positive_val:
-            logger.debug(f"the float32 number {positive_min} will be truncated to {min_positive_val}")
-
-    if np_array[np.where(np_array < 0)].shape[0] > 0:
-        negative_max = np_array[np.where(np_array < 0)].max()
-        negative_min = np_array[np.where(np_array < 0)].min()
-        if negative_min <= -max_finite_val:
-            logger.debug(f"the float32 number {negative_min} will be truncated to {-max_finite_val}")
-        if negative_max >= -min_positive_val:
-            logger.debug(f"the float32 number {negative_max} will be truncated to {-min_positive_val}")
-
-    np_array = np.where(between(0, np_array, min_positive_val), min_positive_val, np_array)
-    np_array = np.where(between(-min_positive_val, np_array, 0), -min_positive_val, np_array)
-    np_array = np.where(between(max_finite_val, np_array, float("inf")), max_finite_val, np_array)
-    np_array = np.where(between(float("-inf"), np_array, -max_finite_val), -max_finite_val, np_array)
+    if logger.isEnabledFor(logging.DEBUG):
+        if np_array[np.where(np_array > 0)].shape[0] > 0:
+            positive_max = np_array[np.where(np_array > 0)].max()
+            positive_min = np_array[np.where(np_array > 0)].min()
+            if positive_max >= max_finite_val:
+                logger.debug(f"the float32 number {positive_max} will be truncated to {max_finite_val}")
+            if positive_min <= min_positive_val:
+                logger.debug(f"the float32 number {positive_min} will be truncated to {min_positive_val}")
+
+        if np_array[np.where(np_array < 0)].shape[0] > 0:
+            negative_max = np_array[np.where(np_array < 0)].max()
+            negative_min = np_array[np.where(np_array < 0)].min()
+            if negative_min <= -max_finite_val:
+                logger.debug(f"the float32 number {negative_min} will be truncated to {-max_finite_val}")
+            if negative_max >= -min_positive_val:
+                logger.debug(f"the float32 number {negative_max} will be truncated to {-min_positive_val}")
+
+    # Update a copy in place, instead of allocating a new array for each range.
+    np_array = np.array(np_array)
+    np_array[between(0, np_array, min_positive_val)] = min_positive_val
+    np_array[between(-min_positive_val, np_array, 0)] = -min_positive_val
+    np_array[between(max_finite_val, np_array, float("inf"))] = max_finite_val
+    np_array[between(float("-inf"), np_array, -max_finite_val)] = -max_finite_val
     return np.float16(np_array)
 
 
@@ -110,8 +115,8 @@ def convert_tensor_float_to_float16(tensor, min_positive_val=5.96e-08, max_finit
 
 
 def make_value_info_from_tensor(tensor):
-    shape = numpy_helper.to_array(tensor).shape
-    return helper.make_tensor_value_info(tensor.name, tensor.data_type, shape)
+    # Use dims instead of the tensor data, which might be large or stored in external data file.
+    return helper.make_tensor_value_info(tensor.name, tensor.data_type, tuple(tensor.dims))
 
 
 DEFAULT_OP_BLOCK_LIST = [
@@ -450,6 +455,138 @@ def convert_float_to_float16(
     return model
 
 
+def _get_all_tensors(graph: onnx_proto.GraphProto) -> List[onnx_proto.TensorProto]:
+    """Get initializers and attribute tensors of a graph and its subgraphs."""
+    tensors = list(graph.initializer)
+    for node in graph.node:
+        for attr in node.attribute:
+            if attr.HasField("t"):
+                tensors.append(attr.t)
+            tensors.extend(attr.tensors)
+            if attr.HasField("g"):
+                tensors.extend(_get_all_tensors(attr.g))
+            for subgraph in attr.graphs:
+                tensors.extend(_get_all_tensors(subgraph))
+    return tensors
+
+
+def _set_external_data(tensor: onnx_proto.TensorProto, location: str, offset: int, length: int):
+    del tensor.external_data[:]
+    for key, value in [("location", location), ("offset", str(offset)), ("length", str(length))]:
+        entry = tensor.external_data.add()
+        entry.key = key
+        entry.value = value
+
+
+def convert_float_to_float16_streaming(
+    model_path: str,
+    output_model_path: str,
+    min_positive_val=5.96e-08,
+    max_finite_val=65504.0,
+    keep_io_types=False,
+    disable_shape_infer=False,
+    op_block_list=None,
+    node_block_list=None,
+    force_fp16_initializers=False,
+    external_data_file_name: Optional[str] = None,
+    chunk_size: int = 1 << 22,
+):
+    """Convert a model with external data to float16, without loading the external data into memory.
+
+    The graph is converted like convert_float_to_float16. Then each tensor in external data is converted (or copied
+    when it is not converted) chunk by chunk, from a memory map of the source data file to a memory map of the
+    external data file of the output model. Peak memory is about the size of the model without external data plus a
+    few chunks, so it can be used for models larger than 2GB.
+
+    Args:
+        model_path (str): path of the ONNX model. Its external data files are looked up in the same directory.
+        output_model_path (str): path to save the converted ONNX model.
+        min_positive_val, max_finite_val, keep_io_types, disable_shape_infer, op_block_list, node_block_list,
+        force_fp16_initializers: see convert_float_to_float16.
+        external_data_file_name (str, optional): name of the external data file of the output model, which is saved in
+                                                 the same directory of the output model. Defaults to None, which
+                                                 will use the name of output model with ".data" suffix.
+        chunk_size (int, optional): number of tensor elements to convert at a time. Defaults to 4M.
+
+    Raises:
+        ValueError: chunk_size is not positive, or the output data file is also an input data file.
+
+    Returns:
+        ModelProto: converted model, which refers to the output external data file.
+    """
+    if chunk_size < 1:
+        raise ValueError(f"chunk_size shall be positive, got {chunk_size}")
+
+    model_dir = os.path.dirname(os.path.abspath(model_path))
+    if disable_shape_infer:
+        model = onnx.load(model_path, load_external_data=False)
+    else:
+        with tempfile.NamedTemporaryFile(dir=model_dir) as tmpfile:
+            # infer_shapes_path can be used for model >2GB, and infer_shapes cannot.
+            infer_shapes_path(model_path, tmpfile.name)
+            model = onnx.load(tmpfile.name, load_external_data=False)
+
+    # Remember data type of tensors in external data, which only have data type changed in graph conversion.
+    external_tensors = [(t, t.data_type) for t in _get_all_tensors(model.graph) if uses_external_data(t)]
+
+    model = convert_float_to_float16(
+        model,
+        min_positive_val=min_positive_val,
+        max_finite_val=max_finite_val,
+        keep_io_types=keep_io_types,
+        disable_shape_infer=True,
+        op_block_list=op_block_list,
+        node_block_list=node_block_list,
+        force_fp16_initializers=force_fp16_initializers,
+    )
+
+    output_dir = os.path.dirname(os.path.abspath(output_model_path))
+    if external_data_file_name is None:
+        external_data_file_name = os.path.basename(output_model_path) + ".data"
+    output_data_path = os.path.join(output_dir, external_data_file_name)
+
+    # Plan the layout of output external data file. Offsets are aligned to 4KB like onnx.save_model does.
+    layout = []
+    total_size = 0
+    for tensor, data_type in external_tensors:
+        info = ExternalDataInfo(tensor)
+        data_path = os.path.join(model_dir, info.location)
+        if os.path.exists(output_data_path) and os.path.samefile(data_path, output_data_path):
+            raise ValueError(f"Output external data file {output_data_path} is also an input data file.")
+        offset = info.offset or 0
+        length = info.length or (os.path.getsize(data_path) - offset)
+        is_converted = data_type == onnx_proto.TensorProto.FLOAT and tensor.data_type == onnx_proto.TensorProto.FLOAT16
+        output_offset = (total_size + 4095) // 4096 * 4096
+        output_length = length // 2 if is_converted else length
+        layout.append((tensor, data_path, offset, length, is_converted, output_offset, output_length))
+        total_size = output_offset + output_length
+
+    if total_size > 0:
+        with open(output_data_path, "wb") as f:
+            f.truncate(total_size)
+        output_data = np.memmap(output_data_path, dtype=np.uint8, mode="r+", shape=(total_size,))
+        for tensor, data_path, offset, length, is_converted, output_offset, output_length in layout:
+            if length > 0:
+                src = np.memmap(data_path, dtype=np.uint8, mode="r", offset=offset, shape=(length,))
+                dst = output_data[output_offset : output_offset + output_length]
+                if is_converted:
+                    src = src.view(np.float32)
+                    dst = dst.view(np.float16)
+                for start in range(0, src.shape[0], chunk_size):
+                    end = start + chunk_size
+                    if is_converted:
+                        dst[start:end] = convert_np_to_float16(src[start:end], min_positive_val, max_finite_val)
+                    else:
+                        dst[start:end] = src[start:end]
+                del src
+            _set_external_data(tensor, external_data_file_name, output_offset, output_length)
+        output_data.flush()
+        del output_data
+
+    onnx.save_model(model, output_model_path)
+    return model
+
+
 def float_to_float16_max_diff(tensor, min_positive_val=5.96e-08, max_finite_val=65504.0):
     """Measure the maximum absolute difference after converting a float tensor to float16."""
     if not isinstance(tensor, onnx_proto.TensorProto):
@@ -1157,7 +1157,7 @@ class FusionAttention(Fusion):
                     ),
                     self.this_graph_name,
                 )
-                einsum_node.input[0] = new_edge
+                self.model.replace_input_of_node(einsum_node, einsum_node.input[0], new_edge)
 
             self.nodes_to_remove.extend([attention_last_node, transpose_qkv, matmul_qkv])
             self.nodes_to_remove.extend(qk_nodes)
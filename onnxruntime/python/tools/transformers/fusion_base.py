@@ -4,8 +4,9 @@
 # --------------------------------------------------------------------------
 from collections import defaultdict
 from logging import getLogger
-from typing import List, Union
+from typing import Dict, List, Set, Union
 
+from onnx import NodeProto
 from onnx_model import OnnxModel
 
 logger = getLogger(__name__)
@@ -34,6 +35,16 @@ class Fusion:
     def increase_counter(self, fused_op_name):
         self.fused_count[fused_op_name] += 1
 
+    def log_fused_count(self, nodes_added: List[NodeProto]):
+        if self.fused_count:
+            for key, value in self.fused_count.items():
+                if value:
+                    logger.info(f"Fused {key}: {value}")
+        else:
+            count = [node.op_type for node in nodes_added].count(self.fused_op_type)
+            if count > 0:
+                logger.info(f"Fused {self.description}: {count}")
+
     def apply(self):
         logger.debug(f"start {self.description} fusion...")
         input_name_to_nodes = self.model.input_name_to_nodes()
@@ -48,15 +59,7 @@ class Fusion:
                 self.this_graph_name = graph.name
                 self.fuse(node, input_name_to_nodes, output_name_to_node)
 
-        op_list = [node.op_type for node in self.nodes_to_add]
-        if self.fused_count:
-            for key, value in self.fused_count.items():
-                if value:
-                    logger.info(f"Fused {key}: {value}")
-        else:
-            count = op_list.count(self.fused_op_type)
-            if count > 0:
-                logger.info(f"Fused {self.description}: {count}")
+        self.log_fused_count(self.nodes_to_add)
 
         self.model.remove_nodes(self.nodes_to_remove)
         self.model.add_nodes(self.nodes_to_add, self.node_name_to_graph_name)
@@ -65,3 +68,101 @@ class Fusion:
             self.model.prune_graph()
         elif self.nodes_to_remove or self.nodes_to_add:
             self.model.update_graph()
+
+
+class FusionEngine:
+    """Apply several fusions together with a single traversal of the graph per round.
+
+    Each node is dispatched to the registered fusions that search its op type, and the nodes removed or added
+    by all fusions are applied in a batch at the end of the round. A fusion is run again in the next round only
+    when another fusion removed or added nodes of an op type that it searches, so fusions that consume the
+    output of other fusions (like QOrderedLayerNormalization after LayerNormalization) can be registered together.
+
+    Like Fusion.apply(), this assumes that fusions registered together do not fuse the same nodes: a node that
+    one fusion has marked for removal in a round is not dispatched to the other fusions.
+
+    It is used by BertOnnxModel.fuse_gelu and fuse_layer_norm, which run variants of the same fusion together.
+    """
+
+    MAX_ROUNDS = 8
+
+    def __init__(self, model: OnnxModel, fusions: List[Fusion]):
+        self.model: OnnxModel = model
+        self.fusions: List[Fusion] = list(fusions)
+        self.dispatch_table: Dict[str, List[Fusion]] = {}
+        for fusion in self.fusions:
+            if fusion.model is not model:
+                raise ValueError(f"{fusion.description} fusion is created for another model")
+            for op_type in fusion.search_op_types:
+                self.dispatch_table.setdefault(op_type, []).append(fusion)
+
+    def apply(self) -> int:
+        """Run fusion rounds until no fusion is triggered again. Returns number of rounds."""
+        nodes_added = {id(fusion): [] for fusion in self.fusions}
+        active_fusions = self.fusions
+        num_rounds = 0
+        while active_fusions:
+            if num_rounds == self.MAX_ROUNDS:
+                logger.warning(
+                    "Stop fusion after %d rounds: %s fusions are still triggered",
+                    num_rounds,
+                    [fusion.description for fusion in active_fusions],
+                )
+                break
+            num_rounds += 1
+            changed_op_types = self._run_round(active_fusions, nodes_added)
+            active_fusions = [
+                fusion
+                for fusion in self.fusions
+                if any(
+                    changed_op_types[id(other)].intersection(fusion.search_op_types)
+                    for other in self.fusions
+                    if other is not fusion and id(other) in changed_op_types
+                )
+            ]
+
+        for fusion in self.fusions:
+            fusion.log_fused_count(nodes_added[id(fusion)])
+        return num_rounds
+
+    def _run_round(self, fusions: List[Fusion], nodes_added: Dict[int, List[NodeProto]]) -> Dict[int, Set[str]]:
+        logger.debug(f"start fusion round of {[fusion.description for fusion in fusions]}...")
+        active = {id(fusion) for fusion in fusions}
+        input_name_to_nodes = self.model.input_name_to_nodes()
+        output_name_to_node = self.model.output_name_to_node()
+
+        # Node id => the fusion that will remove it in this round.
+        claimed: Dict[int, Fusion] = {}
+        for node in list(self.model.nodes()):
+            for fusion in self.dispatch_table.get(node.op_type, []):
+                if id(fusion) not in active or claimed.get(id(node), fusion) is not fusion:
+                    continue
+                graph = self.model.get_graph_by_node(node)
+                if graph is None:
+                    raise Exception("Can not find node in any graphs")
+                fusion.this_graph_name = graph.name
+                start = len(fusion.nodes_to_remove)
+                fusion.fuse(node, input_name_to_nodes, output_name_to_node)
+                for removed in fusion.nodes_to_remove[start:]:
+                    claimed.setdefault(id(removed), fusion)
+
+        changed_op_types = {}
+        nodes_to_remove = []
+        for fusion in fusions:
+            if fusion.nodes_to_remove or fusion.nodes_to_add:
+                changed_op_types[id(fusion)] = {node.op_type for node in fusion.nodes_to_remove + fusion.nodes_to_add}
+                nodes_to_remove.extend(fusion.nodes_to_remove)
+
+        self.model.remove_nodes(nodes_to_remove)
+        for fusion in fusions:
+            self.model.add_nodes(fusion.nodes_to_add, fusion.node_name_to_graph_name)
+            nodes_added[id(fusion)].extend(fusion.nodes_to_add)
+            fusion.nodes_to_remove = []
+            fusion.nodes_to_add = []
+            fusion.node_name_to_graph_name = {}
+
+        if any(fusion.prune_graph for fusion in fusions):
+            self.model.prune_graph()
+        elif changed_op_types:
+            self.model.update_graph()
+        return changed_op_types
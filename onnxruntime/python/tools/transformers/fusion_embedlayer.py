@@ -746,13 +746,16 @@ class FusionEmbedLayerNormalization(FusionEmbedLayerNoMask):
         else:
             logger.debug("skip mask in %s", embed_node.name)
             return
+        self.model.reindex_node(embed_node)
 
+        # Inputs are updated by position since an optional input could be empty, and so is not unique in a node.
         for attention_node in attention_nodes:
             logger.debug("update mask_index in %s", attention_node.name)
             if attention_node.op_type == "Attention":
                 attention_node.input[3] = embed_node.output[1]
             elif attention_node.op_type == "MultiHeadAttention":
                 attention_node.input[4] = embed_node.output[1]
+            self.model.reindex_node(attention_node)
 
     def fuse(self, node, input_name_to_nodes, output_name_to_node):
         # Reset attention and embed_node so that we know fusion is successful when they are not None.
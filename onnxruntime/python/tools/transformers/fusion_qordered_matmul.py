@@ -175,7 +175,7 @@ class FusionQOrderedMatMul(Fusion):
 
         # Deal with the case where-in the Attention subgraph is not fused
         if transpose_node_0 is not None:
-            self.model.replace_node_input(transpose_node_0, transpose_node_0.input[0], dequantize_node_0.input[0])
+            self.model.replace_input_of_node(transpose_node_0, transpose_node_0.input[0], dequantize_node_0.input[0])
 
         # Make inputs
         fused_node_inputs = [
@@ -153,8 +153,8 @@ class FusionInsertTranspose(Fusion):
             )
             self.model.add_initializer(axes_2_tensor, self.this_graph_name)
 
-        unsqueeze_3.input[1] = "ort_const_unsqueeze_axes_2"
-        unsqueeze_2.input[1] = "ort_const_unsqueeze_axes_1"
+        self.model.replace_input_of_node(unsqueeze_3, unsqueeze_3.input[1], "ort_const_unsqueeze_axes_2")
+        self.model.replace_input_of_node(unsqueeze_2, unsqueeze_2.input[1], "ort_const_unsqueeze_axes_1")
         transpose_output_name = self.model.create_node_name("Transpose") + "_NCHW"
         self.model.replace_input_of_all_nodes(unsqueeze_3.output[0], transpose_output_name)
         new_transpose = self.create_transpose_node(unsqueeze_3.output[0], [0, 3, 1, 2], transpose_output_name)
@@ -105,6 +105,7 @@ class FusionUtils:
         old_input_name = node.input[node_input_index]
         new_input_name = parent_node.input[parent_input_index]
         old_input_reference = FusionUtils.update_node_input(node, node_input_index, new_input_name, input_name_to_nodes)
+        model.reindex_node(node)
 
         # We can remove the first Transpose if its output is not used (linked to graph output or other nodes) anymore.
         parent_can_be_removed = (old_input_reference == 0) and not model.find_graph_output(old_input_name)
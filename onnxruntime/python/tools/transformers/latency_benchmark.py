@@ -0,0 +1,274 @@
+# -------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation.  All rights reserved.
+# Licensed under the MIT License.
+# --------------------------------------------------------------------------
+
+# Latency measurement shared by benchmark scripts. Instead of a fixed number of runs, it runs until the confidence
+# interval of average latency is narrow enough, so that results are stable across runs on a noisy machine.
+import logging
+import statistics
+import timeit
+from argparse import ArgumentParser
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy
+from affinity_helper import AffinitySetting
+
+logger = logging.getLogger(__name__)
+
+
+class LatencyResult:
+    """Latency samples after warm-up, with and without outlier rejection, and how they were collected."""
+
+    def __init__(
+        self,
+        latencies: List[float],
+        raw_latencies: List[float],
+        warmup_times: int,
+        converged: bool,
+        confidence: float,
+    ):
+        self.latencies = latencies  # in seconds, after outlier rejection
+        self.raw_latencies = raw_latencies  # in seconds, all the runs after warm-up
+        self.warmup_times = warmup_times
+        self.outlier_times = len(raw_latencies) - len(latencies)
+        self.converged = converged
+        self.confidence = confidence
+
+    def get_confidence_interval_ms(self) -> float:
+        """Half width of the confidence interval of average latency in milliseconds"""
+        return _get_confidence_interval(self.latencies, self.confidence) * 1000.0
+
+    def to_dict(self, batch_size: int = 1) -> Dict[str, Any]:
+        """Machine readable statistics. Latencies are in milliseconds.
+        Average, confidence interval and standard deviation exclude outliers, while percentiles include them.
+        """
+        latency_ms = numpy.array(self.latencies, dtype=numpy.float64) * 1000.0
+        raw_latency_ms = numpy.array(self.raw_latencies, dtype=numpy.float64) * 1000.0
+        average_latency_ms = float(numpy.mean(latency_ms))
+        return {
+            "test_times": len(self.raw_latencies),
+            "warmup_times": self.warmup_times,
+            "outlier_times": self.outlier_times,
+            "converged": self.converged,
+            "confidence": self.confidence,
+            "average_latency_ms": average_latency_ms,
+            "latency_ci_ms": self.get_confidence_interval_ms(),
+            "latency_std_ms": float(numpy.std(latency_ms, ddof=1)) if len(latency_ms) > 1 else 0.0,
+            "latency_50_percentile": float(numpy.percentile(raw_latency_ms, 50)),
+            "latency_90_percentile": float(numpy.percentile(raw_latency_ms, 90)),
+            "latency_95_percentile": float(numpy.percentile(raw_latency_ms, 95)),
+            "latency_99_percentile": float(numpy.percentile(raw_latency_ms, 99)),
+            "QPS": batch_size * 1000.0 / average_latency_ms,
+        }
+
+
+def _get_confidence_interval(latencies: List[float], confidence: float) -> float:
+    if len(latencies) < 2:
+        return float("inf")
+    z = statistics.NormalDist().inv_cdf(0.5 + confidence / 2)
+    return z * statistics.stdev(latencies) / len(latencies) ** 0.5
+
+
+def reject_outliers(latencies: List[float], threshold: float) -> List[float]:
+    """Remove latencies that are slower than median by more than threshold times of scaled median absolute deviation
+    (MAD). MAD is scaled by 1.4826 to be consistent with standard deviation for normal distribution. Only slow runs
+    (like those interrupted by other processes) are removed, and MAD is at least 1% of median so that timer resolution
+    does not make a tight distribution look like many outliers.
+    """
+    if threshold <= 0 or len(latencies) < 3:
+        return latencies
+    samples = numpy.array(latencies)
+    median = numpy.median(samples)
+    mad = max(numpy.median(numpy.abs(samples - median)) * 1.4826, 0.01 * median)
+    return samples[samples - median <= threshold * mad].tolist()
+
+
+class LatencyBenchmark:
+    """Measure latency of a function with warm-up detection, outlier rejection and adaptive number of runs.
+
+    Runs continue until the confidence interval of average latency (after outlier rejection) is within
+    relative_error of the average, or max_test_times or max_seconds is reached.
+    """
+
+    def __init__(
+        self,
+        min_test_times: int = 100,
+        max_test_times: int = 10000,
+        max_seconds: float = 60.0,
+        relative_error: float = 0.01,
+        confidence: float = 0.95,
+        outlier_threshold: float = 3.0,
+        max_warmup_times: int = 100,
+        warmup_window: int = 10,
+        cpus: Optional[List[int]] = None,
+    ):
+        """
+        Args:
+            min_test_times (int): minimum number of runs to measure.
+            max_test_times (int): maximum number of runs to measure.
+            max_seconds (float): stop measuring after this time if there are at least min_test_times runs.
+            relative_error (float): target half width of confidence interval relative to average latency.
+            confidence (float): confidence level of the interval.
+            outlier_threshold (float): runs are outliers when they are slower than the median by more than this
+                                       times of scaled median absolute deviation. 0 means no outlier rejection.
+            max_warmup_times (int): maximum number of runs for warm-up.
+            warmup_window (int): warm-up completes when median latency of two consecutive windows of this number of
+                                 runs are within 5% of each other.
+            cpus (List[int], optional): pin the calling thread to these CPUs during measurement. Note that threads
+                                        created before (like those in the thread pool of an inference session)
+                                        are not pinned.
+        """
+        if min_test_times < 2:
+            raise ValueError(f"min_test_times shall be at least 2, got {min_test_times}")
+        if max_test_times < min_test_times:
+            raise ValueError(f"max_test_times {max_test_times} is smaller than min_test_times {min_test_times}")
+        if not 0 < confidence < 1:
+            raise ValueError(f"confidence shall be in range (0, 1), got {confidence}")
+
+        self.min_test_times = min_test_times
+        self.max_test_times = max_test_times
+        self.max_seconds = max_seconds
+        self.relative_error = relative_error
+        self.confidence = confidence
+        self.outlier_threshold = outlier_threshold
+        self.max_warmup_times = max_warmup_times
+        self.warmup_window = warmup_window
+        self.cpus = cpus
+
+    def _warm_up(self, func: Callable[[], Any]) -> int:
+        """Run func until latency is stable, and return the number of runs."""
+        previous_median = None
+        runs = 0
+        while runs + self.warmup_window <= self.max_warmup_times:
+            latencies = timeit.repeat(func, number=1, repeat=self.warmup_window)
+            runs += self.warmup_window
+            median = statistics.median(latencies)
+            if previous_median is not None and abs(median - previous_median) <= 0.05 * previous_median:
+                break
+            previous_median = median
+        return runs
+
+    def _is_converged(self, latencies: List[float]) -> bool:
+        samples = reject_outliers(latencies, self.outlier_threshold)
+        interval = _get_confidence_interval(samples, self.confidence)
+        return interval <= self.relative_error * statistics.mean(samples)
+
+    def measure(self, func: Callable[[], Any], warm_up_repeat: int = 0) -> LatencyResult:
+        """Measure latency of func.
+
+        Args:
+            func (Callable[[], Any]): function to measure.
+            warm_up_repeat (int, optional): number of runs before warm-up detection. Defaults to 0.
+
+        Returns:
+            LatencyResult: latencies with and without outlier rejection.
+        """
+        original_affinity = None
+        if self.cpus:
+            original_affinity = AffinitySetting()
+            original_affinity.get_affinity()
+            pinned_affinity = AffinitySetting()
+            pinned_affinity.affinity = set(self.cpus)
+            pinned_affinity.set_affinity()
+
+        try:
+            for _ in range(warm_up_repeat):
+                func()
+            warmup_times = warm_up_repeat + self._warm_up(func)
+
+            latencies = []
+            converged = False
+            next_check = self.min_test_times
+            start_time = timeit.default_timer()
+            while len(latencies) < self.max_test_times:
+                latencies.extend(timeit.repeat(func, number=1, repeat=next_check - len(latencies)))
+                if self._is_converged(latencies):
+                    converged = True
+                    break
+                if timeit.default_timer() - start_time >= self.max_seconds:
+                    break
+                # Check again after 10% more runs so that checking cost is amortized.
+                next_check = min(self.max_test_times, len(latencies) + max(1, len(latencies) // 10))
+        finally:
+            if original_affinity is not None:
+                original_affinity.set_affinity()
+
+        if not converged:
+            logger.warning(
+                f"Latency does not converge to relative error {self.relative_error} after {len(latencies)} runs"
+            )
+
+        samples = reject_outliers(latencies, self.outlier_threshold)
+        return LatencyResult(samples, latencies, warmup_times, converged, self.confidence)
+
+    @staticmethod
+    def add_arguments(parser: ArgumentParser):
+        latency_group = parser.add_argument_group(
+            "Adaptive latency measurement. It is enabled when --relative_error is specified, and --test_times is the"
+            " minimum number of runs."
+        )
+
+        latency_group.add_argument(
+            "--relative_error",
+            required=False,
+            type=float,
+            default=None,
+            help="Run until the 95%% confidence interval of average latency is within this ratio of the average.",
+        )
+
+        latency_group.add_argument(
+            "--max_test_times",
+            required=False,
+            type=int,
+            default=10000,
+            help="Maximum number of runs in adaptive latency measurement.",
+        )
+
+        latency_group.add_argument(
+            "--max_test_seconds",
+            required=False,
+            type=float,
+            default=60.0,
+            help="Maximum seconds of measurement for each test in adaptive latency measurement.",
+        )
+
+        latency_group.add_argument(
+            "--outlier_threshold",
+            required=False,
+            type=float,
+            default=3.0,
+            help="Reject runs slower than median by more than this times of scaled median absolute deviation. "
+            "Use 0 to disable outlier rejection.",
+        )
+
+        latency_group.add_argument(
+            "--pin_cpus",
+            required=False,
+            nargs="+",
+            type=int,
+            default=None,
+            help="CPUs to pin the benchmark thread to during latency measurement.",
+        )
+
+        latency_group.add_argument(
+            "--latency_json",
+            required=False,
+            type=str,
+            default=None,
+            help="JSON file for saving machine readable results.",
+        )
+
+    @staticmethod
+    def parse(args) -> Optional["LatencyBenchmark"]:
+        """Create LatencyBenchmark from parsed arguments, or None when adaptive latency measurement is disabled."""
+        if args.relative_error is None:
+            return None
+        return LatencyBenchmark(
+            min_test_times=args.test_times,
+            max_test_times=max(args.max_test_times, args.test_times),
+            max_seconds=args.max_test_seconds,
+            relative_error=args.relative_error,
+            outlier_threshold=args.outlier_threshold,
+            cpus=args.pin_cpus,
+        )
@@ -25,9 +25,11 @@ from benchmark_helper import (  # noqa: E402
     Precision,
     create_onnxruntime_session,
     get_ort_environment_variables,
+    output_json,
     prepare_environment,
     setup_logger,
 )
+from latency_benchmark import LatencyBenchmark  # noqa: E402
 from quantize_helper import QuantizeHelper  # noqa: E402
 
 logger = logging.getLogger("")
@@ -163,6 +165,8 @@ def parse_arguments(argv=None):
     parser.add_argument("--disable_io_binding", required=False, action="store_true")
     parser.set_defaults(disable_io_binding=False)
 
+    LatencyBenchmark.add_arguments(parser)
+
     args = parser.parse_args(argv)
 
     return args
@@ -273,6 +277,7 @@ def main(args):
         args.model_class,
     )
     output_buffers = gpt2helper.get_output_buffers(max_output_shapes, device, args.precision == Precision.FLOAT16)
+    latency_benchmark = LatencyBenchmark.parse(args)
 
     csv_filename = args.result_csv or "benchmark_result_{}.csv".format(datetime.now().strftime("%Y%m%d-%H%M%S"))
     with open(csv_filename, mode="a", newline="") as csv_file:
@@ -294,6 +299,7 @@ def main(args):
         ]
         csv_writer = csv.DictWriter(csv_file, fieldnames=column_names)
         csv_writer.writeheader()
+        rows = []
 
         for batch_size in args.batch_sizes:
             for sequence_length in args.sequence_lengths:
@@ -329,7 +335,9 @@ def main(args):
 
                     try:
                         if args.validate_onnx or args.output_torch_latency:
-                            outputs, torch_latency = gpt2helper.pytorch_inference(model, dummy_inputs, args.test_times)
+                            outputs, torch_latency = gpt2helper.pytorch_inference(
+                                model, dummy_inputs, args.test_times, latency_benchmark
+                            )
 
                             # Dump Torch output shape
                             for i, value in enumerate(outputs):
@@ -345,7 +353,7 @@ def main(args):
 
                         if args.disable_io_binding:
                             ort_outputs, ort_latency = gpt2helper.onnxruntime_inference(
-                                session, dummy_inputs, args.test_times
+                                session, dummy_inputs, args.test_times, latency_benchmark
                             )
                         else:
                             ort_outputs, ort_latency = gpt2helper.onnxruntime_inference_with_binded_io(
@@ -356,6 +364,7 @@ def main(args):
                                 args.test_times,
                                 return_numpy=False,
                                 include_copy_output_latency=args.include_copy_output_latency,
+                                latency_benchmark=latency_benchmark,
                             )
 
                         if args.validate_onnx:
@@ -404,11 +413,14 @@ def main(args):
                             "onnxruntime_latency": f"{ort_latency:.2f}",
                         }
                         csv_writer.writerow(row)
+                        rows.append(row)
                     except Exception:
                         logger.error("Exception", exc_info=True)
                         return None
 
     logger.info(f"Results are saved to file {csv_filename}")
+    if args.latency_json:
+        output_json(rows, args.latency_json)
     return csv_filename
 
 
@@ -614,8 +614,10 @@ class Gpt2Helper:
         return parameters
 
     @staticmethod
-    def pytorch_inference(model, inputs: Gpt2Inputs, total_runs: int = 0):
-        """Run inference of PyTorch model, and returns average latency in ms when total_runs > 0 besides outputs."""
+    def pytorch_inference(model, inputs: Gpt2Inputs, total_runs: int = 0, latency_benchmark=None):
+        """Run inference of PyTorch model, and returns average latency in ms when total_runs > 0 besides outputs.
+        When latency_benchmark is given, it measures the latency with total_runs as minimum number of runs.
+        """
         logger.debug("start pytorch_inference")
 
         # Convert it to fp32 as the PyTroch model cannot deal with half input.
@@ -627,6 +629,11 @@ class Gpt2Helper:
         if total_runs == 0:
             return outputs
 
+        if latency_benchmark is not None:
+            with torch.no_grad():
+                average_latency = latency_benchmark.measure(lambda: model(*input_list)).to_dict()["average_latency_ms"]
+            return outputs, average_latency
+
         latency = []
         with torch.no_grad():
             for _ in range(total_runs):
@@ -640,8 +647,10 @@ class Gpt2Helper:
         return outputs, average_latency
 
     @staticmethod
-    def onnxruntime_inference(ort_session, inputs: Gpt2Inputs, total_runs: int = 0):
-        """Run inference of ONNX model, and returns average latency in ms when total_runs > 0 besides outputs."""
+    def onnxruntime_inference(ort_session, inputs: Gpt2Inputs, total_runs: int = 0, latency_benchmark=None):
+        """Run inference of ONNX model, and returns average latency in ms when total_runs > 0 besides outputs.
+        When latency_benchmark is given, it measures the latency with total_runs as minimum number of runs.
+        """
         logger.debug("start onnxruntime_inference")
 
         ort_inputs = {"input_ids": numpy.ascontiguousarray(inputs.input_ids.cpu().numpy())}
@@ -660,6 +669,10 @@ class Gpt2Helper:
         if total_runs == 0:
             return ort_outputs
 
+        if latency_benchmark is not None:
+            result = latency_benchmark.measure(lambda: ort_session.run(None, ort_inputs))
+            return ort_outputs, result.to_dict()["average_latency_ms"]
+
         latency = []
         for _ in range(total_runs):
             start = time.time()
@@ -708,8 +721,11 @@ class Gpt2Helper:
         total_runs: int = 0,
         return_numpy: bool = True,
         include_copy_output_latency: bool = False,
+        latency_benchmark=None,
     ):
-        """Inference with IO binding. Returns outputs, and optional latency when total_runs > 0."""
+        """Inference with IO binding. Returns outputs, and optional latency when total_runs > 0.
+        When latency_benchmark is given, it measures the latency with total_runs as minimum number of runs.
+        """
         logger.debug("start onnxruntime_inference_with_binded_io")
 
         # Bind inputs and outputs to onnxruntime session
@@ -734,15 +750,21 @@ class Gpt2Helper:
         if total_runs == 0:
             return ort_outputs
 
-        latency = []
-        for _ in range(total_runs):
-            start = time.time()
+        def run():
             # Run onnxruntime with io binding
             ort_session.run_with_iobinding(io_binding)
             if include_copy_output_latency:
                 _ = Gpt2Helper.get_outputs_from_io_binding_buffer(
                     ort_session, output_buffers, output_shapes, return_numpy
                 )
+
+        if latency_benchmark is not None:
+            return ort_outputs, latency_benchmark.measure(run).to_dict()["average_latency_ms"]
+
+        latency = []
+        for _ in range(total_runs):
+            start = time.time()
+            run()
             latency.append(time.time() - start)
 
         average_latency = sum(latency) * 1000 / len(latency)
@@ -37,7 +37,6 @@ import math
 import os
 import re
 import sys
-import timeit
 import traceback
 from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
@@ -52,6 +51,7 @@ import onnxruntime
 
 sys.path.append(os.path.join(os.path.dirname(__file__), "..", ".."))
 import benchmark_helper  # noqa: E402
+from latency_benchmark import LatencyBenchmark  # noqa: E402
 
 logger = logging.getLogger("")
 
@@ -65,6 +65,7 @@ def test_torch_latency(
     global_lengths,
     test_times,
     num_threads,
+    latency_benchmark=None,
 ) -> List[Dict[str, Any]]:
     if num_threads > 0:
         torch.set_num_threads(num_threads)
@@ -80,7 +81,6 @@ def test_torch_latency(
                 input_list = inputs.to_list()
 
                 _ = model(*input_list)
-                runtimes = timeit.repeat(lambda: model(*input_list), repeat=test_times, number=1)  # noqa: B023
                 result = {
                     "engine": "torch",  # TODO: test torchscript
                     "version": torch.__version__,
@@ -103,7 +103,14 @@ def test_torch_latency(
                     "diff_99_percentile": 0,
                     "use_compact_memory": "NA",
                 }
-                result.update(benchmark_helper.get_latency_result(runtimes, batch_size))
+                result.update(
+                    benchmark_helper.measure_latency(
+                        lambda: model(*input_list),  # noqa: B023
+                        test_times,
+                        batch_size,
+                        latency_benchmark=latency_benchmark,
+                    )
+                )
                 logger.info("%s", result)
                 results.append(result)
     return results
@@ -145,6 +152,7 @@ def test_ort_latency(
     use_compact_memory=False,
     use_half4=False,
     disable_parity=False,
+    latency_benchmark=None,
 ) -> List[Dict[str, Any]]:
     results = []
     for batch_size in batch_sizes:
@@ -210,6 +218,7 @@ def test_ort_latency(
                         batch_size=batch_size,
                         device=device,
                         data_type=np.longlong,  # input data type
+                        latency_benchmark=latency_benchmark,
                     )
                 else:
                     result = benchmark_helper.inference_ort(
@@ -218,6 +227,7 @@ def test_ort_latency(
                         result_template=result_template,
                         repeat_times=test_times,
                         batch_size=batch_size,
+                        latency_benchmark=latency_benchmark,
                     )
 
                 # measure result difference between PyTorch and OnnxRuntime
@@ -277,7 +287,10 @@ def test_ort_memory(
         for _ in range(test_times):
             _ = session.run(None, ort_inputs)
 
-    memory_used = benchmark_helper.measure_memory(is_gpu=True, func=inference)
+        # Keep the session alive until memory is measured.
+        return session
+
+    memory_usage = benchmark_helper.measure_memory_usage(is_gpu=True, func=inference)
 
     return {
         "onnx_model": onnx_model_path,
@@ -286,7 +299,8 @@ def test_ort_memory(
         "global_length": global_length,
         "test_times": test_times,
         "num_threads": num_threads,
-        "memory": memory_used,
+        "memory": None if memory_usage is None else memory_usage["peak_MB"],
+        "steady_memory": None if memory_usage is None else memory_usage["steady_MB"],
     }
 
 
@@ -386,6 +400,7 @@ def test_ort(args, device) -> List[Dict[str, Any]]:
         use_compact_memory,
         args.use_half4,
         args.disable_parity,
+        LatencyBenchmark.parse(args),
     )
 
 
@@ -400,6 +415,7 @@ def test_torch(args, device) -> List[Dict[str, Any]]:
         args.global_lengths,
         args.test_times,
         args.num_threads,
+        LatencyBenchmark.parse(args),
     )
 
 
@@ -500,6 +516,8 @@ def parse_arguments(argv=None):
     parser.add_argument("--disable_parity", required=False, action="store_true", help="Do not run parity test.")
     parser.set_defaults(disable_parity=False)
 
+    LatencyBenchmark.add_arguments(parser)
+
     args = parser.parse_args(argv)
 
     return args
@@ -541,6 +559,14 @@ def output_details(results, csv_filename):
             "latency_90_percentile",
             "latency_95_percentile",
             "latency_99_percentile",
+            # Columns below are only available in adaptive latency measurement
+            "latency_50_percentile",
+            "latency_std_ms",
+            "latency_ci_ms",
+            "confidence",
+            "converged",
+            "warmup_times",
+            "outlier_times",
         ]
 
         csv_writer = csv.DictWriter(csv_file, fieldnames=column_names)
@@ -784,6 +810,8 @@ def main():
         time_stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
         csv_filename = f"benchmark_detail_{time_stamp}.csv"
         output_details(test_results, csv_filename)
+        if args.latency_json:
+            benchmark_helper.output_json(test_results, args.latency_json)
         return
 
     gpu_list = benchmark_helper.get_gpu_info()
@@ -3,6 +3,7 @@
 # Licensed under the MIT License.
 # --------------------------------------------------------------------------
 
+import functools
 import logging
 import os
 import sys
@@ -27,6 +28,80 @@ from shape_infer_helper import SymbolicShapeInferenceHelper
 logger = logging.getLogger(__name__)
 
 
+class ParentPathPattern:
+    """Constraints on op type and input index of each parent in a path, see OnnxModel.match_parent_path.
+
+    A pattern is compiled once for each distinct list of op types and input indices, and reused by all matches.
+    Compiled patterns are kept in a bounded cache, so patterns built at run time do not grow memory without limit.
+    """
+
+    def __init__(self, op_types, input_indices=None):
+        if input_indices is not None:
+            assert len(input_indices) == len(op_types)
+            assert all(index is None or index >= 0 for index in input_indices)
+        self.op_types: Tuple[str, ...] = tuple(op_types)
+        self.input_indices: Optional[Tuple[Optional[int], ...]] = (
+            None if input_indices is None else tuple(input_indices)
+        )
+        self.steps = tuple(zip(self.op_types, self.input_indices or (None,) * len(self.op_types)))
+        self.op_type_set = frozenset(self.op_types)
+
+    @classmethod
+    def compile(cls, op_types, input_indices=None):
+        return cls._compile(tuple(op_types), None if input_indices is None else tuple(input_indices))
+
+    @classmethod
+    @functools.lru_cache(maxsize=1024)
+    def _compile(cls, op_types, input_indices):
+        return cls(op_types, input_indices)
+
+    def __repr__(self):
+        return f"ParentPathPattern({list(self.op_types)}, {self.input_indices})"
+
+    def match(self, node, output_name_to_node, return_indice=None, edges=None):
+        """Match the path starting from a node.
+
+        Args:
+            node (NodeProto): the node to start from.
+            output_name_to_node (dict): dictionary with output name as key, and node as value.
+            return_indice (list): a list to append the input index of each edge without constraint on input index.
+            edges (list): a list to append (node, input index, input names) of each edge visited.
+
+        Returns:
+            parents: a list of matched parent nodes, or None if not matched.
+        """
+        current_node = node
+        matched_parents = []
+        for op_type, input_index in self.steps:
+            parent = None
+            if input_index is None:
+                if edges is not None:
+                    edges.append((current_node, None, tuple(current_node.input)))
+                matched_index = None
+                for i, input in enumerate(current_node.input):
+                    candidate = output_name_to_node.get(input)
+                    if candidate is not None and candidate.op_type == op_type:
+                        parent, matched_index = candidate, i
+                        break
+                if return_indice is not None:
+                    return_indice.append(matched_index)
+            elif input_index < len(current_node.input):
+                input = current_node.input[input_index]
+                if edges is not None:
+                    edges.append((current_node, input_index, input))
+                parent = output_name_to_node.get(input)
+                if parent is not None and parent.op_type != op_type:
+                    parent = None
+            elif edges is not None:
+                edges.append((current_node, input_index, None))
+
+            if parent is None:
+                return None
+            matched_parents.append(parent)
+            current_node = parent
+        return matched_parents
+
+
 class OnnxModel:
     def __init__(self, model):
         self.initialize(model)
@@ -37,6 +112,9 @@ class OnnxModel:
         self.shape_infer_helper: SymbolicShapeInferenceHelper = None
         self.enable_shape_infer: bool = True
         self.all_graphs: Optional[List[GraphProto]] = None
+        # incremented whenever the producer or op type of a tensor might change, see match_parent_path.
+        self._producers_generation: int = 0
+        self.invalidate_index()
 
     def disable_shape_inference(self):
         self.enable_shape_infer = False
@@ -55,25 +133,207 @@ class OnnxModel:
 
         return None
 
+    def invalidate_index(self):
+        """Drop the index of the graphs, so that it is rebuilt on next lookup.
+
+        The index (producer, consumers, op type and graph of nodes, initializers, graph inputs and outputs) is kept up
+        to date by the methods of this class that change the graphs. Adding or removing nodes, initializers, inputs or
+        outputs directly through the protobuf is detected. Code that changes inputs or outputs of a node in place should
+        use replace_input_of_node/replace_output_of_node or call reindex_node afterwards. Other in-place changes are
+        found by input_name_to_nodes(), output_name_to_node(), and by lookups of parents or children that hit a changed
+        edge. When debug logging is enabled, every lookup checks the whole index, which takes time linear to graph size.
+        """
+        self._index_fingerprint: Optional[List[Tuple[int, int, int, int]]] = None
+
+    def _graphs_fingerprint(self):
+        return [(len(g.node), len(g.initializer), len(g.input), len(g.output)) for g in self.graphs()]
+
+    def _ensure_index(self):
+        if self._index_fingerprint is None or self._index_fingerprint != self._graphs_fingerprint():
+            self._build_index()
+        elif logger.isEnabledFor(logging.DEBUG):
+            self._reindex_changed_nodes()
+
+    def _reindex_changed_nodes(self):
+        """Update the index for nodes whose op type, inputs or outputs were changed in place without reindex_node."""
+        changed_nodes = []
+        for graph in self.graphs():
+            for node in graph.node:
+                node_io = self._node_io.get(id(node))
+                if node_io is None:
+                    # a node is replaced directly through the protobuf.
+                    self._build_index()
+                    return
+                if node_io != (node.op_type, tuple(node.input), tuple(node.output)):
+                    changed_nodes.append(node)
+        if changed_nodes:
+            logger.debug(f"Update index of nodes changed in place: {[node.name for node in changed_nodes]}")
+            for node in changed_nodes:
+                self.reindex_node(node)
+
+    def _update_index_fingerprint(self):
+        self._index_fingerprint = self._graphs_fingerprint()
+
+    def _build_index(self):
+        self._producers: Dict[str, NodeProto] = {}  # output name to node
+        self._consumers: Dict[str, List[NodeProto]] = {}  # input name to nodes in graph order
+        self._op_type_to_nodes: Dict[str, List[NodeProto]] = {}
+        self._node_graph: Dict[int, GraphProto] = {}  # id of node to the graph it belongs to
+        self._node_order: Dict[int, Tuple[int, int]] = {}  # id of node to (graph index, sequence number in graph)
+        # id of node to its op type, inputs and outputs when it is indexed, since they might be changed in place later
+        self._node_io: Dict[int, Tuple[str, Tuple[str, ...], Tuple[str, ...]]] = {}
+        self._next_node_sequence: int = 0
+        self._initializers: Dict[str, TensorProto] = {}
+        self._graph_inputs: Dict[str, ValueInfoProto] = {}  # inputs of the main graph
+        self._graph_outputs: Dict[str, ValueInfoProto] = {}  # outputs of the main graph
+        # (id of node, pattern) to (node, edges visited, parents matched, indices returned) of match_parent_path,
+        # for results of the generation of producers in _parent_path_cache_generation.
+        self._parent_path_cache: Dict[Tuple[int, ParentPathPattern], Tuple] = {}
+        self._parent_path_cache_generation: int = -1
+        # the last copy returned by output_name_to_node(), and the generation of producers in it.
+        self._output_name_to_node_copy: Tuple[Optional[Dict[str, NodeProto]], int] = (None, -1)
+        self._producers_generation += 1
+
+        for graph in self.graphs():
+            for node in graph.node:
+                self._index_node(node, graph)
+            for tensor in graph.initializer:
+                if tensor.name not in self._initializers:
+                    self._initializers[tensor.name] = tensor
+        for input in self.model.graph.input:
+            self._graph_inputs.setdefault(input.name, input)
+        for output in self.model.graph.output:
+            self._graph_outputs.setdefault(output.name, output)
+        self._update_index_fingerprint()
+
+    def _graph_index(self, graph):
+        for i, g in enumerate(self.graphs()):
+            if g is graph:
+                return i
+        return len(self.graphs())
+
+    def _index_node(self, node, graph, order=None):
+        if order is None:
+            order = (self._graph_index(graph), self._next_node_sequence)
+            self._next_node_sequence += 1
+        self._node_graph[id(node)] = graph
+        self._node_order[id(node)] = order
+        self._node_io[id(node)] = (node.op_type, tuple(node.input), tuple(node.output))
+        self._producers_generation += 1
+
+        self._insert_in_order(self._op_type_to_nodes.setdefault(node.op_type, []), node)
+        for input_name in node.input:
+            if input_name:  # could be empty when it is optional
+                self._insert_in_order(self._consumers.setdefault(input_name, []), node)
+        for output_name in node.output:
+            if output_name:  # could be empty when it is optional
+                self._producers[output_name] = node
+
+    def _unindex_node(self, node):
+        op_type, node_inputs, node_outputs = self._node_io.pop(id(node))
+        self._remove_from_list(self._op_type_to_nodes.get(op_type, []), node)
+        for input_name in node_inputs:
+            if input_name in self._consumers:
+                self._remove_from_list(self._consumers[input_name], node)
+                if not self._consumers[input_name]:
+                    del self._consumers[input_name]
+        for output_name in node_outputs:
+            if self._producers.get(output_name) is node:
+                del self._producers[output_name]
+        del self._node_graph[id(node)]
+        del self._node_order[id(node)]
+        self._producers_generation += 1
+
+    def reindex_node(self, node):
+        """Update the index after op type, inputs or outputs of a node in a graph are changed in place."""
+        if self._index_fingerprint is not None and id(node) in self._node_graph:
+            graph = self._node_graph[id(node)]
+            order = self._node_order[id(node)]
+            op_type, _, outputs = self._node_io[id(node)]
+            generation = self._producers_generation
+            self._unindex_node(node)
+            self._index_node(node, graph, order)
+            if op_type == node.op_type and outputs == tuple(node.output):
+                # Only inputs are changed, which match_parent_path checks for each cached result.
+                self._producers_generation = generation
+
+    def _insert_in_order(self, nodes, node):
+        """Append a node to a list of nodes, keeping the list in the order of graphs() and of nodes in graph."""
+        nodes.append(node)
+        if len(nodes) > 1 and self._node_order[id(nodes[-2])] > self._node_order[id(node)]:
+            nodes.sort(key=lambda n: self._node_order[id(n)])
+
+    @staticmethod
+    def _remove_from_list(nodes, node):
+        # NodeProto equality compares the whole message, so look up by identity instead of using list.remove.
+        for i, n in enumerate(nodes):
+            if n is node:
+                del nodes[i]
+                return True
+        return False
+
+    @staticmethod
+    def _remove_from_repeated_field(field, items):
+        # Messages compare by value, so find the items by identity instead of using field.remove.
+        item_ids = {id(item) for item in items}
+        for i in reversed([i for i, item in enumerate(field) if id(item) in item_ids]):
+            del field[i]
+
+    def _remove_graph_values(self, field, items):
+        """Remove inputs, outputs or initializers from a graph and from the index."""
+        if not items:
+            return
+        self._ensure_index()
+        self._remove_from_repeated_field(field, items)
+        for item in items:
+            for index in (self._initializers, self._graph_inputs, self._graph_outputs):
+                if index.get(item.name) is item:
+                    del index[item.name]
+        # an initializer, input or output with the same name might still be in a graph
+        for graph in self.graphs():
+            for tensor in graph.initializer:
+                self._initializers.setdefault(tensor.name, tensor)
+        for input in self.model.graph.input:
+            self._graph_inputs.setdefault(input.name, input)
+        for output in self.model.graph.output:
+            self._graph_outputs.setdefault(output.name, output)
+        self._update_index_fingerprint()
+
     def input_name_to_nodes(self):
-        input_name_to_nodes = {}
-        for node in self.nodes():
-            for input_name in node.input:
-                if input_name:  # could be empty when it is optional
-                    if input_name not in input_name_to_nodes:
-                        input_name_to_nodes[input_name] = [node]
-                    else:
-                        input_name_to_nodes[input_name].append(node)
-        return input_name_to_nodes
+        self._ensure_index()
+        # copying the map takes linear time anyway, so check all nodes.
+        self._reindex_changed_nodes()
+        return {input_name: list(nodes) for input_name, nodes in self._consumers.items()}
 
     def output_name_to_node(self):
-        output_name_to_node = {}
-        for node in self.nodes():
-            for output_name in node.output:
-                if output_name:  # could be empty when it is optional
-                    output_name_to_node[output_name] = node
+        self._ensure_index()
+        self._reindex_changed_nodes()
+        output_name_to_node = dict(self._producers)
+        self._output_name_to_node_copy = (output_name_to_node, self._producers_generation)
         return output_name_to_node
 
+    def _is_indexed_producers(self, output_name_to_node):
+        """Whether a map is the index of producers, or the last copy of it while producers are unchanged."""
+        self._ensure_index()
+        if output_name_to_node is None or output_name_to_node is self._producers:
+            return True
+        copy, generation = self._output_name_to_node_copy
+        return copy is output_name_to_node and generation == self._producers_generation
+
+    def _get_indexed_producer(self, name):
+        node = self._producers.get(name)
+        if node is not None and name not in node.output:
+            self._reindex_changed_nodes()
+            node = self._producers.get(name)
+        return node
+
+    def _get_indexed_consumers(self, name):
+        nodes = self._consumers.get(name, [])
+        if any(name not in node.input for node in nodes):
+            self._reindex_changed_nodes()
+            nodes = self._consumers.get(name, [])
+        return nodes
+
     def nodes(self):
         all_nodes = []
         for graph in self.graphs():
@@ -118,6 +378,9 @@ class OnnxModel:
         return output_names
 
     def get_graph_by_node(self, node):
+        self._ensure_index()
+        if id(node) in self._node_graph:
+            return self._node_graph[id(node)]
         for graph in self.graphs():
             if node in graph.node:
                 return graph
@@ -137,45 +400,87 @@ class OnnxModel:
         return len(graph.node)
 
     def remove_node(self, node):
-        for graph in self.graphs():
-            if node in graph.node:
-                graph.node.remove(node)
-                return
-        logger.warning("Failed to remove node %s", node)  # It might be a bug to hit this line.
+        self.remove_nodes([node])
 
     def remove_nodes(self, nodes_to_remove):
+        self._ensure_index()
+        indexed_nodes_to_remove = {}  # graph index to ids of the nodes to remove from that graph
+        removed_node_ids = set()
         for node in nodes_to_remove:
-            self.remove_node(node)
+            if id(node) in self._node_graph:
+                graph_index = self._node_order[id(node)][0]
+                indexed_nodes_to_remove.setdefault(graph_index, set()).add(id(node))
+                removed_node_ids.add(id(node))
+                self._unindex_node(node)
+                continue
+
+            if id(node) not in removed_node_ids:
+                # The node is not one of the graph nodes (like a copy of it), so look for an equal node.
+                graph = next((g for g in self.graphs() if node in g.node), None)
+                if graph is not None:
+                    graph.node.remove(node)
+                    self.invalidate_index()
+                    continue
+            logger.warning("Failed to remove node %s", node)  # It might be a bug to hit this line.
+
+        for graph_index, node_ids in indexed_nodes_to_remove.items():
+            graph = self.graphs()[graph_index]
+            for i in reversed([i for i, n in enumerate(graph.node) if id(n) in node_ids]):
+                del graph.node[i]
+
+        if self._index_fingerprint is not None:
+            self._update_index_fingerprint()
 
     def add_node(self, node, graph_name=None):
+        self._ensure_index()
         if graph_name is None or graph_name == self.model.graph.name:
             self.model.graph.node.extend([node])
+            # extend adds a copy of the node, so index the node that is in the graph.
+            self._index_node(self.model.graph.node[-1], self.model.graph)
+            self._update_index_fingerprint()
         else:
             graph = self.get_graph_by_name(graph_name)
             insert_idx = self.get_topological_insert_id(graph, node.output)
             graph.node.insert(insert_idx, node)
+            self.invalidate_index()
 
     def add_nodes(self, nodes_to_add, node_name_to_graph_name=None):
         if node_name_to_graph_name is None:
+            self._ensure_index()
+            start = len(self.model.graph.node)
             self.model.graph.node.extend(nodes_to_add)
+            for i in range(start, len(self.model.graph.node)):
+                self._index_node(self.model.graph.node[i], self.model.graph)
+            self._update_index_fingerprint()
         else:
             for node in nodes_to_add:
                 graph_name = node_name_to_graph_name[node.name]
                 self.add_node(node, graph_name)
 
     def add_initializer(self, tensor, graph_name=None):
+        self._ensure_index()
         if graph_name is None or graph_name == self.model.graph.name:
-            self.model.graph.initializer.extend([tensor])
+            graph = self.model.graph
         else:
             graph = self.get_graph_by_name(graph_name)
-            graph.initializer.extend([tensor])
+        graph.initializer.extend([tensor])
+        if tensor.name not in self._initializers:
+            self._initializers[tensor.name] = graph.initializer[-1]
+        else:
+            # an initializer with the same name in another graph might come first in graphs()
+            self.invalidate_index()
+            return
+        self._update_index_fingerprint()
 
     def add_input(self, input, graph_name=None):
+        self._ensure_index()
         if graph_name is None or graph_name == self.model.graph.name:
             self.model.graph.input.extend([input])
+            self._graph_inputs.setdefault(input.name, self.model.graph.input[-1])
         else:
             graph = self.get_graph_by_name(graph_name)
             graph.input.extend([input])
+        self._update_index_fingerprint()
 
     @staticmethod
     def replace_node_input(node, old_input_name, new_input_name):
@@ -184,9 +489,17 @@ class OnnxModel:
             if node.input[j] == old_input_name:
                 node.input[j] = new_input_name
 
+    def replace_input_of_node(self, node, old_input_name, new_input_name):
+        """Like replace_node_input, and also update the index of the model."""
+        OnnxModel.replace_node_input(node, old_input_name, new_input_name)
+        self.reindex_node(node)
+
     def replace_input_of_all_nodes(self, old_input_name, new_input_name):
-        for node in self.model.graph.node:
-            OnnxModel.replace_node_input(node, old_input_name, new_input_name)
+        self._ensure_index()
+        # a node is listed once for each time it uses the input
+        for node in {id(node): node for node in self._consumers.get(old_input_name, [])}.values():
+            if self._node_graph[id(node)] is self.model.graph:
+                self.replace_input_of_node(node, old_input_name, new_input_name)
 
     @staticmethod
     def replace_node_output(node, old_output_name, new_output_name):
@@ -195,6 +508,11 @@ class OnnxModel:
             if node.output[j] == old_output_name:
                 node.output[j] = new_output_name
 
+    def replace_output_of_node(self, node, old_output_name, new_output_name):
+        """Like replace_node_output, and also update the index of the model."""
+        OnnxModel.replace_node_output(node, old_output_name, new_output_name)
+        self.reindex_node(node)
+
     def replace_output_of_all_nodes(self, old_output_name, new_output_name):
         # This function shall be used carefully. For example:
         #       Add --[old_name]--> Cast ---> [new_name]
@@ -202,26 +520,23 @@ class OnnxModel:
         #        +----[old_name]--> Transpose -->
         # If we want to remove the Cast node: replace output of Add to new_name is not enough;
         # The input of Transpose shall also be updated to new_name.
-        for node in self.model.graph.node:
-            OnnxModel.replace_node_output(node, old_output_name, new_output_name)
+        self._ensure_index()
+        node = self._producers.get(old_output_name)
+        if node is not None and self._node_graph[id(node)] is self.model.graph:
+            self.replace_output_of_node(node, old_output_name, new_output_name)
 
     def get_initializer(self, name):
-        for graph in self.graphs():
-            for tensor in graph.initializer:
-                if tensor.name == name:
-                    return tensor
-        return None
+        self._ensure_index()
+        return self._initializers.get(name)
 
     def get_nodes_by_op_type(self, op_type):
-        nodes = []
-        for node in self.nodes():
-            if node.op_type == op_type:
-                nodes.append(node)
-        return nodes
+        self._ensure_index()
+        return list(self._op_type_to_nodes.get(op_type, []))
 
     def get_children(self, node, input_name_to_nodes=None):
         if input_name_to_nodes is None:
-            input_name_to_nodes = self.input_name_to_nodes()
+            self._ensure_index()
+            return [child for output in node.output for child in self._get_indexed_consumers(output)]
 
         children = []
         for output in node.output:
@@ -232,7 +547,9 @@ class OnnxModel:
 
     def get_parents(self, node, output_name_to_node=None):
         if output_name_to_node is None:
-            output_name_to_node = self.output_name_to_node()
+            self._ensure_index()
+            parents = [self._get_indexed_producer(input) for input in node.input]
+            return [parent for parent in parents if parent is not None]
 
         parents = []
         for input in node.input:
@@ -242,7 +559,8 @@ class OnnxModel:
 
     def get_parent(self, node, i, output_name_to_node=None):
         if output_name_to_node is None:
-            output_name_to_node = self.output_name_to_node()
+            self._ensure_index()
+            return self._get_indexed_producer(node.input[i]) if i < len(node.input) else None
 
         if len(node.input) <= i:
             return None
@@ -304,10 +622,10 @@ class OnnxModel:
         assert node is not None
         assert input_index is None or input_index >= 0
 
-        if output_name_to_node is None:
-            output_name_to_node = self.output_name_to_node()
-
         if input_index is None:
+            if output_name_to_node is None:
+                self._ensure_index()
+                output_name_to_node = self._producers
             parent, index = self.match_first_parent(node, parent_op_type, output_name_to_node, exclude)
             if return_indice is not None:
                 return_indice.append(index)
@@ -348,9 +666,13 @@ class OnnxModel:
         When input_index is None, we will find the first parent node based on constraints,
         and return_indice will be appended the corresponding input index.
 
+        When output_name_to_node is not given or is returned by output_name_to_node(), the result is cached until
+        a node that produces a tensor is added, removed or changed. Changes of node inputs are checked on each lookup.
+
         Args:
             node (str): current node name.
             parent_op_types (str): constraint of parent node op_type of each input edge.
+                                   It could also be a ParentPathPattern that combines both constraints.
             parent_input_index (list): constraint of input index of each input edge. None means no constraint.
             output_name_to_node (dict): dictionary with output name as key, and node as value.
             return_indice (list): a list to append the input index
@@ -359,37 +681,74 @@ class OnnxModel:
         Returns:
             parents: a list of matched parent node.
         """
-        if parent_input_index is not None:
-            assert len(parent_input_index) == len(parent_op_types)
+        if isinstance(parent_op_types, ParentPathPattern):
+            pattern = parent_op_types
+        else:
+            pattern = ParentPathPattern.compile(parent_op_types, parent_input_index)
 
-        if output_name_to_node is None:
-            output_name_to_node = self.output_name_to_node()
+        if self._is_indexed_producers(output_name_to_node):
+            matched_parents = self._match_parent_path_with_index(node, pattern, return_indice)
+        else:
+            matched_parents = pattern.match(node, output_name_to_node, return_indice)
 
-        current_node = node
-        matched_parents = []
-        for i, op_type in enumerate(parent_op_types):
-            matched_parent = self.match_parent(
-                current_node,
-                op_type,
-                parent_input_index[i] if parent_input_index is not None else None,
-                output_name_to_node,
-                exclude=[],
-                return_indice=return_indice,
-            )
-            if matched_parent is None:
-                if parent_input_index is not None:
-                    logger.debug(
-                        f"Failed to match index={i} parent_input_index={parent_input_index[i]} op_type={op_type}",
-                        stack_info=True,
-                    )
-                else:
-                    logger.debug(f"Failed to match index={i} op_type={op_type}", stack_info=True)
+        if matched_parents is None:
+            logger.debug("Failed to match %s", pattern, stack_info=True)
+        return matched_parents
+
+    def _match_parent_path_with_index(self, node, pattern, return_indice):
+        # Early rejection when an op type is not in the graph.
+        if return_indice is None and not self._op_type_to_nodes.keys() >= pattern.op_type_set:
+            return None
+
+        # Most walks fail at the first edge, which is cheaper to check than a cached result.
+        op_type, input_index = pattern.steps[0] if pattern.steps else (None, None)
+        if input_index is not None:
+            parent = self.get_parent(node, input_index)
+            if parent is None or parent.op_type != op_type:
                 return None
 
-            matched_parents.append(matched_parent)
-            current_node = matched_parent
+        key = (id(node), pattern)
+        cached = self._get_parent_path_cache().get(key)
+        if cached is not None and cached[0] is node:
+            _, edges, matched_parents, indices = cached
+            # Node inputs might be changed in place since the result was cached.
+            if all(
+                names == (tuple(n.input) if i is None else (n.input[i] if i < len(n.input) else None))
+                for n, i, names in edges
+            ):
+                if return_indice is not None:
+                    return_indice.extend(indices)
+                return None if matched_parents is None else list(matched_parents)
+
+        edges = []
+        indices = []
+        matched_parents = pattern.match(node, self._producers, indices, edges)
+        if matched_parents is not None and not self._are_edges_indexed(node, matched_parents):
+            self._reindex_changed_nodes()
+            edges = []
+            indices = []
+            matched_parents = pattern.match(node, self._producers, indices, edges)
+        self._get_parent_path_cache()[key] = (node, edges, matched_parents, indices)
+        if return_indice is not None:
+            return_indice.extend(indices)
+        return None if matched_parents is None else list(matched_parents)
+
+    def _get_parent_path_cache(self):
+        # Results of another generation might refer to nodes that are removed or changed.
+        if self._parent_path_cache_generation != self._producers_generation:
+            self._parent_path_cache.clear()
+            self._parent_path_cache_generation = self._producers_generation
+        return self._parent_path_cache
 
-        return matched_parents
+    @staticmethod
+    def _are_edges_indexed(node, parents):
+        """Whether each parent still produces an input of its child, to detect nodes changed in place."""
+        child = node
+        for parent in parents:
+            if not any(output in child.input for output in parent.output if output):
+                return False
+            child = parent
+        return True
 
     def find_first_child_by_type(self, node, child_type, input_name_to_nodes=None, recursive=True):
         children = self.get_children(node, input_name_to_nodes)
@@ -408,7 +767,8 @@ class OnnxModel:
 
     def find_first_parent_by_type(self, node, parent_type, output_name_to_node=None, recursive=True):
         if output_name_to_node is None:
-            output_name_to_node = self.output_name_to_node()
+            self._ensure_index()
+            output_name_to_node = self._producers
 
         parents = self.get_parents(node, output_name_to_node)
         dq = deque(parents)
@@ -425,11 +785,12 @@ class OnnxModel:
         return None
 
     def get_constant_value(self, output_name):
-        for node in self.get_nodes_by_op_type("Constant"):
-            if node.output[0] == output_name:
-                for att in node.attribute:
-                    if att.name == "value":
-                        return numpy_helper.to_array(att.t)
+        self._ensure_index()
+        node = self._producers.get(output_name)
+        if node is not None and node.op_type == "Constant" and node.output[0] == output_name:
+            for att in node.attribute:
+                if att.name == "value":
+                    return numpy_helper.to_array(att.t)
 
         # Fall back to intializer since constant folding might have been applied.
         initializer = self.get_initializer(output_name)
@@ -470,11 +831,13 @@ class OnnxModel:
 
     def get_children_subgraph_nodes(self, root_node, stop_nodes, input_name_to_nodes=None):
         if input_name_to_nodes is None:
-            input_name_to_nodes = self.input_name_to_nodes()
+            self._ensure_index()
+            input_name_to_nodes = self._consumers
 
         children = input_name_to_nodes[root_node.output[0]]
 
         unique_nodes = []
+        unique_node_ids = set()
 
         dq = deque(children)
         while len(dq) > 0:
@@ -482,8 +845,9 @@ class OnnxModel:
             if current_node in stop_nodes:
                 continue
 
-            if current_node not in unique_nodes:
+            if id(current_node) not in unique_node_ids:
                 unique_nodes.append(current_node)
+                unique_node_ids.add(id(current_node))
 
                 for output in current_node.output:
                     if output in input_name_to_nodes:
@@ -542,7 +906,7 @@ class OnnxModel:
             if node.op_type == "Cast":
                 parent = self.get_parent(node, 0, output_name_to_node=output_name_to_node)
                 if parent and parent.op_type == "Cast":
-                    node.input[0] = parent.input[0]
+                    self.replace_input_of_node(node, node.input[0], parent.input[0])
                     removed_count += 1
 
         if removed_count > 0:
@@ -724,22 +1088,20 @@ class OnnxModel:
         return prefix + str(suffix)
 
     def find_graph_input(self, input_name):
-        for input in self.model.graph.input:
-            if input.name == input_name:
-                return input
-        return None
+        self._ensure_index()
+        return self._graph_inputs.get(input_name)
 
     def find_graph_output(self, output_name):
-        for output in self.model.graph.output:
-            if output.name == output_name:
-                return output
-        return None
+        self._ensure_index()
+        return self._graph_outputs.get(output_name)
 
     def get_parent_subgraph_nodes(self, node, stop_nodes, output_name_to_node=None):
         if output_name_to_node is None:
-            output_name_to_node = self.output_name_to_node()
+            self._ensure_index()
+            output_name_to_node = self._producers
 
         unique_nodes = []
+        unique_node_ids = set()
 
         parents = self.get_parents(node, output_name_to_node)
         dq = deque(parents)
@@ -748,8 +1110,9 @@ class OnnxModel:
             if current_node in stop_nodes:
                 continue
 
-            if current_node not in unique_nodes:
+            if id(current_node) not in unique_node_ids:
                 unique_nodes.append(current_node)
+                unique_node_ids.add(id(current_node))
 
                 for input in current_node.input:
                     if input in output_name_to_node:
@@ -784,13 +1147,12 @@ class OnnxModel:
         return -1
 
     def remove_unused_constant(self):
-        input_name_to_nodes = self.input_name_to_nodes()
+        self._ensure_index()
 
         # remove unused constant
         unused_nodes = []
-        nodes = self.nodes()
-        for node in nodes:
-            if node.op_type == "Constant" and node.output[0] not in input_name_to_nodes:
+        for node in self._op_type_to_nodes.get("Constant", []):
+            if node.output[0] not in self._consumers:
                 unused_nodes.append(node)
 
         self.remove_nodes(unused_nodes)
@@ -817,20 +1179,22 @@ class OnnxModel:
         if outputs is None:
             outputs = [output.name for output in self.model.graph.output]
 
-        output_name_to_node = self.output_name_to_node()
-        all_nodes = []
+        # Callers often change nodes in place before pruning, so do not trust the index here.
+        self.invalidate_index()
+        self._ensure_index()
+        all_node_ids = set()
         for output in outputs:
-            if output in output_name_to_node:
-                last_node = output_name_to_node[output]
-                if last_node in all_nodes:
+            if output in self._producers:
+                last_node = self._producers[output]
+                if id(last_node) in all_node_ids:
                     continue
                 nodes = self.get_parent_subgraph_nodes(last_node, [])
-                all_nodes.append(last_node)
-                all_nodes.extend(nodes)
+                all_node_ids.add(id(last_node))
+                all_node_ids.update(id(node) for node in nodes)
 
         nodes_to_remove = []
         for node in self.model.graph.node:
-            if node not in all_nodes:
+            if id(node) not in all_node_ids:
                 nodes_to_remove.append(node)
 
         self.remove_nodes(nodes_to_remove)
@@ -840,18 +1204,16 @@ class OnnxModel:
         for output in self.model.graph.output:
             if output.name not in outputs:
                 output_to_remove.append(output)
-        for output in output_to_remove:
-            self.model.graph.output.remove(output)
+        self._remove_graph_values(self.model.graph.output, output_to_remove)
 
         # remove inputs not used by any node.
         input_to_remove = []
         if allow_remove_graph_inputs:
-            input_name_to_nodes = self.input_name_to_nodes()
+            self._ensure_index()
             for input in self.model.graph.input:
-                if input.name not in input_name_to_nodes:
+                if input.name not in self._consumers:
                     input_to_remove.append(input)
-            for input in input_to_remove:
-                self.model.graph.input.remove(input)
+            self._remove_graph_values(self.model.graph.input, input_to_remove)
 
         if input_to_remove or output_to_remove or nodes_to_remove:
             removed = []
@@ -867,8 +1229,9 @@ class OnnxModel:
 
     def update_graph(self, verbose=False, allow_remove_graph_inputs=False):
         graph = self.model.graph
+        self.invalidate_index()
 
-        remaining_input_names = []
+        remaining_input_names = {}  # used as an ordered set
         for node in graph.node:
             if node.op_type in ["Loop", "Scan", "If"]:
                 # TODO: handle inner graph
@@ -876,10 +1239,9 @@ class OnnxModel:
                 return
             if node.op_type != "Constant":
                 for input_name in node.input:
-                    if input_name not in remaining_input_names:
-                        remaining_input_names.append(input_name)
+                    remaining_input_names[input_name] = None
         if verbose:
-            logger.debug(f"remaining input names: {remaining_input_names}")
+            logger.debug(f"remaining input names: {list(remaining_input_names)}")
 
         # remove graph input that is not used
         inputs_to_remove = []
@@ -887,8 +1249,7 @@ class OnnxModel:
             for input in graph.input:
                 if input.name not in remaining_input_names:
                     inputs_to_remove.append(input)
-            for input in inputs_to_remove:
-                graph.input.remove(input)
+            self._remove_graph_values(graph.input, inputs_to_remove)
 
         names_to_remove = [input.name for input in inputs_to_remove]
         logger.debug(f"remove {len(inputs_to_remove)} unused inputs: {names_to_remove}")
@@ -901,8 +1262,7 @@ class OnnxModel:
                 weights_to_remove.append(initializer)
             else:
                 weights_to_keep.append(initializer.name)
-        for initializer in weights_to_remove:
-            graph.initializer.remove(initializer)
+        self._remove_graph_values(graph.initializer, weights_to_remove)
 
         names_to_remove = [initializer.name for initializer in weights_to_remove]
         logger.debug(f"remove {len(weights_to_remove)} unused initializers: {names_to_remove}")
@@ -990,6 +1350,7 @@ class OnnxModel:
         # for graph in self.graphs():
         #    self.graph_topological_sort(graph)
         OnnxModel.graph_topological_sort(self.model.graph, is_deterministic)
+        self.invalidate_index()
 
     @staticmethod
     def save(
@@ -1173,5 +1534,7 @@ class OnnxModel:
             if value_info.name not in excluded:
                 value_info.name = prefix + value_info.name
 
+        self.invalidate_index()
+
     def clean_shape_infer(self):
         self.model.graph.ClearField("value_info")
@@ -9,6 +9,7 @@ from typing import List, Optional
 from convert_to_packing_mode import PackingMode
 from fusion_attention import AttentionMask, FusionAttention
 from fusion_bart_attention import FusionBartAttention
+from fusion_base import FusionEngine
 from fusion_biasgelu import FusionBiasGelu
 from fusion_embedlayer import FusionEmbedLayerNormalization
 from fusion_fastgelu import FusionFastGelu
@@ -67,13 +68,10 @@ class BertOnnxModel(OnnxModel):
         self.qordered_attention_fusion.apply()
 
     def fuse_gelu(self):
-        fusion = FusionGelu(self)
-        fusion.apply()
-        fusion = FusionFastGelu(self)
-        fusion.apply()
+        fusions = [FusionGelu(self), FusionFastGelu(self)]
         # Only relevant in models with Q-DQ nodes
-        fusion = FusionQOrderedGelu(self)
-        fusion.apply()
+        fusions.append(FusionQOrderedGelu(self))
+        FusionEngine(self, fusions).apply()
 
     def fuse_bias_gelu(self, is_fastgelu):
         fusion = FusionBiasGelu(self, is_fastgelu)
@@ -104,15 +102,10 @@ class BertOnnxModel(OnnxModel):
         fusion.apply()
 
     def fuse_layer_norm(self):
-        fusion = FusionLayerNormalization(self)
-        fusion.apply()
-
-        fusion = FusionLayerNormalizationTF(self)
-        fusion.apply()
-
+        fusions = [FusionLayerNormalization(self), FusionLayerNormalizationTF(self)]
         # Only relevant in models with Q-DQ nodes
-        fusion = FusionQOrderedLayerNormalization(self)
-        fusion.apply()
+        fusions.append(FusionQOrderedLayerNormalization(self))
+        FusionEngine(self, fusions).apply()
 
     def fuse_skip_layer_norm(self):
         fusion = FusionSkipLayerNormalization(self)
@@ -199,7 +192,7 @@ class BertOnnxModel(OnnxModel):
                 graph.node.extend([new_cast_node])
 
                 for node in nodes_not_cast:
-                    OnnxModel.replace_node_input(node, graph_input.name, output_name)
+                    self.replace_input_of_node(node, graph_input.name, output_name)
 
             # For children that is Cast node, no need to insert Cast.
             # When the children is Cast to int32, we can remove that Cast node since input type is int32 now.
@@ -288,7 +281,7 @@ class BertOnnxModel(OnnxModel):
                         and len(shape_value) == 1
                         and expand_shape_value[1] == shape_value[0]
                     ):
-                        node.input[0] = slice_node.output[0]
+                        self.replace_input_of_node(node, node.input[0], slice_node.output[0])
 
         if nodes_to_remove:
             self.remove_nodes(nodes_to_remove)
@@ -332,7 +325,7 @@ class BertOnnxModel(OnnxModel):
                         shape,
                     ) = parent_nodes
                     if shape.input[0] == self.graph().input[0].name:
-                        constantOfShape.input[0] = shape.output[0]
+                        self.replace_input_of_node(constantOfShape, constantOfShape.input[0], shape.output[0])
                         output_name_to_node = self.output_name_to_node()
 
             if node.op_type == "Attention":
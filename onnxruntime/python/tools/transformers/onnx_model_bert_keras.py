@@ -209,7 +209,7 @@ class BertOnnxModelKeras(BertOnnxModelTF):
                 nodes_to_remove.extend(mask_nodes)
                 nodes_to_remove.extend(reshape_nodes)
                 nodes_to_remove.append(extra_reshape_0)
-                self.replace_node_input(add, extra_reshape_0.output[0], matmul.output[0])
+                self.replace_input_of_node(add, extra_reshape_0.output[0], matmul.output[0])
             else:
                 logger.debug("Root node not matched.")
                 continue
@@ -231,7 +231,7 @@ class BertOnnxModelKeras(BertOnnxModelTF):
         for reshape_node in reshape_nodes:
             parent = self.get_parent(reshape_node, 0)
             if parent is not None and parent.op_type == "Reshape":
-                reshape_node.input[0] = parent.input[0]
+                self.replace_input_of_node(reshape_node, reshape_node.input[0], parent.input[0])
                 count += 1
 
         if count > 0:
@@ -355,14 +355,14 @@ class BertOnnxModelKeras(BertOnnxModelTF):
                     axes=[2],
                 )
 
-                # self.replace_node_input(cast_node, cast_node.input[0], 'mask_fuse_unsqueeze2_output')
+                # self.replace_input_of_node(cast_node, cast_node.input[0], 'mask_fuse_unsqueeze2_output')
                 cast_node_2 = onnx.helper.make_node(
                     "Cast",
                     inputs=["mask_fuse_unsqueeze2_output"],
                     outputs=["mask_fuse_cast_output"],
                 )
                 cast_node_2.attribute.extend([onnx.helper.make_attribute("to", 1)])
-                self.replace_node_input(sub_node, sub_node.input[1], "mask_fuse_cast_output")
+                self.replace_input_of_node(sub_node, sub_node.input[1], "mask_fuse_cast_output")
 
                 nodes_to_remove.extend([slice_node, unsqueeze_node, cast_node])
                 self.add_node(unsqueeze_added_1)
@@ -410,11 +410,11 @@ class BertOnnxModelKeras(BertOnnxModelTF):
                 matmul_2,
                 skiplayernorm,
             ) = path
-            add_2.input[0] = matmul_2.output[0]
+            self.replace_input_of_node(add_2, add_2.input[0], matmul_2.output[0])
             self.remove_node(reshape_3)
-            matmul_1.input[0] = gelu.output[0]
+            self.replace_input_of_node(matmul_1, matmul_1.input[0], gelu.output[0])
             self.remove_node(reshape_2)
-            add_1.input[0] = matmul_1.output[0]
+            self.replace_input_of_node(add_1, add_1.input[0], matmul_1.output[0])
             self.remove_node(reshape_1)
             reshape_removed += 3
 
@@ -456,16 +456,16 @@ class BertOnnxModelKeras(BertOnnxModelTF):
                 skiplayernorm,
             ) = path
 
-            matmul_2.input[0] = skiplayernorm.output[0]
+            self.replace_input_of_node(matmul_2, matmul_2.input[0], skiplayernorm.output[0])
             self.remove_node(reshape_4)
 
-            add_2.input[0] = matmul_2.output[0]
+            self.replace_input_of_node(add_2, add_2.input[0], matmul_2.output[0])
             self.remove_node(reshape_3)
 
-            matmul_1.input[0] = gelu.output[0]
+            self.replace_input_of_node(matmul_1, matmul_1.input[0], gelu.output[0])
             self.remove_node(reshape_2)
 
-            add_1.input[0] = matmul_1.output[0]
+            self.replace_input_of_node(add_1, add_1.input[0], matmul_1.output[0])
             self.remove_node(reshape_1)
 
             reshape_removed += 4
@@ -474,7 +474,7 @@ class BertOnnxModelTF(BertOnnxModel):
                     ),
                     graph_name,
                 )
-                mask_nodes[-1].input[0] = squeeze_output_name
+                self.replace_input_of_node(mask_nodes[-1], mask_nodes[-1].input[0], squeeze_output_name)
 
             is_same_root = self.check_attention_input(matmul_q, matmul_k, matmul_v, parent, output_name_to_node)
             if is_same_root:
@@ -527,7 +527,9 @@ class BertOnnxModelTF(BertOnnxModel):
                         outputs=[qkv_nodes[1].name + "_reshape_output"],
                         name=qkv_nodes[1].name + "_reshape",
                     )
-                    qkv_nodes[1].input[0] = qkv_nodes[1].name + "_reshape_output"
+                    self.replace_input_of_node(
+                        qkv_nodes[1], qkv_nodes[1].input[0], qkv_nodes[1].name + "_reshape_output"
+                    )
                     self.add_node(reshape_, graph_name)
                 if parent.op_type == "Reshape":
                     # Temporary work around: we require the skiplayernorm and attention op be fed with 3-d input
@@ -540,7 +542,7 @@ class BertOnnxModelTF(BertOnnxModel):
                         raw=True,
                     )
                     self.add_initializer(tensor, graph_name)
-                    parent.input[1] = parent.name + "_modified"
+                    self.replace_input_of_node(parent, parent.input[1], parent.name + "_modified")
 
                 self.add_node(attention_node, graph_name)
                 attention_count += 1
@@ -569,7 +571,7 @@ class BertOnnxModelTF(BertOnnxModel):
         for reshape_node in reshape_nodes:
             parent = self.get_parent(reshape_node, 0)
             if parent is not None and parent.op_type == "Reshape":
-                reshape_node.input[0] = parent.input[0]
+                self.replace_input_of_node(reshape_node, reshape_node.input[0], parent.input[0])
                 count += 1
 
         if count > 0:
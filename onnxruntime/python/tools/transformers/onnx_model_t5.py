@@ -796,7 +796,7 @@ class T5OnnxModel(BertOnnxModel):
                     continue
 
                 rpb_node = rpb_nodes[0]
-                rpb_node.output[0] = node.output[0]
+                self.replace_output_of_node(rpb_node, rpb_node.output[0], node.output[0])
 
                 nodes_to_remove.extend(extended_mask_nodes)
                 nodes_to_remove.append(node)
@@ -832,7 +832,7 @@ class T5OnnxModel(BertOnnxModel):
                     continue
 
                 rpb_node = rpb_nodes[0]
-                rpb_node.output[0] = node.output[0]
+                self.replace_output_of_node(rpb_node, rpb_node.output[0], node.output[0])
 
                 nodes_to_remove.extend(extended_mask_nodes)
                 nodes_to_remove.append(node)
@@ -206,8 +206,8 @@ class FusionTnlrAttention(FusionAttention):
                 perm=[1, 0, 2],
             )
             self.model.add_node(back_transpose, self.this_graph_name)
-            new_node.input[0] = transpose.input[0]
-            new_node.output[0] = "back_transpose_in_" + new_node.name
+            self.model.replace_input_of_node(new_node, new_node.input[0], transpose.input[0])
+            self.model.replace_output_of_node(new_node, new_node.output[0], "back_transpose_in_" + new_node.name)
 
             self.nodes_to_remove.extend([attention_last_node, transpose_qkv, matmul_qkv])
             self.nodes_to_remove.extend(qk_nodes)
@@ -0,0 +1,342 @@
+# -------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation.  All rights reserved.
+# Licensed under the MIT License.
+# --------------------------------------------------------------------------
+
+"""
+This tool loads the kernel time of every node in an onnxruntime profile into NumPy columns, and reports latency
+statistics (like p50 and p99) grouped by node, op type, provider, input shape or run. It can also compare two profiles
+of the same model, which helps to find nodes with tail latency regression after upgrading onnxruntime.
+Example of statistics per node:
+    python profile_store.py --input profile_2021-10-25_12-02-41.json --group_by node
+Example of comparing with a baseline profile, and sorting by change of p99 latency:
+    python profile_store.py --input new_profile.json --baseline old_profile.json --group_by node --sort_by p99
+"""
+
+import argparse
+from array import array
+from typing import Dict, List, Optional, Sequence
+
+import numpy
+from profiler import NODES_TYPE_CONTAINING_SUBGRAPH, iterate_profile_json
+
+KEY_COLUMNS = ["node", "op_type", "provider", "input_shape", "run"]
+
+DEFAULT_PERCENTILES = (50, 90, 99)
+
+
+def get_input_shape_string(input_type_shape: List[Dict[str, List[int]]]) -> str:
+    """Convert input_type_shape in profile like [{"float":[2,8]},{"int32":[1,7]}] to a string like float[2,8],int32[1,7]"""
+    return ",".join(
+        f"{data_type}[{','.join(str(dim) for dim in shape)}]"
+        for type_shape in input_type_shape
+        for data_type, shape in type_shape.items()
+    )
+
+
+class ProfileStore:
+    """Kernel time of nodes in a profile stored in columns.
+
+    Each key column (node, op_type, provider and input_shape) is stored as integer codes into a list of distinct
+    values, so that group-by could be done with NumPy without touching Python strings per event. The run column is
+    the index of the model run that the event belongs to.
+    """
+
+    def __init__(self, codes: Dict[str, numpy.ndarray], categories: Dict[str, numpy.ndarray], duration: numpy.ndarray):
+        self.codes = codes
+        self.categories = categories
+        self.duration = duration
+
+    @staticmethod
+    def from_events(events):
+        """Build a store from profile events.
+
+        Args:
+            events (Iterable[Dict]): events in profile. Events could be consumed one by one (like the output of
+                                     iterate_profile_json), and only columns of node events are kept in memory.
+
+        Returns:
+            ProfileStore: the store with one row per node kernel time event.
+        """
+        value_to_code = {key: {} for key in KEY_COLUMNS if key != "run"}
+        codes = {key: array("q") for key in KEY_COLUMNS}
+        duration = array("q")
+
+        def get_code(key, value):
+            mapping = value_to_code[key]
+            code = mapping.get(value)
+            if code is None:
+                code = len(mapping)
+                mapping[value] = code
+            return code
+
+        # Node events of a run are written before the model_run event of the same run.
+        run = 0
+        for item in events:
+            if item["cat"] == "Session" and item["name"] == "model_run":
+                run += 1
+                continue
+
+            if item["cat"] != "Node" or "dur" not in item or not item["name"].endswith("_kernel_time"):
+                continue
+
+            args = item.get("args", {})
+            if "op_name" not in args or "provider" not in args:
+                continue
+
+            op_name = args["op_name"]
+            if op_name in NODES_TYPE_CONTAINING_SUBGRAPH:
+                continue
+
+            codes["node"].append(get_code("node", item["name"][: -len("_kernel_time")]))
+            codes["op_type"].append(get_code("op_type", op_name))
+            codes["provider"].append(get_code("provider", args["provider"].replace("ExecutionProvider", "")))
+            codes["input_shape"].append(
+                get_code("input_shape", get_input_shape_string(args.get("input_type_shape", [])))
+            )
+            codes["run"].append(run)
+            duration.append(int(item["dur"]))
+
+        categories = {key: numpy.array(list(mapping), dtype=object) for key, mapping in value_to_code.items()}
+        categories["run"] = numpy.arange(run + 1)
+        return ProfileStore(
+            {key: numpy.frombuffer(column, dtype=numpy.int64) for key, column in codes.items()},
+            categories,
+            numpy.frombuffer(duration, dtype=numpy.int64),
+        )
+
+    @staticmethod
+    def from_file(profile_file: str):
+        """Build a store from a profile file in one streaming pass."""
+        return ProfileStore.from_events(iterate_profile_json(profile_file))
+
+    def __len__(self):
+        return len(self.duration)
+
+    def get_column(self, name: str) -> numpy.ndarray:
+        """Get values of a column, which is duration or one of KEY_COLUMNS."""
+        if name == "duration":
+            return self.duration
+        self._check_keys([name])
+        return self.categories[name][self.codes[name]]
+
+    @staticmethod
+    def _check_keys(keys: Sequence[str]):
+        for key in keys:
+            if key not in KEY_COLUMNS:
+                raise ValueError(f"Unknown column {key}. Supported columns: {KEY_COLUMNS}")
+
+    def group_by(self, keys: Sequence[str], percentiles: Sequence[float] = DEFAULT_PERCENTILES):
+        """Get latency statistics of each group of rows that have same values in key columns.
+
+        Args:
+            keys (Sequence[str]): key columns. Empty means all rows are in one group.
+            percentiles (Sequence[float], optional): percentiles (in range [0, 100]) of duration to compute.
+                                                     Values are interpolated linearly like numpy.percentile.
+
+        Returns:
+            Dict[str, numpy.ndarray]: columns of result table with one row per group, sorted by total duration in
+                                      descending order. Columns are the keys, count, total, mean, min, max, and
+                                      p{percentile} for each percentile.
+        """
+        self._check_keys(keys)
+        for q in percentiles:
+            if not 0 <= q <= 100:
+                raise ValueError(f"Percentile {q} is not in range [0, 100]")
+
+        if keys and len(self) > 0:
+            unique_codes, group = numpy.unique(
+                numpy.stack([self.codes[key] for key in keys]), axis=1, return_inverse=True
+            )
+            group = group.reshape(-1)
+        else:
+            unique_codes = numpy.zeros((len(keys), 1 if len(self) > 0 else 0), dtype=numpy.int64)
+            group = numpy.zeros(len(self), dtype=numpy.int64)
+
+        count = numpy.bincount(group, minlength=unique_codes.shape[1])
+        total = numpy.bincount(group, weights=self.duration, minlength=unique_codes.shape[1]).astype(numpy.int64)
+
+        # Sort durations within each group, then each group occupies a contiguous range in sorted durations.
+        sorted_duration = self.duration[numpy.lexsort((self.duration, group))]
+        start = numpy.cumsum(count) - count
+        end = start + count - 1
+
+        table = {key: self.categories[key][unique_codes[i]] for i, key in enumerate(keys)}
+        table["count"] = count
+        table["total"] = total
+        table["mean"] = total / count
+        table["min"] = sorted_duration[start]
+        table["max"] = sorted_duration[end]
+        for q in percentiles:
+            offset = (count - 1) * (q / 100.0)
+            lower = numpy.floor(offset)
+            lower_value = sorted_duration[start + lower.astype(numpy.int64)]
+            upper_value = sorted_duration[start + numpy.ceil(offset).astype(numpy.int64)]
+            table[_get_percentile_name(q)] = lower_value + (upper_value - lower_value) * (offset - lower)
+
+        order = numpy.argsort(-total, kind="stable")
+        return {name: column[order] for name, column in table.items()}
+
+    def diff(
+        self,
+        baseline,
+        keys: Sequence[str],
+        percentiles: Sequence[float] = DEFAULT_PERCENTILES,
+        sort_by: Optional[str] = None,
+    ):
+        """Compare latency statistics of each group with a baseline profile.
+
+        Args:
+            baseline (ProfileStore): profile to compare with, like a profile of same model with previous version.
+            keys (Sequence[str]): key columns to match groups in two profiles.
+            percentiles (Sequence[float], optional): percentiles of duration to compare.
+            sort_by (str, optional): statistic to sort the result by its change in descending order. Defaults to the
+                                     last percentile.
+
+        Returns:
+            Dict[str, numpy.ndarray]: columns of result table with one row per group. Besides the keys, there are
+                                      columns {stat}_base, {stat} and {stat}_diff for each statistic among count,
+                                      mean and percentiles. Statistics are NaN for groups not found in one profile.
+        """
+        stats = ["count", "mean"] + [_get_percentile_name(q) for q in percentiles]
+        if sort_by is None:
+            sort_by = stats[-1]
+        if sort_by not in stats:
+            raise ValueError(f"Unknown statistic {sort_by} to sort by. Supported statistics: {stats}")
+
+        current = self.group_by(keys, percentiles)
+        base = baseline.group_by(keys, percentiles)
+
+        current_rows = {row: i for i, row in enumerate(zip(*[current[key] for key in keys]))} if keys else {(): 0}
+        base_rows = {row: i for i, row in enumerate(zip(*[base[key] for key in keys]))} if keys else {(): 0}
+        if len(current["count"]) == 0:
+            current_rows = {}
+        if len(base["count"]) == 0:
+            base_rows = {}
+        rows = list(current_rows) + [row for row in base_rows if row not in current_rows]
+
+        current_index = numpy.array([current_rows.get(row, -1) for row in rows], dtype=numpy.int64)
+        base_index = numpy.array([base_rows.get(row, -1) for row in rows], dtype=numpy.int64)
+
+        table = {key: numpy.array([row[i] for row in rows], dtype=object) for i, key in enumerate(keys)}
+        for stat in stats:
+            table[f"{stat}_base"] = _take_or_nan(base[stat], base_index)
+            table[stat] = _take_or_nan(current[stat], current_index)
+            table[f"{stat}_diff"] = table[stat] - table[f"{stat}_base"]
+
+        # Sort in descending order of change, and put NaN at the end.
+        order = numpy.argsort(-numpy.nan_to_num(table[f"{sort_by}_diff"], nan=-numpy.inf), kind="stable")
+        return {name: column[order] for name, column in table.items()}
+
+
+def _get_percentile_name(q: float) -> str:
+    return f"p{q:g}"
+
+
+def _take_or_nan(column: numpy.ndarray, index: numpy.ndarray) -> numpy.ndarray:
+    result = numpy.full(len(index), numpy.nan)
+    found = index >= 0
+    result[found] = column[index[found]]
+    return result
+
+
+def format_table(table: Dict[str, numpy.ndarray], top: int = 0) -> List[str]:
+    """Format a result table of ProfileStore as lines of tab separated values.
+
+    Args:
+        table (Dict[str, numpy.ndarray]): result table from ProfileStore.group_by or ProfileStore.diff.
+        top (int, optional): maximum number of rows to output. Defaults to 0, which means all rows.
+
+    Returns:
+        List[str]: lines of string for output. Key columns are put at the end since node names could be long.
+    """
+    names = [name for name in table if name not in KEY_COLUMNS] + [name for name in table if name in KEY_COLUMNS]
+    num_rows = len(table[names[0]]) if names else 0
+    if top > 0:
+        num_rows = min(num_rows, top)
+
+    def format_value(value):
+        if isinstance(value, (float, numpy.floating)):
+            return f"{value:.1f}"
+        return str(value)
+
+    lines = ["\t".join(names)]
+    for i in range(num_rows):
+        lines.append("\t".join(format_value(table[name][i]) for name in names))
+    return lines
+
+
+def parse_arguments(argv=None):
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument(
+        "-i",
+        "--input",
+        required=True,
+        type=str,
+        help="Set the input file for reading the profile results",
+    )
+
+    parser.add_argument(
+        "-b",
+        "--baseline",
+        required=False,
+        type=str,
+        default=None,
+        help="Profile results to compare with. When it is not specified, output latency statistics of the input.",
+    )
+
+    parser.add_argument(
+        "-g",
+        "--group_by",
+        required=False,
+        nargs="*",
+        choices=KEY_COLUMNS,
+        default=["node"],
+        help="Columns to group by. Default is node.",
+    )
+
+    parser.add_argument(
+        "-p",
+        "--percentiles",
+        required=False,
+        nargs="+",
+        type=float,
+        default=list(DEFAULT_PERCENTILES),
+        help="Percentiles of latency to compute. Default is 50 90 99.",
+    )
+
+    parser.add_argument(
+        "-s",
+        "--sort_by",
+        required=False,
+        type=str,
+        default=None,
+        help="Statistic (like count, mean or p99) to sort the comparison by its change. Default is the last percentile.",
+    )
+
+    parser.add_argument(
+        "-t",
+        "--top",
+        required=False,
+        type=int,
+        default=0,
+        help="Maximum number of rows to output. Default is 0, which means all rows.",
+    )
+
+    return parser.parse_args(argv)
+
+
+def process_results(args):
+    store = ProfileStore.from_file(args.input)
+    if args.baseline:
+        table = store.diff(ProfileStore.from_file(args.baseline), args.group_by, args.percentiles, args.sort_by)
+    else:
+        table = store.group_by(args.group_by, args.percentiles)
+    return format_table(table, args.top)
+
+
+if __name__ == "__main__":
+    arguments = parse_arguments()
+    for line in process_results(arguments):
+        print(line)
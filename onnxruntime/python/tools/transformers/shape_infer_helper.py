@@ -3,10 +3,17 @@
 # Licensed under the MIT License.
 # --------------------------------------------------------------------------
 
+import hashlib
+import json
 import logging
 import os
 import sys
-from typing import Dict
+import tempfile
+from functools import lru_cache
+from typing import Dict, Optional
+
+import onnx
+from onnx import AttributeProto, ModelProto, TensorProto
 
 # In ORT Package the symbolic_shape_infer.py is in ../tools
 file_path = os.path.dirname(__file__)
@@ -19,14 +26,139 @@ from symbolic_shape_infer import SymbolicShapeInference, get_shape_from_type_pro
 
 logger = logging.getLogger(__name__)
 
+# Directory of the on-disk shape inference cache, used when no cache directory is given explicitly.
+SHAPE_INFER_CACHE_DIR_ENV = "ORT_SHAPE_INFER_CACHE_DIR"
+
+# Values of integer initializers up to this number of elements are part of the cache key, since they might be shapes,
+# axes or indices used in shape inference. Other initializers only contribute name, data type and dims.
+MAX_HASHED_INITIALIZER_SIZE = 1024
+
+
+@lru_cache(maxsize=None)
+def _get_source_digest() -> str:
+    """Digest of the shape inference source code, so that cache entries are invalidated when the code changes."""
+    sha = hashlib.sha256()
+    for module in [sys.modules[SymbolicShapeInference.__module__], sys.modules[__name__]]:
+        with open(module.__file__, "rb") as f:
+            sha.update(f.read())
+    return sha.hexdigest()
+
+
+class ShapeInferenceCache:
+    """On-disk cache of symbolic shape inference results.
+
+    An entry is keyed by the structure of the main graph (nodes, inputs, outputs, value infos, and name, data type and
+    dims of initializers, plus values of small integer initializers), opset imports, inference settings (like dynamic
+    axis mapping), and versions of onnx and the shape inference code, so one directory can be shared by processes that
+    optimize the same model in different configurations. Weights are not hashed, so the key is cheap to compute for
+    large models. An entry is a model file that only has value infos in its graph.
+    """
+
+    def __init__(self, cache_dir: str):
+        self.cache_dir = cache_dir
+
+    @staticmethod
+    def create(cache_dir: Optional[str] = None):
+        """Create a cache for the given directory, or the directory in ORT_SHAPE_INFER_CACHE_DIR environment variable.
+
+        Returns:
+            Optional[ShapeInferenceCache]: the cache, or None if no cache directory is specified.
+        """
+        cache_dir = cache_dir or os.environ.get(SHAPE_INFER_CACHE_DIR_ENV)
+        return ShapeInferenceCache(cache_dir) if cache_dir else None
+
+    @staticmethod
+    def _get_initializer_bytes(initializer: TensorProto) -> bytes:
+        size = 1
+        for dim in initializer.dims:
+            size *= dim
+        if initializer.data_type in [TensorProto.INT64, TensorProto.INT32] and size <= MAX_HASHED_INITIALIZER_SIZE:
+            return initializer.SerializeToString(deterministic=True)
+        header = TensorProto(name=initializer.name, data_type=initializer.data_type, dims=initializer.dims)
+        return header.SerializeToString(deterministic=True)
+
+    def get_key(self, model: ModelProto, **settings) -> Optional[str]:
+        graph = model.graph
+        sha = hashlib.sha256()
+
+        def update(items):
+            # Lengths are hashed too, so that bytes cannot move between items or fields without changing the key.
+            sha.update(len(items).to_bytes(8, "little"))
+            for item in items:
+                sha.update(len(item).to_bytes(8, "little"))
+                sha.update(item)
+
+        try:
+            for field in [graph.node, graph.input, graph.output, graph.value_info]:
+                update([item.SerializeToString(deterministic=True) for item in field])
+        except Exception:
+            # a node (like Constant) is too large to be serialized.
+            return None
+        update([self._get_initializer_bytes(initializer) for initializer in graph.initializer])
+        update(
+            [
+                self._get_initializer_bytes(sparse_initializer.values)
+                + TensorProto(dims=sparse_initializer.dims).SerializeToString()
+                for sparse_initializer in graph.sparse_initializer
+            ]
+        )
+        context = {
+            "opset_import": sorted((opset.domain, opset.version) for opset in model.opset_import),
+            "onnx": onnx.__version__,
+            "source": _get_source_digest(),
+            "settings": settings,
+        }
+        sha.update(json.dumps(context, sort_keys=True).encode())
+        return sha.hexdigest()
+
+    def _get_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key + ".onnx")
+
+    def load(self, key: str) -> Optional[ModelProto]:
+        path = self._get_path(key)
+        if not os.path.exists(path):
+            return None
+        try:
+            return onnx.load_model(path)
+        except Exception:
+            logger.warning(f"Ignore shape inference cache entry that cannot be loaded: {path}")
+            return None
+
+    def save(self, key: str, entry: ModelProto):
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            # write to a temporary file first, so that other processes never read a partial entry.
+            with tempfile.NamedTemporaryFile(dir=self.cache_dir, suffix=".tmp", delete=False) as f:
+                f.write(entry.SerializeToString())
+            os.replace(f.name, self._get_path(key))
+        except OSError as e:
+            logger.warning(f"Failed to save shape inference cache entry to {self.cache_dir}: {e}")
+
+
+def _has_subgraph(model: ModelProto) -> bool:
+    return any(
+        attr.type in [AttributeProto.GRAPH, AttributeProto.GRAPHS]
+        for node in model.graph.node
+        for attr in node.attribute
+    )
+
 
 class SymbolicShapeInferenceHelper(SymbolicShapeInference):
-    def __init__(self, model, verbose=0, int_max=2**31 - 1, auto_merge=True, guess_output_rank=False):
+    def __init__(
+        self,
+        model,
+        verbose=0,
+        int_max=2**31 - 1,
+        auto_merge=True,
+        guess_output_rank=False,
+        cache_dir: Optional[str] = None,
+    ):
         super().__init__(int_max, auto_merge, guess_output_rank, verbose)
         self.model_ = model
         self.all_shapes_inferred_: bool = False
         self.is_inferred_: bool = False
         self.dynamic_axis_mapping_: Dict[str, int] = {}
+        self.cache_: Optional[ShapeInferenceCache] = ShapeInferenceCache.create(cache_dir)
 
     def infer(self, dynamic_axis_mapping: Dict[str, int], max_runs: int = 128):
         """Run shape inference, and try replace dynamic axis from string to integer when mapping is provided.
@@ -45,6 +177,25 @@ class SymbolicShapeInferenceHelper(SymbolicShapeInference):
 
         self.dynamic_axis_mapping_ = dynamic_axis_mapping
 
+        cache_key = None
+        if self.cache_ is not None:
+            cache_key = self.cache_.get_key(
+                self.model_,
+                int_max=self.int_max_,
+                auto_merge=self.auto_merge_,
+                guess_output_rank=self.guess_output_rank_,
+                dynamic_axis_mapping=dynamic_axis_mapping,
+                max_runs=max_runs,
+            )
+            entry = self.cache_.load(cache_key) if cache_key else None
+            if entry is not None:
+                self.known_vi_ = {vi.name: vi for vi in entry.graph.value_info}
+                self.all_shapes_inferred_ = any(
+                    prop.key == "all_shapes_inferred" and prop.value == "1" for prop in entry.metadata_props
+                )
+                self.is_inferred_ = True
+                return self.all_shapes_inferred_
+
         self._preprocess(self.model_)
 
         count = 0
@@ -56,8 +207,56 @@ class SymbolicShapeInferenceHelper(SymbolicShapeInference):
                 break
 
         self.is_inferred_ = True
+
+        if cache_key:
+            entry = ModelProto()
+            entry.graph.value_info.extend(self.known_vi_.values())
+            onnx.helper.set_model_props(entry, {"all_shapes_inferred": "1" if self.all_shapes_inferred_ else "0"})
+            self.cache_.save(cache_key, entry)
+
         return self.all_shapes_inferred_
 
+    @staticmethod
+    def infer_shapes(
+        in_mp,
+        int_max=2**31 - 1,
+        auto_merge=False,
+        guess_output_rank=False,
+        verbose=0,
+        onnx_infer_batch_size=1,
+        cache_dir: Optional[str] = None,
+    ):
+        """Same as SymbolicShapeInference.infer_shapes, and use the on-disk cache when a cache directory is given
+        by cache_dir or ORT_SHAPE_INFER_CACHE_DIR environment variable. Models with subgraphs are not cached.
+        """
+        cache = ShapeInferenceCache.create(cache_dir)
+        cache_key = None
+        if cache is not None and not _has_subgraph(in_mp):
+            cache_key = cache.get_key(
+                in_mp, int_max=int_max, auto_merge=auto_merge, guess_output_rank=guess_output_rank
+            )
+
+        entry = cache.load(cache_key) if cache_key else None
+        if entry is not None:
+            out_mp = ModelProto()
+            out_mp.CopyFrom(in_mp)
+            for field in ["input", "output", "value_info"]:
+                out_mp.graph.ClearField(field)
+                getattr(out_mp.graph, field).extend(getattr(entry.graph, field))
+            return out_mp
+
+        out_mp = SymbolicShapeInference.infer_shapes(
+            in_mp, int_max, auto_merge, guess_output_rank, verbose, onnx_infer_batch_size
+        )
+
+        if cache_key and out_mp is not None:
+            entry = ModelProto()
+            for field in ["input", "output", "value_info"]:
+                getattr(entry.graph, field).extend(getattr(out_mp.graph, field))
+            cache.save(cache_key, entry)
+
+        return out_mp
+
     def _get_sympy_shape(self, node, idx):
         """Override it to ensure shape inference by giving the actual value of dynamic axis."""
         sympy_shape = []
@@ -650,6 +650,53 @@ class TestInferenceSession(unittest.TestCase):
         output_expected = np.array([[5.0], [11.0], [17.0]], dtype=np.float32)
         np.testing.assert_allclose(output_expected, res[0], rtol=1e-05, atol=1e-08)
 
+    def testPreparedRun(self):  # noqa: N802
+        sess = onnxrt.InferenceSession(get_name("mul_1.onnx"), providers=["CPUExecutionProvider"])
+        prepared_run = sess.prepare_run()
+        self.assertEqual(prepared_run.get_input_names(), ["X"])
+        self.assertEqual(prepared_run.get_output_names(), ["Y"])
+
+        x = np.array([[1.0, 2.0], [3.0, 4.0], [5.0, 6.0]], dtype=np.float32)
+        res = prepared_run.run(x)
+        output_expected = np.array([[1.0, 4.0], [9.0, 16.0], [25.0, 36.0]], dtype=np.float32)
+        np.testing.assert_allclose(output_expected, res[0], rtol=1e-05, atol=1e-08)
+
+        # Outputs of a previous run are not overwritten. Non contiguous inputs are supported.
+        x2 = np.array([[1.0, 3.0, 5.0], [2.0, 4.0, 6.0]], dtype=np.float32).T + 1
+        res2 = prepared_run.run(x2)
+        np.testing.assert_allclose(output_expected, res[0], rtol=1e-05, atol=1e-08)
+        np.testing.assert_allclose(sess.run(["Y"], {"X": x2})[0], res2[0], rtol=1e-05, atol=1e-08)
+
+        # Inputs are bound without copy, and converted to the element type of the input when needed.
+        x3 = x.copy()
+        prepared_run.run(x3)
+        x3 += 1
+        np.testing.assert_allclose(res2[0], prepared_run.run(x3)[0], rtol=1e-05, atol=1e-08)
+        np.testing.assert_allclose(output_expected, prepared_run.run(x.astype(np.float64))[0], rtol=1e-05, atol=1e-08)
+        ortvalue = onnxrt.OrtValue.ortvalue_from_numpy(x)
+        np.testing.assert_allclose(output_expected, prepared_run.run(ortvalue)[0], rtol=1e-05, atol=1e-08)
+
+        with self.assertRaises(TypeError):
+            prepared_run.run(x.tolist())
+        with self.assertRaises(ValueError):
+            prepared_run.run(x, x)
+        with self.assertRaises(ValueError):
+            sess.prepare_run(["Z"])
+        with self.assertRaises(ValueError):
+            sess.prepare_run(output_names=["Z"])
+
+        sess = onnxrt.InferenceSession(get_name("logicaland.onnx"), providers=["CPUExecutionProvider"])
+        with self.assertRaises(ValueError):
+            sess.prepare_run(["input:0"])
+
+    def testPreparedRunSymbolicInput(self):  # noqa: N802
+        sess = onnxrt.InferenceSession(get_name("matmul_2.onnx"), providers=["CPUExecutionProvider"])
+        prepared_run = sess.prepare_run(["X"], ["Y"])
+        x = np.array([[1.0, 2.0], [3.0, 4.0], [5.0, 6.0]], dtype=np.float32)
+        for batch_size in [3, 1, 2, 3]:
+            res = prepared_run.run(x[:batch_size])
+            np.testing.assert_allclose(res[0], sess.run(["Y"], {"X": x[:batch_size]})[0], rtol=1e-05, atol=1e-08)
+
     def testBooleanInputs(self):  # noqa: N802
         sess = onnxrt.InferenceSession(get_name("logicaland.onnx"), providers=available_providers)
         a = np.array([[True, True], [False, False]], dtype=bool)
@@ -1166,6 +1213,33 @@ class TestInferenceSession(unittest.TestCase):
             # The constructed OrtValue should still be valid after being used in a session
             self.assertTrue(np.array_equal(ortvalue2.numpy(), numpy_arr_input))
 
+    @unittest.skipIf(not hasattr(np, "from_dlpack"), "DLPack requires numpy >= 1.22")
+    def testOrtValueDlpack(self):  # noqa: N802
+        numpy_arr_input = np.array([[1.0, 2.0], [3.0, 4.0], [5.0, 6.0]], dtype=np.float32)
+
+        # Buffers are shared with the consumer of DLPack, and they are kept alive by the consumer.
+        ortvalue = onnxrt.OrtValue.from_dlpack(numpy_arr_input)
+        self.assertEqual(ortvalue.data_ptr(), numpy_arr_input.ctypes.data)
+        self.assertEqual(ortvalue.__dlpack_device__(), (1, 0))
+        shared = np.from_dlpack(ortvalue)
+        self.assertEqual(shared.ctypes.data, numpy_arr_input.ctypes.data)
+
+        sess = onnxrt.InferenceSession(get_name("mul_1.onnx"), providers=["CPUExecutionProvider"])
+        io_binding = sess.io_binding()
+        io_binding.bind_ortvalue_input("X", ortvalue)
+        io_binding.bind_output("Y")
+        sess.run_with_iobinding(io_binding)
+        output = io_binding.get_outputs()[0]
+        output_ptr = output.data_ptr()
+        shared_output = np.from_dlpack(onnxrt.OrtValue.from_dlpack(output.to_dlpack()))
+        del ortvalue, output, io_binding
+        gc.collect()
+        self.assertEqual(shared_output.ctypes.data, output_ptr)
+        np.testing.assert_array_equal(shared_output, numpy_arr_input * numpy_arr_input)
+
+        for value in [np.array([True, False]), np.zeros((0, 3), dtype=np.int64)]:
+            np.testing.assert_array_equal(np.from_dlpack(onnxrt.OrtValue.ortvalue_from_numpy(value)), value)
+
     def testOrtValue_ghIssue9799(self):  # noqa: N802
         if "CUDAExecutionProvider" in onnxrt.get_available_providers():
             session = onnxrt.InferenceSession(
@@ -7,6 +7,7 @@ import unittest
 import numpy as np
 from helper import get_name
 from numpy.testing import assert_allclose
+from onnx import TensorProto, helper
 
 import onnxruntime as onnxrt
 import onnxruntime.backend as backend
@@ -53,6 +54,86 @@ class TestBackend(unittest.TestCase):
         session_run_results = sess.run(["outp1"], {"inp0": inp0, "inp1": inp1}, run_options)
         assert_allclose(session_run_results[0], -(inp0 - inp1))
 
+    def testSessionCache(self):  # noqa: N802
+        name = get_name("mul_1.onnx")
+        model = helper.make_model(
+            helper.make_graph(
+                [helper.make_node("Mul", ["X", "X"], ["Y"])],
+                "square",
+                [helper.make_tensor_value_info("X", TensorProto.FLOAT, [3, 2])],
+                [helper.make_tensor_value_info("Y", TensorProto.FLOAT, [3, 2])],
+            ),
+            opset_imports=[helper.make_opsetid("", 13)],
+        )
+        other_name = get_name("alloc_tensor_reuse.onnx")
+        x = np.array([[1.0, 2.0], [3.0, 4.0], [5.0, 6.0]], dtype=np.float32)
+
+        self.assertIsNot(backend.prepare(name), backend.prepare(name))
+
+        backend.set_session_cache_size(2)
+        try:
+            rep = backend.prepare(name)
+            self.assertIs(backend.prepare(name), rep)
+            self.assertIsNot(backend.prepare(name, intra_op_num_threads=1), rep)
+
+            model_rep = backend.prepare(model)
+            self.assertIs(backend.prepare(model), model_rep)
+            self.assertIs(backend.prepare(model.SerializeToString()), model_rep)
+            np.testing.assert_allclose(backend.run(model, x)[0], x * x)
+
+            # The least recently used entry is evicted.
+            backend.prepare(other_name)
+            self.assertIs(backend.prepare(model), model_rep)
+            self.assertIsNot(backend.prepare(name), rep)
+
+            backend.clear_session_cache(model)
+            self.assertIsNot(backend.prepare(model), model_rep)
+        finally:
+            backend.set_session_cache_size(0)
+
+        self.assertIsNot(backend.prepare(model), backend.prepare(model))
+
+    def testRunNode(self):  # noqa: N802
+        from onnxruntime.backend.backend import OnnxRuntimeBackend
+
+        backend.clear_session_cache()
+        x = np.array([[1.0, 2.0], [3.0, 4.0], [5.0, 6.0]], dtype=np.float32)
+
+        node = helper.make_node("Mul", ["X", "X"], ["Y"], name="square")
+        np.testing.assert_allclose(OnnxRuntimeBackend.run_node(node, [x, x])[0], x * x)
+        # Nodes with same signature share the session, regardless of names and input shapes.
+        node = helper.make_node("Mul", ["A", "A"], ["B"])
+        np.testing.assert_allclose(OnnxRuntimeBackend.run_node(node, {"A": x[:2]})[0], x[:2] * x[:2])
+        self.assertEqual(len(OnnxRuntimeBackend._node_session_cache), 1)
+
+        # Different element type, rank or attributes need another session.
+        np.testing.assert_array_equal(OnnxRuntimeBackend.run_node(node, [x.astype(np.int64)] * 2)[0], x * x)
+        np.testing.assert_allclose(OnnxRuntimeBackend.run_node(node, [x[0], x[0]])[0], x[0] * x[0])
+        node = helper.make_node("Transpose", ["X"], ["Y"], perm=[1, 0])
+        np.testing.assert_allclose(OnnxRuntimeBackend.run_node(node, [x])[0], x.T)
+        self.assertEqual(len(OnnxRuntimeBackend._node_session_cache), 4)
+
+        # Optional inputs and outputs are skipped.
+        node = helper.make_node("Clip", ["X", "", "max"], ["Y"])
+        np.testing.assert_allclose(
+            OnnxRuntimeBackend.run_node(node, [x, np.array(2.5, np.float32)])[0], x.clip(max=2.5)
+        )
+        node = helper.make_node("LayerNormalization", ["X", "scale"], ["Y", "", "inv_std_dev"], epsilon=0.0)
+        outputs = OnnxRuntimeBackend.run_node(node, [x, np.ones(2, np.float32)])
+        self.assertEqual(len(outputs), 2)
+        np.testing.assert_allclose(outputs[1], np.ones((3, 1), np.float32) * 2)
+
+        # Resize needs the static length of sizes.
+        node = helper.make_node("Resize", ["X", "", "", "sizes"], ["Y"], mode="nearest")
+        sizes = np.array([6, 4], dtype=np.int64)
+        np.testing.assert_allclose(OnnxRuntimeBackend.run_node(node, [x, sizes])[0], x.repeat(2, 0).repeat(2, 1))
+
+        with self.assertRaises(ValueError):
+            OnnxRuntimeBackend.run_node(node, [x])
+
+        backend.clear_session_cache()
+        self.assertEqual(len(OnnxRuntimeBackend._node_session_cache), 0)
+
 
 if __name__ == "__main__":
     unittest.main(module=__name__, buffer=True)
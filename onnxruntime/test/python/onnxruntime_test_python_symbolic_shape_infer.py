@@ -105,6 +105,88 @@ class TestSymbolicShapeInference(unittest.TestCase):
         with self.assertRaisesRegex(ValueError, r"if_node.*FLOAT.*DOUBLE"):
             SymbolicShapeInference.infer_shapes(model, auto_merge=True)
 
+    def test_unsorted_nodes(self):
+        # chain of Unsqueeze nodes in reverse order, and a dead Relu node before them
+        num_nodes = 5
+        nodes = [helper.make_node("Relu", [f"x{num_nodes}"], ["dead"], name="relu")]
+        nodes.extend(
+            helper.make_node("Unsqueeze", [f"x{i}", "axes"], [f"x{i + 1}"], name=f"unsqueeze{i}")
+            for i in reversed(range(num_nodes))
+        )
+        graph = helper.make_graph(
+            nodes,
+            "graph",
+            [helper.make_tensor_value_info("x0", TensorProto.FLOAT, ["batch"])],
+            [helper.make_tensor_value_info(f"x{num_nodes}", TensorProto.FLOAT, None)],
+            [numpy_helper.from_array(numpy.array([0], dtype=numpy.int64), "axes")],
+        )
+        model = SymbolicShapeInference.infer_shapes(helper.make_model(graph))
+        output_dims = unique_element(model.graph.output).type.tensor_type.shape.dim
+        self.assertEqual([dim.dim_value for dim in output_dims[:num_nodes]], [1] * num_nodes)
+        self.assertEqual(output_dims[num_nodes].dim_param, "batch")
+        # sort stops once graph outputs are known, so the dead node is not visited.
+        self.assertEqual([vi.name for vi in model.graph.value_info], [f"x{i + 1}" for i in range(num_nodes)])
+
+        # the dead node is visited when it is after the node producing its input.
+        graph.node.append(graph.node.pop(0))
+        model = SymbolicShapeInference.infer_shapes(helper.make_model(graph))
+        self.assertEqual(len(model.graph.value_info), num_nodes + 1)
+
+    def test_cyclic_graph(self):
+        graph = helper.make_graph(
+            [
+                helper.make_node("Add", ["x", "b"], ["a"], name="add0"),
+                helper.make_node("Add", ["x", "a"], ["b"], name="add1"),
+            ],
+            "graph",
+            [helper.make_tensor_value_info("x", TensorProto.FLOAT, [1])],
+            [helper.make_tensor_value_info("b", TensorProto.FLOAT, None)],
+        )
+        with self.assertRaisesRegex(Exception, "cyclic"):
+            SymbolicShapeInference.infer_shapes(helper.make_model(graph))
+
+    def test_onnx_infer_batch(self):
+        # Reshape output is refined by symbolic inference, Constant value is only visible to onnx inference in a batch,
+        # and axes is passed as initializer to Unsqueeze but not to Cast.
+        graph = helper.make_graph(
+            [
+                helper.make_node("Shape", ["x"], ["shape"], name="shape"),
+                helper.make_node("Gather", ["shape", "zero"], ["batch"], name="gather"),
+                helper.make_node("Unsqueeze", ["batch", "axes"], ["batch_1d"], name="unsqueeze"),
+                helper.make_node("Cast", ["axes"], ["axes_float"], to=TensorProto.FLOAT, name="cast"),
+                helper.make_node("Concat", ["batch_1d", "minus_one"], ["new_shape"], axis=0, name="concat"),
+                helper.make_node("Reshape", ["x", "new_shape"], ["reshaped"], name="reshape"),
+                helper.make_node("Relu", ["reshaped"], ["relu"], name="relu"),
+                helper.make_node("MatMul", ["relu", "y"], ["matmul"], name="matmul"),
+                helper.make_node(
+                    "Constant", [], ["const_shape"], value=numpy_helper.from_array(numpy.array([-1])), name="const"
+                ),
+                helper.make_node("Reshape", ["matmul", "const_shape"], ["output"], name="flatten"),
+            ],
+            "graph",
+            [
+                helper.make_tensor_value_info("x", TensorProto.FLOAT, ["batch", 4, 8]),
+                helper.make_tensor_value_info("y", TensorProto.FLOAT, [32, "n"]),
+            ],
+            [
+                helper.make_tensor_value_info("output", TensorProto.FLOAT, None),
+                helper.make_tensor_value_info("axes_float", TensorProto.FLOAT, None),
+            ],
+            [
+                numpy_helper.from_array(numpy.array(0, dtype=numpy.int64), "zero"),
+                numpy_helper.from_array(numpy.array([0], dtype=numpy.int64), "axes"),
+                numpy_helper.from_array(numpy.array([-1], dtype=numpy.int64), "minus_one"),
+            ],
+        )
+        model = helper.make_model(graph, opset_imports=[helper.make_opsetid("", 13)])
+        expected = SymbolicShapeInference.infer_shapes(model)
+        for onnx_infer_batch_size in [2, 16]:
+            inferred = SymbolicShapeInference.infer_shapes(model, onnx_infer_batch_size=onnx_infer_batch_size)
+            self.assertEqual(inferred.graph.value_info, expected.graph.value_info)
+            self.assertEqual(inferred.graph.output, expected.graph.output)
+        output_dims = expected.graph.output[0].type.tensor_type.shape.dim
+        self.assertEqual([dim.dim_param for dim in output_dims], ["batch*n"])
+
 
 class TestSymbolicShapeInferenceForOperators(unittest.TestCase):
     def _check_shapes(self, graph, inferred_graph, vis):  # type: (GraphProto, GraphProto, List[ValueInfoProto]) -> None
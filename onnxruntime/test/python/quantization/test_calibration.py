@@ -6,6 +6,7 @@
 # --------------------------------------------------------------------------
 
 import tempfile
+import time
 import unittest
 from pathlib import Path
 
@@ -14,7 +15,14 @@ import onnx
 from onnx import TensorProto, helper, numpy_helper
 
 import onnxruntime
-from onnxruntime.quantization.calibrate import CalibrationDataReader, create_calibrator
+from onnxruntime.quantization.calibrate import (
+    CalibrationDataReader,
+    CalibrationMethod,
+    HistogramCollector,
+    StreamingHistogramCollector,
+    create_calibrator,
+)
+from onnxruntime.quantization.quant_utils import smooth_distribution
 
 
 def generate_input_initializer(tensor_shape, tensor_dtype, input_name):
@@ -357,6 +365,262 @@ class TestCalibrateMinMaxCalibrator(unittest.TestCase):
         for output_name in output_min_max_dict:
             self.assertEqual(output_min_max_dict[output_name], tensors_range[output_name])
 
+    def test_compute_range_streaming(self):
+        test_model_path = Path(self._tmp_model_dir.name).joinpath("./test_model_4_streaming.onnx")
+        self.construct_test_compute_range_model(test_model_path.as_posix())
+        data_reader = TestDataReader()
+
+        for moving_average in [False, True]:
+            tensors_ranges = []
+            for streaming in [False, True]:
+                augmented_model_path = Path(self._tmp_model_dir.name).joinpath(
+                    f"./augmented_test_model_4_{moving_average}_{streaming}.onnx"
+                )
+                calibrater = create_calibrator(
+                    test_model_path,
+                    augmented_model_path=augmented_model_path.as_posix(),
+                    extra_options={"moving_average": moving_average, "streaming": streaming},
+                )
+                data_reader.rewind()
+                calibrater.collect_data(data_reader)
+                tensors_ranges.append(calibrater.compute_range())
+                self.assertEqual(len(calibrater.intermediate_outputs), 0)
+
+            buffered_range, streamed_range = tensors_ranges
+            self.assertEqual(buffered_range.keys(), streamed_range.keys())
+            for tensor_name, (rmin, rmax) in buffered_range.items():
+                self.assertAlmostEqual(rmin, streamed_range[tensor_name][0], places=6)
+                self.assertAlmostEqual(rmax, streamed_range[tensor_name][1], places=6)
+
+    def test_compute_range_streaming_histogram(self):
+        test_model_path = Path(self._tmp_model_dir.name).joinpath("./test_model_4_streaming_histogram.onnx")
+        self.construct_test_compute_range_model(test_model_path.as_posix())
+        data_reader = TestDataReader()
+
+        for calibrate_method in [CalibrationMethod.Entropy, CalibrationMethod.Percentile]:
+            augmented_model_path = Path(self._tmp_model_dir.name).joinpath(
+                f"./augmented_test_model_4_streaming_{calibrate_method.name}.onnx"
+            )
+            calibrater = create_calibrator(
+                test_model_path,
+                augmented_model_path=augmented_model_path.as_posix(),
+                calibrate_method=calibrate_method,
+                extra_options={"streaming": True},
+            )
+            data_reader.rewind()
+            calibrater.collect_data(data_reader)
+            tensors_range = calibrater.compute_range()
+
+            self.assertIsInstance(calibrater.collector, StreamingHistogramCollector)
+            self.assertEqual(len(calibrater.intermediate_outputs), 0)
+            self.assertEqual(set(tensors_range.keys()), calibrater.tensors_to_calibrate)
+            for rmin, rmax in tensors_range.values():
+                self.assertLessEqual(rmin, rmax)
+
+    def test_compute_range_parallel(self):
+        test_model_path = Path(self._tmp_model_dir.name).joinpath("./test_model_4_parallel.onnx")
+        self.construct_test_compute_range_model(test_model_path.as_posix())
+        data_reader = TestDataReader()
+
+        for moving_average, streaming in [(False, False), (True, False), (True, True)]:
+            tensors_ranges = []
+            for num_workers in [1, 3]:
+                augmented_model_path = Path(self._tmp_model_dir.name).joinpath(
+                    f"./augmented_test_model_4_{moving_average}_{streaming}_{num_workers}.onnx"
+                )
+                calibrater = create_calibrator(
+                    test_model_path,
+                    augmented_model_path=augmented_model_path.as_posix(),
+                    extra_options={
+                        "moving_average": moving_average,
+                        "streaming": streaming,
+                        "num_workers": num_workers,
+                    },
+                )
+                data_reader.rewind()
+                calibrater.collect_data(data_reader)
+                tensors_ranges.append(calibrater.compute_range())
+
+            if moving_average:
+                # the workers sum their batches separately, so the averages may differ by rounding
+                self.assertEqual(tensors_ranges[0].keys(), tensors_ranges[1].keys())
+                for tensor, tensor_range in tensors_ranges[0].items():
+                    np.testing.assert_allclose(tensor_range, tensors_ranges[1][tensor], rtol=1e-6)
+            else:
+                self.assertEqual(tensors_ranges[0], tensors_ranges[1])
+                min_max_range = tensors_ranges[0]
+
+        # the workers send back their accumulators every checkpoint_interval batches to save a checkpoint
+        checkpoint_path = Path(self._tmp_model_dir.name).joinpath("./test_model_4_parallel.npz")
+        calibrater = create_calibrator(
+            test_model_path,
+            augmented_model_path=Path(self._tmp_model_dir.name).joinpath("./augmented_test_model_4_ckpt.onnx"),
+            extra_options={"num_workers": 3, "checkpoint_path": checkpoint_path, "checkpoint_interval": 2},
+        )
+        saved_num_batches = []
+        save_state = calibrater.save_state
+
+        def save_state_and_count(path):
+            saved_num_batches.append(calibrater.num_streamed_batches)
+            save_state(path)
+
+        calibrater.save_state = save_state_and_count
+        data_reader.rewind()
+        calibrater.collect_data(data_reader)
+        self.assertEqual(saved_num_batches, [2, 4, 0])
+        self.assertEqual(calibrater.compute_range(), min_max_range)
+
+    def test_compute_range_parallel_reader_error(self):
+        test_model_path = Path(self._tmp_model_dir.name).joinpath("./test_model_4_parallel_error.onnx")
+        self.construct_test_compute_range_model(test_model_path.as_posix())
+        calibrater = create_calibrator(
+            test_model_path,
+            augmented_model_path=Path(self._tmp_model_dir.name).joinpath("./augmented_test_model_4_error.onnx"),
+            extra_options={"num_workers": 2},
+        )
+        data_reader = TestDataReader()
+        batches = [data_reader.get_next()]
+
+        def get_next():
+            if not batches:
+                raise ValueError("failed to read")
+            return batches.pop()
+
+        data_reader.get_next = get_next
+        # the workers waiting for batches are stopped instead of being joined with a timeout
+        start = time.monotonic()
+        with self.assertRaises(ValueError):
+            calibrater.collect_data(data_reader)
+        self.assertLess(time.monotonic() - start, 10)
+
+    def test_compute_range_parallel_histogram(self):
+        test_model_path = Path(self._tmp_model_dir.name).joinpath("./test_model_4_parallel_histogram.onnx")
+        self.construct_test_compute_range_model(test_model_path.as_posix())
+        data_reader = TestDataReader()
+
+        for calibrate_method in [CalibrationMethod.Entropy, CalibrationMethod.Percentile]:
+            tensors_ranges = []
+            histogram_dicts = []
+            # a serial streaming run, then twice the same parallel run
+            for run, num_workers in enumerate([1, 2, 2]):
+                augmented_model_path = Path(self._tmp_model_dir.name).joinpath(
+                    f"./augmented_test_model_4_parallel_{calibrate_method.name}_{run}.onnx"
+                )
+                calibrater = create_calibrator(
+                    test_model_path,
+                    augmented_model_path=augmented_model_path.as_posix(),
+                    calibrate_method=calibrate_method,
+                    extra_options={"streaming": True, "num_workers": num_workers},
+                )
+                data_reader.rewind()
+                calibrater.collect_data(data_reader)
+                tensors_ranges.append(calibrater.compute_range())
+                histogram_dicts.append(calibrater.collector.get_histogram_dict())
+
+            self.assertEqual(tensors_ranges[1], tensors_ranges[2])
+            self.assertEqual(set(tensors_ranges[1].keys()), calibrater.tensors_to_calibrate)
+            for tensor, histogram in histogram_dicts[0].items():
+                # the workers share the bins laid out by the first batch, so no count is moved between bins
+                np.testing.assert_array_equal(histogram[0], histogram_dicts[1][tensor][0])
+                np.testing.assert_allclose(histogram[1], histogram_dicts[1][tensor][1])
+                self.assertEqual(histogram[2:4], histogram_dicts[1][tensor][2:4])
+
+    def test_compute_range_checkpoint(self):
+        test_model_path = Path(self._tmp_model_dir.name).joinpath("./test_model_4_checkpoint.onnx")
+        self.construct_test_compute_range_model(test_model_path.as_posix())
+        data_reader = TestDataReader()
+
+        class InterruptedDataReader(CalibrationDataReader):
+            def __init__(self, data_reader, num_batches):
+                self.data_reader = data_reader
+                self.num_batches = num_batches
+
+            def get_next(self):
+                if self.num_batches == 0:
+                    raise RuntimeError("interrupted")
+                self.num_batches -= 1
+                return self.data_reader.get_next()
+
+        for calibrate_method in [CalibrationMethod.MinMax, CalibrationMethod.Entropy, CalibrationMethod.Percentile]:
+            checkpoint_path = Path(self._tmp_model_dir.name).joinpath(f"./checkpoint_{calibrate_method.name}.npz")
+            augmented_model_path = Path(self._tmp_model_dir.name).joinpath(
+                f"./augmented_test_model_4_checkpoint_{calibrate_method.name}.onnx"
+            )
+            extra_options = {"checkpoint_path": checkpoint_path.as_posix(), "checkpoint_interval": 1}
+
+            calibrater = create_calibrator(
+                test_model_path,
+                augmented_model_path=augmented_model_path.as_posix(),
+                calibrate_method=calibrate_method,
+                extra_options=extra_options,
+            )
+            data_reader.rewind()
+            calibrater.collect_data(data_reader)
+            expected_range = calibrater.compute_range()
+
+            calibrater = create_calibrator(
+                test_model_path,
+                augmented_model_path=augmented_model_path.as_posix(),
+                calibrate_method=calibrate_method,
+                extra_options=extra_options,
+            )
+            data_reader.rewind()
+            with self.assertRaises(RuntimeError):
+                calibrater.collect_data(InterruptedDataReader(data_reader, 2))
+
+            calibrater = create_calibrator(
+                test_model_path,
+                augmented_model_path=augmented_model_path.as_posix(),
+                calibrate_method=calibrate_method,
+                extra_options={**extra_options, "resume_from_checkpoint": True},
+            )
+            self.assertEqual(calibrater.num_batches_to_skip, 2)
+            data_reader.rewind()
+            calibrater.collect_data(data_reader)
+            self.assertEqual(calibrater.compute_range(), expected_range)
+
+    def test_compute_range_checkpoint_add_data(self):
+        test_model_path = Path(self._tmp_model_dir.name).joinpath("./test_model_4_checkpoint_add_data.onnx")
+        self.construct_test_compute_range_model(test_model_path.as_posix())
+        data_reader = TestDataReader()
+        new_data_reader = TestDataReader()
+        checkpoint_path = Path(self._tmp_model_dir.name).joinpath("./checkpoint_add_data.npz")
+        augmented_model_path = Path(self._tmp_model_dir.name).joinpath(
+            "./augmented_test_model_4_checkpoint_add_data.onnx"
+        )
+
+        calibrater = create_calibrator(test_model_path, augmented_model_path=augmented_model_path.as_posix())
+        calibrater.collect_data(data_reader)
+        calibrater.collect_data(new_data_reader)
+        expected_range = calibrater.compute_range()
+
+        # calibrate on the first data reader only, then add the second one to the saved ranges
+        data_reader.rewind()
+        new_data_reader.rewind()
+        extra_options = {"checkpoint_path": checkpoint_path.as_posix()}
+        calibrater = create_calibrator(
+            test_model_path, augmented_model_path=augmented_model_path.as_posix(), extra_options=extra_options
+        )
+        calibrater.collect_data(data_reader)
+
+        calibrater = create_calibrator(
+            test_model_path,
+            augmented_model_path=augmented_model_path.as_posix(),
+            extra_options={**extra_options, "resume_from_checkpoint": True},
+        )
+        self.assertEqual(calibrater.num_batches_to_skip, 0)
+        calibrater.collect_data(new_data_reader)
+        self.assertEqual(calibrater.compute_range(), expected_range)
+
+        # a min-max calibration state can't be loaded by a histogram calibrator
+        with self.assertRaises(ValueError):
+            create_calibrator(
+                test_model_path,
+                augmented_model_path=augmented_model_path.as_posix(),
+                calibrate_method=CalibrationMethod.Entropy,
+                extra_options={**extra_options, "resume_from_checkpoint": True},
+            )
+
     def test_augment_graph_with_zero_value_dimension(self):
         """TEST_CONFIG_5"""
         #   Conv
@@ -457,5 +721,167 @@ class TestCalibrateMinMaxCalibrator(unittest.TestCase):
             self.assertTrue(output in augmented_model_outputs)
 
 
+class TestStreamingHistogramCollector(unittest.TestCase):
+    @staticmethod
+    def make_batches():
+        np.random.seed(0)
+        # increasing scales so that the range keeps growing across batches
+        return [
+            {"X": np.random.normal(0, scale, [2, 16]).astype(np.float32), "Y": np.random.rand(4, 4).astype(np.float32)}
+            for scale in [0.5, 1.0, 0.25, 3.0]
+        ]
+
+    def test_collect_value_matches_histogram_collector(self):
+        for method in ["entropy", "percentile"]:
+            collector = HistogramCollector(method, False, 128, 32, 99.9)
+            streaming_collector = StreamingHistogramCollector(method, False, 128, 32, 99.9)
+            for batch in self.make_batches():
+                collector.collect({name: [value] for name, value in batch.items()})
+                streaming_collector.collect(batch)
+
+            for tensor, histogram in collector.get_histogram_dict().items():
+                streamed_histogram = streaming_collector.get_histogram_dict()[tensor]
+                np.testing.assert_array_equal(histogram[0], streamed_histogram[0])
+                np.testing.assert_array_equal(histogram[1], streamed_histogram[1])
+                self.assertEqual(histogram[2:], streamed_histogram[2:])
+            self.assertEqual(collector.compute_collection_result(), streaming_collector.compute_collection_result())
+
+    def test_collect_absolute_value(self):
+        streaming_collector = StreamingHistogramCollector("percentile", True, 128, 32, 99.9)
+        batches = self.make_batches()
+        for batch in batches:
+            streaming_collector.collect(batch)
+
+        for tensor, (hist, hist_edges, min_value, max_value) in streaming_collector.get_histogram_dict().items():
+            values = np.concatenate([batch[tensor].ravel() for batch in batches])
+            self.assertEqual(hist.size + 1, hist_edges.size)
+            self.assertEqual(hist.sum(), values.size)
+            self.assertEqual(hist_edges[0], 0)
+            self.assertGreaterEqual(hist_edges[-1], np.abs(values).max())
+            np.testing.assert_allclose(np.diff(hist_edges), hist_edges[1] - hist_edges[0])
+            self.assertEqual(min_value, values.min())
+            self.assertEqual(max_value, values.max())
+
+    def test_merge(self):
+        for symmetric in [False, True]:
+            batches = self.make_batches()
+            collector = StreamingHistogramCollector("percentile", symmetric, 128, 32, 99.9)
+            other_collector = StreamingHistogramCollector("percentile", symmetric, 128, 32, 99.9)
+            for batch in batches[::2]:
+                collector.collect(batch)
+            for batch in batches[1::2]:
+                other_collector.collect(batch)
+            collector.merge(other_collector)
+
+            for tensor, histogram in collector.get_histogram_dict().items():
+                values = np.concatenate([batch[tensor].ravel() for batch in batches])
+                self.assertEqual(histogram[0].sum(), values.size)
+                self.assertGreaterEqual(histogram[1][-1], np.abs(values).max())
+                self.assertEqual(histogram[2], values.min())
+                self.assertEqual(histogram[3], values.max())
+                other_histogram = other_collector.get_histogram_dict()[tensor]
+                self.assertFalse(histogram[0] is other_histogram[0])
+
+    def test_merge_shared_layout(self):
+        for symmetric in [False, True]:
+            batches = self.make_batches()
+            serial_collector = StreamingHistogramCollector("percentile", symmetric, 128, 32, 99.9)
+            for batch in batches:
+                serial_collector.collect(batch)
+
+            collector = StreamingHistogramCollector("percentile", symmetric, 128, 32, 99.9)
+            collector.collect(batches[0])
+            worker_collectors = [collector.copy_layout(), collector.copy_layout()]
+            for i, batch in enumerate(batches[1:]):
+                worker_collectors[i % 2].collect(batch)
+            for worker_collector in worker_collectors:
+                collector.merge(worker_collector)
+
+            for tensor, histogram in serial_collector.get_histogram_dict().items():
+                merged_histogram = collector.get_histogram_dict()[tensor]
+                np.testing.assert_array_equal(histogram[0], merged_histogram[0])
+                np.testing.assert_allclose(histogram[1], merged_histogram[1])
+                self.assertEqual(histogram[2:], merged_histogram[2:])
+
+
+class TestHistogramCollectorEntropy(unittest.TestCase):
+    @staticmethod
+    def get_kl_divergences_reference(histogram, num_quantized_bins):
+        """one candidate threshold at a time, as HistogramCollector used to do. Returns thresholds and divergences."""
+        from scipy.stats import entropy
+
+        hist, hist_edges = histogram[:2]
+        num_bins = hist.size
+        zero_bin_index = num_bins // 2
+        num_half_quantized_bin = num_quantized_bins // 2
+        kl_divergence = []
+        thresholds = []
+        for i in range(num_half_quantized_bin, zero_bin_index + 1):
+            start_index = zero_bin_index - i
+            end_index = min(zero_bin_index + i + 1, num_bins)
+            thresholds.append((float(hist_edges[start_index]), float(hist_edges[end_index])))
+
+            sliced_distribution = hist[start_index:end_index]
+            p = sliced_distribution.copy()
+            p[0] += hist[:start_index].sum()
+            p[-1] += hist[end_index:].sum()
+            nonzeros = (p != 0).astype(np.int64)
+
+            num_merged_bins = sliced_distribution.size // num_quantized_bins
+            quantized_bins = np.array(
+                [
+                    sliced_distribution[index * num_merged_bins : (index + 1) * num_merged_bins].sum()
+                    for index in range(num_quantized_bins)
+                ]
+            )
+            quantized_bins[-1] += sliced_distribution[num_quantized_bins * num_merged_bins :].sum()
+            q = np.zeros(p.size, dtype=np.int64)
+            for index in range(num_quantized_bins):
+                start = index * num_merged_bins
+                end = start + num_merged_bins
+                norm = nonzeros[start:end].sum()
+                if norm != 0:
+                    q[start:end] = float(quantized_bins[index]) / float(norm)
+
+            p = smooth_distribution(p)
+            q = smooth_distribution(q)
+            kl_divergence.append(entropy(p, q) if isinstance(q, np.ndarray) else float("inf"))
+
+        thresholds = [(max(low, histogram[2]), min(high, histogram[3])) for low, high in thresholds]
+        return thresholds, np.array(kl_divergence)
+
+    def test_get_entropy_threshold(self):
+        np.random.seed(0)
+        datasets = [
+            np.random.normal(0, 1, 4096),
+            np.concatenate([np.random.laplace(0, 0.3, 2048), [20.0, -15.0]]),
+            np.concatenate([np.random.normal(0, 1, 64), np.zeros(2048)]),
+            np.random.exponential(1, 2048),
+        ]
+        for data in datasets:
+            for num_bins, num_quantized_bins in [(128, 32), (255, 64), (512, 128)]:
+                collector = HistogramCollector("entropy", False, num_bins, num_quantized_bins, 99.999)
+                collector.collect({"X": [data.astype(np.float32)]})
+                histogram = collector.get_histogram_dict()["X"]
+                thresholds, kl_divergence = self.get_kl_divergences_reference(histogram, num_quantized_bins)
+                # Sums are rounded differently from the reference, so candidates within rounding error are equivalent.
+                optimal_thresholds = [
+                    threshold
+                    for threshold, divergence in zip(thresholds, kl_divergence)
+                    if divergence <= kl_divergence.min() * (1 + 1e-4)
+                ]
+                self.assertIn(collector.get_entropy_threshold(histogram, num_quantized_bins), optimal_thresholds)
+
+    def test_get_entropy_threshold_in_blocks(self):
+        np.random.seed(1)
+        collector = HistogramCollector("entropy", False, 256, 32, 99.999)
+        collector.collect({"X": [np.random.normal(0, 1, 4096).astype(np.float32)]})
+        histogram = collector.get_histogram_dict()["X"]
+        threshold = collector.get_entropy_threshold(histogram, 32)
+
+        collector.max_entropy_block_elements = 256 * 7
+        self.assertEqual(collector.get_entropy_threshold(histogram, 32), threshold)
+
+
 if __name__ == "__main__":
     unittest.main()
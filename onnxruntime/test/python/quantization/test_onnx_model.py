@@ -168,6 +168,104 @@ class TestONNXModel(unittest.TestCase):
         onnx_model.topological_sort()
         check_op_type_order(self, onnx_model.model, ["Op1", "Op1", "Op2", "Op3"])
 
+    def test_index(self):
+        test_model_path = str(Path(self._tmp_model_dir.name) / "onnx_model_index.onnx")
+        construct_model_for_topo_sort(test_model_path)
+        onnx_model = ONNXModel(onnx.load(test_model_path))
+        gru_node = onnx_model.get_producer("GRU_O")
+        self.assertEqual(gru_node.op_type, "GRU")
+        self.assertEqual([node.op_type for node in onnx_model.get_consumers("GRU_O")], ["Conv", "Conv"])
+        self.assertIs(onnx_model.get_initializer("W_GRU"), onnx_model.initializer()[0])
+        self.assertEqual(onnx_model.get_value_info("input").name, "input")
+        self.assertTrue(onnx_model.is_graph_input("input"))
+        self.assertTrue(onnx_model.is_graph_output("output"))
+
+        # Changes through ONNXModel are applied to the index.
+        scale = numpy_helper.from_array(np.array(0.5, dtype=np.float32), "scale")
+        onnx_model.add_initializer(scale)
+        mul_node = helper.make_node("Mul", ["output", "scale"], ["scaled_output"], name="Mul")
+        onnx_model.add_node(mul_node)
+        self.assertEqual(onnx_model.get_initializer("scale"), scale)
+        self.assertEqual(onnx_model.get_producer("scaled_output"), mul_node)
+        self.assertEqual(onnx_model.get_children(onnx_model.get_producer("output")), [onnx_model.nodes()[-1]])
+
+        onnx_model.remove_node(onnx_model.get_producer("scaled_output"))
+        onnx_model.remove_initializer(onnx_model.get_initializer("scale"))
+        self.assertIsNone(onnx_model.get_producer("scaled_output"))
+        self.assertEqual(onnx_model.get_consumers("scale"), [])
+        self.assertIsNone(onnx_model.get_initializer("scale"))
+        self.assertNotIn("scale", [initializer.name for initializer in onnx_model.initializer()])
+        self.assertEqual(len(onnx_model.nodes()), 5)
+
+        # Nodes and initializers added to the graph directly are found as well.
+        onnx_model.graph().node.append(helper.make_node("Relu", ["output"], ["relu_output"], name="Relu2"))
+        onnx_model.initializer().append(numpy_helper.from_array(np.ones(2, dtype=np.float32), "ones"))
+        self.assertEqual(onnx_model.get_producer("relu_output").name, "Relu2")
+        self.assertIsNotNone(onnx_model.get_initializer("ones"))
+
+        # Topological sort reorders nodes, and the index follows.
+        onnx_model.topological_sort()
+        self.assertIs(onnx_model.get_producer("GRU_O"), onnx_model.nodes()[0])
+        self.assertEqual(onnx_model.output_name_to_node(), {o: n for n in onnx_model.nodes() for o in n.output})
+
+    def test_index_after_rename(self):
+        test_model_path = str(Path(self._tmp_model_dir.name) / "onnx_model_index_rename.onnx")
+        construct_model_for_topo_sort(test_model_path)
+        onnx_model = ONNXModel(onnx.load(test_model_path))
+        gru_node = onnx_model.get_producer("GRU_O")
+        conv_nodes = onnx_model.get_consumers("GRU_O")
+
+        onnx_model.replace_input_of_all_nodes("GRU_O", "GRU_O_dq")
+        self.assertEqual(onnx_model.get_consumers("GRU_O"), [])
+        self.assertEqual(onnx_model.get_consumers("GRU_O_dq"), conv_nodes)
+        self.assertEqual(onnx_model.get_children(gru_node), [])
+
+        onnx_model.replace_output_of_all_nodes("GRU_O", "GRU_O_q")
+        self.assertIsNone(onnx_model.get_producer("GRU_O"))
+        self.assertIs(onnx_model.get_producer("GRU_O_q"), gru_node)
+
+        # Inputs of a single node are renamed, and names are not recognized after the node is removed.
+        relu_node = onnx_model.get_producer("Relu_O")
+        onnx_model.replace_input_of_node(relu_node, "Conv1_O", "Conv1_O_q")
+        self.assertEqual(onnx_model.get_parents(relu_node), [])
+        self.assertEqual(onnx_model.get_consumers("Conv1_O_q"), [relu_node])
+        onnx_model.remove_node(relu_node)
+        self.assertEqual(onnx_model.get_consumers("Conv1_O_q"), [])
+        self.assertEqual(onnx_model.get_consumers("Conv1_O"), [])
+        self.assertEqual(onnx_model.input_name_to_nodes(), ONNXModel(onnx_model.model).input_name_to_nodes())
+
+    def test_changes_in_place_without_reindex(self):
+        test_model_path = str(Path(self._tmp_model_dir.name) / "onnx_model_index_in_place.onnx")
+        construct_model_for_topo_sort(test_model_path)
+        onnx_model = ONNXModel(onnx.load(test_model_path))
+        relu_node = onnx_model.get_producer("Relu_O")
+        conv_node = onnx_model.get_producer("Conv1_O")
+
+        # The static methods do not update the index, so the changed names are detected on lookup.
+        ONNXModel.replace_node_input(relu_node, "Conv1_O", "Conv1_O_q")
+        self.assertEqual(onnx_model.get_consumers("Conv1_O"), [])
+        self.assertEqual(onnx_model.get_consumers("Conv1_O_q"), [relu_node])
+        ONNXModel.replace_node_output(conv_node, "Conv1_O", "Conv1_O_q")
+        self.assertIsNone(onnx_model.get_producer("Conv1_O"))
+        self.assertIs(onnx_model.get_parent(relu_node, 0), conv_node)
+        relu_node.input[0] = "Conv1_O"
+        # Nodes that are indexed again are listed after the other consumers of a tensor.
+        input_name_to_nodes = ONNXModel(onnx_model.model).input_name_to_nodes()
+        for input_name, nodes in onnx_model.input_name_to_nodes().items():
+            self.assertCountEqual(nodes, input_name_to_nodes.pop(input_name))
+        self.assertEqual(input_name_to_nodes, {})
+        self.assertEqual(onnx_model.output_name_to_node(), ONNXModel(onnx_model.model).output_name_to_node())
+
+    def test_remove_initializers(self):
+        test_model_path = str(Path(self._tmp_model_dir.name) / "onnx_model_remove_initializers.onnx")
+        construct_model_for_topo_sort(test_model_path)
+        onnx_model = ONNXModel(onnx.load(test_model_path))
+        names = sorted(onnx_model.get_initializer_name_set())
+        onnx_model.remove_initializers([onnx_model.get_initializer(name) for name in names[:2]])
+        self.assertEqual(onnx_model.get_initializer_name_set(), set(names[2:]))
+        self.assertEqual(onnx_model.get_initializer_name_set(), ONNXModel(onnx_model.model).get_initializer_name_set())
+        self.assertIsNone(onnx_model.get_initializer(names[0]))
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -23,6 +23,7 @@ from onnxruntime.quantization.qdq_loss_debug import (
     QUANT_INPUT_SUFFIX,
     collect_activations,
     compute_activation_error,
+    compute_activation_error_streaming,
     compute_weight_error,
     create_activation_matching,
     create_weight_matching,
@@ -221,6 +222,53 @@ class TestSaveActivations(unittest.TestCase):
                 f"{tensor_name} qdq error {activations_error[tensor_name]['qdq_err']} exceeds threashold.",
             )
 
+    def test_compute_activation_error_streaming(self):
+        float_model_path = str(Path(self._tmp_model_dir.name) / "float_model5.onnx")
+        construct_test_model1(float_model_path, activations_as_outputs=False)
+        data_reader = TestDataReader()
+        data_reader.count = 5
+        data_reader.input_data_list = [
+            np.random.normal(0, 0.33, [1, 3, 1, 3]).astype(np.float32) for _ in range(data_reader.count)
+        ]
+
+        qdq_model_path = str(Path(self._tmp_model_dir.name) / "qdq_model5.onnx")
+        quantize_static(
+            float_model_path,
+            qdq_model_path,
+            data_reader,
+            quant_format=QuantFormat.QDQ,
+            activation_type=QuantType.QInt8,
+            weight_type=QuantType.QInt8,
+            optimize_model=False,
+        )
+
+        data_reader.rewind()
+        augmented_float_model_path = str(Path(self._tmp_model_dir.name) / "augmented_float_model5.onnx")
+        float_activations = augment_model_collect_activations(float_model_path, augmented_float_model_path, data_reader)
+        data_reader.rewind()
+        augmented_qdq_model_path = str(Path(self._tmp_model_dir.name) / "augmented_qdq_model5.onnx")
+        qdq_activations = augment_model_collect_activations(qdq_model_path, augmented_qdq_model_path, data_reader)
+        expected = compute_activation_error(create_activation_matching(qdq_activations, float_activations))
+
+        data_reader.rewind()
+        actual = compute_activation_error_streaming(
+            augmented_qdq_model_path, data_reader, float_augmented_model=augmented_float_model_path
+        )
+        self.assertEqual(sorted(actual), sorted(expected))
+        for tensor_name, errors in expected.items():
+            self.assertEqual(sorted(actual[tensor_name]), sorted(errors))
+            for error_name, error in errors.items():
+                self.assertAlmostEqual(actual[tensor_name][error_name], error, places=3)
+
+        data_reader.rewind()
+        actual = compute_activation_error_streaming(augmented_qdq_model_path, data_reader)
+        for tensor_name, errors in actual.items():
+            self.assertEqual(list(errors), ["qdq_err"])
+            self.assertAlmostEqual(errors["qdq_err"], expected[tensor_name]["qdq_err"], places=3)
+
+        with self.assertRaises(RuntimeError):
+            compute_activation_error_streaming(augmented_qdq_model_path, iter([]))
+
     def test_create_weight_matching(self):
         # Setup: create float model:
         float_model_path = str(Path(self._tmp_model_dir.name) / "float_model3.onnx")
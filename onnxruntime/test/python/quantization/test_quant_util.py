@@ -13,7 +13,17 @@ import numpy
 import onnx
 from onnx import TensorProto, helper, numpy_helper
 
-from onnxruntime.quantization.quant_utils import compute_scale_zp, load_model, model_has_infer_metadata
+from onnxruntime.quantization.quant_utils import (
+    compute_scale_zp,
+    compute_scale_zp_array,
+    dequantize_blockwise_4bits,
+    load_model,
+    model_has_infer_metadata,
+    quantize_blockwise_4bits,
+    quantize_data,
+    smooth_distribution,
+    smooth_distributions,
+)
 
 
 class TestQuantUtil(unittest.TestCase):
@@ -33,6 +43,93 @@ class TestQuantUtil(unittest.TestCase):
         self.assertEqual(compute_scale_zp(-tiny_float, tiny_float, 0, 255, symmetric=True), [0, 1.0])
         self.assertEqual(compute_scale_zp(-tiny_float, 0.0, 0, 255, symmetric=False), [0, 1.0])
 
+    def test_compute_scale_zp_array(self):
+        rmin = numpy.array([0.0, 1.0, -1.0, -1.0, -numpy.finfo(numpy.float32).tiny * 0.1])
+        rmax = numpy.array([0.0, -1.0, 2.0, 2.0, 0.0])
+        for qmin, qmax in [(-127, 127), (0, 255)]:
+            for symmetric in [True, False]:
+                zero_points, scales = compute_scale_zp_array(rmin, rmax, qmin, qmax, symmetric)
+                expected = [compute_scale_zp(*r, qmin, qmax, symmetric) for r in zip(rmin.tolist(), rmax.tolist())]
+                self.assertEqual(zero_points.tolist(), [zero_point for zero_point, _ in expected])
+                self.assertEqual(scales.tolist(), [scale for _, scale in expected])
+
+        with self.assertRaises(ValueError):
+            compute_scale_zp_array(rmin, rmax, 1, 255)
+
+    def test_quantize_data_per_axis(self):
+        data = numpy.random.default_rng(0).standard_normal((4, 3, 5)).astype(numpy.float32)
+        data[:, 1] = 0  # a channel that cannot be quantized with a positive range
+        for quant_type in [TensorProto.INT8, TensorProto.UINT8]:
+            for symmetric in [True, False]:
+                for axis in [0, 1, -1]:
+                    rmins, rmaxs, zero_points, scales, quantized = quantize_data(
+                        data, quant_type, symmetric, reduce_range=True, axis=axis
+                    )
+                    self.assertEqual(quantized.shape, data.shape)
+                    for i in range(data.shape[axis]):
+                        rmin, rmax, zero_point, scale, quantized_channel = quantize_data(
+                            data.take(i, axis).flatten().tolist(), quant_type, symmetric, reduce_range=True
+                        )
+                        self.assertEqual(
+                            [rmins[i], rmaxs[i], zero_points[i], scales[i]], [rmin, rmax, zero_point, scale]
+                        )
+                        numpy.testing.assert_array_equal(quantized.take(i, axis).flatten(), quantized_channel)
+
+        with self.assertRaises(ValueError):
+            quantize_data(data, TensorProto.INT8, True, axis=3)
+
+    def test_quantize_blockwise_4bits(self):
+        data = numpy.random.default_rng(0).standard_normal((37, 3)).astype(numpy.float32)
+        data[:16, 1] = 0  # a block that cannot be quantized with a positive range
+        for symmetric in [True, False]:
+            packed, scales, zero_points = quantize_blockwise_4bits(data, 16, symmetric)
+            self.assertEqual(packed.shape, (3, 8, 3))
+            self.assertEqual(scales.shape, (3, 1, 3))
+            self.assertEqual(zero_points.shape, (3, 1, 3))
+
+            # Each block has the same result as per-tensor quantization to [0, 15] or [1, 15] with zero point 8.
+            padded = numpy.concatenate([data, numpy.zeros((11, 3), dtype=numpy.float32)])
+            unpacked = numpy.concatenate([packed & 0x0F, packed >> 4], axis=1)
+            for block in range(3):
+                for column in range(3):
+                    values = padded[block * 16 : (block + 1) * 16, column]
+                    if symmetric:
+                        absmax = float(numpy.abs(values).max())
+                        zero_point, scale = compute_scale_zp(-absmax, absmax, -7, 7, symmetric=True)
+                        zero_point += 8
+                    else:
+                        zero_point, scale = compute_scale_zp(float(values.min()), float(values.max()), 0, 15)
+                    self.assertEqual(zero_points[block, 0, column], zero_point)
+                    self.assertAlmostEqual(scales[block, 0, column], scale, places=6)
+                    expected = numpy.clip(numpy.round(values / numpy.float32(scale)) + zero_point, 0, 15)
+                    numpy.testing.assert_array_equal(unpacked[block, :, column], expected)
+
+            dequantized = dequantize_blockwise_4bits(packed, scales, zero_points, 37)
+            self.assertEqual(dequantized.shape, data.shape)
+            numpy.testing.assert_allclose(dequantized, data, atol=float(scales.max()) / 2 + 1e-6)
+
+        with self.assertRaises(ValueError):
+            quantize_blockwise_4bits(data, 15, True)
+
+    def test_smooth_distributions(self):
+        distributions = [
+            numpy.array([0, 3, 0, 7, 1], dtype=numpy.int64),
+            numpy.array([5, 5, 5], dtype=numpy.int64),
+            numpy.array([0, 0, 0, 0], dtype=numpy.int64),
+            numpy.array([0, 0, 1, 0, 0, 0], dtype=numpy.int64),
+        ]
+        lengths = numpy.array([distribution.size for distribution in distributions])
+        p = numpy.zeros((len(distributions), lengths.max()), dtype=numpy.int64)
+        for row, distribution in enumerate(distributions):
+            p[row, : distribution.size] = distribution
+
+        smoothed, smoothable = smooth_distributions(p, lengths)
+        self.assertEqual(smoothable.tolist(), [True, True, False, True])
+        for row, distribution in enumerate(distributions):
+            if smoothable[row]:
+                numpy.testing.assert_array_equal(smoothed[row, : lengths[row]], smooth_distribution(distribution))
+            self.assertTrue((smoothed[row, lengths[row] :] == 0).all())
+
     def test_load_external_model(self):
         input_name = "input"
         output_name = "output"
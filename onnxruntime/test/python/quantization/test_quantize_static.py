@@ -6,15 +6,18 @@
 # --------------------------------------------------------------------------
 
 import tempfile
+import threading
 import unittest
 from pathlib import Path
+from unittest.mock import patch
 
 import numpy as np
 import onnx
 from onnx import TensorProto, helper
 from op_test_utils import InputFeedsNegOneZeroOne, check_model_correctness, generate_random_initializer
 
-from onnxruntime.quantization import QuantType, StaticQuantConfig, quantize, quantize_static
+from onnxruntime.quantization import QuantFormat, QuantType, StaticQuantConfig, quantize, quantize_static
+from onnxruntime.quantization import onnx_quantizer
 
 
 def construct_test_model(test_model_path, channel_size):
@@ -98,6 +101,52 @@ class TestStaticQuantization(unittest.TestCase):
         check_model_correctness(self, self._model_fp32_path, quant_model_path, data_reader.get_next())
         data_reader.rewind()
 
+    def test_weight_quant_num_workers(self):
+        data_reader = InputFeedsNegOneZeroOne(10, {"input": [1, self._channel_size, 1, 3]})
+        original_quantize_data = onnx_quantizer.quantize_data
+        original_release = onnx_quantizer.ONNXQuantizer.release_prequantized_weights
+        quantize_data_threads = []
+        unused_weights = []
+
+        def quantize_data(*args, **kwargs):
+            quantize_data_threads.append(threading.current_thread())
+            return original_quantize_data(*args, **kwargs)
+
+        def release_prequantized_weights(quantizer):
+            unused_weights.extend(quantizer.prequantized_weights)
+            original_release(quantizer)
+            self.assertEqual(quantizer.prequantized_weights, {})
+
+        for quant_format in [QuantFormat.QOperator, QuantFormat.QDQ]:
+            for per_channel in [False, True]:
+                quantized_models = []
+                for num_workers in [1, 4]:
+                    quant_model_path = str(Path(self._tmp_model_dir.name) / f"quant.workers.{num_workers}.onnx")
+                    quantize_data_threads.clear()
+                    with patch.object(onnx_quantizer, "quantize_data", quantize_data), patch.object(
+                        onnx_quantizer.ONNXQuantizer, "release_prequantized_weights", release_prequantized_weights
+                    ):
+                        quantize_static(
+                            self._model_fp32_path,
+                            quant_model_path,
+                            data_reader,
+                            quant_format=quant_format,
+                            per_channel=per_channel,
+                            extra_options={"WeightQuantNumWorkers": num_workers},
+                        )
+                    data_reader.rewind()
+                    quantized_models.append(Path(quant_model_path).read_bytes())
+                    if num_workers == 1:
+                        quantize_count = len(quantize_data_threads)
+
+                # Weights quantized concurrently are the same as those quantized one by one.
+                self.assertEqual(quantized_models[0], quantized_models[1])
+                # Every weight is quantized in worker threads, and quantized once since the results are consumed.
+                self.assertEqual(len(quantize_data_threads), quantize_count)
+                self.assertGreater(quantize_count, 0)
+                self.assertNotIn(threading.main_thread(), quantize_data_threads)
+                self.assertEqual(unused_weights, [])
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,108 @@
+#!/usr/bin/env python
+# -------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for
+# license information.
+# --------------------------------------------------------------------------
+
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy as np
+import onnx
+from onnx import TensorProto, helper, numpy_helper
+from op_test_utils import check_op_type_count
+
+import onnxruntime
+from onnxruntime.quantization import quantize_weight_only
+from onnxruntime.quantization.qdq_loss_debug import compute_weight_error, create_weight_matching
+from onnxruntime.quantization.quant_utils import dequantize_blockwise_4bits, quantize_blockwise_4bits
+
+
+class TestQuantizeWeightOnly(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls._tmp_model_dir = tempfile.TemporaryDirectory(prefix="test_quantize_weight_only.")
+
+    @classmethod
+    def tearDownClass(cls):
+        cls._tmp_model_dir.cleanup()
+
+    def construct_model(self, output_model_path):
+        #      (input)
+        #         |
+        #       MatMul    W1 is shared with Add, which keeps the float weight
+        #         |
+        #        Gemm     transB=1, which is converted to MatMul
+        #         |
+        #      (output)
+        rng = np.random.default_rng(0)
+        self.weights = {
+            "W1": rng.normal(0, 0.1, [100, 48]).astype(np.float32),
+            "W2": rng.normal(0, 0.1, [40, 48]).astype(np.float32),
+            "B2": rng.normal(0, 0.1, [40]).astype(np.float32),
+        }
+        nodes = [
+            helper.make_node("MatMul", ["input", "W1"], ["matmul_output"], name="MatMul"),
+            helper.make_node("Gemm", ["matmul_output", "W2", "B2"], ["output"], name="Gemm", transB=1),
+            helper.make_node("Add", ["W1", "W1"], ["double_w1"], name="Add"),
+        ]
+        graph = helper.make_graph(
+            nodes,
+            "weight_only_test",
+            [helper.make_tensor_value_info("input", TensorProto.FLOAT, [3, 100])],
+            [
+                helper.make_tensor_value_info("output", TensorProto.FLOAT, [3, 40]),
+                helper.make_tensor_value_info("double_w1", TensorProto.FLOAT, [100, 48]),
+            ],
+            initializer=[numpy_helper.from_array(value, name) for name, value in self.weights.items()],
+        )
+        model = helper.make_model(graph, opset_imports=[helper.make_opsetid("", 13)])
+        onnx.save(model, output_model_path)
+
+    def test_quantize_weight_only(self):
+        model_fp32_path = str(Path(self._tmp_model_dir.name) / "matmul_fp32.onnx")
+        self.construct_model(model_fp32_path)
+        inputs = {"input": np.random.default_rng(1).standard_normal([3, 100]).astype(np.float32)}
+
+        for is_symmetric in [True, False]:
+            model_q4_path = str(Path(self._tmp_model_dir.name) / f"matmul_q4.{is_symmetric}.onnx")
+            quantize_weight_only(model_fp32_path, model_q4_path, block_size=32, is_symmetric=is_symmetric)
+            check_op_type_count(self, model_q4_path, MatMul=2, Gemm=0, Cast=2 if is_symmetric else 4)
+
+            # Only the shared weight is kept in float. Weight with 4 bits and a scale (and a zero point) per block
+            # is less than 1/4 of float, though K of W2 is padded from 48 to 64.
+            initializers = {
+                initializer.name: numpy_helper.to_array(initializer)
+                for initializer in onnx.load(model_q4_path).graph.initializer
+            }
+            self.assertIn("W1", initializers)
+            self.assertNotIn("W2", initializers)
+            w2_size = sum(initializers[f"W2{suffix}"].nbytes for suffix in ["_quantized", "_scale", "_zero_point"])
+            self.assertLess(w2_size, self.weights["W2"].nbytes / 4)
+
+            # Output is same as MatMul with weights dequantized by the reference.
+            expected = inputs["input"]
+            for weight in [self.weights["W1"], self.weights["W2"].T]:
+                packed, scales, zero_points = quantize_blockwise_4bits(weight, 32, is_symmetric)
+                expected = expected @ dequantize_blockwise_4bits(packed, scales, zero_points, weight.shape[0])
+            expected += self.weights["B2"]
+            # Weights are unpacked by constant folding when the session is created.
+            optimized_model_path = str(Path(self._tmp_model_dir.name) / f"matmul_q4.{is_symmetric}.optimized.onnx")
+            sess_options = onnxruntime.SessionOptions()
+            sess_options.optimized_model_filepath = optimized_model_path
+            session = onnxruntime.InferenceSession(model_q4_path, sess_options, providers=["CPUExecutionProvider"])
+            check_op_type_count(self, optimized_model_path, Cast=0, Floor=0, Concat=0)
+            output, double_w1 = session.run(None, inputs)
+            np.testing.assert_allclose(output, expected, rtol=1e-5, atol=1e-5)
+            np.testing.assert_array_equal(double_w1, self.weights["W1"] * 2)
+
+            matched_weights = create_weight_matching(model_fp32_path, model_q4_path)
+            self.assertEqual(sorted(matched_weights), ["W1", "W2"])
+            for weight_error in compute_weight_error(matched_weights).values():
+                self.assertGreater(weight_error, 15)
+
+
+if __name__ == "__main__":
+    unittest.main()
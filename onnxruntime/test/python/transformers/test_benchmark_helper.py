@@ -0,0 +1,40 @@
+#!/usr/bin/env python
+# -------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation.  All rights reserved.
+# Licensed under the MIT License.  See License.txt in the project root for
+# license information.
+# --------------------------------------------------------------------------
+
+import sys
+import unittest
+
+import numpy
+
+
+class TestMeasureMemory(unittest.TestCase):
+    @unittest.skipIf(not sys.platform.startswith("linux"), "peak resident set size is reset only in Linux")
+    def test_measure_memory_usage(self):
+        from onnxruntime.transformers.benchmark_helper import measure_memory, measure_memory_usage
+
+        def allocate_temporary():
+            # Touch 256 MB in a short burst which is released before returning.
+            buffer = numpy.ones(64 * 1024 * 1024, dtype=numpy.float32)
+            del buffer
+
+        def allocate_persistent():
+            return numpy.ones(64 * 1024 * 1024, dtype=numpy.float32)
+
+        usage = measure_memory_usage(is_gpu=False, func=allocate_temporary)
+        self.assertGreater(usage["peak_MB"], 200)
+        self.assertLess(usage["steady_MB"], 50)
+
+        # The result of func is kept alive until memory is measured.
+        usage = measure_memory_usage(is_gpu=False, func=allocate_persistent)
+        self.assertGreater(usage["peak_MB"], 200)
+        self.assertGreater(usage["steady_MB"], 200)
+
+        self.assertGreater(measure_memory(is_gpu=False, func=allocate_temporary), 200)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,119 @@
+# -------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation.  All rights reserved.
+# Licensed under the MIT License.  See License.txt in the project root for
+# license information.
+# --------------------------------------------------------------------------
+
+import os
+import tempfile
+import unittest
+
+import numpy as np
+import onnx
+from onnx import TensorProto, helper, numpy_helper
+from parity_utilities import find_transformers_source
+
+if find_transformers_source():
+    from float16 import (
+        _npfloat16_to_int,
+        convert_float_to_float16,
+        convert_float_to_float16_streaming,
+        convert_np_to_float16,
+    )
+else:
+    from onnxruntime.transformers.float16 import (
+        _npfloat16_to_int,
+        convert_float_to_float16,
+        convert_float_to_float16_streaming,
+        convert_np_to_float16,
+    )
+
+
+def create_test_model():
+    #   input --> MatMul --> Add --> Reshape --> TopK (fp32 only) --> output
+    #               ^         ^        ^                 ^
+    #            weight     bias     shape               k
+    rng = np.random.default_rng(0)
+    weight = rng.standard_normal((64, 32)).astype(np.float32)
+    weight[0, :4] = [1e-9, -1e-9, 1e6, -1e6]
+    initializers = [
+        numpy_helper.from_array(weight, "weight"),
+        numpy_helper.from_array(rng.standard_normal(32).astype(np.float32), "bias"),
+        numpy_helper.from_array(np.array([-1, 32], dtype=np.int64), "shape"),
+        numpy_helper.from_array(np.array([4], dtype=np.int64), "k"),
+    ]
+    nodes = [
+        helper.make_node("MatMul", ["input", "weight"], ["matmul_out"], name="matmul"),
+        helper.make_node("Add", ["matmul_out", "bias"], ["add_out"], name="add"),
+        helper.make_node("Reshape", ["add_out", "shape"], ["reshape_out"], name="reshape"),
+        helper.make_node("TopK", ["reshape_out", "k"], ["output", "indices"], name="topk"),
+    ]
+    graph = helper.make_graph(
+        nodes,
+        "test_graph",
+        [helper.make_tensor_value_info("input", TensorProto.FLOAT, [2, 64])],
+        [
+            helper.make_tensor_value_info("output", TensorProto.FLOAT, [2, 4]),
+            helper.make_tensor_value_info("indices", TensorProto.INT64, [2, 4]),
+        ],
+        initializers,
+    )
+    return helper.make_model(graph, opset_imports=[helper.make_opsetid("", 13)])
+
+
+class TestFloat16Conversion(unittest.TestCase):
+    def test_convert_np_to_float16(self):
+        values = np.array([0, -0.0, 1e-9, -1e-9, 5.96e-08, 1.5, 65504, 70000, -1e6, np.inf, -np.inf], np.float32)
+        expected = np.array([0, -0.0, 5.96e-08, -5.96e-08, 5.96e-08, 1.5, 65504, 65504, -65504, np.inf, -np.inf])
+        converted = convert_np_to_float16(values)
+        self.assertEqual(converted.dtype, np.float16)
+        np.testing.assert_array_equal(converted, expected.astype(np.float16))
+        self.assertTrue(np.isnan(convert_np_to_float16(np.array([np.nan], np.float32))[0]))
+
+        # input is not modified
+        self.assertEqual(values[2], np.float32(1e-9))
+
+    def test_npfloat16_to_int(self):
+        values = np.array([0, 1, -2, 65504, np.inf], np.float16)
+        expected = [int(bin(value.view("H"))[2:].zfill(16), 2) for value in values]
+        self.assertEqual(_npfloat16_to_int(values), expected)
+
+    def test_streaming(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            model_path = os.path.join(tmp_dir, "model.onnx")
+            onnx.save_model(
+                create_test_model(),
+                model_path,
+                save_as_external_data=True,
+                all_tensors_to_one_file=True,
+                location="model.onnx.data",
+                size_threshold=0,
+            )
+            expected = convert_float_to_float16(model_path, keep_io_types=True, node_block_list=["add"])
+
+            output_path = os.path.join(tmp_dir, "output", "model_fp16.onnx")
+            os.makedirs(os.path.dirname(output_path))
+            convert_float_to_float16_streaming(
+                model_path, output_path, keep_io_types=True, node_block_list=["add"], chunk_size=100
+            )
+            self.assertTrue(os.path.exists(output_path + ".data"))
+
+            # bias is used by fp32 node only, so it is kept as fp32
+            self.assertEqual(expected.graph.initializer[1].data_type, TensorProto.FLOAT)
+
+            model = onnx.load(output_path)
+            self.assertEqual(
+                [(t.name, t.data_type) for t in model.graph.initializer],
+                [(t.name, t.data_type) for t in expected.graph.initializer],
+            )
+            for tensor, expected_tensor in zip(model.graph.initializer, expected.graph.initializer):
+                np.testing.assert_array_equal(numpy_helper.to_array(tensor), numpy_helper.to_array(expected_tensor))
+            self.assertEqual(model.graph.node, expected.graph.node)
+            self.assertEqual(model.graph.value_info, expected.graph.value_info)
+
+            with self.assertRaises(ValueError):
+                convert_float_to_float16_streaming(model_path, model_path, external_data_file_name="model.onnx.data")
+
+
+if __name__ == "__main__":
+    unittest.main()
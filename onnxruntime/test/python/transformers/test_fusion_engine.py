@@ -0,0 +1,123 @@
+# -------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation.  All rights reserved.
+# Licensed under the MIT License.  See License.txt in the project root for
+# license information.
+# --------------------------------------------------------------------------
+
+import os
+import unittest
+
+import onnx
+from onnx import TensorProto, helper
+from parity_utilities import find_transformers_source
+
+if find_transformers_source():
+    from fusion_base import Fusion, FusionEngine
+    from fusion_fastgelu import FusionFastGelu
+    from fusion_gelu import FusionGelu
+    from fusion_layernorm import FusionLayerNormalization, FusionLayerNormalizationTF
+    from fusion_qordered_gelu import FusionQOrderedGelu
+    from fusion_qordered_layernorm import FusionQOrderedLayerNormalization
+    from onnx_model import OnnxModel
+else:
+    from onnxruntime.transformers.fusion_base import Fusion, FusionEngine
+    from onnxruntime.transformers.fusion_fastgelu import FusionFastGelu
+    from onnxruntime.transformers.fusion_gelu import FusionGelu
+    from onnxruntime.transformers.fusion_layernorm import FusionLayerNormalization, FusionLayerNormalizationTF
+    from onnxruntime.transformers.fusion_qordered_gelu import FusionQOrderedGelu
+    from onnxruntime.transformers.fusion_qordered_layernorm import FusionQOrderedLayerNormalization
+    from onnxruntime.transformers.onnx_model import OnnxModel
+
+
+class FusionRename(Fusion):
+    """Replace a node of one op type by a node of another op type."""
+
+    def __init__(self, model: OnnxModel, search_op_type: str, fused_op_type: str):
+        super().__init__(model, fused_op_type, search_op_type)
+        self.num_calls = 0
+
+    def fuse(self, node, input_name_to_nodes, output_name_to_node):
+        self.num_calls += 1
+        self.nodes_to_remove.append(node)
+        fused_node = helper.make_node(
+            self.fused_op_type, node.input, node.output, name=node.name + "_" + self.fused_op_type
+        )
+        self.nodes_to_add.append(fused_node)
+        self.node_name_to_graph_name[fused_node.name] = self.this_graph_name
+
+
+def create_chain_model(op_types):
+    nodes = []
+    for i, op_type in enumerate(op_types):
+        nodes.append(helper.make_node(op_type, [f"x{i}"], [f"x{i + 1}"], name=f"node{i}"))
+    graph = helper.make_graph(
+        nodes,
+        "chain",
+        [helper.make_tensor_value_info("x0", TensorProto.FLOAT, [2])],
+        [helper.make_tensor_value_info(f"x{len(op_types)}", TensorProto.FLOAT, [2])],
+    )
+    return helper.make_model(graph)
+
+
+class TestFusionEngine(unittest.TestCase):
+    def test_rounds(self):
+        model = OnnxModel(create_chain_model(["Relu", "Sigmoid", "Relu"]))
+        relu_to_tanh = FusionRename(model, "Relu", "Tanh")
+        tanh_to_neg = FusionRename(model, "Tanh", "Neg")
+        sigmoid_to_abs = FusionRename(model, "Sigmoid", "Abs")
+        engine = FusionEngine(model, [tanh_to_neg, relu_to_tanh, sigmoid_to_abs])
+        self.assertEqual(engine.apply(), 2)
+
+        self.assertEqual([node.op_type for node in model.nodes()], ["Abs", "Neg", "Neg"])
+        self.assertEqual(relu_to_tanh.num_calls, 2)
+        self.assertEqual(tanh_to_neg.num_calls, 2)
+        # Not triggered again since no other fusion changes Sigmoid or Abs nodes.
+        self.assertEqual(sigmoid_to_abs.num_calls, 1)
+
+    def test_max_rounds(self):
+        model = OnnxModel(create_chain_model(["Relu"]))
+        engine = FusionEngine(model, [FusionRename(model, "Relu", "Tanh"), FusionRename(model, "Tanh", "Relu")])
+        with self.assertLogs(level="WARNING"):
+            self.assertEqual(engine.apply(), FusionEngine.MAX_ROUNDS)
+
+    def test_overlapped_patterns(self):
+        model = OnnxModel(create_chain_model(["Relu", "Sigmoid"]))
+        first = FusionRename(model, "Relu", "Tanh")
+        second = FusionRename(model, "Relu", "Abs")
+        FusionEngine(model, [first, second]).apply()
+        self.assertEqual([node.op_type for node in model.nodes()], ["Sigmoid", "Tanh"])
+        self.assertEqual(second.num_calls, 0)
+
+    def test_register_fusion_of_another_model(self):
+        model = OnnxModel(create_chain_model(["Relu"]))
+        other_model = OnnxModel(create_chain_model(["Relu"]))
+        with self.assertRaises(ValueError):
+            FusionEngine(model, [FusionRename(other_model, "Relu", "Tanh")])
+
+    def verify_same_as_sequential_apply(self, model_name, fusion_classes):
+        model_path = os.path.join(os.path.dirname(__file__), "test_data", "models", model_name)
+        expected = OnnxModel(onnx.load(model_path))
+        for fusion_class in fusion_classes:
+            fusion_class(expected).apply()
+
+        model = OnnxModel(onnx.load(model_path))
+        FusionEngine(model, [fusion_class(model) for fusion_class in fusion_classes]).apply()
+
+        self.assertLess(len(model.nodes()), len(onnx.load(model_path).graph.node))
+        self.assertEqual(
+            model.model.SerializeToString(deterministic=True), expected.model.SerializeToString(deterministic=True)
+        )
+
+    def test_layer_norm_fusions(self):
+        fusion_classes = [FusionLayerNormalization, FusionLayerNormalizationTF, FusionQOrderedLayerNormalization]
+        self.verify_same_as_sequential_apply("gpt2_past.onnx", fusion_classes)
+        self.verify_same_as_sequential_apply("TFBertForQuestionAnswering.onnx", fusion_classes)
+
+    def test_gelu_fusions(self):
+        fusion_classes = [FusionGelu, FusionFastGelu, FusionQOrderedGelu]
+        self.verify_same_as_sequential_apply("gpt2_past.onnx", fusion_classes)
+        self.verify_same_as_sequential_apply("TFBertForQuestionAnswering.onnx", fusion_classes)
+
+
+if __name__ == "__main__":
+    unittest.main()
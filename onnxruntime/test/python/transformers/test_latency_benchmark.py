@@ -0,0 +1,88 @@
+#!/usr/bin/env python
+# -------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation.  All rights reserved.
+# Licensed under the MIT License.  See License.txt in the project root for
+# license information.
+# --------------------------------------------------------------------------
+
+import itertools
+import unittest
+from unittest.mock import patch
+
+
+class TestLatencyBenchmark(unittest.TestCase):
+    def test_reject_outliers(self):
+        from onnxruntime.transformers.latency_benchmark import reject_outliers
+
+        latencies = [1.0, 1.1, 0.9, 1.05, 0.95, 10.0]
+        self.assertEqual(reject_outliers(latencies, 3.0), latencies[:-1])
+        self.assertEqual(reject_outliers(latencies, 0), latencies)
+        self.assertEqual(reject_outliers([1.0] * 10, 3.0), [1.0] * 10)
+
+    def test_percentiles_include_outliers(self):
+        from onnxruntime.transformers.latency_benchmark import LatencyResult, reject_outliers
+
+        raw_latencies = [0.001] * 99 + [0.01]
+        result = LatencyResult(reject_outliers(raw_latencies, 3.0), raw_latencies, 0, True, 0.95)
+        self.assertEqual(result.outlier_times, 1)
+
+        stats = result.to_dict()
+        self.assertEqual(stats["test_times"], 100)
+        self.assertAlmostEqual(stats["average_latency_ms"], 1.0)
+        self.assertAlmostEqual(stats["latency_50_percentile"], 1.0)
+        self.assertGreater(stats["latency_99_percentile"], 1.0)
+
+    def test_measure(self):
+        from onnxruntime.transformers.benchmark_helper import measure_latency
+        from onnxruntime.transformers.latency_benchmark import LatencyBenchmark
+
+        # Simulated latencies: the first runs are slow (like a cold cache), then stable with a rare spike.
+        def simulated_latencies():
+            yield from [5.0] * 20
+            for i in itertools.count():
+                yield 10.0 if i % 50 == 49 else 1.0 + 0.001 * (i % 3)
+
+        benchmark = LatencyBenchmark(min_test_times=10, max_test_times=1000, relative_error=0.01)
+        with patch("timeit.repeat", side_effect=self._fake_repeat(simulated_latencies())):
+            result = benchmark.measure(lambda: None)
+        self.assertTrue(result.converged)
+        self.assertGreaterEqual(result.warmup_times, 20)
+        self.assertTrue(all(latency < 2.0 for latency in result.latencies))
+        self.assertEqual(result.outlier_times, len(result.raw_latencies) - len(result.latencies))
+
+        with patch("timeit.repeat", side_effect=self._fake_repeat(simulated_latencies())):
+            stats = measure_latency(lambda: None, 10, 4, latency_benchmark=benchmark)
+        self.assertAlmostEqual(stats["average_latency_ms"], 1001, delta=1)
+        self.assertAlmostEqual(stats["QPS"], 4000 / stats["average_latency_ms"])
+        self.assertLess(stats["latency_ci_ms"], 0.01 * stats["average_latency_ms"])
+        self.assertTrue(stats["converged"])
+
+        # Noisy latency cannot converge within max_test_times.
+        noisy = (float(i % 2 + 1) for i in itertools.count())
+        benchmark = LatencyBenchmark(min_test_times=10, max_test_times=100, relative_error=0.001, outlier_threshold=0)
+        with patch("timeit.repeat", side_effect=self._fake_repeat(noisy)):
+            result = benchmark.measure(lambda: None)
+        self.assertFalse(result.converged)
+        self.assertEqual(len(result.latencies), 100)
+        self.assertEqual(result.to_dict()["outlier_times"], 0)
+
+    @staticmethod
+    def _fake_repeat(latencies):
+        def repeat(func, number=1, repeat=5):
+            return [next(latencies) for _ in range(repeat)]
+
+        return repeat
+
+    def test_invalid_arguments(self):
+        from onnxruntime.transformers.latency_benchmark import LatencyBenchmark
+
+        with self.assertRaises(ValueError):
+            LatencyBenchmark(min_test_times=1)
+        with self.assertRaises(ValueError):
+            LatencyBenchmark(min_test_times=100, max_test_times=10)
+        with self.assertRaises(ValueError):
+            LatencyBenchmark(confidence=1.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,281 @@
+# -------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation.  All rights reserved.
+# Licensed under the MIT License.  See License.txt in the project root for
+# license information.
+# --------------------------------------------------------------------------
+
+import unittest
+
+import numpy as np
+from onnx import TensorProto, helper, numpy_helper
+from parity_utilities import find_transformers_source
+
+if find_transformers_source():
+    from onnx_model import OnnxModel, ParentPathPattern
+else:
+    from onnxruntime.transformers.onnx_model import OnnxModel, ParentPathPattern
+
+
+def create_test_model():
+    #   input --> Add --> Relu --> Mul --> output
+    #              ^       |        ^
+    #   weight ----+       +--------+
+    nodes = [
+        helper.make_node("Add", ["input", "weight"], ["add_out"], name="add"),
+        helper.make_node("Relu", ["add_out"], ["relu_out"], name="relu"),
+        helper.make_node("Mul", ["relu_out", "relu_out"], ["output"], name="mul"),
+        helper.make_node(
+            "Constant", [], ["unused_constant"], name="constant", value=numpy_helper.from_array(np.ones(1))
+        ),
+    ]
+    graph = helper.make_graph(
+        nodes,
+        "test_graph",
+        [helper.make_tensor_value_info("input", TensorProto.FLOAT, [2])],
+        [helper.make_tensor_value_info("output", TensorProto.FLOAT, [2])],
+        [
+            numpy_helper.from_array(np.ones(2, dtype=np.float32), "weight"),
+            numpy_helper.from_array(np.ones(2, dtype=np.float32), "unused_weight"),
+        ],
+    )
+    return helper.make_model(graph)
+
+
+def full_scan_input_name_to_nodes(model):
+    input_name_to_nodes = {}
+    for node in model.nodes():
+        for input_name in node.input:
+            if input_name:
+                input_name_to_nodes.setdefault(input_name, []).append(node)
+    return input_name_to_nodes
+
+
+def full_scan_output_name_to_node(model):
+    return {output_name: node for node in model.nodes() for output_name in node.output if output_name}
+
+
+class TestOnnxModelIndex(unittest.TestCase):
+    def assert_index_consistent(self, model):
+        input_name_to_nodes = model.input_name_to_nodes()
+        expected = full_scan_input_name_to_nodes(model)
+        self.assertEqual(set(input_name_to_nodes), set(expected))
+        for name, nodes in expected.items():
+            self.assertEqual([node.name for node in input_name_to_nodes[name]], [node.name for node in nodes])
+        self.assertEqual(
+            {name: node.name for name, node in model.output_name_to_node().items()},
+            {name: node.name for name, node in full_scan_output_name_to_node(model).items()},
+        )
+        for node in model.nodes():
+            self.assertIs(model.get_graph_by_node(node), model.graph())
+            self.assertIn(node, model.get_nodes_by_op_type(node.op_type))
+
+    def test_lookups(self):
+        model = OnnxModel(create_test_model())
+        self.assert_index_consistent(model)
+
+        relu = model.get_nodes_by_op_type("Relu")[0]
+        self.assertEqual([node.name for node in model.get_children(relu)], ["mul", "mul"])
+        self.assertEqual(model.get_parent(relu, 0).name, "add")
+        self.assertEqual(model.get_initializer("weight").name, "weight")
+        self.assertIsNone(model.get_initializer("relu_out"))
+        self.assertEqual(model.find_graph_input("input").name, "input")
+        self.assertEqual(model.find_graph_output("output").name, "output")
+        self.assertIsNone(model.find_graph_input("output"))
+        np.testing.assert_array_equal(model.get_constant_value("unused_constant"), np.ones(1))
+
+    def test_add_and_remove_nodes(self):
+        model = OnnxModel(create_test_model())
+        relu = model.get_nodes_by_op_type("Relu")[0]
+        model.add_node(helper.make_node("Sigmoid", ["relu_out"], ["sigmoid_out"], name="sigmoid"))
+        self.assert_index_consistent(model)
+
+        sigmoid = model.get_nodes_by_op_type("Sigmoid")[0]
+        self.assertIn(sigmoid, model.graph().node)
+        self.assertEqual([node.name for node in model.get_children(relu)], ["mul", "mul", "sigmoid"])
+
+        model.remove_nodes([sigmoid, relu])
+        self.assertEqual([node.name for node in model.nodes()], ["add", "mul", "constant"])
+        self.assert_index_consistent(model)
+
+        # a copy of a node is removed by value
+        add_copy = helper.make_node("Add", ["input", "weight"], ["add_out"], name="add")
+        model.remove_node(add_copy)
+        self.assertEqual([node.name for node in model.nodes()], ["mul", "constant"])
+        self.assert_index_consistent(model)
+
+    def test_replace_input_and_output(self):
+        model = OnnxModel(create_test_model())
+        model.replace_input_of_all_nodes("relu_out", "add_out")
+        self.assertEqual(list(model.get_nodes_by_op_type("Mul")[0].input), ["add_out", "add_out"])
+        self.assertEqual([node.name for node in model.input_name_to_nodes()["add_out"]], ["relu", "mul", "mul"])
+        self.assert_index_consistent(model)
+
+        model.replace_output_of_all_nodes("add_out", "sum")
+        self.assertEqual(model.output_name_to_node()["sum"].name, "add")
+        self.assert_index_consistent(model)
+
+    def test_replace_input_and_output_of_node(self):
+        model = OnnxModel(create_test_model())
+        add, relu, mul = (model.get_nodes_by_op_type(op_type)[0] for op_type in ["Add", "Relu", "Mul"])
+        model.replace_input_of_node(mul, "relu_out", "add_out")
+        self.assertEqual(model.get_children(relu), [])
+        self.assertEqual([node.name for node in model.get_children(add)], ["relu", "mul", "mul"])
+        self.assertIs(model.get_parent(mul, 1), add)
+        self.assert_index_consistent(model)
+
+        model.replace_output_of_node(relu, "relu_out", "relu_renamed")
+        self.assertIsNone(model.output_name_to_node().get("relu_out"))
+        self.assertIs(model.output_name_to_node()["relu_renamed"], relu)
+        self.assert_index_consistent(model)
+
+        # a node changed by position is updated by reindex_node, and removed under its new names
+        add.input[1] = "unused_weight"
+        model.reindex_node(add)
+        self.assertEqual([node.name for node in model.input_name_to_nodes()["unused_weight"]], ["add"])
+        self.assertNotIn("weight", model.input_name_to_nodes())
+        model.remove_nodes([relu, add])
+        self.assertNotIn("unused_weight", model.input_name_to_nodes())
+        self.assert_index_consistent(model)
+
+    def test_changes_in_place_without_reindex(self):
+        model = OnnxModel(create_test_model())
+        add, relu, mul = (model.get_nodes_by_op_type(op_type)[0] for op_type in ["Add", "Relu", "Mul"])
+
+        # the static methods only change the node, and lookups that hit a changed edge update the index.
+        OnnxModel.replace_node_input(mul, "relu_out", "add_out")
+        self.assertEqual(model.get_children(relu), [])
+        self.assertEqual([node.name for node in model.get_children(add)], ["relu", "mul", "mul"])
+        self.assert_index_consistent(model)
+
+        OnnxModel.replace_node_output(add, "add_out", "sum")
+        self.assertIsNone(model.get_parent(relu, 0))
+        self.assertIsNone(model.match_parent_path(mul, ["Add"], [0]))
+        self.assert_index_consistent(model)
+
+        # an edge added in place is found by the maps of the whole graph.
+        relu.input[0] = "sum"
+        self.assertIs(model.output_name_to_node()["sum"], add)
+        self.assertEqual([node.name for node in model.input_name_to_nodes()["sum"]], ["relu"])
+        self.assertIs(model.get_parent(relu, 0), add)
+
+    def test_prune_graph(self):
+        model = OnnxModel(create_test_model())
+        model.add_node(helper.make_node("Sigmoid", ["relu_out"], ["dangling"], name="sigmoid"))
+        model.prune_graph()
+        self.assertEqual([node.name for node in model.nodes()], ["add", "relu", "mul"])
+        self.assertEqual([tensor.name for tensor in model.graph().initializer], ["weight"])
+        self.assertIsNone(model.get_initializer("unused_weight"))
+        self.assert_index_consistent(model)
+
+    def test_direct_changes(self):
+        model = OnnxModel(create_test_model())
+        model.input_name_to_nodes()
+
+        # nodes added through the protobuf are detected
+        model.graph().node.extend([helper.make_node("Neg", ["output"], ["neg_out"], name="neg")])
+        self.assertEqual(model.get_children(model.get_nodes_by_op_type("Mul")[0])[0].name, "neg")
+        self.assert_index_consistent(model)
+
+        # in place changes need invalidate_index
+        model.get_nodes_by_op_type("Neg")[0].input[0] = "add_out"
+        model.invalidate_index()
+        self.assertEqual([node.name for node in model.input_name_to_nodes()["add_out"]], ["relu", "neg"])
+        self.assert_index_consistent(model)
+
+    def test_prune_graph_after_direct_changes(self):
+        model = OnnxModel(create_test_model())
+        model.input_name_to_nodes()
+
+        # bypass Relu without telling the model, then prune
+        model.get_nodes_by_op_type("Mul")[0].input[0] = "add_out"
+        model.get_nodes_by_op_type("Mul")[0].input[1] = "add_out"
+        model.prune_graph()
+        self.assertEqual([node.name for node in model.nodes()], ["add", "mul"])
+        self.assert_index_consistent(model)
+
+    def test_returned_maps_are_copies(self):
+        model = OnnxModel(create_test_model())
+        input_name_to_nodes = model.input_name_to_nodes()
+        input_name_to_nodes["relu_out"].append(model.get_nodes_by_op_type("Add")[0])
+        del model.output_name_to_node()["output"]
+        model.get_nodes_by_op_type("Relu").clear()
+        self.assert_index_consistent(model)
+
+
+class TestMatchParentPath(unittest.TestCase):
+    def test_compiled_pattern(self):
+        pattern = ParentPathPattern.compile(["Relu", "Add"], [0, 0])
+        self.assertIs(ParentPathPattern.compile(("Relu", "Add"), (0, 0)), pattern)
+        self.assertIsNot(ParentPathPattern.compile(["Relu", "Add"]), pattern)
+        self.assertIsNotNone(ParentPathPattern._compile.cache_info().maxsize)
+
+        model = OnnxModel(create_test_model())
+        mul = model.get_nodes_by_op_type("Mul")[0]
+        self.assertEqual([node.name for node in model.match_parent_path(mul, pattern)], ["relu", "add"])
+
+    def test_match(self):
+        model = OnnxModel(create_test_model())
+        mul = model.get_nodes_by_op_type("Mul")[0]
+        output_name_to_node = model.output_name_to_node()
+        for _ in range(2):  # second time is from cache
+            for name_to_node in [None, output_name_to_node]:
+                return_indice = []
+                parents = model.match_parent_path(mul, ["Relu", "Add"], [1, None], name_to_node, return_indice)
+                self.assertEqual([node.name for node in parents], ["relu", "add"])
+                self.assertEqual(return_indice, [0])
+
+                # partial indices are still returned when the path does not match.
+                return_indice = []
+                self.assertIsNone(
+                    model.match_parent_path(mul, ["Relu", "Mul"], [None, None], name_to_node, return_indice)
+                )
+                self.assertEqual(return_indice, [0, None])
+
+                self.assertIsNone(model.match_parent_path(mul, ["Relu", "Add"], [2, 0], name_to_node))
+                self.assertIsNone(model.match_parent_path(mul, ["Relu", "Gelu"], [0, 0], name_to_node))
+
+        parents = model.match_parent_path(mul, ["Relu", "Add"], [0, 0])
+        parents.clear()
+        self.assertEqual(len(model.match_parent_path(mul, ["Relu", "Add"], [0, 0])), 2)
+
+    def test_cached_result_after_graph_changes(self):
+        model = OnnxModel(create_test_model())
+        mul = model.get_nodes_by_op_type("Mul")[0]
+        self.assertIsNotNone(model.match_parent_path(mul, ["Relu", "Add"], [0, 0]))
+
+        # in place change of node inputs is detected
+        mul.input[0] = "add_out"
+        self.assertIsNone(model.match_parent_path(mul, ["Relu", "Add"], [0, 0]))
+        self.assertEqual(model.match_parent_path(mul, ["Add"], [0])[0].name, "add")
+        mul.input[0] = "relu_out"
+        self.assertIsNotNone(model.match_parent_path(mul, ["Relu", "Add"], [0, 0]))
+
+        model.remove_node(model.get_nodes_by_op_type("Add")[0])
+        self.assertIsNone(model.match_parent_path(mul, ["Relu", "Add"], [0, 0]))
+        model.add_node(helper.make_node("Sub", ["input", "weight"], ["add_out"], name="sub"))
+        self.assertEqual([node.name for node in model.match_parent_path(mul, ["Relu", "Sub"], [0, 0])], ["relu", "sub"])
+
+    def test_cache_during_fusion(self):
+        model = OnnxModel(create_test_model())
+        mul = model.get_nodes_by_op_type("Mul")[0]
+        output_name_to_node = model.output_name_to_node()
+        self.assertIsNotNone(model.match_parent_path(mul, ["Relu", "Add"], [0, 0], output_name_to_node))
+        self.assertEqual(len(model._parent_path_cache), 1)
+
+        # Cached results are kept when only node inputs are changed, and a changed input is checked.
+        model.replace_input_of_node(mul, "relu_out", "add_out")
+        self.assertEqual(len(model._parent_path_cache), 1)
+        self.assertEqual(model.match_parent_path(mul, ["Add"], [0], output_name_to_node)[0].name, "add")
+        self.assertIsNone(model.match_parent_path(mul, ["Relu", "Add"], [0, 0], output_name_to_node))
+        self.assertEqual(len(model._parent_path_cache), 2)
+
+        # The copy is not used for lookups in the index after a producer is changed.
+        add = model.get_nodes_by_op_type("Add")[0]
+        model.replace_output_of_node(add, "add_out", "add_out_2")
+        self.assertEqual(model.match_parent_path(mul, ["Add"], [0], output_name_to_node)[0].name, "add")
+        self.assertIsNone(model.match_parent_path(mul, ["Add"]))
+        self.assertEqual(len(model._parent_path_cache), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -7,7 +7,9 @@
 
 # For live logging, use the command: pytest -o log_cli=true --log-cli-level=DEBUG
 
+import json
 import os
+import tempfile
 import unittest
 
 import pytest
@@ -39,6 +41,127 @@ class TestBertProfiler(unittest.TestCase):
         self.run_profile(f"--model {input_model_path} --batch_size 1 --sequence_length 7 --dummy_inputs default")
 
 
+class TestProfileParser(unittest.TestCase):
+    def _create_events(self, runs):
+        events = [
+            {"cat": "Session", "name": "model_loading_uri", "dur": 139, "args": {}},
+            {"cat": "Kernel", "name": "memcpy_before_init", "dur": 3, "args": {"op_name": ""}},
+            {"cat": "Session", "name": "session_initialization", "dur": 722, "args": {}},
+        ]
+        for run in range(runs):
+            for node, op_type in [("matmul", "MatMul"), ("add", "Add"), ("loop", "Loop")]:
+                events.append({"cat": "Node", "name": f"{node}_fence_before", "dur": 1, "args": {"op_name": op_type}})
+                events.append(
+                    {
+                        "cat": "Node",
+                        "name": f"{node}_kernel_time",
+                        "dur": 10 + run,
+                        "args": {"op_name": op_type, "provider": "CUDAExecutionProvider"},
+                    }
+                )
+                events.append({"cat": "Node", "name": f"{node}_fence_after", "dur": 0, "args": {"op_name": op_type}})
+                events.append(
+                    {"cat": "Kernel", "name": f"{op_type}_kernel", "dur": 7 + run, "args": {"op_name": op_type}}
+                )
+            events.append({"cat": "Kernel", "name": "memcpy", "dur": 2, "args": {"op_name": ""}})
+            events.append({"cat": "Session", "name": "model_run", "dur": 50.5, "args": {}})
+        return events
+
+    def test_parse_profile_results(self):
+        from onnxruntime.transformers.profiler import (
+            group_node_results,
+            iterate_profile_json,
+            parse_kernel_results,
+            parse_node_results,
+            parse_profile_results,
+        )
+
+        events = self._create_events(runs=20)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            list_file = os.path.join(tmp_dir, "profile.json")
+            with open(list_file, "w") as f:
+                f.write("[\n" + ",\n".join(json.dumps(event) for event in events) + "\n]\n")
+            trace_file = os.path.join(tmp_dir, "trace.json")
+            with open(trace_file, "w") as f:
+                json.dump({"displayTimeUnit": "ns", "traceEvents": events, "otherData": {"version": 1.5}}, f)
+
+            for profile_file in [list_file, trace_file]:
+                self.assertEqual(list(iterate_profile_json(profile_file, chunk_size=7)), events)
+
+            for kernel_time_only in [False, True]:
+                expected = parse_kernel_results(events, 0.1)
+                expected += parse_node_results(events, kernel_time_only, 0.1)
+                expected += group_node_results(events, kernel_time_only, True)
+                for profile_file in [list_file, trace_file]:
+                    self.assertEqual(parse_profile_results(profile_file, kernel_time_only, 0.1, True), expected)
+
+            with open(list_file, "w") as f:
+                f.write(json.dumps(events)[:-100])
+            with self.assertRaises(ValueError):
+                list(iterate_profile_json(list_file, chunk_size=7))
+
+    def test_profile_store(self):
+        import numpy
+
+        from onnxruntime.transformers.profile_store import ProfileStore
+
+        events = self._create_events(runs=20)
+        for event in events:
+            if event["name"] == "add_kernel_time":
+                event["args"]["input_type_shape"] = [{"float": [2, 8]}, {"float": [8]}]
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            profile_file = os.path.join(tmp_dir, "profile.json")
+            with open(profile_file, "w") as f:
+                json.dump(events, f)
+            store = ProfileStore.from_file(profile_file)
+
+        self.assertEqual(len(store), 40)
+        self.assertEqual(list(store.get_column("run")[:4]), [0, 0, 1, 1])
+
+        expected_duration = numpy.arange(10, 30)
+        table = store.group_by(["node", "op_type", "provider", "input_shape"], percentiles=[50, 99])
+        self.assertEqual(list(table["node"]), ["matmul", "add"])
+        self.assertEqual(list(table["provider"]), ["CUDA", "CUDA"])
+        self.assertEqual(list(table["input_shape"]), ["", "float[2,8],float[8]"])
+        self.assertEqual(list(table["count"]), [20, 20])
+        self.assertEqual(list(table["total"]), [expected_duration.sum()] * 2)
+        self.assertEqual(list(table["min"]), [10, 10])
+        self.assertEqual(list(table["max"]), [29, 29])
+        for q in [50, 99]:
+            self.assertEqual(list(table[f"p{q}"]), [numpy.percentile(expected_duration, q)] * 2)
+
+        table = store.group_by(["run"])
+        self.assertEqual(list(table["run"]), list(range(19, -1, -1)))
+        self.assertEqual(list(table["total"]), [2 * (29 - run) for run in range(20)])
+
+        table = store.group_by([])
+        self.assertEqual(list(table["count"]), [40])
+
+        with self.assertRaises(ValueError):
+            store.group_by(["kernel"])
+
+        # Baseline has the slowest run of add node removed, and an extra node.
+        baseline_events = [event for event in events if not (event["name"] == "add_kernel_time" and event["dur"] == 29)]
+        baseline_events.append(
+            {
+                "cat": "Node",
+                "name": "gelu_kernel_time",
+                "dur": 5,
+                "args": {"op_name": "Gelu", "provider": "CPUExecutionProvider"},
+            }
+        )
+        baseline = ProfileStore.from_events(baseline_events)
+        table = store.diff(baseline, ["node"], percentiles=[99])
+        self.assertEqual(list(table["node"]), ["add", "matmul", "gelu"])
+        self.assertEqual(list(table["count_diff"][:2]), [1, 0])
+        self.assertAlmostEqual(
+            table["p99_diff"][0], numpy.percentile(expected_duration, 99) - numpy.percentile(expected_duration[:-1], 99)
+        )
+        self.assertEqual(table["p99_diff"][1], 0)
+        self.assertEqual(table["count_base"][2], 1)
+        self.assertTrue(numpy.isnan(table["count"][2]))
+
+
 if __name__ == "__main__":
     import sys
 
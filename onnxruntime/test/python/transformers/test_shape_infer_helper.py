@@ -1,20 +1,24 @@
+import os
+import tempfile
 import unittest
 
+import numpy as np
 import onnx
 import pytest
 import torch
+from onnx import TensorProto, helper, numpy_helper
 from parity_utilities import find_transformers_source
 
 if find_transformers_source():
     from benchmark_helper import ConfigModifier, OptimizerInfo, Precision
     from huggingface_models import MODELS
     from onnx_exporter import export_onnx_model_from_pt
-    from shape_infer_helper import SymbolicShapeInferenceHelper
+    from shape_infer_helper import ShapeInferenceCache, SymbolicShapeInferenceHelper
 else:
     from onnxruntime.transformers.benchmark_helper import ConfigModifier, OptimizerInfo, Precision
     from onnxruntime.transformers.huggingface_models import MODELS
     from onnxruntime.transformers.onnx_exporter import export_onnx_model_from_pt
-    from onnxruntime.transformers.shape_infer_helper import SymbolicShapeInferenceHelper
+    from onnxruntime.transformers.shape_infer_helper import ShapeInferenceCache, SymbolicShapeInferenceHelper
 
 
 class SymbolicShapeInferenceHelperTest(unittest.TestCase):
@@ -74,5 +78,72 @@ class SymbolicShapeInferenceHelperTest(unittest.TestCase):
         self.assertEqual(shape_infer_helper.compare_shape("447", "853"), False)
 
 
+class ShapeInferenceCacheTest(unittest.TestCase):
+    def _create_model(self):
+        graph = helper.make_graph(
+            [
+                helper.make_node("MatMul", ["input", "weight"], ["matmul_out"], name="matmul"),
+                helper.make_node("Reshape", ["matmul_out", "shape"], ["output"], name="reshape"),
+            ],
+            "graph",
+            [helper.make_tensor_value_info("input", TensorProto.FLOAT, ["batch_size", "seq_len", 8])],
+            [helper.make_tensor_value_info("output", TensorProto.FLOAT, None)],
+            [
+                numpy_helper.from_array(np.ones((8, 4), dtype=np.float32), "weight"),
+                numpy_helper.from_array(np.array([0, -1], dtype=np.int64), "shape"),
+            ],
+        )
+        return helper.make_model(graph, opset_imports=[helper.make_opsetid("", 13)])
+
+    def test_infer(self):
+        model = self._create_model()
+        with tempfile.TemporaryDirectory() as cache_dir:
+            shape_infer_helper = SymbolicShapeInferenceHelper(model, cache_dir=cache_dir)
+            self.assertTrue(shape_infer_helper.infer({"batch_size": 2, "seq_len": 3}))
+            self.assertEqual(len(os.listdir(cache_dir)), 1)
+
+            cached_helper = SymbolicShapeInferenceHelper(model, cache_dir=cache_dir)
+            self.assertTrue(cached_helper.infer({"batch_size": 2, "seq_len": 3}))
+            self.assertFalse(hasattr(cached_helper, "out_mp_"))  # shape inference is not run
+            self.assertEqual(cached_helper.known_vi_, shape_infer_helper.known_vi_)
+            self.assertEqual(cached_helper.get_edge_shape("output"), [2, 12])
+
+            # dynamic axis mapping is part of the key
+            other_helper = SymbolicShapeInferenceHelper(model, cache_dir=cache_dir)
+            self.assertTrue(other_helper.infer({"batch_size": 4, "seq_len": 3}))
+            self.assertEqual(other_helper.get_edge_shape("output"), [4, 12])
+            self.assertEqual(len(os.listdir(cache_dir)), 2)
+
+            # so is the graph
+            model.graph.initializer[1].CopyFrom(numpy_helper.from_array(np.array([-1], dtype=np.int64), "shape"))
+            cache = ShapeInferenceCache(cache_dir)
+            self.assertIsNone(cache.load(cache.get_key(model)))
+
+    def test_key(self):
+        model = self._create_model()
+        cache = ShapeInferenceCache("cache")
+        key = cache.get_key(model)
+
+        # values of float weights are not part of the key, while their dims are.
+        model.graph.initializer[0].CopyFrom(numpy_helper.from_array(np.zeros((8, 4), dtype=np.float32), "weight"))
+        self.assertEqual(cache.get_key(model), key)
+        model.graph.initializer[0].CopyFrom(numpy_helper.from_array(np.zeros((8, 5), dtype=np.float32), "weight"))
+        self.assertNotEqual(cache.get_key(model), key)
+
+        # values of small integer initializers are part of the key, since they might be shapes.
+        model = self._create_model()
+        model.graph.initializer[1].CopyFrom(numpy_helper.from_array(np.array([0, 4], dtype=np.int64), "shape"))
+        self.assertNotEqual(cache.get_key(model), key)
+
+    def test_infer_shapes(self):
+        model = self._create_model()
+        expected = SymbolicShapeInferenceHelper.infer_shapes(model, auto_merge=True)
+        with tempfile.TemporaryDirectory() as cache_dir:
+            for _ in range(2):
+                inferred = SymbolicShapeInferenceHelper.infer_shapes(model, auto_merge=True, cache_dir=cache_dir)
+                self.assertEqual(len(os.listdir(cache_dir)), 1)
+                self.assertEqual(inferred, expected)
+
+
 if __name__ == "__main__":
     unittest.main()